@@ -0,0 +1,27 @@
+"""Add telegram_file_id to image_generations
+
+Revision ID: a7c3e9d41b52
+Revises: f2488211585a
+Create Date: 2026-10-17 12:00:00.000000+05:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e9d41b52'
+down_revision: Union[str, None] = 'f2488211585a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # file_id первого отправленного в Telegram изображения - галерея показывает его без повторной загрузки
+    op.add_column('image_generations', sa.Column('telegram_file_id', sa.String(length=255), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('image_generations', 'telegram_file_id')
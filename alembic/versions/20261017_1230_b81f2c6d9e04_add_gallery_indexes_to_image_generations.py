@@ -0,0 +1,86 @@
+"""Add gallery indexes to image_generations
+
+Revision ID: b81f2c6d9e04
+Revises: a7c3e9d41b52
+Create Date: 2026-10-17 12:30:00.000000+05:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81f2c6d9e04'
+down_revision: Union[str, None] = 'a7c3e9d41b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COMPLETED = sa.text("status = 'completed'")
+
+
+def upgrade() -> None:
+    """
+    Индексы под запросы галереи (GalleryService._build_filter_conditions)
+
+    Все индексы упорядочены как keyset-пагинация (created_at DESC, id DESC),
+    поэтому страница читается из индекса без сортировки. Создаются
+    CONCURRENTLY, чтобы не блокировать запись в большую таблицу.
+    """
+    with op.get_context().autocommit_block():
+        # Общий составной индекс: история генераций пользователя по статусу
+        op.create_index(
+            'ix_image_generations_user_status_created',
+            'image_generations',
+            ['user_id', 'status', sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+        # Основная лента галереи: только завершенные
+        op.create_index(
+            'ix_image_generations_user_completed',
+            'image_generations',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_where=COMPLETED,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+        # Фильтр "избранное"
+        op.create_index(
+            'ix_image_generations_user_favorites',
+            'image_generations',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_where=sa.text("status = 'completed' AND is_favorite"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+        # Фильтр по аватарам
+        op.create_index(
+            'ix_image_generations_user_avatar_completed',
+            'image_generations',
+            ['user_id', 'avatar_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_where=COMPLETED,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in (
+            'ix_image_generations_user_avatar_completed',
+            'ix_image_generations_user_favorites',
+            'ix_image_generations_user_completed',
+            'ix_image_generations_user_status_created',
+        ):
+            op.drop_index(
+                name,
+                table_name='image_generations',
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,77 @@
+"""Add balance_transactions ledger
+
+Revision ID: c4d8f2a6b913
+Revises: b81f2c6d9e04
+Create Date: 2026-10-17 13:00:00.000000+05:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d8f2a6b913'
+down_revision: Union[str, None] = 'b81f2c6d9e04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Журнал операций с балансом: только вставка, amount со знаком (списание < 0)
+    op.create_table('balance_transactions',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('balance_after', sa.Float(), nullable=True),
+        sa.Column('kind', sa.String(length=32), nullable=False),
+        sa.Column('description', sa.String(length=255), nullable=True),
+        sa.Column('idempotency_key', sa.String(length=128), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('idempotency_key', name='uq_balance_transactions_idempotency_key')
+    )
+    # История операций пользователя
+    op.create_index(
+        'ix_balance_transactions_user_created',
+        'balance_transactions',
+        ['user_id', sa.text('created_at DESC')],
+        unique=False,
+    )
+    # Гонка при создании баланса могла оставить пользователю несколько строк:
+    # сливаем монеты в одну (с наименьшим id), остальные удаляем - иначе
+    # уникальный индекс ниже не создастся
+    op.execute("""
+        WITH duplicates AS (
+            SELECT user_id, (array_agg(id ORDER BY id))[1] AS keep_id, sum(coins) AS total
+            FROM user_balances
+            GROUP BY user_id
+            HAVING count(*) > 1
+        ),
+        merged AS (
+            UPDATE user_balances AS b
+            SET coins = d.total
+            FROM duplicates AS d
+            WHERE b.id = d.keep_id
+        )
+        DELETE FROM user_balances AS b
+        USING duplicates AS d
+        WHERE b.user_id = d.user_id AND b.id <> d.keep_id
+    """)
+    # Одна строка баланса на пользователя: цель ON CONFLICT при создании баланса
+    op.create_index(
+        'uq_user_balances_user_id',
+        'user_balances',
+        ['user_id'],
+        unique=True,
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_user_balances_user_id', table_name='user_balances', if_exists=True)
+    op.drop_index('ix_balance_transactions_user_created', table_name='balance_transactions')
+    op.drop_table('balance_transactions')
@@ -329,6 +329,10 @@ async def handle_fal_webhook(webhook_data: Dict[str, Any]) -> bool:
                 else:
                     logger.warning(f"⚠️ Пользователь не найден для аватара {avatar.id}")
         
+        # Webhook дошел - снимаем обучение с резервного опроса в боте
+        from app.services.avatar.fal_training_service.training_poller import training_poller
+        await training_poller.mark_delivered(request_id, status)
+
         logger.info(f"✅ Webhook успешно обработан для request_id: {request_id}")
         return True
         
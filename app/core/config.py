@@ -34,7 +34,30 @@ class Settings(BaseSettings):
             return dev_token
         # Иначе используем продакшн токен
         return self.TELEGRAM_TOKEN
-    
+
+    # FSM и рантайм обновлений Telegram
+    FSM_STORAGE: str = Field(default="redis")  # redis | memory (memory - только для локальной отладки)
+    AIOGRAM_SESSION_TTL: int = Field(default=86400)  # TTL состояния FSM в Redis (сек)
+    TELEGRAM_WEBHOOK_URL: Optional[str] = Field(default=None)  # Публичный URL, на который Telegram шлет обновления
+    TELEGRAM_WEBHOOK_PATH: str = Field(default="/telegram/webhook")
+    TELEGRAM_WEBHOOK_SECRET: Optional[str] = Field(default=None)  # X-Telegram-Bot-Api-Secret-Token
+    WEBHOOK_LISTEN_HOST: str = Field(default="0.0.0.0")
+    WEBHOOK_LISTEN_PORT: int = Field(default=8080)
+    UPDATE_SHARDS: int = Field(default=16)  # Шардов очереди обновлений (чат всегда попадает в один шард)
+    UPDATE_STREAM_MAXLEN: int = Field(default=10000)  # Примерная длина стрима одного шарда
+    UPDATE_WORKER_CONCURRENCY: int = Field(default=64)  # Обновлений в обработке на одну реплику
+    UPDATE_CHAT_ORDER_TIMEOUT: int = Field(default=30)  # Сколько следующее обновление чата ждет предыдущее (сек)
+    UPDATE_LEASE_TTL: int = Field(default=15)  # Аренда шарда репликой (сек)
+
+    # Очередь фоновых задач (Redis Streams, обрабатывает BOT_MODE=worker)
+    JOB_QUEUE_ENABLED: bool = Field(default=False)  # Ставить генерации в очередь (нужен запущенный worker)
+    JOB_STREAM_MAXLEN: int = Field(default=10000)  # Примерная длина стрима очереди
+    JOB_WORKER_CONCURRENCY: int = Field(default=8)  # Задач в обработке на один воркер
+    JOB_VISIBILITY_TIMEOUT: int = Field(default=120)  # Простой задачи без продления, после которого ее заберет другой воркер (сек)
+    JOB_MAX_ATTEMPTS: int = Field(default=5)  # Попыток до переноса в dead letter
+    JOB_RETRY_BACKOFF: float = Field(default=10.0)  # Задержка первого повтора, далее удваивается (сек)
+    JOB_RETRY_BACKOFF_MAX: float = Field(default=600.0)  # Максимальная задержка повтора (сек)
+
     # BACKEND_URL: str = "http://localhost:8000"  # LEGACY - удален
     
     # OpenAI
@@ -62,9 +85,23 @@ class Settings(BaseSettings):
     FAL_TRAINING_TIMEOUT: int = Field(1800, env="FAL_TRAINING_TIMEOUT")  # 30 минут
     FAL_STATUS_CHECK_INTERVAL: int = Field(30, env="FAL_STATUS_CHECK_INTERVAL")  # секунд
     FAL_MAX_RETRIES: int = Field(3, env="FAL_MAX_RETRIES")
+    FAL_TRAINING_POLL_INITIAL_DELAY: int = Field(90, env="FAL_TRAINING_POLL_INITIAL_DELAY")  # Первая проверка после запуска (сек)
+    FAL_TRAINING_POLL_MIN_INTERVAL: int = Field(30, env="FAL_TRAINING_POLL_MIN_INTERVAL")  # секунд
+    FAL_TRAINING_POLL_MAX_INTERVAL: int = Field(300, env="FAL_TRAINING_POLL_MAX_INTERVAL")  # секунд
+    FAL_TRAINING_POLL_CONCURRENCY: int = Field(8, env="FAL_TRAINING_POLL_CONCURRENCY")  # Запросов статуса одновременно
+    FAL_TRAINING_POLL_MAX_AGE: int = Field(86400, env="FAL_TRAINING_POLL_MAX_AGE")  # Перестаем опрашивать через (сек)
     FAL_AUTO_MODEL_SELECTION: bool = Field(True, env="FAL_AUTO_MODEL_SELECTION")  # Автовыбор модели
     FAL_DEFAULT_QUALITY_PRESET: str = Field("fast", env="FAL_DEFAULT_QUALITY_PRESET")  # Качество по умолчанию
-    
+    FAL_ARCHIVE_STORAGE: str = Field("fal", env="FAL_ARCHIVE_STORAGE")  # fal - хранилище FAL; minio - бакет аватаров по presigned URL (MinIO должен быть доступен FAL)
+    FAL_ARCHIVE_READ_CONCURRENCY: int = Field(8, env="FAL_ARCHIVE_READ_CONCURRENCY")  # Параллельных чтений фото из MinIO
+    FAL_ARCHIVE_CACHE_TTL: int = Field(7 * 24 * 3600, env="FAL_ARCHIVE_CACHE_TTL")  # секунд хранения ссылки на архив набора фото
+
+    # FAL AI - Параллельная генерация
+    FAL_GENERATION_MAX_CONCURRENCY: int = Field(32, env="FAL_GENERATION_MAX_CONCURRENCY")  # Всего на процесс
+    FAL_GENERATION_MAX_PER_USER: int = Field(2, env="FAL_GENERATION_MAX_PER_USER")  # На одного пользователя
+    FAL_GENERATION_TIMEOUT: int = Field(300, env="FAL_GENERATION_TIMEOUT")  # секунд
+    FAL_GENERATION_POLL_INTERVAL: float = Field(1.0, env="FAL_GENERATION_POLL_INTERVAL")  # секунд
+
     # FAL AI - Пресеты качества (основываясь на документации flux-lora-portrait-trainer)
     FAL_PRESET_FAST: dict = Field(default={
         "portrait": {
@@ -131,6 +168,15 @@ class Settings(BaseSettings):
     SUPPORTED_LANGUAGES: List[str] = ["ru", "en"]
     WHISPER_MODEL: str = "whisper-1"
     WHISPER_LANGUAGE: str = "ru"
+    AUDIO_TRANSCRIBE_CONCURRENCY: int = Field(4, env="AUDIO_TRANSCRIBE_CONCURRENCY")  # Параллельных запросов к Whisper
+    AUDIO_WORKER_PROCESSES: int = Field(0, env="AUDIO_WORKER_PROCESSES")  # 0 = по числу ядер
+    AUDIO_WORKER_QUEUE_SIZE: int = Field(8, env="AUDIO_WORKER_QUEUE_SIZE")  # Задач в ожидании сверх воркеров
+    AUDIO_WORKER_TIMEOUT: int = Field(600, env="AUDIO_WORKER_TIMEOUT")  # секунд на одну задачу
+    AUDIO_SEGMENT_SECONDS: int = Field(60, env="AUDIO_SEGMENT_SECONDS")  # Длина сегмента для Whisper
+    AUDIO_SEGMENT_TIMEOUT: int = Field(1800, env="AUDIO_SEGMENT_TIMEOUT")  # секунд на нарезку файла
+    AUDIO_SPOOL_BACKEND: str = Field("disk", env="AUDIO_SPOOL_BACKEND")  # disk - каталог, общий для процессов бота; minio - бакет MINIO_BUCKET_TEMP
+    AUDIO_SPOOL_DIR: Path = Field(BASE_DIR / "storage" / "audio_spool", env="AUDIO_SPOOL_DIR")  # Аудио, ожидающее оплаты
+    AUDIO_SPOOL_TTL: int = Field(3600, env="AUDIO_SPOOL_TTL")  # секунд до удаления неоплаченной загрузки
     
     # ========== НАСТРОЙКИ АВАТАРОВ ==========
     
@@ -148,9 +194,15 @@ class Settings(BaseSettings):
     PHOTO_MIN_RESOLUTION: int = Field(512, env="PHOTO_MIN_RESOLUTION")
     PHOTO_MAX_RESOLUTION: int = Field(4096, env="PHOTO_MAX_RESOLUTION")
     PHOTO_ALLOWED_FORMATS: List[str] = Field(["jpg", "jpeg", "png", "webp"], env="PHOTO_ALLOWED_FORMATS")
+    IMAGE_WORKER_PROCESSES: int = Field(0, env="IMAGE_WORKER_PROCESSES")  # 0 = по числу ядер
+    IMAGE_WORKER_QUEUE_SIZE: int = Field(32, env="IMAGE_WORKER_QUEUE_SIZE")  # Задач в ожидании сверх воркеров
+    RENDITION_CACHE_MAX_BYTES: int = Field(64 * 1024 * 1024, env="RENDITION_CACHE_MAX_BYTES")  # Копии фото в памяти процесса
+    RENDITION_CACHE_TTL: int = Field(3600, env="RENDITION_CACHE_TTL")  # секунд
     
     # UX настройки
     PHOTO_UPLOAD_TIMEOUT: int = Field(300, env="PHOTO_UPLOAD_TIMEOUT")  # 5 минут
+    PHOTO_ALBUM_COLLECT_DELAY: float = Field(1.0, env="PHOTO_ALBUM_COLLECT_DELAY")  # секунд тишины до обработки альбома
+    PHOTO_ALBUM_DOWNLOAD_CONCURRENCY: int = Field(5, env="PHOTO_ALBUM_DOWNLOAD_CONCURRENCY")  # Параллельных скачиваний фото альбома
     GALLERY_PHOTOS_PER_PAGE: int = Field(6, env="GALLERY_PHOTOS_PER_PAGE")
     TRAINING_STATUS_UPDATE_INTERVAL: int = Field(30, env="TRAINING_STATUS_UPDATE_INTERVAL")  # секунд
     AUTO_GENERATE_PREVIEW: bool = Field(True, env="AUTO_GENERATE_PREVIEW")
@@ -172,6 +224,9 @@ class Settings(BaseSettings):
     PORN_VIDEO_5S_GENERATION_COST: float = Field(30.0, env="PORN_VIDEO_5S_GENERATION_COST")  # Парное видео 5 сек
     PORN_VIDEO_10S_GENERATION_COST: float = Field(60.0, env="PORN_VIDEO_10S_GENERATION_COST")  # Парное видео 10 сек
     TRANSCRIPTION_COST_PER_MINUTE: float = Field(10.0, env="TRANSCRIPTION_COST_PER_MINUTE")  # Транскрибация за минуту
+    BALANCE_REFUND_BATCH_WINDOW_MS: int = Field(50, env="BALANCE_REFUND_BATCH_WINDOW_MS")  # Окно сбора возвратов в пакет
+    BALANCE_REFUND_BATCH_SIZE: int = Field(200, env="BALANCE_REFUND_BATCH_SIZE")  # Максимум возвратов в одном пакете
+    BALANCE_REFUND_RETRIES: int = Field(3, env="BALANCE_REFUND_RETRIES")  # Повторы записи пакета возвратов при ошибке БД
     
     # Пакеты пополнения баланса
     TOPUP_PACKAGES: dict = Field(default={
@@ -227,6 +282,11 @@ class Settings(BaseSettings):
     REDIS_POOL_SIZE: int = Field(default=10)
     REDIS_POOL_TIMEOUT: int = Field(default=5)
     REDIS_MAX_RETRIES: int = Field(default=3)
+    USER_CACHE_L1_SIZE: int = Field(default=10000)  # Пользователей в LRU процесса
+    USER_CACHE_L1_TTL: int = Field(default=60)  # Жизнь записи LRU (сек); изменения из других процессов приходят через pub/sub
+    CACHE_L1_MAX_ITEMS: int = Field(default=50000)  # Записей в L1 CacheService
+    CACHE_L1_MAX_BYTES: int = Field(default=64 * 1024 * 1024)  # Объем сериализованных значений L1 (байт)
+    CACHE_L1_TTL: int = Field(default=10)  # Жизнь записи L1 при доступном Redis (сек)
     
     # PostgreSQL
     POSTGRES_HOST: Optional[str] = Field(default="192.168.0.4")
@@ -260,6 +320,22 @@ class Settings(BaseSettings):
     MINIO_BUCKET_PHOTOS: Optional[str] = Field(default="photos")
     MINIO_BUCKET_TEMP: Optional[str] = Field(default="temp")
     MINIO_PRESIGNED_EXPIRES: int = Field(default=3600)  # Время истечения presigned URL в секундах
+    MINIO_UPLOAD_CONCURRENCY: int = Field(default=4)  # Параллельных загрузок изображений одной генерации
+    MINIO_REGION: str = Field(default="us-east-1")  # Регион для подписи SigV4 (MinIO по умолчанию us-east-1)
+    MINIO_POOL_SIZE: int = Field(default=64)  # Соединений в общем пуле к MinIO на процесс
+    MINIO_PART_SIZE: int = Field(default=8 * 1024 * 1024)  # Размер части multipart-загрузки (не меньше 5MB)
+    MINIO_MULTIPART_CONCURRENCY: int = Field(default=4)  # Частей одной multipart-загрузки в полете
+    MINIO_REQUEST_TIMEOUT: int = Field(default=300)  # Таймаут одного запроса к MinIO (сек)
+
+    # Общий HTTP-клиент (OpenAI, FAL, загрузка изображений)
+    HTTP_POOL_SIZE: int = Field(default=200)  # Соединений в пуле одного профиля на процесс
+    HTTP_KEEPALIVE_TIMEOUT: int = Field(default=30)  # Сколько простаивающее соединение остается в пуле (сек)
+    HTTP_DNS_CACHE_TTL: int = Field(default=300)  # Кеш DNS (сек)
+
+    # Кеш переводов промптов через GPT
+    PROMPT_TRANSLATION_CACHE_TTL: int = Field(default=30 * 24 * 3600)  # Перевод в Redis (сек)
+    PROMPT_TRANSLATION_L1_SIZE: int = Field(default=4096)  # Переводов в LRU процесса
+    VISION_CACHE_TTL: int = Field(default=30 * 24 * 3600)  # Анализ референсного изображения GPT Vision (сек)
     TEMP_DIR: Path = Path("/tmp") if os.name != 'nt' else Path(os.environ.get('TEMP', 'temp'))
     
     # Настройки алертов
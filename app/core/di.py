@@ -2,13 +2,18 @@
 Dependency Injection контейнер
 """
 
+import json
 import logging
 from contextlib import asynccontextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
 from functools import lru_cache
-from typing import Optional
+from typing import Any, Optional
+from uuid import UUID
 
 import redis.asyncio as redis
-from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
 from minio import Minio
 from redis.asyncio import Redis
 from redis.backoff import ExponentialBackoff
@@ -17,6 +22,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_asyn
 
 from app.core.config import settings
 from app.core.database import AsyncSessionLocal
+from app.core.http_client import HttpClientRegistry, get_http_client, shutdown_http_client
 from app.core.logger import get_logger
 from app.services.audio_processing.factory import get_audio_service
 from app.services.audio_processing.service import AudioService as AudioProcessingService
@@ -67,14 +73,40 @@ async def get_redis() -> Redis:
     return get_redis_client()
 
 
+def _fsm_json_default(value: Any) -> Any:
+    """Сериализация значений, которые хендлеры кладут в FSM data (UUID, Enum, даты, Decimal)"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _fsm_json_dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, default=_fsm_json_default)
+
+
 def get_state_storage() -> RedisStorage:
     """
     Получить хранилище состояний
+
+    FSM хранится в Redis, поэтому состояние пользователя видят все
+    экземпляры бота (polling, webhook и воркеры обновлений).
     """
     global _state_storage
     if _state_storage is None:
         redis = get_redis_client()
-        _state_storage = RedisStorage(redis=redis)
+        _state_storage = RedisStorage(
+            redis=redis,
+            key_builder=DefaultKeyBuilder(prefix="aisha:fsm", with_bot_id=True),
+            state_ttl=settings.AIOGRAM_SESSION_TTL,
+            data_ttl=settings.AIOGRAM_SESSION_TTL,
+            json_dumps=_fsm_json_dumps,
+        )
     return _state_storage
 
 
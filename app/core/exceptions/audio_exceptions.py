@@ -190,6 +190,11 @@ class FFmpegNotAvailableError(AudioProcessingError):
     pass
 
 
+class AudioWorkerBusyError(AudioProcessingError):
+    """Очередь пула аудио-воркеров переполнена"""
+    pass
+
+
 class InsufficientBalanceError(AishaBaseException):
     """Недостаточно средств на балансе"""
     pass 
\ No newline at end of file
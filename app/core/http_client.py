@@ -0,0 +1,283 @@
+"""
+Общий HTTP-клиент процесса
+
+Сессии aiohttp с пулом соединений на каждый профиль (OpenAI, FAL, загрузка
+изображений): keep-alive и кеш DNS вместо нового TCP/TLS соединения на
+каждый запрос. Единые таймауты и повторы, метрики задержек по эндпоинтам.
+Получать через app.core.di.get_http_client().
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Статусы, после которых запрос повторяется
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Методы, которые можно повторить после обрыва уже отправленного запроса
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# Максимальное ожидание по заголовку Retry-After (сек)
+MAX_RETRY_AFTER = 30.0
+
+
+@dataclass(frozen=True)
+class HttpProfile:
+    """Настройки пула и политики запросов одной группы хостов"""
+    name: str
+    timeout: float  # Общий таймаут запроса (сек)
+    connect_timeout: float = 10.0
+    limit_per_host: int = 32
+    retries: int = 2
+    backoff: float = 0.5
+
+
+PROFILES: Dict[str, HttpProfile] = {
+    # OpenAI: chat completions, vision, whisper
+    "openai": HttpProfile("openai", timeout=60.0, limit_per_host=32),
+    # FAL: CDN результатов генерации
+    "fal": HttpProfile("fal", timeout=120.0, limit_per_host=20),
+    # Загрузка изображений галереи (MinIO presigned URL) - быстрый отказ, без повторов
+    "media": HttpProfile("media", timeout=5.0, connect_timeout=3.0, limit_per_host=32, retries=0),
+    "default": HttpProfile("default", timeout=30.0),
+}
+
+
+class EndpointMetrics:
+    """Счетчики и окно задержек (мс) одного эндпоинта"""
+
+    __slots__ = ("requests", "errors", "retries", "statuses", "latencies")
+
+    def __init__(self, window: int = 1024):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.statuses: Dict[int, int] = {}
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+    def observe(self, latency_ms: float, status: Optional[int]) -> None:
+        self.requests += 1
+        self.latencies.append(latency_ms)
+        if status is None:
+            self.errors += 1
+        else:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 1)
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "statuses": dict(self.statuses),
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(ordered[-1], 1) if ordered else 0.0,
+        }
+
+
+class HttpClientRegistry:
+    """
+    Реестр HTTP-сессий процесса
+
+    - Одна сессия на профиль и event loop; пул соединений на хост,
+      keep-alive и кеш DNS
+    - request(): таймаут профиля, повторы с экспоненциальной задержкой
+      (429 с учетом Retry-After, 5xx, сетевые ошибки), метрики задержки
+      до получения заголовков ответа по эндпоинту (хост[/метка])
+
+    HTTP/2 aiohttp не поддерживает - выигрыш дает переиспользование
+    соединений HTTP/1.1 из пула.
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, HttpProfile]] = None):
+        self.profiles = dict(profiles or PROFILES)
+        self._sessions: Dict[str, Tuple[aiohttp.ClientSession, asyncio.AbstractEventLoop]] = {}
+        self.metrics: Dict[str, EndpointMetrics] = {}
+
+    def profile(self, name: str) -> HttpProfile:
+        return self.profiles.get(name) or self.profiles["default"]
+
+    def session(self, profile: str = "default") -> aiohttp.ClientSession:
+        """Сессия профиля (создается при первом обращении в текущем event loop)"""
+        loop = asyncio.get_running_loop()
+        cached = self._sessions.get(profile)
+        if cached is not None:
+            session, session_loop = cached
+            if not session.closed and session_loop is loop:
+                return session
+            if session_loop is not loop:
+                self._close_foreign(profile, session, session_loop)
+
+        config = self.profile(profile)
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=settings.HTTP_POOL_SIZE,
+                limit_per_host=config.limit_per_host,
+                ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL,
+                keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+            ),
+            timeout=aiohttp.ClientTimeout(total=config.timeout, sock_connect=config.connect_timeout),
+        )
+        self._sessions[profile] = (session, loop)
+        return session
+
+    @asynccontextmanager
+    async def request(
+        self,
+        profile: str,
+        method: str,
+        url: str,
+        *,
+        endpoint: Optional[str] = None,
+        retries: Optional[int] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        Запрос с политикой профиля
+
+        Повторы выполняются до того, как ответ отдан вызывающему; последний
+        ответ (в том числе с ошибочным статусом) отдается как есть.
+        Тело запроса должно допускать повторную отправку (json, bytes) -
+        для FormData передавайте retries=0.
+
+        Args:
+            profile: Имя профиля (PROFILES)
+            method: HTTP метод
+            url: URL
+            endpoint: Метка эндпоинта для метрик (по умолчанию хост)
+            retries: Переопределить число повторов профиля
+            **kwargs: Параметры aiohttp (headers, json, data, timeout, ...)
+        """
+        config = self.profile(profile)
+        attempts = 1 + max(0, config.retries if retries is None else retries)
+        metrics = self._metrics(endpoint or urlsplit(url).netloc)
+        session = self.session(profile)
+        method = method.upper()
+
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            started = time.perf_counter()
+            try:
+                response = await session.request(method, url, **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                metrics.observe((time.perf_counter() - started) * 1000, None)
+                if last or not self._retryable_error(method, e):
+                    raise
+                metrics.retries += 1
+                delay = self._backoff(config, attempt)
+                logger.debug(f"[HTTP] {method} {metrics_label(url)}: {type(e).__name__}, повтор через {delay:.2f}с")
+                await asyncio.sleep(delay)
+                continue
+
+            metrics.observe((time.perf_counter() - started) * 1000, response.status)
+            if response.status in RETRY_STATUSES and not last:
+                delay = self._retry_after(response) or self._backoff(config, attempt)
+                response.release()
+                metrics.retries += 1
+                logger.debug(f"[HTTP] {method} {metrics_label(url)}: HTTP {response.status}, повтор через {delay:.2f}с")
+                await asyncio.sleep(delay)
+                continue
+
+            try:
+                yield response
+            finally:
+                response.release()
+            return
+
+    def _metrics(self, endpoint: str) -> EndpointMetrics:
+        metrics = self.metrics.get(endpoint)
+        if metrics is None:
+            metrics = self.metrics[endpoint] = EndpointMetrics()
+        return metrics
+
+    @staticmethod
+    def _retryable_error(method: str, error: Exception) -> bool:
+        # Соединение не установлено - запрос не отправлен, повтор безопасен для любого метода
+        if isinstance(error, aiohttp.ClientConnectorError):
+            return True
+        return method in IDEMPOTENT_METHODS
+
+    @staticmethod
+    def _backoff(config: HttpProfile, attempt: int) -> float:
+        return config.backoff * (2 ** attempt) * random.uniform(0.8, 1.2)
+
+    @staticmethod
+    def _retry_after(response: aiohttp.ClientResponse) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        try:
+            return min(MAX_RETRY_AFTER, max(0.0, float(value))) if value else None
+        except ValueError:
+            return None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Метрики по эндпоинтам"""
+        return {endpoint: metrics.snapshot() for endpoint, metrics in self.metrics.items()}
+
+    async def close(self) -> None:
+        """Закрывает все сессии"""
+        loop = asyncio.get_running_loop()
+        sessions, self._sessions = self._sessions, {}
+        for profile, (session, session_loop) in sessions.items():
+            if session_loop is not loop:
+                self._close_foreign(profile, session, session_loop)
+            elif not session.closed:
+                await session.close()
+
+    @staticmethod
+    def _close_foreign(profile: str, session: aiohttp.ClientSession, session_loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Закрывает сессию другого event loop
+
+        Соединения сессии привязаны к ее loop: закрыть ее можно только там.
+        Если тот loop уже остановлен, закрывать нечем - сессия брошена.
+        """
+        if session.closed:
+            return
+        if session_loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), session_loop)
+            logger.info(f"[HTTP] Сессия профиля {profile} другого event loop закрыта")
+        else:
+            logger.warning(f"[HTTP] Сессия профиля {profile} осталась от остановленного event loop и не закрыта")
+
+
+def metrics_label(url: str) -> str:
+    """URL без query (presigned-подписи не попадают в логи)"""
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+_http_client: Optional[HttpClientRegistry] = None
+
+
+def get_http_client() -> HttpClientRegistry:
+    """Получить HTTP-клиент процесса (Singleton)"""
+    global _http_client
+    if _http_client is None:
+        _http_client = HttpClientRegistry()
+    return _http_client
+
+
+async def shutdown_http_client() -> None:
+    """Закрывает сессии HTTP-клиента, если он был создан"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.close()
+        _http_client = None
@@ -0,0 +1,272 @@
+"""
+Очередь фоновых задач на Redis Streams
+
+Продюсеры (хендлеры и сервисы) кладут задачу в стрим очереди, воркеры
+(BOT_MODE=worker) читают ее через группу потребителей. Задача переживает
+перезапуск процесса: неподтвержденные записи упавшего воркера по
+истечении visibility timeout забирает другой воркер.
+"""
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Группа потребителей всех очередей задач
+JOB_GROUP = "workers"
+
+
+class PermanentJobError(Exception):
+    """Ошибка, которую повтор не исправит - задача сразу уходит в dead letter"""
+
+
+# Переносит наступившие отложенные задачи (повторы с backoff) в стрим очереди.
+# Атомарно: задача не потеряется и не попадет в стрим дважды при нескольких воркерах.
+_PROMOTE_SCRIPT = """
+local jobs = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, job in ipairs(jobs) do
+    redis.call('ZREM', KEYS[1], job)
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', 'job', job)
+end
+return #jobs
+"""
+
+
+class Job:
+    """Задача очереди"""
+
+    __slots__ = ("id", "type", "payload", "attempt", "enqueued_at", "error")
+
+    def __init__(
+        self,
+        type: str,
+        payload: Optional[Dict[str, Any]] = None,
+        id: Optional[str] = None,
+        attempt: int = 0,
+        enqueued_at: Optional[float] = None,
+        error: Optional[str] = None,
+    ):
+        self.id = id or uuid.uuid4().hex
+        self.type = type
+        self.payload = payload or {}
+        self.attempt = attempt
+        self.enqueued_at = enqueued_at or time.time()
+        self.error = error
+
+    def dumps(self) -> str:
+        return json.dumps(
+            {
+                "id": self.id,
+                "type": self.type,
+                "payload": self.payload,
+                "attempt": self.attempt,
+                "enqueued_at": self.enqueued_at,
+                "error": self.error,
+            },
+            ensure_ascii=False,
+            default=str,
+        )
+
+    @classmethod
+    def loads(cls, raw) -> "Job":
+        data = json.loads(raw)
+        return cls(
+            type=data["type"],
+            payload=data.get("payload"),
+            id=data.get("id"),
+            attempt=int(data.get("attempt", 0)),
+            enqueued_at=data.get("enqueued_at"),
+            error=data.get("error"),
+        )
+
+
+class JobQueue:
+    """
+    Очереди задач
+
+    Для очереди <name> (имена из QueueNames):
+    - <name> - стрим задач, группа JOB_GROUP
+    - <name>:delayed - ZSET задач, ждущих повтора (score - время запуска)
+    - <name>:dead - стрим задач, исчерпавших попытки (dead letter)
+    """
+
+    def __init__(
+        self,
+        redis=None,
+        maxlen: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+    ):
+        self._redis = redis
+        self.maxlen = maxlen or settings.JOB_STREAM_MAXLEN
+        self.max_attempts = max(1, max_attempts or settings.JOB_MAX_ATTEMPTS)
+        self.backoff_base = backoff_base or settings.JOB_RETRY_BACKOFF
+        self.backoff_max = backoff_max or settings.JOB_RETRY_BACKOFF_MAX
+
+    async def get_redis(self):
+        """Redis клиент (по умолчанию общий клиент приложения)"""
+        if self._redis is None:
+            from app.core.di import get_redis
+            self._redis = await get_redis()
+        return self._redis
+
+    @staticmethod
+    def delayed_key(queue: str) -> str:
+        return f"{queue}:delayed"
+
+    @staticmethod
+    def dead_key(queue: str) -> str:
+        return f"{queue}:dead"
+
+    async def enqueue(
+        self,
+        queue: str,
+        job_type: str,
+        payload: Optional[Dict[str, Any]] = None,
+        job_id: Optional[str] = None,
+        delay: float = 0,
+    ) -> str:
+        """
+        Ставит задачу в очередь
+
+        Args:
+            queue: Имя очереди (QueueNames)
+            job_type: Тип задачи (по нему воркер выбирает обработчик)
+            payload: Параметры задачи (JSON-сериализуемые)
+            job_id: ID задачи (по умолчанию случайный)
+            delay: Отложить запуск на delay секунд
+
+        Returns:
+            str: ID задачи
+
+        Raises:
+            Exception: Redis недоступен - вызывающий решает, выполнить ли задачу сам
+        """
+        job = Job(job_type, payload, id=job_id)
+        redis = await self.get_redis()
+        if delay > 0:
+            await redis.zadd(self.delayed_key(queue), {job.dumps(): time.time() + delay})
+        else:
+            await redis.xadd(queue, {"job": job.dumps()}, maxlen=self.maxlen, approximate=True)
+        logger.info(f"[JobQueue] Задача {job.type} {job.id} поставлена в {queue}")
+        return job.id
+
+    def retry_delay(self, attempt: int) -> float:
+        """Задержка перед попыткой attempt (экспоненциальная, с ограничением)"""
+        return min(self.backoff_max, self.backoff_base * (2 ** max(0, attempt - 1)))
+
+    async def ensure_group(self, queue: str) -> None:
+        """Создает группу потребителей (и стрим), если их еще нет"""
+        redis = await self.get_redis()
+        try:
+            await redis.xgroup_create(queue, JOB_GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def promote_due(self, queue: str, limit: int = 100) -> int:
+        """Переносит наступившие отложенные задачи в стрим очереди"""
+        redis = await self.get_redis()
+        return int(await redis.eval(
+            _PROMOTE_SCRIPT, 2, self.delayed_key(queue), queue, time.time(), limit, self.maxlen
+        ))
+
+    async def fail(self, queue: str, entry_id: str, job: Job, error: str, retryable: bool = True) -> bool:
+        """
+        Подтверждает неудачную попытку: задача уходит на повтор или в dead letter
+
+        XACK и постановка выполняются одной транзакцией - задача
+        не теряется и не дублируется при падении воркера между ними.
+
+        Returns:
+            bool: True если задача будет повторена
+        """
+        job.attempt += 1
+        job.error = error[:1000]
+        retry = retryable and job.attempt < self.max_attempts
+        redis = await self.get_redis()
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.xack(queue, JOB_GROUP, entry_id)
+            if retry:
+                pipe.zadd(self.delayed_key(queue), {job.dumps(): time.time() + self.retry_delay(job.attempt)})
+            else:
+                pipe.xadd(self.dead_key(queue), {"job": job.dumps()}, maxlen=self.maxlen, approximate=True)
+            await pipe.execute()
+
+        if retry:
+            logger.warning(
+                f"[JobQueue] Задача {job.type} {job.id}: попытка {job.attempt}/{self.max_attempts} "
+                f"не удалась, повтор через {self.retry_delay(job.attempt):.0f}с: {error}"
+            )
+        else:
+            logger.error(f"[JobQueue] Задача {job.type} {job.id} перемещена в {self.dead_key(queue)}: {error}")
+        return retry
+
+    async def ack(self, queue: str, entry_id: str) -> None:
+        """Подтверждает выполненную задачу"""
+        redis = await self.get_redis()
+        await redis.xack(queue, JOB_GROUP, entry_id)
+
+    async def dead_letters(self, queue: str, count: int = 100) -> List[Tuple[str, Job]]:
+        """Последние задачи из dead letter очереди"""
+        redis = await self.get_redis()
+        entries = await redis.xrevrange(self.dead_key(queue), count=count)
+        return [(_decode(entry_id), Job.loads(_field(fields, "job"))) for entry_id, fields in entries]
+
+    async def requeue_dead(self, queue: str, entry_id: str) -> bool:
+        """Возвращает задачу из dead letter в очередь с обнулением попыток"""
+        redis = await self.get_redis()
+        entries = await redis.xrange(self.dead_key(queue), min=entry_id, max=entry_id)
+        if not entries:
+            return False
+        job = Job.loads(_field(entries[0][1], "job"))
+        job.attempt = 0
+        job.error = None
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(queue, {"job": job.dumps()}, maxlen=self.maxlen, approximate=True)
+            pipe.xdel(self.dead_key(queue), entry_id)
+            await pipe.execute()
+        return True
+
+    async def stats(self, queue: str) -> Dict[str, int]:
+        """Размеры очереди: в стриме, в обработке, отложенные, dead letter"""
+        redis = await self.get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.xlen(queue)
+            pipe.xpending(queue, JOB_GROUP)
+            pipe.zcard(self.delayed_key(queue))
+            pipe.xlen(self.dead_key(queue))
+            length, pending, delayed, dead = await pipe.execute(raise_on_error=False)
+
+        if isinstance(pending, dict):
+            pending = pending.get("pending", 0)
+        return {
+            "length": length if isinstance(length, int) else 0,
+            "pending": pending if isinstance(pending, int) else 0,
+            "delayed": delayed if isinstance(delayed, int) else 0,
+            "dead": dead if isinstance(dead, int) else 0,
+        }
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _field(fields: Dict, name: str):
+    return fields.get(name.encode()) or fields.get(name)
+
+
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Получить очередь задач (Singleton)"""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue()
+    return _job_queue
@@ -0,0 +1,88 @@
+"""
+LRU-кеш процесса с TTL записей
+"""
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """
+    LRU с ограничением по числу записей и временем жизни записи
+
+    Если задан maxbytes, суммарный размер записей (weigher, по умолчанию
+    len значения) тоже ограничен. Не потокобезопасен - рассчитан на один
+    event loop.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+        maxbytes: Optional[int] = None,
+        weigher: Callable[[V], int] = len,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self._clock = clock
+        self._weigher = weigher
+        self._data: "OrderedDict[Hashable, Tuple[float, V, int]]" = OrderedDict()
+        self.currbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Значение или None, если записи нет или она истекла"""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        expires_at, value, _ = item
+        if expires_at <= self._clock():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None) -> None:
+        """Кладет значение, вытесняя самые давние записи сверх maxsize/maxbytes"""
+        self._remove(key)
+        size = self._weigher(value) if self.maxbytes is not None else 0
+        if self.maxbytes is not None and size > self.maxbytes:
+            # Запись больше всего кеша - не вытесняем ради нее остальные
+            return
+
+        self._data[key] = (self._clock() + (self.ttl if ttl is None else ttl), value, size)
+        self.currbytes += size
+        while len(self._data) > self.maxsize or (
+            self.maxbytes is not None and self.currbytes > self.maxbytes
+        ):
+            _, (_, _, evicted_size) = self._data.popitem(last=False)
+            self.currbytes -= evicted_size
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        item = self._remove(key)
+        return item[1] if item else None
+
+    def _remove(self, key: Hashable) -> Optional[Tuple[float, V, int]]:
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.currbytes -= item[2]
+        return item
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.currbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
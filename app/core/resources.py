@@ -67,6 +67,9 @@ class QueueNames:
     AVATAR_TRAINING = "aisha:v2:avatar:training"
     AVATAR_GENERATION = "aisha:v2:avatar:generation"
     NOTIFICATIONS = "aisha:v2:notifications"
+    GENERATION_EVENTS = "aisha:v2:generation:events"  # pub/sub канал статусов генераций
+    TELEGRAM_UPDATES = "aisha:v2:telegram:updates"  # префикс стримов входящих обновлений (по шардам)
+    USER_INVALIDATIONS = "aisha:v2:user:invalidate"  # pub/sub канал сброса кеша пользователей в процессах
 
 
 # Лимиты API
@@ -0,0 +1,99 @@
+"""
+Очередь входящих обновлений Telegram на Redis Streams
+
+Webhook кладет обновление в стрим шарда, воркеры разбирают шарды.
+Все обновления одного чата попадают в один шард, поэтому их порядок
+сохраняется при любом числе реплик.
+"""
+import json
+import zlib
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.resources import QueueNames
+
+# Группа потребителей стримов обновлений
+UPDATE_GROUP = "bot"
+
+# Имя потребителя одно на все реплики: шард читает только владелец аренды,
+# и новый владелец забирает незавершенные (pending) записи предыдущего
+UPDATE_CONSUMER = "owner"
+
+
+def update_chat_key(update: Dict[str, Any]) -> str:
+    """
+    Ключ упорядочивания обновления: чат, иначе пользователь
+
+    Args:
+        update: Обновление Telegram в виде словаря (как пришло в webhook)
+
+    Returns:
+        str: "c<chat_id>", "u<user_id>" или "x<update_id>" для обновлений без чата
+    """
+    for name, event in update.items():
+        if name == "update_id" or not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return f"c{chat['id']}"
+        user = event.get("from") or event.get("user")
+        if isinstance(user, dict) and "id" in user:
+            return f"u{user['id']}"
+    return f"x{update.get('update_id', 0)}"
+
+
+def update_shard(chat_key: str, shards: int) -> int:
+    """Номер шарда для ключа чата (стабилен между процессами)"""
+    return zlib.crc32(chat_key.encode()) % shards
+
+
+class UpdateQueue:
+    """
+    Шардированная очередь обновлений
+
+    - Стримы aisha:v2:telegram:updates:<shard>, длина ограничена MAXLEN ~
+    - Запись: JSON обновления и ключ чата
+    """
+
+    def __init__(
+        self,
+        redis=None,
+        shards: Optional[int] = None,
+        prefix: str = QueueNames.TELEGRAM_UPDATES,
+        maxlen: Optional[int] = None,
+    ):
+        self._redis = redis
+        self.shards = max(1, shards or settings.UPDATE_SHARDS)
+        self.prefix = prefix
+        self.maxlen = maxlen or settings.UPDATE_STREAM_MAXLEN
+
+    async def get_redis(self):
+        """Redis клиент (по умолчанию общий клиент приложения)"""
+        if self._redis is None:
+            from app.core.di import get_redis
+            self._redis = await get_redis()
+        return self._redis
+
+    def stream(self, shard: int) -> str:
+        """Имя стрима шарда"""
+        return f"{self.prefix}:{shard}"
+
+    async def publish(self, update: Dict[str, Any]) -> str:
+        """
+        Кладет обновление в стрим его шарда
+
+        Returns:
+            str: ID записи в стриме
+
+        Raises:
+            Exception: Redis недоступен (webhook вернет ошибку, Telegram повторит доставку)
+        """
+        chat_key = update_chat_key(update)
+        redis = await self.get_redis()
+        entry_id = await redis.xadd(
+            self.stream(update_shard(chat_key, self.shards)),
+            {"k": chat_key, "u": json.dumps(update, ensure_ascii=False)},
+            maxlen=self.maxlen,
+            approximate=True,
+        )
+        return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
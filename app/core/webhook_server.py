@@ -0,0 +1,104 @@
+"""
+Прием обновлений Telegram через webhook на aiohttp
+
+Сервер только проверяет секрет и кладет обновление в UpdateQueue,
+обработку выполняют воркеры обновлений (в этом же процессе или в других).
+"""
+import hmac
+import logging
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+
+from app.core.config import settings
+from app.core.http_client import get_http_client
+from app.core.update_queue import UpdateQueue
+
+logger = logging.getLogger(__name__)
+
+_QUEUE_KEY = web.AppKey("update_queue", UpdateQueue)
+
+
+async def _handle_update(request: web.Request) -> web.Response:
+    """Принимает обновление и ставит его в очередь"""
+    secret = settings.TELEGRAM_WEBHOOK_SECRET
+    if secret:
+        received = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(received, secret):
+            return web.Response(status=401)
+
+    try:
+        update = await request.json()
+    except ValueError:
+        return web.Response(status=400)
+
+    try:
+        await request.app[_QUEUE_KEY].publish(update)
+    except Exception as e:
+        # Telegram повторит доставку при ответе не 2xx
+        logger.error(f"[Webhook] Не удалось поставить обновление {update.get('update_id')} в очередь: {e}")
+        return web.Response(status=503)
+
+    return web.Response()
+
+
+async def _handle_health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok", "instance": settings.INSTANCE_ID})
+
+
+async def _handle_http_metrics(request: web.Request) -> web.Response:
+    """Метрики исходящих HTTP-запросов процесса по эндпоинтам"""
+    return web.json_response({"instance": settings.INSTANCE_ID, "endpoints": get_http_client().stats()})
+
+
+def setup_webhook_routes(
+    app: web.Application,
+    queue: UpdateQueue,
+    path: Optional[str] = None,
+) -> web.Application:
+    """
+    Добавляет прием обновлений Telegram в aiohttp-приложение
+
+    Приложение может быть общим с другими HTTP-эндпоинтами процесса.
+    """
+    app[_QUEUE_KEY] = queue
+    app.router.add_post(path or settings.TELEGRAM_WEBHOOK_PATH, _handle_update)
+    app.router.add_get("/health", _handle_health)
+    app.router.add_get("/metrics/http", _handle_http_metrics)
+    return app
+
+
+async def start_webhook_server(
+    bot: Bot,
+    dp: Dispatcher,
+    queue: UpdateQueue,
+    app: Optional[web.Application] = None,
+) -> web.AppRunner:
+    """
+    Запускает aiohttp-сервер webhook и регистрирует webhook в Telegram
+
+    Returns:
+        web.AppRunner: Для остановки через cleanup()
+    """
+    app = setup_webhook_routes(app or web.Application(), queue)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, settings.WEBHOOK_LISTEN_HOST, settings.WEBHOOK_LISTEN_PORT)
+    await site.start()
+    logger.info(
+        f"🌐 Webhook слушает {settings.WEBHOOK_LISTEN_HOST}:{settings.WEBHOOK_LISTEN_PORT}"
+        f"{settings.TELEGRAM_WEBHOOK_PATH}"
+    )
+
+    if settings.TELEGRAM_WEBHOOK_URL:
+        await bot.set_webhook(
+            url=settings.TELEGRAM_WEBHOOK_URL,
+            secret_token=settings.TELEGRAM_WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        logger.info(f"✅ Webhook зарегистрирован: {settings.TELEGRAM_WEBHOOK_URL}")
+    else:
+        logger.warning("⚠️ TELEGRAM_WEBHOOK_URL не задан - webhook в Telegram не регистрируется")
+
+    return runner
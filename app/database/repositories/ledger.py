@@ -0,0 +1,255 @@
+"""
+Репозиторий журнала операций с балансом
+
+Каждая операция - один SQL-запрос: условный UPDATE баланса и вставка
+записи журнала в одном CTE. Проверка "хватает ли средств" выполняется
+самим UPDATE (WHERE coins >= :amount), поэтому параллельные списания
+не могут уйти в минус и не держат блокировку строки дольше запроса.
+"""
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set
+from uuid import UUID, uuid4
+
+import sqlalchemy as sa
+from sqlalchemy import exists, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import UserBalance
+
+# Таблица журнала (миграция c4d8f2a6b913)
+balance_transactions = sa.table(
+    "balance_transactions",
+    sa.column("id", PG_UUID(as_uuid=True)),
+    sa.column("user_id", PG_UUID(as_uuid=True)),
+    sa.column("amount", sa.Float),
+    sa.column("balance_after", sa.Float),
+    sa.column("kind", sa.String),
+    sa.column("description", sa.String),
+    sa.column("idempotency_key", sa.String),
+    sa.column("created_at", sa.DateTime(timezone=True)),
+)
+
+_INSERT_COLUMNS = ["id", "user_id", "amount", "balance_after", "kind", "description", "idempotency_key"]
+
+
+class LedgerResult(NamedTuple):
+    """Результат операции с балансом"""
+    applied: bool                   # Баланс изменен этой операцией
+    balance: Optional[float]        # Баланс после операции (или текущий, если не применена)
+    duplicate: bool = False         # Операция с этим ключом уже была выполнена
+    transaction_id: Optional[UUID] = None
+
+
+class LedgerBatchResult(NamedTuple):
+    """Результат пакетного зачисления"""
+    balances: Dict[UUID, float]     # Новый баланс по пользователям, которым что-то зачислено
+    applied_keys: Set[str]          # Ключи операций, записанных этим пакетом (не повторов)
+
+
+class LedgerEntry(NamedTuple):
+    """Операция для пакетного зачисления"""
+    user_id: UUID
+    amount: float
+    kind: str
+    description: Optional[str] = None
+    idempotency_key: Optional[str] = None
+
+
+class LedgerRepository:
+    """
+    Атомарные операции с балансом и журнал транзакций
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.balances = UserBalance.__table__
+
+    async def apply(
+        self,
+        user_id: UUID,
+        amount: float,
+        kind: str,
+        description: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> LedgerResult:
+        """
+        Изменяет баланс на amount (списание - отрицательное значение)
+
+        Списание применяется только если средств достаточно. Повтор операции
+        с тем же idempotency_key не меняет баланс и возвращает duplicate=True.
+        """
+        result = await self._apply_once(user_id, amount, kind, description, idempotency_key)
+        if result is None and amount > 0 and await self.get_balance(user_id) is None:
+            # Баланса еще нет - создаем пустую строку и повторяем зачисление
+            await self._insert_missing_balances([user_id])
+            await self.session.commit()
+            result = await self._apply_once(user_id, amount, kind, description, idempotency_key)
+        if result is not None:
+            return result
+
+        # Не применено: разбираемся почему (редкий путь, лишний запрос допустим)
+        if idempotency_key and await self._find_by_key(idempotency_key) is not None:
+            return LedgerResult(False, await self.get_balance(user_id), duplicate=True)
+        return LedgerResult(False, await self.get_balance(user_id))
+
+    async def _apply_once(
+        self,
+        user_id: UUID,
+        amount: float,
+        kind: str,
+        description: Optional[str],
+        idempotency_key: Optional[str],
+    ) -> Optional[LedgerResult]:
+        """Условный UPDATE + запись журнала; None - строка баланса не изменена"""
+        transaction_id = uuid4()
+        coins = self.balances.c.coins
+
+        balance_update = (
+            update(self.balances)
+            .where(self.balances.c.user_id == user_id)
+            .values(coins=coins + amount)
+            .returning(coins)
+        )
+        if amount < 0:
+            balance_update = balance_update.where(coins >= -amount)
+        if idempotency_key:
+            balance_update = balance_update.where(
+                ~exists().where(balance_transactions.c.idempotency_key == idempotency_key)
+            )
+        updated = balance_update.cte("balance_update")
+
+        journal_insert = (
+            insert(balance_transactions)
+            .from_select(
+                _INSERT_COLUMNS,
+                select(
+                    literal(transaction_id, PG_UUID(as_uuid=True)),
+                    literal(user_id, PG_UUID(as_uuid=True)),
+                    literal(amount, sa.Float),
+                    updated.c.coins,
+                    literal(kind, sa.String),
+                    literal(description, sa.String),
+                    literal(idempotency_key, sa.String),
+                ),
+            )
+            .returning(balance_transactions.c.balance_after)
+            .cte("journal_insert")
+        )
+
+        try:
+            result = await self.session.execute(select(journal_insert.c.balance_after))
+            new_balance = result.scalar_one_or_none()
+            await self.session.commit()
+        except IntegrityError:
+            # Параллельный запрос с тем же ключом успел первым - весь запрос откатан
+            await self.session.rollback()
+            if not idempotency_key:
+                raise
+            return LedgerResult(False, await self.get_balance(user_id), duplicate=True)
+
+        if new_balance is None:
+            return None
+        return LedgerResult(True, float(new_balance), transaction_id=transaction_id)
+
+    async def apply_many(self, entries: Sequence[LedgerEntry]) -> LedgerBatchResult:
+        """
+        Пакетно зачисляет средства (возвраты) одной транзакцией
+
+        Записи журнала вставляются одним INSERT ... ON CONFLICT DO NOTHING,
+        балансы обновляются одним UPDATE ... FROM (VALUES ...) только на
+        суммы реально вставленных записей - повторы по ключу игнорируются.
+
+        Returns:
+            LedgerBatchResult: Новые балансы и ключи реально записанных операций
+        """
+        if not entries:
+            return LedgerBatchResult({}, set())
+        if any(entry.amount < 0 for entry in entries):
+            raise ValueError("Пакетно можно только зачислять средства")
+
+        rows = [
+            {
+                "id": uuid4(),
+                "user_id": entry.user_id,
+                "amount": entry.amount,
+                "balance_after": None,
+                "kind": entry.kind,
+                "description": entry.description,
+                "idempotency_key": entry.idempotency_key,
+            }
+            for entry in entries
+        ]
+        journal_insert = (
+            pg_insert(balance_transactions)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["idempotency_key"])
+            .returning(
+                balance_transactions.c.user_id,
+                balance_transactions.c.amount,
+                balance_transactions.c.idempotency_key,
+            )
+        )
+        inserted = (await self.session.execute(journal_insert)).all()
+
+        totals: Dict[UUID, float] = defaultdict(float)
+        applied_keys: Set[str] = set()
+        for user_id, amount, idempotency_key in inserted:
+            totals[user_id] += amount
+            applied_keys.add(idempotency_key)
+        if not totals:
+            await self.session.commit()
+            return LedgerBatchResult({}, applied_keys)
+
+        # У кого еще нет строки баланса - создаем пустую, UPDATE ниже зачислит сумму
+        ordered = sorted(totals.items(), key=lambda item: str(item[0]))
+        await self._insert_missing_balances([user_id for user_id, _ in ordered])
+
+        deltas = sa.values(
+            sa.column("user_id", PG_UUID(as_uuid=True)),
+            sa.column("delta", sa.Float),
+            name="deltas",
+        ).data(ordered)
+        balance_update = (
+            update(self.balances)
+            .where(self.balances.c.user_id == deltas.c.user_id)
+            .values(coins=self.balances.c.coins + deltas.c.delta)
+            .returning(self.balances.c.user_id, self.balances.c.coins)
+        )
+        updated = {user_id: float(coins) for user_id, coins in (await self.session.execute(balance_update)).all()}
+        await self.session.commit()
+        return LedgerBatchResult(updated, applied_keys)
+
+    async def get_balance(self, user_id: UUID) -> Optional[float]:
+        """Текущий баланс пользователя или None, если строки баланса нет"""
+        result = await self.session.execute(
+            select(self.balances.c.coins).where(self.balances.c.user_id == user_id)
+        )
+        coins = result.scalar_one_or_none()
+        return float(coins) if coins is not None else None
+
+    async def get_history(self, user_id: UUID, limit: int = 50) -> List[dict]:
+        """Последние операции пользователя"""
+        result = await self.session.execute(
+            select(balance_transactions)
+            .where(balance_transactions.c.user_id == user_id)
+            .order_by(balance_transactions.c.created_at.desc())
+            .limit(limit)
+        )
+        return [dict(row._mapping) for row in result]
+
+    async def _insert_missing_balances(self, user_ids: Sequence[UUID]) -> None:
+        """Пустые строки баланса; уже существующие (в т.ч. созданные параллельно) не трогаются"""
+        await self.session.execute(
+            pg_insert(self.balances)
+            .values([{"user_id": user_id, "coins": 0.0} for user_id in user_ids])
+            .on_conflict_do_nothing(index_elements=["user_id"])
+        )
+
+    async def _find_by_key(self, idempotency_key: str) -> Optional[UUID]:
+        result = await self.session.execute(
+            select(balance_transactions.c.id).where(balance_transactions.c.idempotency_key == idempotency_key)
+        )
+        return result.scalar_one_or_none()
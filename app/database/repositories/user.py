@@ -1,50 +1,86 @@
-"""
-Репозиторий для работы с пользователями
-"""
-from typing import Optional
-
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from app.database.models import User
-from app.database.repositories.base import BaseRepository
-
-
-class UserRepository(BaseRepository[User]):
-    """
-    Репозиторий для работы с пользователями
-    """
-
-    def __init__(self, session: AsyncSession):
-        super().__init__(session, User)
-
-    async def get_by_telegram_id(self, telegram_id: str) -> Optional[User]:
-        """Получить пользователя по Telegram ID"""
-        # Убеждаемся, что telegram_id является строкой
-        if not isinstance(telegram_id, str):
-            # Если это не строка, преобразуем в строку
-            telegram_id = str(telegram_id)
-        
-        stmt = select(self.model).where(self.model.telegram_id == telegram_id)
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
-
-    async def get_with_balance(self, user_id: int) -> Optional[User]:
-        """Получить пользователя с балансом"""
-        stmt = (
-            select(self.model)
-            .where(self.model.id == user_id)
-            .join(self.model.balance)
-        )
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
-
-    async def get_with_state(self, user_id: int) -> Optional[User]:
-        """Получить пользователя с текущим состоянием"""
-        stmt = (
-            select(self.model)
-            .where(self.model.id == user_id)
-            .join(self.model.state)
-        )
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
+"""
+Репозиторий для работы с пользователями
+"""
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import User
+from app.database.repositories.base import BaseRepository
+
+
+class UserRepository(BaseRepository[User]):
+    """
+    Репозиторий для работы с пользователями
+    """
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, User)
+
+    async def get_by_telegram_id(self, telegram_id: str) -> Optional[User]:
+        """Получить пользователя по Telegram ID"""
+        # Убеждаемся, что telegram_id является строкой
+        if not isinstance(telegram_id, str):
+            # Если это не строка, преобразуем в строку
+            telegram_id = str(telegram_id)
+        
+        stmt = select(self.model).where(self.model.telegram_id == telegram_id)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def get_with_balance(self, user_id: int) -> Optional[User]:
+        """Получить пользователя с балансом"""
+        stmt = (
+            select(self.model)
+            .where(self.model.id == user_id)
+            .join(self.model.balance)
+        )
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def get_with_state(self, user_id: int) -> Optional[User]:
+        """Получить пользователя с текущим состоянием"""
+        stmt = (
+            select(self.model)
+            .where(self.model.id == user_id)
+            .join(self.model.state)
+        )
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def upsert_by_telegram_id(
+        self,
+        data: Dict[str, Any],
+        update_fields: Tuple[str, ...],
+    ) -> Tuple[User, bool]:
+        """
+        Создать пользователя или обновить поля существующего одним запросом
+
+        INSERT ... ON CONFLICT (telegram_id) DO UPDATE ... RETURNING
+
+        Args:
+            data: Поля нового пользователя
+            update_fields: Поля, которые обновляются у существующего
+
+        Returns:
+            (пользователь, True если создан этим запросом)
+        """
+        excluded = pg_insert(self.model).excluded
+        set_ = {field: getattr(excluded, field) for field in update_fields}
+        if "updated_at" in self.model.__table__.c:
+            set_["updated_at"] = func.now()
+
+        stmt = (
+            pg_insert(self.model)
+            .values(**data)
+            .on_conflict_do_update(index_elements=["telegram_id"], set_=set_)
+            .returning(self.model, literal_column("(xmax = 0)").label("inserted"))
+            .execution_options(populate_existing=True)
+        )
+        result = await self.session.execute(stmt)
+        user, inserted = result.one()
+        await self.session.commit()
+        return user, bool(inserted)
+
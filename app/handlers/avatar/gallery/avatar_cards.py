@@ -10,7 +10,7 @@ from aiogram.types import CallbackQuery, InputMediaPhoto, BufferedInputFile
 from aiogram.fsm.context import FSMContext
 
 from app.core.di import get_user_service, get_avatar_service
-from app.services.storage import StorageService
+from app.services.images.renditions import get_rendition_service
 from app.database.models import AvatarGender, AvatarStatus, AvatarTrainingType
 from .keyboards import GalleryKeyboards
 from .models import gallery_cache
@@ -150,11 +150,10 @@ class AvatarCardsHandler:
 ({avatar_idx + 1} из {total_avatars})"""
 
     async def _load_avatar_preview(self, avatar) -> Optional[bytes]:
-        """Загружает превью аватара из MinIO"""
+        """Загружает превью аватара (уменьшенную копию первого фото)"""
         try:
-            storage = StorageService()
             first_photo = avatar.photos[0]
-            return await storage.download_file("avatars", first_photo.minio_key)
+            return await get_rendition_service().get("avatars", first_photo.minio_key)
         except Exception as e:
             logger.warning(f"Ошибка загрузки превью аватара: {e}")
             return None
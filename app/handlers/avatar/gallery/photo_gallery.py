@@ -10,7 +10,7 @@ from aiogram.fsm.context import FSMContext
 
 from app.core.di import get_avatar_service
 from app.core.logger import get_logger
-from app.services.storage import StorageService
+from app.services.images.renditions import get_rendition_service
 from .keyboards import GalleryKeyboards
 from .models import gallery_cache
 
@@ -55,19 +55,15 @@ class PhotoGalleryHandler:
             
             photo = avatar.photos[photo_idx]
             
-            # Загружаем фото из MinIO
-            storage = StorageService()
-            
             # 🔧 ИСПРАВЛЕНИЕ: Убираем дублирование префикса "avatars/"
             # Если minio_key уже содержит "avatars/", используем его как есть
             # Если нет - добавляем префикс
             minio_key = photo.minio_key
-            if minio_key.startswith("avatars/"):
-                # Ключ уже содержит префикс - используем как object_name
-                photo_data = await storage.download_file("avatars", minio_key)
-            else:
-                # Ключ без префикса - добавляем его
-                photo_data = await storage.download_file("avatars", f"avatars/{minio_key}")
+            if not minio_key.startswith("avatars/"):
+                minio_key = f"avatars/{minio_key}"
+            
+            # Загружаем уменьшенную копию фото вместо оригинала
+            photo_data = await get_rendition_service().get("avatars", minio_key)
             
             logger.info(f"[Avatar Photo] Загружаем фото: bucket=avatars, key={minio_key}, размер={len(photo_data) if photo_data else 0} байт")
             
@@ -120,12 +120,13 @@ class PhotoUploadGalleryHandler:
             # Обновляем кэш с новым индексом
             await self._set_gallery_cache(user_id, cache_data)
             
-            # Получаем файл из MinIO
-            from app.services.storage import StorageService
-            storage = StorageService()
+            # Получаем уменьшенную копию фото из MinIO
+            from app.services.images.renditions import get_rendition_service
             
             try:
-                file_data = await storage.download_file("avatars", photo["minio_key"])
+                file_data = await get_rendition_service().get("avatars", photo["minio_key"])
+                if not file_data:
+                    raise FileNotFoundError(photo["minio_key"])
                 
                 # Формируем caption с информацией о фото
                 caption = f"""📸 Галерея фотографий
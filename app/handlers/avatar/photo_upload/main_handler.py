@@ -8,10 +8,13 @@ from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from aiogram.filters import StateFilter
 from uuid import UUID
+from typing import List
 import logging
 
 from app.handlers.state import AvatarStates
+from app.core.config import settings
 from app.core.di import get_avatar_service
+from app.shared.utils.media_group import MediaGroupCollector
 from .upload_handler import UploadHandler
 from .gallery_handler import PhotoUploadGalleryHandler
 from .progress_handler import ProgressHandler
@@ -35,6 +38,9 @@ class PhotoUploadHandler:
         self.gallery_handler = PhotoUploadGalleryHandler()
         self.progress_handler = ProgressHandler()
         
+        # Альбомы обрабатываются одним пакетом
+        self.album_collector = MediaGroupCollector(self._handle_album, delay=settings.PHOTO_ALBUM_COLLECT_DELAY)
+        
         logger.info("Инициализирован PhotoUploadHandler с модулями")
 
     def _register_handlers_sync(self):
@@ -152,29 +158,53 @@ class PhotoUploadHandler:
     async def handle_photo_upload(self, message: Message, state: FSMContext, bot: Bot):
         """Делегирует обработку загрузки фото к UploadHandler"""
         try:
+            # Фото альбома копятся и загружаются пакетом в _handle_album
+            if message.media_group_id:
+                self.album_collector.add(message, state, bot)
+                return
+            
             # Обрабатываем загрузку через UploadHandler
             success, error_message, photos_count = await self.upload_handler.handle_photo_upload(message, state, bot)
             
             if success:
-                # Получаем данные для обновления UI
-                data = await state.get_data()
-                avatar_id = UUID(data.get("avatar_id"))
-                user_id = message.from_user.id
-                
-                # Получаем обновленные фотографии
-                async with get_avatar_service() as avatar_service:
-                    photos, _ = await avatar_service.get_avatar_photos(avatar_id)
-                
-                # Обновляем галерею если открыта
-                await self.progress_handler.update_gallery_if_open(user_id, avatar_id, photos)
-                
-                # Показываем прогресс
-                await self.progress_handler.show_upload_progress(message, photos_count, avatar_id)
+                await self._refresh_upload_progress(message, state, photos_count)
             
         except Exception as e:
             logger.exception(f"Ошибка при обработке загрузки фото: {e}")
             await message.answer("❌ Произошла ошибка при загрузке фото")
 
+    async def _handle_album(self, messages: List[Message], state: FSMContext, bot: Bot):
+        """Загружает альбом одним пакетом и один раз обновляет прогресс"""
+        message = messages[0]
+        try:
+            uploaded, error_message, photos_count = await self.upload_handler.handle_album_upload(messages, state, bot)
+            
+            if error_message:
+                await message.answer(f"❌ {error_message}")
+            elif uploaded:
+                await self._refresh_upload_progress(message, state, photos_count)
+            
+        except Exception as e:
+            logger.exception(f"Ошибка при обработке альбома: {e}")
+            await message.answer("❌ Произошла ошибка при загрузке фото")
+
+    async def _refresh_upload_progress(self, message: Message, state: FSMContext, photos_count: int):
+        """Обновляет галерею и сообщение прогресса после загрузки"""
+        # Получаем данные для обновления UI
+        data = await state.get_data()
+        avatar_id = UUID(data.get("avatar_id"))
+        user_id = message.from_user.id
+        
+        # Получаем обновленные фотографии
+        async with get_avatar_service() as avatar_service:
+            photos, _ = await avatar_service.get_avatar_photos(avatar_id)
+        
+        # Обновляем галерею если открыта
+        await self.progress_handler.update_gallery_if_open(user_id, avatar_id, photos)
+        
+        # Показываем прогресс
+        await self.progress_handler.show_upload_progress(message, photos_count, avatar_id)
+
     async def show_photo_gallery(self, callback: CallbackQuery, state: FSMContext):
         """Делегирует показ галереи к GalleryHandler"""
         await self.gallery_handler.show_photo_gallery(callback, state)
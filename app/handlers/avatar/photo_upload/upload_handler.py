@@ -10,8 +10,9 @@ from uuid import UUID
 from typing import List, Optional, Tuple
 import logging
 
+from app.core.config import settings
 from app.core.di import get_user_service, get_avatar_service
-from app.services.avatar.photo_service import PhotoUploadService
+from app.services.avatar.photo_service import PhotoBatchUploadResult, PhotoUploadService
 from app.database.models import AvatarPhoto
 from .models import PhotoUploadConfig
 
@@ -94,6 +95,90 @@ class UploadHandler:
             logger.exception(f"Критическая ошибка при загрузке фото: {e}")
             return False, "Произошла критическая ошибка. Попробуйте позже.", 0
 
+    async def handle_album_upload(
+        self,
+        messages: List[Message],
+        state: FSMContext,
+        bot: Bot
+    ) -> Tuple[int, Optional[str], int]:
+        """
+        Обработка альбома фотографий одним пакетом
+        
+        Фото скачиваются параллельно и загружаются через
+        PhotoUploadService.upload_photos_batch; отклоненные фото
+        перечисляются одним сообщением.
+        
+        Returns:
+            tuple: (uploaded_count, error_message, photos_count)
+        """
+        first = messages[0]
+        try:
+            user_id = first.from_user.id
+            
+            data = await state.get_data()
+            avatar_id_str = data.get("avatar_id")
+            if not avatar_id_str:
+                return 0, "Аватар не найден. Начните создание заново.", 0
+            
+            avatar_id = UUID(avatar_id_str)
+            
+            user_db_id = await self._get_user_db_id(user_id)
+            if not user_db_id:
+                return 0, "Пользователь не найден", 0
+            
+            if user_id not in user_upload_locks:
+                user_upload_locks[user_id] = asyncio.Lock()
+            
+            async with user_upload_locks[user_id]:
+                loading_msg = await first.answer(f"📤 Обрабатываю {len(messages)} фото...")
+                
+                try:
+                    # Скачиваем фото параллельно (с ограничением на число запросов)
+                    semaphore = asyncio.Semaphore(settings.PHOTO_ALBUM_DOWNLOAD_CONCURRENCY)
+                    
+                    async def download(message: Message) -> bytes:
+                        async with semaphore:
+                            return await self._download_photo(bot, message)
+                    
+                    downloads = await asyncio.gather(*(download(m) for m in messages), return_exceptions=True)
+                    
+                    photos = []
+                    failed_downloads = []
+                    for message, photo_bytes in zip(messages, downloads):
+                        if isinstance(photo_bytes, BaseException):
+                            logger.warning(f"Не удалось скачать фото альбома {message.message_id}: {photo_bytes}")
+                            failed_downloads.append(message)
+                            continue
+                        photos.append((message, photo_bytes))
+                    
+                    batch = await self._upload_photos_batch_to_service(
+                        avatar_id,
+                        user_db_id,
+                        [(photo_bytes, f"telegram_photo_{m.photo[-1].file_id}.jpg") for m, photo_bytes in photos]
+                    )
+                finally:
+                    await loading_msg.delete()
+                
+                # Удаляем исходные фото альбома одним запросом
+                await self._delete_original_photos(bot, messages)
+                
+                # Номер фото в альбоме и причина отказа
+                position = {m.message_id: number for number, m in enumerate(messages, start=1)}
+                errors = [(position[photos[index][0].message_id], reason) for index, reason in batch.rejected]
+                errors += [(position[message.message_id], "Не удалось скачать фото") for message in failed_downloads]
+                if errors:
+                    await self._show_album_errors(first, sorted(errors), len(messages))
+                
+                logger.info(
+                    f"Альбом из {len(messages)} фото для аватара {avatar_id}: загружено "
+                    f"{len(batch.uploaded)}, всего: {batch.photos_count}"
+                )
+                return len(batch.uploaded), None, batch.photos_count
+                
+        except Exception as e:
+            logger.exception(f"Критическая ошибка при загрузке альбома: {e}")
+            return 0, "Произошла критическая ошибка. Попробуйте позже.", 0
+
     async def _get_user_db_id(self, user_id: int) -> Optional[UUID]:
         """Получает ID пользователя из БД"""
         try:
@@ -133,6 +218,21 @@ class UploadHandler:
                 filename=f"telegram_photo_{file_id}.jpg"
             )
 
+    async def _upload_photos_batch_to_service(
+        self,
+        avatar_id: UUID,
+        user_id: UUID,
+        photos: List[Tuple[bytes, str]]
+    ) -> PhotoBatchUploadResult:
+        """Загружает пакет фото через PhotoUploadService"""
+        async with get_avatar_service() as avatar_service:
+            photo_service = PhotoUploadService(avatar_service.session)
+            return await photo_service.upload_photos_batch(
+                avatar_id=avatar_id,
+                user_id=user_id,
+                photos=photos
+            )
+
     async def _get_avatar_photos(self, avatar_id: UUID) -> Tuple[List[AvatarPhoto], int]:
         """Получает фотографии аватара"""
         async with get_avatar_service() as avatar_service:
@@ -146,6 +246,34 @@ class UploadHandler:
         except Exception as e:
             logger.warning(f"Не удалось удалить исходное фото: {e}")
 
+    async def _delete_original_photos(self, bot: Bot, messages: List[Message]):
+        """Удаляет исходные фото альбома из чата"""
+        try:
+            await bot.delete_messages(messages[0].chat.id, [m.message_id for m in messages])
+        except Exception as e:
+            logger.warning(f"Не удалось удалить исходные фото альбома: {e}")
+
+    async def _show_album_errors(self, message: Message, errors: List[Tuple[int, str]], total: int):
+        """Одно сообщение со списком отклоненных фото альбома (номер фото, причина)"""
+        lines = "\n".join(
+            f"• Фото {number}: {self._format_error_message(reason)}" for number, reason in errors
+        )
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="💡 Понятно", callback_data="delete_error_photo")]
+        ])
+        text = f"""❌ Не принято {len(errors)} из {total} фото:
+{lines}
+
+💡 Рекомендации:
+• Размер от {self.config.MIN_RESOLUTION}×{self.config.MIN_RESOLUTION} пикселей
+• Формат JPG или PNG
+• Без размытия и фильтров
+• Хорошее освещение"""
+        try:
+            await message.answer(text, reply_markup=keyboard)
+        except Exception as e:
+            logger.warning(f"Не удалось показать ошибки альбома: {e}")
+
     async def _handle_upload_error_with_photo(self, bot: Bot, message: Message, error: Exception, photo_bytes: bytes):
         """Обрабатывает ошибки загрузки фото с показом самого фото"""
         try:
@@ -6,10 +6,13 @@
 from .ultra_fast_cache import UltraFastGalleryCache, ultra_gallery_cache
 from .image_cache import ImageCacheManager
 from .session_cache import SessionCacheManager
+from .telegram_file_cache import TelegramFileIdCache, telegram_file_cache
 
 __all__ = [
     "UltraFastGalleryCache",
     "ultra_gallery_cache",
     "ImageCacheManager", 
-    "SessionCacheManager"
+    "SessionCacheManager",
+    "TelegramFileIdCache",
+    "telegram_file_cache"
 ] 
\ No newline at end of file
@@ -11,6 +11,7 @@ from uuid import UUID
 from app.core.logger import get_logger
 from app.database.models.generation import ImageGeneration
 from .ultra_fast_cache import ultra_gallery_cache
+from .telegram_file_cache import telegram_file_cache
 
 logger = get_logger(__name__)
 
@@ -53,8 +54,16 @@ class ImageCacheManager:
         priority_tasks = []  # Соседние изображения (высокий приоритет)
         background_tasks = []  # Случайные изображения (низкий приоритет)
         
+        # Изображения, уже загруженные в Telegram, показываются по file_id - их байты не нужны
+        known_file_ids = await telegram_file_cache.get_known_ids(
+            images[idx].id for idx in prefetch_indices
+            if not getattr(images[idx], "telegram_file_id", None)
+        )
+        
         for idx in prefetch_indices:
             generation = images[idx]
+            if getattr(generation, "telegram_file_id", None) or str(generation.id) in known_file_ids:
+                continue
             if generation.result_urls and len(generation.result_urls) > 0:
                 url = generation.result_urls[0]
                 
@@ -110,23 +119,25 @@ class ImageCacheManager:
             # Настраиваем таймаут в зависимости от приоритета
             timeout = PRIORITY_TIMEOUT if high_priority else BACKGROUND_TIMEOUT
             
-            # Загружаем изображение
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
-                    if response.status == 200:
-                        data = await response.read()
-                        await ultra_gallery_cache.set_cached_image(url, data)
-                        priority_text = "HIGH" if high_priority else "LOW"
-                        logger.debug(f"🚀 PREFETCH {priority_text}: {url[:50]}... ({len(data)} байт)")
-                    elif response.status == 403:
-                        # URL устарел - пытаемся обновить только для высокого приоритета
-                        if high_priority:
-                            updated_data = await self._try_refresh_minio_url_ultra_fast(url)
-                            if updated_data:
-                                await ultra_gallery_cache.set_cached_image(url, updated_data)
-                                logger.debug(f"🚀 PREFETCH HIGH REFRESHED: {url[:50]}... ({len(updated_data)} байт)")
-                    else:
-                        logger.debug(f"🚀 PREFETCH FAILED: {url[:50]}... (HTTP {response.status})")
+            # Загружаем изображение через общий пул соединений
+            from app.core.di import get_http_client
+            async with get_http_client().request(
+                "media", "GET", url, timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                if response.status == 200:
+                    data = await response.read()
+                    await ultra_gallery_cache.set_cached_image(url, data)
+                    priority_text = "HIGH" if high_priority else "LOW"
+                    logger.debug(f"🚀 PREFETCH {priority_text}: {url[:50]}... ({len(data)} байт)")
+                elif response.status == 403:
+                    # URL устарел - пытаемся обновить только для высокого приоритета
+                    if high_priority:
+                        updated_data = await self._try_refresh_minio_url_ultra_fast(url)
+                        if updated_data:
+                            await ultra_gallery_cache.set_cached_image(url, updated_data)
+                            logger.debug(f"🚀 PREFETCH HIGH REFRESHED: {url[:50]}... ({len(updated_data)} байт)")
+                else:
+                    logger.debug(f"🚀 PREFETCH FAILED: {url[:50]}... (HTTP {response.status})")
             
         except asyncio.TimeoutError:
             priority_text = "HIGH" if high_priority else "LOW"
@@ -143,7 +154,7 @@ class ImageCacheManager:
         """🚀 УЛЬТРАБЫСТРОЕ обновление устаревшего MinIO URL"""
         
         try:
-            from app.services.storage.minio import MinioStorage
+            from app.services.storage import get_storage_service
             import urllib.parse
             
             # Парсим URL
@@ -159,7 +170,7 @@ class ImageCacheManager:
             # 🚀 ИСПОЛЬЗУЕМ ТОЛЬКО работающий путь (из логов - "вариант 2")
             correct_path = f"generated/{object_name}"
             
-            storage = MinioStorage()
+            storage = get_storage_service()
             
             # Создаем новый URL с коротким временем жизни для скорости
             new_url = await storage.generate_presigned_url(
@@ -172,14 +183,16 @@ class ImageCacheManager:
                 return None
             
             # Загружаем по новому URL с коротким таймаутом
-            async with aiohttp.ClientSession() as session:
-                async with session.get(new_url, timeout=aiohttp.ClientTimeout(total=2)) as response:
-                    if response.status == 200:
-                        image_data = await response.read()
-                        logger.debug(f"🚀 ULTRA FAST MinIO refresh: {len(image_data)} bytes")
-                        return image_data
-                    else:
-                        return None
+            from app.core.di import get_http_client
+            async with get_http_client().request(
+                "media", "GET", new_url, timeout=aiohttp.ClientTimeout(total=2)
+            ) as response:
+                if response.status == 200:
+                    image_data = await response.read()
+                    logger.debug(f"🚀 ULTRA FAST MinIO refresh: {len(image_data)} bytes")
+                    return image_data
+                else:
+                    return None
                         
         except Exception as e:
             logger.debug(f"❌ MinIO refresh error (ignored): {e}")
@@ -0,0 +1,167 @@
+"""
+Кеш Telegram file_id для изображений галереи
+Повторный показ изображения идет по file_id без скачивания из MinIO и загрузки в Telegram
+"""
+import asyncio
+from typing import Iterable, Optional, Set
+
+from aiogram.types import Message
+from sqlalchemy import text
+
+from app.core.logger import get_logger
+from app.core.di import get_redis
+from .ultra_fast_cache import ultra_gallery_cache
+
+logger = get_logger(__name__)
+
+# file_id не меняется, пока жив бот - храним долго
+FILE_ID_TTL = 30 * 24 * 3600  # 30 дней
+
+
+class TelegramFileIdCache:
+    """
+    Соответствие генерация -> Telegram file_id
+
+    Уровни:
+    - поле telegram_file_id генерации (колонка image_generations.telegram_file_id)
+    - Redis (gallery:tgfile:<generation_id>)
+
+    file_id фиксируется из ответа первого answer_photo/edit_media,
+    дальше навигация по галерее - один вызов Bot API без передачи байтов.
+    """
+
+    def __init__(self):
+        self.redis = None
+        self._prefix = "gallery:tgfile:"
+        self._background_tasks: Set[asyncio.Task] = set()
+
+    async def _get_redis(self):
+        """Получает Redis клиент"""
+        if not self.redis:
+            self.redis = await get_redis()
+        return self.redis
+
+    async def get_file_id(self, generation) -> Optional[str]:
+        """
+        Возвращает file_id изображения генерации
+
+        Args:
+            generation: ImageGeneration
+
+        Returns:
+            Optional[str]: file_id или None, если изображение еще не отправлялось
+        """
+        file_id = getattr(generation, "telegram_file_id", None)
+        if file_id:
+            return file_id
+
+        try:
+            redis = await self._get_redis()
+            cached = await redis.get(f"{self._prefix}{generation.id}")
+            if cached:
+                return cached.decode() if isinstance(cached, bytes) else cached
+        except Exception as e:
+            logger.debug(f"[TG File Cache] Ошибка чтения file_id {generation.id}: {e}")
+
+        return None
+
+    async def get_known_ids(self, generation_ids: Iterable[str]) -> Set[str]:
+        """Возвращает id генераций, для которых file_id уже есть в Redis (один MGET)"""
+        ids = [str(gid) for gid in generation_ids]
+        if not ids:
+            return set()
+
+        try:
+            redis = await self._get_redis()
+            values = await redis.mget([f"{self._prefix}{gid}" for gid in ids])
+            return {gid for gid, value in zip(ids, values) if value}
+        except Exception as e:
+            logger.debug(f"[TG File Cache] Ошибка пакетного чтения file_id: {e}")
+            return set()
+
+    async def remember(self, generation, message) -> Optional[str]:
+        """
+        Запоминает file_id из ответа answer_photo/edit_media
+
+        Args:
+            generation: ImageGeneration
+            message: Ответ Bot API (Message или True для inline-сообщений)
+
+        Returns:
+            Optional[str]: Сохраненный file_id
+        """
+        file_id = self.extract_file_id(message)
+        if not file_id or file_id == getattr(generation, "telegram_file_id", None):
+            return file_id
+
+        try:
+            # Объект может жить в кеше дольше сессии - обновляем и его
+            generation.telegram_file_id = file_id
+        except Exception:
+            pass
+
+        try:
+            redis = await self._get_redis()
+            await redis.setex(f"{self._prefix}{generation.id}", FILE_ID_TTL, file_id)
+        except Exception as e:
+            logger.debug(f"[TG File Cache] Ошибка записи file_id {generation.id}: {e}")
+
+        # Запись в БД не задерживает ответ пользователю
+        self._spawn(self._persist(str(generation.id), file_id))
+        self._spawn(self._update_gallery_record(generation, file_id))
+
+        logger.debug(f"[TG File Cache] Сохранен file_id для генерации {generation.id}")
+        return file_id
+
+    async def forget(self, generation) -> None:
+        """Сбрасывает file_id (например, Telegram отклонил его после смены бота)"""
+        try:
+            generation.telegram_file_id = None
+        except Exception:
+            pass
+
+        try:
+            redis = await self._get_redis()
+            await redis.delete(f"{self._prefix}{generation.id}")
+        except Exception as e:
+            logger.debug(f"[TG File Cache] Ошибка удаления file_id {generation.id}: {e}")
+
+        self._spawn(self._persist(str(generation.id), None))
+        self._spawn(self._update_gallery_record(generation, None))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    @staticmethod
+    async def _update_gallery_record(generation, file_id: Optional[str]) -> None:
+        """Обновляет file_id в записи кеша галереи, чтобы следующий показ взял его оттуда"""
+        user_id = getattr(generation, "user_id", None)
+        if user_id:
+            await ultra_gallery_cache.update_user_image(user_id, generation.id, telegram_file_id=file_id)
+
+    @staticmethod
+    def extract_file_id(message) -> Optional[str]:
+        """Достает file_id самого большого размера фото из ответа Bot API"""
+        if isinstance(message, Message) and message.photo:
+            return message.photo[-1].file_id
+        return None
+
+    @staticmethod
+    async def _persist(generation_id: str, file_id: Optional[str]) -> None:
+        """Сохраняет file_id в image_generations.telegram_file_id"""
+        try:
+            from app.core.database import get_session
+
+            async with get_session() as session:
+                await session.execute(
+                    text("UPDATE image_generations SET telegram_file_id = :file_id WHERE id = :id"),
+                    {"file_id": file_id, "id": generation_id}
+                )
+        except Exception as e:
+            logger.warning(f"[TG File Cache] Не удалось сохранить file_id в БД для {generation_id}: {e}")
+
+
+# Глобальный экземпляр кеша
+telegram_file_cache = TelegramFileIdCache()
@@ -1,18 +1,56 @@
 """
 Ультрабыстрый кеш галереи изображений
 Оптимизированное кеширование для быстрого отображения
+
+Изображения галереи хранятся компактными записями msgpack:
+- HASH {пространство}:records - запись по id изображения (+ поле _meta)
+- ZSET {пространство}:index - id изображений со score = created_at
+
+Страница читается ZREVRANGE + HMGET, одно изображение - HGET. Ключи
+лежат в пространстве имен галереи пользователя (CacheService), поэтому
+GalleryService.invalidate_user_gallery_cache сбрасывает и этот кеш.
 """
-import asyncio
 import json
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Union
 from uuid import UUID
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from app.core.logger import get_logger
 from app.core.di import get_redis
+from app.database.models import Avatar
+from app.database.models.generation import ImageGeneration, GenerationStatus
+from app.services.cache_service import cache_service
+from app.services.gallery_records import (
+    IMAGE_RECORD_SCHEMA,
+    image_record,
+    pack_record as _pack,
+    record_attributes,
+    unpack_record as _unpack,
+)
 
 logger = get_logger(__name__)
 
+# Служебное поле хеша: галерея загружена (в том числе пустая)
+_META_FIELD = "_meta"
+
+
+def image_from_record(record: Dict[str, Any]) -> ImageGeneration:
+    """
+    Восстанавливает изображение из записи
+    
+    Объект не привязан к сессии - для изменений нужен запрос к БД.
+    """
+    attributes = record_attributes(record)
+    avatar_name = attributes.pop("avatar_name")
+    telegram_file_id = attributes.pop("telegram_file_id")
+    generation = ImageGeneration(status=GenerationStatus.COMPLETED, **attributes)
+    # Колонка не объявлена в модели - атрибут как в TelegramFileIdCache
+    generation.telegram_file_id = telegram_file_id
+    generation.avatar = (
+        Avatar(id=generation.avatar_id, name=avatar_name) if generation.avatar_id else None
+    )
+    return generation
+
 
 class UltraFastGalleryCache:
     """Ультрабыстрый кеш для галереи изображений"""
@@ -20,6 +58,7 @@ class UltraFastGalleryCache:
     def __init__(self):
         self.redis = None
         self._cache_ttl = 3600  # 1 час
+        self._images_ttl = 900  # 15 минут
         self._user_cache_prefix = "gallery:user:"
         self._generation_cache_prefix = "gallery:gen:"
         self._session_prefix = "gallery:session:"
@@ -55,13 +94,13 @@ class UltraFastGalleryCache:
             }
             
             # Сохраняем в Redis
-            await redis.hset(cache_key, mapping={
-                "data": str(cache_data),
-                "timestamp": datetime.now().timestamp()
-            })
-            
-            # Устанавливаем TTL
-            await redis.expire(cache_key, self._cache_ttl)
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.hset(cache_key, mapping={
+                    "data": _pack(cache_data),
+                    "timestamp": datetime.now().timestamp()
+                })
+                pipe.expire(cache_key, self._cache_ttl)
+                await pipe.execute()
             
             logger.info(f"[Gallery Cache] Закешировано {len(generations)} генераций для пользователя {user_id}")
             return True
@@ -84,17 +123,11 @@ class UltraFastGalleryCache:
             redis = await self._get_redis()
             cache_key = f"{self._user_cache_prefix}{user_id}"
             
-            # Проверяем существование кеша
-            if not await redis.exists(cache_key):
-                return None
-            
-            # Получаем данные
             cached_data = await redis.hget(cache_key, "data")
             if not cached_data:
                 return None
             
-            # Парсим данные (в реальности лучше использовать JSON)
-            cache_info = eval(cached_data)  # Упрощенно для примера
+            cache_info = _unpack(cached_data)
             generations = cache_info.get("generations", [])
             
             logger.info(f"[Gallery Cache] Получено {len(generations)} генераций из кеша для пользователя {user_id}")
@@ -145,13 +178,13 @@ class UltraFastGalleryCache:
             cache_key = f"{self._generation_cache_prefix}{generation_id}"
             
             # Сохраняем детали
-            await redis.hset(cache_key, mapping={
-                "details": str(details),
-                "timestamp": datetime.now().timestamp()
-            })
-            
-            # Устанавливаем TTL
-            await redis.expire(cache_key, self._cache_ttl)
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.hset(cache_key, mapping={
+                    "details": _pack(details),
+                    "timestamp": datetime.now().timestamp()
+                })
+                pipe.expire(cache_key, self._cache_ttl)
+                await pipe.execute()
             
             return True
             
@@ -159,6 +192,25 @@ class UltraFastGalleryCache:
             logger.exception(f"[Gallery Cache] Ошибка кеширования деталей генерации {generation_id}: {e}")
             return False
     
+    async def get_generation_details(self, generation_id: UUID) -> Optional[Dict[str, Any]]:
+        """
+        Получает закешированные детали генерации
+        
+        Args:
+            generation_id: ID генерации
+            
+        Returns:
+            Optional[Dict]: Детали генерации или None
+        """
+        try:
+            redis = await self._get_redis()
+            cached = await redis.hget(f"{self._generation_cache_prefix}{generation_id}", "details")
+            return _unpack(cached) if cached else None
+            
+        except Exception as e:
+            logger.exception(f"[Gallery Cache] Ошибка получения деталей генерации {generation_id}: {e}")
+            return None
+    
     async def set_session_data(self, user_id: UUID, session_data: Dict[str, Any]) -> bool:
         """
         Сохраняет сессионные данные пользователя
@@ -268,50 +320,115 @@ class UltraFastGalleryCache:
             logger.exception(f"[Gallery Cache] Ошибка сохранения состояния галереи пользователя {user_id}: {e}")
             return False
     
-    async def get_user_images(self, user_id: UUID) -> Optional[List]:
+    async def _images_keys(self, user_id: UUID, version: Optional[int] = None) -> tuple:
+        """Ключи записей и индекса в текущей (или заданной) версии пространства галереи"""
+        base = await cache_service.namespaced_key(
+            f"gallery_optimized:{user_id}", f"ultra:s{IMAGE_RECORD_SCHEMA}", version
+        )
+        return f"{base}:records", f"{base}:index"
+    
+    async def images_version(self, user_id: UUID) -> int:
+        """Версия пространства галереи - читается до загрузки изображений из БД"""
+        return await cache_service.namespace_version(f"gallery_optimized:{user_id}")
+    
+    async def get_user_images(
+        self,
+        user_id: UUID,
+        start: int = 0,
+        stop: int = -1
+    ) -> Optional[List[ImageGeneration]]:
         """
-        Получает закешированные изображения пользователя
+        Получает закешированные изображения пользователя (новые первыми)
         
         Args:
             user_id: ID пользователя
+            start: Индекс первого изображения
+            stop: Индекс последнего изображения включительно (-1 - до конца)
             
         Returns:
-            Optional[List]: Список изображений или None
+            Optional[List]: Список изображений или None, если кеш не загружен
         """
         try:
             redis = await self._get_redis()
-            cache_key = f"{self._user_cache_prefix}images:{user_id}"
+            records_key, index_key = await self._images_keys(user_id)
             
-            cached_data = await redis.get(cache_key)
-            if cached_data:
-                # В реальности здесь должна быть более сложная десериализация
-                # объектов ImageGeneration, но для простоты возвращаем None
-                # чтобы всегда делать свежий запрос к БД
-                pass
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hexists(records_key, _META_FIELD)
+                pipe.zrevrange(index_key, start, stop)
+                loaded, ids = await pipe.execute()
             
-            return None
+            if not loaded:
+                return None
+            if not ids:
+                return []
+            
+            packed = await redis.hmget(records_key, ids)
+            # Записи без пары в хеше (гонка с удалением) пропускаем
+            return [image_from_record(_unpack(item)) for item in packed if item]
             
         except Exception as e:
             logger.exception(f"[Gallery Cache] Ошибка получения изображений пользователя {user_id}: {e}")
             return None
     
-    async def set_user_images(self, user_id: UUID, images: List) -> bool:
+    async def get_user_image(self, user_id: UUID, image_id: Union[str, UUID]) -> Optional[ImageGeneration]:
+        """
+        Получает одно закешированное изображение пользователя
+        
+        Args:
+            user_id: ID пользователя
+            image_id: ID изображения
+            
+        Returns:
+            Optional[ImageGeneration]: Изображение или None
+        """
+        try:
+            redis = await self._get_redis()
+            records_key, _ = await self._images_keys(user_id)
+            packed = await redis.hget(records_key, str(image_id))
+            return image_from_record(_unpack(packed)) if packed else None
+            
+        except Exception as e:
+            logger.exception(f"[Gallery Cache] Ошибка получения изображения {image_id}: {e}")
+            return None
+    
+    async def set_user_images(
+        self,
+        user_id: UUID,
+        images: List[ImageGeneration],
+        version: Optional[int] = None
+    ) -> bool:
         """
         Кеширует изображения пользователя
         
+        Галерея заменяется целиком в одной транзакции - читатели не видят
+        частично записанный индекс.
+        
         Args:
             user_id: ID пользователя
             images: Список изображений
+            version: Версия пространства из images_version(), прочитанная до
+                загрузки изображений - галерея, инвалидированная во время
+                загрузки, не перезапишется устаревшим списком
             
         Returns:
             bool: True если успешно закешировано
         """
         try:
             redis = await self._get_redis()
-            cache_key = f"{self._user_cache_prefix}images:{user_id}"
+            records_key, index_key = await self._images_keys(user_id, version)
+            
+            records = [image_record(image) for image in images]
+            mapping = {record["id"]: _pack(record) for record in records}
+            mapping[_META_FIELD] = _pack({"schema": IMAGE_RECORD_SCHEMA, "count": len(records)})
             
-            # Упрощенное кеширование - просто сохраняем количество
-            await redis.setex(cache_key, 900, str(len(images)))  # 15 минут
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.delete(records_key, index_key)
+                pipe.hset(records_key, mapping=mapping)
+                if records:
+                    pipe.zadd(index_key, {record["id"]: record["created_at"] for record in records})
+                    pipe.expire(index_key, self._images_ttl)
+                pipe.expire(records_key, self._images_ttl)
+                await pipe.execute()
             
             logger.debug(f"[Gallery Cache] Закешировано {len(images)} изображений для пользователя {user_id}")
             return True
@@ -320,6 +437,64 @@ class UltraFastGalleryCache:
             logger.exception(f"[Gallery Cache] Ошибка кеширования изображений пользователя {user_id}: {e}")
             return False
     
+    async def update_user_image(self, user_id: UUID, image_id: Union[str, UUID], **fields) -> bool:
+        """
+        Обновляет поля закешированного изображения (избранное, file_id)
+        
+        Args:
+            user_id: ID пользователя
+            image_id: ID изображения
+            **fields: Поля записи
+            
+        Returns:
+            bool: True если запись была в кеше и обновлена
+        """
+        try:
+            redis = await self._get_redis()
+            records_key, index_key = await self._images_keys(user_id)
+            packed = await redis.hget(records_key, str(image_id))
+            if not packed:
+                return False
+            
+            record = _unpack(packed)
+            record.update(fields)
+            # Если ключи успели истечь, HSET создаст хеш заново - вместе с TTL.
+            # Такой хеш без _meta читатели не считают загруженной галереей
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.hset(records_key, str(image_id), _pack(record))
+                pipe.expire(records_key, self._images_ttl)
+                pipe.expire(index_key, self._images_ttl)
+                await pipe.execute()
+            return True
+            
+        except Exception as e:
+            logger.exception(f"[Gallery Cache] Ошибка обновления изображения {image_id}: {e}")
+            return False
+    
+    async def remove_user_image(self, user_id: UUID, image_id: Union[str, UUID]) -> bool:
+        """
+        Убирает изображение из закешированной галереи
+        
+        Args:
+            user_id: ID пользователя
+            image_id: ID изображения
+            
+        Returns:
+            bool: True если успешно
+        """
+        try:
+            redis = await self._get_redis()
+            records_key, index_key = await self._images_keys(user_id)
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.zrem(index_key, str(image_id))
+                pipe.hdel(records_key, str(image_id))
+                await pipe.execute()
+            return True
+            
+        except Exception as e:
+            logger.exception(f"[Gallery Cache] Ошибка удаления изображения {image_id} из кеша: {e}")
+            return False
+    
     async def get_cached_image(self, image_url: str) -> Optional[bytes]:
         """
         Получает закешированное изображение
@@ -392,19 +567,15 @@ class UltraFastGalleryCache:
         try:
             redis = await self._get_redis()
             
-            # Собираем все ключи пользователя
-            patterns = [
-                f"{self._user_cache_prefix}{user_id}*",
+            deleted_count = await redis.delete(
+                f"{self._user_cache_prefix}{user_id}",
+                f"{self._user_cache_prefix}data:{user_id}",
                 f"{self._session_prefix}{user_id}",
                 f"{self._state_prefix}{user_id}",
-                f"{self._generation_cache_prefix}{user_id}*"
-            ]
-            
-            deleted_count = 0
-            for pattern in patterns:
-                async for key in redis.scan_iter(match=pattern):
-                    await redis.delete(key)
-                    deleted_count += 1
+            )
+            
+            # Изображения галереи - новой версией пространства имен
+            await cache_service.invalidate_namespace(f"gallery_optimized:{user_id}")
             
             logger.info(f"[Gallery Cache] Очищено {deleted_count} ключей кеша для пользователя {user_id}")
             return True
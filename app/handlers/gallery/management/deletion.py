@@ -161,8 +161,8 @@ class DeletionManager(BaseHandler):
             deleted = await self._delete_generation(UUID(generation_id), user.id)
             
             if deleted:
-                # Очищаем кэш пользователя
-                await ultra_gallery_cache.clear_all_cache(user.id)
+                # Убираем изображение из кэша галереи
+                await ultra_gallery_cache.remove_user_image(user.id, generation_id)
                 
                 # Перенаправляем в галерею или показываем что галерея пуста
                 await self._refresh_gallery_after_deletion(callback, user.id)
@@ -30,10 +30,10 @@ class FavoritesManager(BaseHandler):
                 return
             
             # Обновляем статус в БД
-            await self._update_favorite_status(UUID(generation_id), user.id)
+            is_favorite = await self._update_favorite_status(UUID(generation_id), user.id)
             
-            # Очищаем кэш изображений пользователя (чтобы обновился статус)
-            await ultra_gallery_cache.clear_all_cache(user.id)
+            # Обновляем одну запись в кэше галереи (остальные остаются теплыми)
+            await ultra_gallery_cache.update_user_image(user.id, generation_id, is_favorite=is_favorite)
             
             # Обновляем изображение
             await self._refresh_gallery_view(callback, user.id)
@@ -44,8 +44,8 @@ class FavoritesManager(BaseHandler):
             logger.exception(f"Ошибка переключения избранного: {e}")
             await callback.answer("❌ Ошибка обновления избранного", show_alert=True)
     
-    async def _update_favorite_status(self, generation_id: UUID, user_id: UUID):
-        """Обновляет статус избранного в БД"""
+    async def _update_favorite_status(self, generation_id: UUID, user_id: UUID) -> bool:
+        """Обновляет статус избранного в БД и возвращает новый статус"""
         
         from app.core.database import get_session
         from app.database.models.generation import ImageGeneration
@@ -69,6 +69,7 @@ class FavoritesManager(BaseHandler):
             await session.commit()
             
             logger.debug(f"Favorite status updated: {generation_id} -> {generation.is_favorite}")
+            return generation.is_favorite
     
     async def _refresh_gallery_view(self, callback: CallbackQuery, user_id: UUID):
         """Обновляет отображение галереи после изменения избранного"""
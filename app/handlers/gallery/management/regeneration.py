@@ -291,29 +291,28 @@ class RegenerationManager(BaseHandler):
             from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
             from aiogram.types import BufferedInputFile
             from app.shared.utils.telegram_utils import format_prompt_for_display
-            import aiohttp
             
             # Загружаем изображение
             if generation.result_urls and len(generation.result_urls) > 0:
                 image_url = generation.result_urls[0]  # Берем первое изображение
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(image_url) as response:
-                        if response.status == 200:
-                            image_data = await response.read()
+                from app.core.di import get_http_client
+                async with get_http_client().request("fal", "GET", image_url, endpoint="fal/cdn") as response:
+                    if response.status == 200:
+                        image_data = await response.read()
                             
-                            # Создаем клавиатуру для результата
-                            keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                                [
-                                    InlineKeyboardButton(text="🔄 Повторить еще раз", callback_data=f"gallery_regenerate:{generation.id}"),
-                                    InlineKeyboardButton(text="🖼️ В галерею", callback_data="gallery_main")
-                                ],
-                                [
-                                    InlineKeyboardButton(text="🎨 Новая генерация", callback_data="generation_menu"),
-                                    InlineKeyboardButton(text="🔙 Главное меню", callback_data="main_menu")
-                                ]
-                            ])
+                        # Создаем клавиатуру для результата
+                        keyboard = InlineKeyboardMarkup(inline_keyboard=[
+                            [
+                                InlineKeyboardButton(text="🔄 Повторить еще раз", callback_data=f"gallery_regenerate:{generation.id}"),
+                                InlineKeyboardButton(text="🖼️ В галерею", callback_data="gallery_main")
+                            ],
+                            [
+                                InlineKeyboardButton(text="🎨 Новая генерация", callback_data="generation_menu"),
+                                InlineKeyboardButton(text="🔙 Главное меню", callback_data="main_menu")
+                            ]
+                        ])
                             
-                            caption = f"""✅ <b>Повторная генерация завершена!</b>
+                        caption = f"""✅ <b>Повторная генерация завершена!</b>
 
 🎭 <b>Аватар:</b> {avatar_name}
 📝 <b>Промпт:</b> {format_prompt_for_display(prompt, 100)}
@@ -321,21 +320,21 @@ class RegenerationManager(BaseHandler):
 
 🎉 <b>Изображение готово!</b>"""
                             
-                            # Удаляем старое сообщение и отправляем новое с фото
-                            try:
-                                await message.delete()
-                            except Exception:
-                                pass
-                            
-                            await message.answer_photo(
-                                photo=BufferedInputFile(image_data, filename=f"regeneration_{generation.id}.jpg"),
-                                caption=caption,
-                                reply_markup=keyboard,
-                                parse_mode="HTML"
-                            )
-                            
-                            logger.info(f"✅ Результат повторной генерации показан: {generation.id}")
-                            return
+                        # Удаляем старое сообщение и отправляем новое с фото
+                        try:
+                            await message.delete()
+                        except Exception:
+                            pass
+                        
+                        await message.answer_photo(
+                            photo=BufferedInputFile(image_data, filename=f"regeneration_{generation.id}.jpg"),
+                            caption=caption,
+                            reply_markup=keyboard,
+                            parse_mode="HTML"
+                        )
+                        
+                        logger.info(f"✅ Результат повторной генерации показан: {generation.id}")
+                        return
             
             # Fallback без изображения
             keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -65,16 +65,18 @@ class ImageLoader:
     async def _try_download_url(self, url: str, timeout: int = DEFAULT_TIMEOUT) -> Optional[bytes]:
         """Попытка загрузки URL с таймаутом"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
-                    if response.status == 200:
-                        return await response.read()
-                    elif response.status == 403:
-                        logger.debug(f"URL expired (403): {url[:50]}...")
-                        return None
-                    else:
-                        logger.debug(f"HTTP {response.status}: {url[:50]}...")
-                        return None
+            from app.core.di import get_http_client
+            async with get_http_client().request(
+                "media", "GET", url, timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                if response.status == 200:
+                    return await response.read()
+                elif response.status == 403:
+                    logger.debug(f"URL expired (403): {url[:50]}...")
+                    return None
+                else:
+                    logger.debug(f"HTTP {response.status}: {url[:50]}...")
+                    return None
         except asyncio.TimeoutError:
             logger.debug(f"Timeout loading: {url[:50]}...")
             return None
@@ -85,7 +87,7 @@ class ImageLoader:
     async def _try_alternative_paths(self, original_url: str) -> Optional[bytes]:
         """Пробует альтернативные пути для загрузки изображения"""
         try:
-            from app.services.storage.minio import MinioStorage
+            from app.services.storage import get_storage_service
             import urllib.parse
             
             # Парсим URL
@@ -98,7 +100,7 @@ class ImageLoader:
             bucket = path_parts[0]
             object_name = path_parts[1].split('?')[0]
             
-            storage = MinioStorage()
+            storage = get_storage_service()
             
             # Варианты путей для поиска
             path_variants = [
@@ -143,7 +145,7 @@ class ImageLoader:
         """🚀 УЛЬТРАБЫСТРОЕ обновление устаревшего MinIO URL"""
         
         try:
-            from app.services.storage.minio import MinioStorage
+            from app.services.storage import get_storage_service
             import urllib.parse
             
             # Парсим URL
@@ -159,7 +161,7 @@ class ImageLoader:
             # 🚀 ИСПОЛЬЗУЕМ ТОЛЬКО работающий путь (из логов - "вариант 2")
             correct_path = f"generated/{object_name}"
             
-            storage = MinioStorage()
+            storage = get_storage_service()
             
             # Создаем новый URL с коротким временем жизни для скорости
             new_url = await storage.generate_presigned_url(
@@ -172,14 +174,16 @@ class ImageLoader:
                 return None
             
             # Загружаем по новому URL с коротким таймаутом
-            async with aiohttp.ClientSession() as session:
-                async with session.get(new_url, timeout=aiohttp.ClientTimeout(total=ULTRA_FAST_TIMEOUT)) as response:
-                    if response.status == 200:
-                        image_data = await response.read()
-                        logger.debug(f"🚀 ULTRA FAST MinIO refresh: {len(image_data)} bytes")
-                        return image_data
-                    else:
-                        return None
+            from app.core.di import get_http_client
+            async with get_http_client().request(
+                "media", "GET", new_url, timeout=aiohttp.ClientTimeout(total=ULTRA_FAST_TIMEOUT)
+            ) as response:
+                if response.status == 200:
+                    image_data = await response.read()
+                    logger.debug(f"🚀 ULTRA FAST MinIO refresh: {len(image_data)} bytes")
+                    return image_data
+                else:
+                    return None
                         
         except Exception as e:
             logger.debug(f"❌ MinIO refresh error (ignored): {e}")
@@ -3,7 +3,7 @@
 Рефакторенная версия с модульной архитектурой
 """
 import asyncio
-from typing import List, Optional
+from typing import List, Optional, Union
 from uuid import UUID
 
 from aiogram.types import CallbackQuery, BufferedInputFile, InputMediaPhoto, InlineKeyboardMarkup, InlineKeyboardButton
@@ -15,7 +15,7 @@ from app.shared.decorators.auth_decorators import require_user
 from app.core.logger import get_logger
 from app.database.models.generation import ImageGeneration, GenerationStatus
 
-from ..cache import ultra_gallery_cache, ImageCacheManager
+from ..cache import ultra_gallery_cache, ImageCacheManager, telegram_file_cache
 from .navigation import NavigationHandler
 from .image_loader import ImageLoader
 from .card_formatter import CardFormatter
@@ -23,6 +23,9 @@ from ..keyboards import build_empty_gallery_keyboard
 
 logger = get_logger(__name__)
 
+# Сколько последних изображений доступно для листания в галерее
+GALLERY_MAX_IMAGES = 150
+
 
 class GalleryViewer(BaseHandler):
     """🚀 УЛЬТРАБЫСТРЫЙ просмотрщик галереи изображений (рефакторенный)"""
@@ -127,14 +130,22 @@ class GalleryViewer(BaseHandler):
             is_favorite=getattr(generation, 'is_favorite', False)
         )
         
-        # ⚡ ПРЯМАЯ загрузка из кэша (БЕЗ лишних проверок)
         if generation.result_urls:
+            # ⚡ Изображение уже есть в Telegram - показываем по file_id (без MinIO и загрузки)
+            file_id = await telegram_file_cache.get_file_id(generation)
+            if file_id and await self._send_card_with_image_lightning_fast(
+                callback, text, keyboard, file_id, generation
+            ):
+                asyncio.create_task(ultra_gallery_cache.set_user_gallery_state(user_id, img_idx))
+                return
+            
+            # ⚡ ПРЯМАЯ загрузка из кэша (БЕЗ лишних проверок)
             image_url = generation.result_urls[0]
             image_data = await ultra_gallery_cache.get_cached_image(image_url)
             
             if image_data:
                 # МГНОВЕННАЯ отправка
-                await self._send_card_with_image_lightning_fast(callback, text, keyboard, image_data)
+                await self._send_card_with_image_lightning_fast(callback, text, keyboard, image_data, generation)
                 # Сохраняем состояние в фоне БЕЗ ожидания
                 asyncio.create_task(ultra_gallery_cache.set_user_gallery_state(user_id, img_idx))
                 return
@@ -145,7 +156,9 @@ class GalleryViewer(BaseHandler):
         # Сохраняем состояние и загружаем контент в фоне
         asyncio.create_task(ultra_gallery_cache.set_user_gallery_state(user_id, img_idx))
         if generation.result_urls:
-            asyncio.create_task(self._async_load_and_update_image(callback, generation.result_urls[0], text, keyboard))
+            asyncio.create_task(
+                self._async_load_and_update_image(callback, generation.result_urls[0], text, keyboard, generation)
+            )
     
     async def get_user_completed_images_ultra_fast(self, user_id: UUID) -> List[ImageGeneration]:
         """🚀 УЛЬТРАБЫСТРОЕ получение изображений (БЕЗ создания FAL клиента)"""
@@ -153,29 +166,46 @@ class GalleryViewer(BaseHandler):
         try:
             # 🎯 СНАЧАЛА проверяем кэш
             cached_images = await ultra_gallery_cache.get_user_images(user_id)
-            if cached_images:
+            if cached_images is not None:
                 logger.debug(f"🚀 ULTRA FAST images from cache: {len(cached_images)} images")
                 return cached_images
             
+            # Версия кеша до запроса: инвалидация во время загрузки не даст записать устаревший список
+            cache_version = await ultra_gallery_cache.images_version(user_id)
+            
             # 🔥 ПРЯМОЙ запрос к БД (БЕЗ generation_service и FAL клиента)
             logger.debug(f"🔄 Direct DB query for user {user_id}")
             
             from app.core.database import get_session
+            from app.database.models import Avatar
             from sqlalchemy import select
-            from sqlalchemy.orm import selectinload
+            from sqlalchemy.orm import load_only, selectinload
             
             async with get_session() as session:
-                # Прямой запрос с оптимизированной загрузкой
+                # Только колонки карточки: промпты и метаданные грузятся отдельно по кнопке.
+                # Порядок (created_at, id) совпадает с индексом ix_image_generations_user_completed
                 stmt = (
                     select(ImageGeneration)
-                    .options(selectinload(ImageGeneration.avatar))
+                    .options(
+                        load_only(
+                            ImageGeneration.id,
+                            ImageGeneration.user_id,
+                            ImageGeneration.avatar_id,
+                            ImageGeneration.status,
+                            ImageGeneration.result_urls,
+                            ImageGeneration.aspect_ratio,
+                            ImageGeneration.is_favorite,
+                            ImageGeneration.created_at,
+                        ),
+                        selectinload(ImageGeneration.avatar).load_only(Avatar.id, Avatar.name)
+                    )
                     .where(
                         ImageGeneration.user_id == user_id,
                         ImageGeneration.status == GenerationStatus.COMPLETED,
                         ImageGeneration.result_urls.isnot(None)
                     )
-                    .order_by(ImageGeneration.created_at.desc())
-                    .limit(150)
+                    .order_by(ImageGeneration.created_at.desc(), ImageGeneration.id.desc())
+                    .limit(GALLERY_MAX_IMAGES)
                 )
                 
                 result = await session.execute(stmt)
@@ -187,8 +217,8 @@ class GalleryViewer(BaseHandler):
                     if (gen.result_urls and len(gen.result_urls) > 0)
                 ]
             
-            # 🎯 КЭШИРУЕМ на 15 минут
-            await ultra_gallery_cache.set_user_images(user_id, completed_images)
+            # 🎯 КЭШИРУЕМ на 15 минут (записи msgpack, следующий показ без БД)
+            await ultra_gallery_cache.set_user_images(user_id, completed_images, version=cache_version)
             
             logger.debug(f"🚀 ULTRA FAST direct DB load: {len(completed_images)} images")
             return completed_images
@@ -261,25 +291,36 @@ class GalleryViewer(BaseHandler):
         callback: CallbackQuery, 
         text: str, 
         keyboard, 
-        image_data: bytes
-    ):
-        """⚡ БЫСТРАЯ отправка изображения БЕЗ удаления сообщений"""
+        image: Union[bytes, str],
+        generation: Optional[ImageGeneration] = None
+    ) -> bool:
+        """
+        ⚡ БЫСТРАЯ отправка изображения БЕЗ удаления сообщений
+        
+        image - байты изображения или Telegram file_id. После загрузки байтов
+        file_id из ответа запоминается, следующие показы идут без загрузки.
+        
+        Returns:
+            bool: False, если Telegram отклонил file_id (нужна загрузка байтов)
+        """
+        
+        by_file_id = isinstance(image, str)
         
         try:
-            image_file = BufferedInputFile(image_data, filename="img.jpg")
+            photo = image if by_file_id else BufferedInputFile(image, filename="img.jpg")
             
             if callback.message.photo:
                 # ✅ ИДЕАЛЬНО: Редактируем существующее фото (БЕЗ мерцания)
-                await callback.message.edit_media(
-                    media=InputMediaPhoto(media=image_file, caption=text, parse_mode="Markdown"),
+                sent = await callback.message.edit_media(
+                    media=InputMediaPhoto(media=photo, caption=text, parse_mode="Markdown"),
                     reply_markup=keyboard
                 )
                 logger.debug("✅ Изображение обновлено через edit_media (без мерцания)")
                 
             elif callback.message.text:
                 # ✅ ХОРОШО: У нас текстовое сообщение, добавляем фото
-                await callback.message.answer_photo(
-                    photo=image_file,
+                sent = await callback.message.answer_photo(
+                    photo=photo,
                     caption=text,
                     reply_markup=keyboard,
                     parse_mode="Markdown"
@@ -288,19 +329,30 @@ class GalleryViewer(BaseHandler):
                 
             else:
                 # Неизвестный тип сообщения - отправляем новое
-                await callback.message.answer_photo(
-                    photo=image_file,
+                sent = await callback.message.answer_photo(
+                    photo=photo,
                     caption=text,
                     reply_markup=keyboard,
                     parse_mode="Markdown"
                 )
                 logger.debug("✅ Новое фото отправлено")
+            
+            if generation is not None and not by_file_id:
+                await telegram_file_cache.remember(generation, sent)
+            return True
                 
         except TelegramBadRequest as e:
+            if by_file_id and "not modified" not in str(e).lower():
+                # file_id выдан другим ботом или устарел - забываем и грузим байты
+                logger.warning(f"Telegram отклонил file_id: {e}")
+                if generation is not None:
+                    await telegram_file_cache.forget(generation)
+                return False
+            
             if "media" in str(e).lower() or "photo" in str(e).lower():
                 logger.warning(f"Ошибка медиа Telegram: {e}")
                 # Fallback на текст с кнопкой "Показать изображение"
-                await self._send_image_fallback_with_button(callback, text, keyboard, image_data)
+                await self._send_image_fallback_with_button(callback, text, keyboard)
             else:
                 logger.debug(f"Другая ошибка Telegram: {e}")
                 await self._send_card_text_loading(callback, text, keyboard)
@@ -308,6 +360,8 @@ class GalleryViewer(BaseHandler):
         except Exception as e:
             logger.debug(f"Общая ошибка отправки изображения: {e}")
             await self._send_card_text_loading(callback, text, keyboard)
+        
+        return True
     
     async def _send_card_text_loading(self, callback: CallbackQuery, text: str, keyboard):
         """Отправляет карточку с индикатором загрузки БЕЗ удаления сообщений"""
@@ -371,7 +425,14 @@ class GalleryViewer(BaseHandler):
             logger.debug(f"Общая ошибка loading: {e}")
             await callback.answer("⏳ Загружается...", show_alert=False)
     
-    async def _async_load_and_update_image(self, callback: CallbackQuery, image_url: str, text: str, keyboard):
+    async def _async_load_and_update_image(
+        self,
+        callback: CallbackQuery,
+        image_url: str,
+        text: str,
+        keyboard,
+        generation: Optional[ImageGeneration] = None
+    ):
         """Асинхронно загружает и обновляет изображение БЕЗ удаления сообщений"""
         
         try:
@@ -384,7 +445,7 @@ class GalleryViewer(BaseHandler):
                 
                 if callback.message.photo:
                     # Редактируем существующее фото
-                    await callback.message.edit_media(
+                    sent = await callback.message.edit_media(
                         media=InputMediaPhoto(media=image_file, caption=text, parse_mode="Markdown"),
                         reply_markup=keyboard
                     )
@@ -392,7 +453,7 @@ class GalleryViewer(BaseHandler):
                     
                 elif callback.message.text:
                     # Текстовое сообщение - добавляем фото как ответ
-                    await callback.message.answer_photo(
+                    sent = await callback.message.answer_photo(
                         photo=image_file,
                         caption=text,
                         reply_markup=keyboard,
@@ -401,13 +462,16 @@ class GalleryViewer(BaseHandler):
                     logger.debug("✅ Фото добавлено к текстовому сообщению асинхронно")
                 else:
                     # Отправляем новое фото
-                    await callback.message.answer_photo(
+                    sent = await callback.message.answer_photo(
                         photo=image_file,
                         caption=text,
                         reply_markup=keyboard,
                         parse_mode="Markdown"
                     )
                     logger.debug("✅ Новое фото отправлено асинхронно")
+                
+                if generation is not None:
+                    await telegram_file_cache.remember(generation, sent)
                     
             else:
                 # Не удалось загрузить - обновляем текст с ошибкой
@@ -459,8 +523,7 @@ class GalleryViewer(BaseHandler):
         self, 
         callback: CallbackQuery, 
         text: str, 
-        keyboard, 
-        image_data: bytes
+        keyboard
     ):
         """Fallback: текст + кнопка для повторной попытки показа изображения"""
         
@@ -17,6 +17,7 @@ from aiogram.types import (
 from app.core.di import get_user_service
 from app.core.logger import get_logger
 from app.database.models.generation import GenerationStatus
+from app.services.generation.core.generation_events import get_generation_event_bus
 from app.services.generation.generation_service import (
     GENERATION_COST,
     ImageGenerationService,
@@ -29,6 +30,9 @@ from .keyboards import build_generation_result_keyboard
 
 logger = get_logger(__name__)
 
+# Сколько ждать событие о завершении генерации до проверки БД (сек)
+GENERATION_MONITOR_TIMEOUT = 120
+
 
 class GenerationMonitor(BaseHandler):
     """Мониторинг и управление процессом генерации"""
@@ -246,42 +250,33 @@ class GenerationMonitor(BaseHandler):
     async def monitor_generation_status(
         self, message, generation, original_prompt: str, avatar_name: str
     ):
-        """Мониторит статус генерации и показывает результат автоматически"""
-
-        max_attempts = 120  # 2 минуты максимум (по 1 секунде)
-        attempt = 0
+        """
+        Мониторит статус генерации и показывает результат автоматически
 
-        while attempt < max_attempts:
-            try:
-                # Получаем актуальный статус
-                current_generation = await self.generation_service.get_generation_by_id(
-                    generation.id
-                )
+        Статус приходит событием от GenerationProcessor. БД проверяется
+        один раз сразу после подписки (событие могло прийти раньше) и
+        один раз по таймауту (событие могло потеряться).
+        """
 
-                if not current_generation:
-                    await message.edit_text("❌ Ошибка: генерация не найдена", parse_mode="HTML")
-                    return
+        event_bus = get_generation_event_bus()
+        waiter = await event_bus.subscribe(generation.id)
 
-                if current_generation.status == GenerationStatus.COMPLETED:
-                    # Генерация завершена - показываем результат
-                    await self.show_final_result(
-                        message, current_generation, original_prompt, avatar_name
-                    )
-                    return
+        try:
+            if await self._show_if_finished(message, generation.id, original_prompt, avatar_name):
+                return
 
-                elif current_generation.status == GenerationStatus.FAILED:
-                    # Генерация провалилась - показываем ошибку
-                    await self.show_final_error(message, current_generation)
-                    return
+            try:
+                await asyncio.wait_for(waiter, timeout=GENERATION_MONITOR_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.info(f"Событие генерации {generation.id} не получено, проверяем БД")
 
-                # Генерация еще идет - ждем секунду
-                await asyncio.sleep(1)
-                attempt += 1
+            if await self._show_if_finished(message, generation.id, original_prompt, avatar_name):
+                return
 
-            except Exception as e:
-                logger.exception(f"Ошибка мониторинга генерации: {e}")
-                await asyncio.sleep(1)
-                attempt += 1
+        except Exception as e:
+            logger.exception(f"Ошибка мониторинга генерации: {e}")
+        finally:
+            event_bus.unsubscribe(generation.id, waiter)
 
         # Таймаут - показываем сообщение
         await message.edit_text(
@@ -294,6 +289,31 @@ class GenerationMonitor(BaseHandler):
             parse_mode="HTML",
         )
 
+    async def _show_if_finished(
+        self, message, generation_id: UUID, original_prompt: str, avatar_name: str
+    ) -> bool:
+        """Проверяет статус в БД и показывает результат, если генерация завершена"""
+
+        current_generation = await self.generation_service.get_generation_by_id(generation_id)
+
+        if not current_generation:
+            await message.edit_text("❌ Ошибка: генерация не найдена", parse_mode="HTML")
+            return True
+
+        if current_generation.status == GenerationStatus.COMPLETED:
+            # Генерация завершена - показываем результат
+            await self.show_final_result(
+                message, current_generation, original_prompt, avatar_name
+            )
+            return True
+
+        if current_generation.status == GenerationStatus.FAILED:
+            # Генерация провалилась - показываем ошибку
+            await self.show_final_error(message, current_generation)
+            return True
+
+        return False
+
     async def show_final_result(self, message, generation, original_prompt: str, avatar_name: str):
         """Показывает финальный результат генерации"""
 
@@ -336,44 +356,43 @@ class GenerationMonitor(BaseHandler):
 
                 try:
                     # Попытка 2: Скачать изображение и отправить как файл
-                    import aiohttp
-
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(result_url) as response:
-                            if response.status == 200:
-                                image_data = await response.read()
-
-                                # Определяем расширение файла
-                                content_type = response.headers.get("content-type", "image/jpeg")
-                                extension = (
-                                    ".jpg"
-                                    if "jpeg" in content_type
-                                    else ".png" if "png" in content_type else ".jpg"
-                                )
-
-                                photo_input = BufferedInputFile(
-                                    image_data,
-                                    filename=f"generated_image_{generation.id}{extension}",
-                                )
-
-                                await message.reply_photo(
-                                    photo=photo_input,
-                                    caption=text,
-                                    reply_markup=keyboard,
-                                    parse_mode="HTML",
-                                )
-
-                                # Удаляем сообщение о генерации
-                                await message.delete()
-
-                                logger.info(
-                                    f"Изображение успешно отправлено как файл для генерации {generation.id}"
-                                )
-
-                            else:
-                                raise Exception(
-                                    f"HTTP {response.status} при скачивании изображения"
-                                )
+                    from app.core.di import get_http_client
+
+                    async with get_http_client().request("fal", "GET", result_url, endpoint="fal/cdn") as response:
+                        if response.status == 200:
+                            image_data = await response.read()
+
+                            # Определяем расширение файла
+                            content_type = response.headers.get("content-type", "image/jpeg")
+                            extension = (
+                                ".jpg"
+                                if "jpeg" in content_type
+                                else ".png" if "png" in content_type else ".jpg"
+                            )
+
+                            photo_input = BufferedInputFile(
+                                image_data,
+                                filename=f"generated_image_{generation.id}{extension}",
+                            )
+
+                            await message.reply_photo(
+                                photo=photo_input,
+                                caption=text,
+                                reply_markup=keyboard,
+                                parse_mode="HTML",
+                            )
+
+                            # Удаляем сообщение о генерации
+                            await message.delete()
+
+                            logger.info(
+                                f"Изображение успешно отправлено как файл для генерации {generation.id}"
+                            )
+
+                        else:
+                            raise Exception(
+                                f"HTTP {response.status} при скачивании изображения"
+                            )
 
                 except Exception as download_error:
                     logger.exception(f"Ошибка скачивания и отправки изображения: {download_error}")
@@ -1,6 +1,7 @@
 """
 Обработчик промптов по фото для генерации изображений
 """
+from typing import Optional
 from uuid import UUID
 
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
@@ -166,14 +167,22 @@ class PhotoPromptHandler(BaseHandler):
                 parse_mode="HTML"
             )
             
-            # Получаем изображение
-            image_bytes = await self._extract_image_from_message(message, analysis_message)
-            if not image_bytes:
-                return
-            
-            # 🤖 ЭТАП 2: ИИ-анализ
-            await analysis_message.edit_text(
-                f"""🤖 <b>ИИ анализирует изображение...</b>
+            # Анализ этого файла уже есть - без скачивания и GPT Vision
+            avatar_type = avatar.training_type.value if avatar.training_type else "portrait"
+            file_unique_id = self._reference_file_unique_id(message)
+            analysis_result = None
+            if file_unique_id:
+                analysis_result = await self.image_analysis_service.get_cached_analysis(file_unique_id, avatar_type)
+            
+            if not analysis_result:
+                # Получаем изображение
+                image_bytes = await self._extract_image_from_message(message, analysis_message)
+                if not image_bytes:
+                    return
+                
+                # 🤖 ЭТАП 2: ИИ-анализ
+                await analysis_message.edit_text(
+                    f"""🤖 <b>ИИ анализирует изображение...</b>
 
 🎭 <b>Аватар:</b> {avatar.name}
 📸 <b>Изображение:</b> {len(image_bytes)} байт получено
@@ -185,14 +194,13 @@ class PhotoPromptHandler(BaseHandler):
 • ⏳ Запуск генерации...
 
 💡 Создаём детальный фотореалистичный промпт""",
-                parse_mode="HTML"
-            )
-            
-            # Анализируем изображение
-            avatar_type = avatar.training_type.value if avatar.training_type else "portrait"
-            analysis_result = await self.image_analysis_service.analyze_image_for_prompt(
-                image_bytes, avatar_type
-            )
+                    parse_mode="HTML"
+                )
+                
+                # Анализируем изображение
+                analysis_result = await self.image_analysis_service.analyze_image_for_prompt(
+                    image_bytes, avatar_type, file_unique_id=file_unique_id
+                )
             
             if not analysis_result.get("prompt"):
                 await analysis_message.edit_text(
@@ -264,6 +272,15 @@ class PhotoPromptHandler(BaseHandler):
             await message.reply("❌ Произошла ошибка при анализе изображения")
             await self.safe_clear_state(state)
     
+    @staticmethod
+    def _reference_file_unique_id(message: Message) -> Optional[str]:
+        """file_unique_id референсного изображения (одинаков для всех пересылок файла)"""
+        if message.photo:
+            return message.photo[-1].file_unique_id
+        if message.document and message.document.mime_type and message.document.mime_type.startswith('image/'):
+            return message.document.file_unique_id
+        return None
+    
     async def _extract_image_from_message(self, message: Message, analysis_message: Message) -> bytes:
         """Извлекает изображение из сообщения"""
         
@@ -206,7 +206,7 @@ class TopupHandler(BaseHandler):
     def _format_promokode_bonus(self, promokode_data: Dict[str, Any]) -> str:
         """Форматирует информацию о бонусе промокода"""
         code = promokode_data["code"]
-        promokode_type = promokode_data["type"]
+        promokode_type = PromokodeType(promokode_data["type"])
         
         if promokode_type == PromokodeType.BALANCE:
             balance_amount = promokode_data["balance_amount"]
@@ -259,7 +259,7 @@ class TopupHandler(BaseHandler):
         
         if promokode_data:
             code = promokode_data["code"]
-            promokode_type = promokode_data["type"]
+            promokode_type = PromokodeType(promokode_data["type"])
             
             text += f"\n\n🎁 <b>Активен промокод: {code}</b>\n"
             
@@ -333,7 +333,7 @@ class TopupHandler(BaseHandler):
                 package_info=package_info
             )
             
-            if success and promokode_data["type"] == PromokodeType.BALANCE:
+            if success and PromokodeType(promokode_data["type"]) == PromokodeType.BALANCE:
                 # Для промокодов баланса сразу зачисляем монеты
                 await balance_service.add_balance(
                     user_id=user_id,
@@ -362,14 +362,14 @@ class TopupHandler(BaseHandler):
 
 """
         
-        if promokode_data and promokode_data["type"] != PromokodeType.BALANCE:
+        if promokode_data and PromokodeType(promokode_data["type"]) != PromokodeType.BALANCE:
             text += f"🎁 Промокод: <b>{promokode_data['code']}</b>\n"
             
-            if promokode_data["type"] == PromokodeType.BONUS:
+            if PromokodeType(promokode_data["type"]) == PromokodeType.BONUS:
                 bonus = promokode_data["bonus_amount"]
                 total_coins = coins + bonus
                 text += f"💎 Итого монет с бонусом: <b>{total_coins}</b>\n\n"
-            elif promokode_data["type"] == PromokodeType.DISCOUNT:
+            elif PromokodeType(promokode_data["type"]) == PromokodeType.DISCOUNT:
                 discount = promokode_data["discount_percent"]
                 text += f"💰 Скидка: <b>{discount}%</b>\n\n"
         
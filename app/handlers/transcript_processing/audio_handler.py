@@ -3,11 +3,14 @@
 Выделен из app/handlers/transcript_processing.py для соблюдения правила ≤500 строк
 """
 import logging
+import time
+from pathlib import Path
 from typing import Optional
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
 from app.core.config import settings
+from app.core.temp_files import get_temp_file_path
 from app.handlers.state import TranscribeStates
 from app.core.di import (
     get_audio_processing_service,
@@ -134,7 +137,7 @@ class AudioHandler:
         if file_size and file_size > telegram_api_limit:
             return await self._process_large_audio(message, file_info, processing_msg)
         else:
-            return await self._process_regular_audio(message, file_info)
+            return await self._process_regular_audio(message, file_info, processing_msg)
 
     async def _process_large_audio(self, message: Message, file_info: dict, processing_msg: Message) -> Optional[str]:
         """Обрабатывает большие аудио файлы через специальный алгоритм"""
@@ -149,9 +152,9 @@ class AudioHandler:
             f"📊 Размер: {file_size / (1024*1024):.1f} МБ\n"
             f"📏 Лимит Bot API: {telegram_api_limit / (1024*1024):.0f} МБ\n\n"
             f"🧠 **Умная обработка:**\n"
-            f"• Анализирую паузы в аудио\n"
-            f"• Разделяю на оптимальные части\n"
-            f"• Добавляю перекрытия для контекста\n"
+            f"• Скачиваю файл на сервер\n"
+            f"• Нарезаю на части за один проход\n"
+            f"• Распознаю части параллельно\n"
             f"⏳ Это займет несколько минут...",
             parse_mode="Markdown"
         )
@@ -176,8 +179,8 @@ class AudioHandler:
                 f"📁 **Большой файл обнаружен**\n\n"
                 f"📊 Размер: {file_size / (1024*1024):.1f} МБ\n"
                 f"🤖 **Запускаю умный алгоритм обработки...**\n"
-                f"🔄 Скачиваю и анализирую структуру аудио\n"
-                f"⚡ Разбиваю на части по естественным паузам",
+                f"🔄 Скачиваю аудио\n"
+                f"⚡ Распознаю части по мере нарезки",
                 parse_mode="Markdown"
             )
             
@@ -227,7 +230,12 @@ class AudioHandler:
         
         return None
 
-    async def _process_regular_audio(self, message: Message, file_info: dict) -> Optional[str]:
+    async def _process_regular_audio(
+        self,
+        message: Message,
+        file_info: dict,
+        processing_msg: Optional[Message] = None
+    ) -> Optional[str]:
         """Обрабатывает обычные аудио файлы (≤20MB)"""
         try:
             logger.info(f"🎵 [TRANSCRIPTION] Начинаем обработку аудио от пользователя {message.from_user.id}")
@@ -235,39 +243,66 @@ class AudioHandler:
             logger.info(f"📊 [TRANSCRIPTION] Размер: {file_info.get('file_size', 0)} байт")
             logger.info(f"⏱️ [TRANSCRIPTION] Длительность: {file_info.get('duration', 'неизвестно')} сек")
             
-            # Обычное скачивание для файлов <= 20MB
+            # Обычное скачивание для файлов <= 20MB - сразу на диск, без буфера в памяти
             logger.info(f"📥 [TRANSCRIPTION] Скачиваем файл из Telegram...")
             file = await message.bot.get_file(file_info["file_id"])
-            downloaded_file = await message.bot.download_file(file.file_path)
-            audio_data = downloaded_file.getvalue()
-            logger.info(f"✅ [TRANSCRIPTION] Файл скачан, размер: {len(audio_data)} байт")
+            audio_path = get_temp_file_path(suffix=".audio")
+            try:
+                await message.bot.download_file(file.file_path, destination=audio_path)
+                logger.info(f"✅ [TRANSCRIPTION] Файл скачан: {audio_path}")
 
-            # Транскрибируем
-            async with self.get_session() as session:
-                audio_service = get_audio_processing_service(session)
-                logger.info(f"🤖 [TRANSCRIPTION] Запускаем процесс транскрибации...")
-                
-                result = await audio_service.process_audio(audio_data)
-                
-                if not result.success:
-                    logger.error(f"❌ [TRANSCRIPTION] Ошибка транскрибации: {result.error}")
-                    logger.error(f"❌ [TRANSCRIPTION] Детали файла: {file_info}")
-                    return None
-                
-                text = result.text
-                word_count = len(text.split()) if text else 0
-                logger.info(f"✅ [TRANSCRIPTION] Транскрибация завершена успешно!")
-                logger.info(f"📝 [TRANSCRIPTION] Длина текста: {len(text)} символов")
-                logger.info(f"📖 [TRANSCRIPTION] Количество слов: {word_count}")
-                logger.info(f"📄 [TRANSCRIPTION] Первые 100 символов: {text[:100]}...")
-                return text
+                # Транскрибируем
+                async with self.get_session() as session:
+                    audio_service = get_audio_processing_service(session)
+                    logger.info(f"🤖 [TRANSCRIPTION] Запускаем процесс транскрибации...")
+                    
+                    result = await audio_service.process_audio_file(
+                        audio_path,
+                        progress_callback=self._make_progress_callback(processing_msg)
+                    )
+            finally:
+                Path(audio_path).unlink(missing_ok=True)
                 
+            if not result.success:
+                logger.error(f"❌ [TRANSCRIPTION] Ошибка транскрибации: {result.error}")
+                logger.error(f"❌ [TRANSCRIPTION] Детали файла: {file_info}")
+                return None
+            
+            text = result.text
+            word_count = len(text.split()) if text else 0
+            logger.info(f"✅ [TRANSCRIPTION] Транскрибация завершена успешно!")
+            logger.info(f"📝 [TRANSCRIPTION] Длина текста: {len(text)} символов")
+            logger.info(f"📖 [TRANSCRIPTION] Количество слов: {word_count}")
+            logger.info(f"📄 [TRANSCRIPTION] Первые 100 символов: {text[:100]}...")
+            return text
+            
         except Exception as e:
             logger.error(f"❌ [TRANSCRIPTION] Критическая ошибка обработки аудио: {e}")
             logger.error(f"❌ [TRANSCRIPTION] Файл: {file_info}")
             logger.exception(f"❌ [TRANSCRIPTION] Полная трассировка ошибки:")
             return None
 
+    def _make_progress_callback(self, processing_msg: Optional[Message]):
+        """Создает колбэк, показывающий прогресс транскрибации по чанкам"""
+        if processing_msg is None:
+            return None
+        
+        last_update = 0.0
+        
+        async def _on_progress(done: int, total: int) -> None:
+            nonlocal last_update
+            now = time.monotonic()
+            # Не чаще раза в 2 секунды, чтобы не упереться в лимиты Telegram
+            if total <= 1 or (done < total and now - last_update < 2.0):
+                return
+            last_update = now
+            try:
+                await processing_msg.edit_text(f"🎙 Распознаю речь: часть {done}/{total}...")
+            except Exception as e:
+                logger.debug(f"[AUDIO_UNIVERSAL] Не удалось обновить прогресс: {e}")
+        
+        return _on_progress
+
     async def _save_transcript(self, message: Message, transcript_text: str, file_info: dict) -> Optional[dict]:
         """Сохраняет транскрипт в БД"""
         try:
@@ -170,14 +170,15 @@ class PaidTranscriptionHandler(BaseHandler):
             callback: Callback с подтверждением оплаты
             user_id: ID пользователя
         """
+        audio_path = None
         try:
             # ВАЖНО: Отвечаем на callback сразу, до длительной операции
             await callback.answer()
             
-            # Извлекаем сохраненные данные аудио
-            audio_data, file_info, quote = await self._retrieve_audio_data(callback.from_user.id)
+            # Забираем аудио из спула до оплаты: повторное нажатие его уже не найдет
+            audio_path, file_info, quote = await self._claim_audio_data(callback.from_user.id)
             
-            if not audio_data:
+            if not audio_path:
                 await callback.message.edit_text(
                     "❌ Данные аудио не найдены. Попробуйте снова.",
                     reply_markup=None
@@ -201,7 +202,7 @@ class PaidTranscriptionHandler(BaseHandler):
                 # Выполняем платную транскрибацию
                 result = await transcription_service.transcribe_with_payment(
                     user_id=user_id,
-                    audio_data=audio_data,
+                    audio_path=audio_path,
                     language="ru",
                     metadata={
                         "source": file_info.get("source_type", "audio"),
@@ -271,10 +272,10 @@ class PaidTranscriptionHandler(BaseHandler):
                         "Средства возвращены на ваш баланс."
                     )
             
-            # Очищаем временные данные
-            await self._clear_audio_data(callback.from_user.id)
-            
         except InsufficientBalanceError as e:
+            # Деньги не списаны - аудио снова ждет оплаты (пополнение, промокод)
+            await self._restore_audio_data(callback.from_user.id, audio_path, file_info, quote)
+            audio_path = None
             await callback.message.edit_text(
                 f"❌ <b>Недостаточно средств</b>\n\n{str(e)}\n\n"
                 "Пополните баланс или используйте промокод.",
@@ -292,6 +293,10 @@ class PaidTranscriptionHandler(BaseHandler):
             await callback.message.edit_text(
                 "❌ Произошла внутренняя ошибка. Попробуйте позже."
             )
+        
+        finally:
+            if audio_path:
+                await self._discard_audio_file(audio_path)
     
     async def handle_promo_code_entry(self, callback: CallbackQuery, state: FSMContext) -> None:
         """
@@ -393,75 +398,48 @@ class PaidTranscriptionHandler(BaseHandler):
         quote: Dict[str, Any]
     ) -> None:
         """
-        Сохраняет данные аудио в Redis для production
+        Сохраняет аудио в спул до подтверждения оплаты
         """
-        try:
-            from app.services.redis_storage import AudioDataRedisStorage
-            storage = AudioDataRedisStorage()
-            
-            success = await storage.store_audio_data(
-                user_id=user_id,
-                audio_data=audio_data,
-                file_info=file_info,
-                quote=quote,
-                ttl_seconds=3600  # 1 час
-            )
-            
-            if not success:
-                logger.warning(f"Не удалось сохранить аудио данные в Redis для пользователя {user_id}")
-                
-        except Exception as e:
-            logger.exception(f"Ошибка сохранения аудио данных: {e}")
-            # Fallback к временному хранению в памяти для development
-            if not hasattr(self, '_temp_storage'):
-                self._temp_storage = {}
-            
-            self._temp_storage[user_id] = {
-                'audio_data': audio_data,
-                'file_info': file_info,
-                'quote': quote
-            }
-            logger.info(f"Использовано fallback хранение в памяти для пользователя {user_id}")
+        from app.services.redis_storage import PendingAudioStorage
+        storage = PendingAudioStorage()
+        
+        success = await storage.store_audio_data(
+            user_id=user_id,
+            audio_data=audio_data,
+            file_info=file_info,
+            quote=quote
+        )
+        
+        if not success:
+            logger.warning(f"Не удалось сохранить аудио в спул для пользователя {user_id}")
     
-    async def _retrieve_audio_data(self, user_id: int) -> tuple:
+    async def _claim_audio_data(self, user_id: int) -> tuple:
         """
-        Извлекает данные аудио из Redis или fallback хранилища
+        Забирает (путь к аудио, file_info, quote) из спула
         """
-        try:
-            from app.services.redis_storage import AudioDataRedisStorage
-            storage = AudioDataRedisStorage()
-            
-            audio_data, file_info, quote = await storage.retrieve_audio_data(user_id)
-            
-            if audio_data is not None:
-                return audio_data, file_info, quote
-            
-        except Exception as e:
-            logger.exception(f"Ошибка извлечения из Redis: {e}")
-        
-        # Fallback к временному хранению в памяти
-        if hasattr(self, '_temp_storage'):
-            data = self._temp_storage.get(user_id)
-            if data:
-                return data['audio_data'], data['file_info'], data['quote']
-        
-        return None, None, None
+        from app.services.redis_storage import PendingAudioStorage
+        return await PendingAudioStorage().claim_audio_data(user_id)
+    
+    async def _restore_audio_data(self, user_id: int, audio_path: str, file_info: dict, quote: dict) -> None:
+        """
+        Возвращает забранное аудио в спул
+        """
+        from app.services.redis_storage import PendingAudioStorage
+        await PendingAudioStorage().restore_audio_data(user_id, audio_path, file_info, quote)
+    
+    async def _discard_audio_file(self, audio_path: str) -> None:
+        """
+        Удаляет забранный из спула файл после обработки
+        """
+        from app.services.redis_storage import PendingAudioStorage
+        await PendingAudioStorage().discard_claimed(audio_path)
     
     async def _clear_audio_data(self, user_id: int) -> None:
         """
-        Очищает данные аудио из Redis и fallback хранилища
+        Удаляет аудио пользователя из спула
         """
-        try:
-            from app.services.redis_storage import AudioDataRedisStorage
-            storage = AudioDataRedisStorage()
-            await storage.clear_audio_data(user_id)
-            
-        except Exception as e:
-            logger.exception(f"Ошибка очистки Redis: {e}")
-        
-        # Очистка fallback хранилища
-        if hasattr(self, '_temp_storage') and user_id in self._temp_storage:
-            del self._temp_storage[user_id]
+        from app.services.redis_storage import PendingAudioStorage
+        await PendingAudioStorage().clear_audio_data(user_id)
 
 
 # Регистрируем обработчики callback
@@ -49,12 +49,10 @@ async def startup_tasks():
     logger.info("🚀 Выполнение задач запуска...")
     
     try:
-        # Проверяем и восстанавливаем мониторинг зависших аватаров
-        from app.services.avatar.fal_training_service.startup_checker import startup_checker
-        await startup_checker.check_and_restore_monitoring()
-        
-        # Запускаем периодические проверки в фоне
-        task = asyncio.create_task(startup_checker.schedule_periodic_checks())
+        # Опрос обучений аватаров: одна реплика держит аренду, реестр в Redis
+        # переживает рестарт, обучения из БД подхватываются при сверке
+        from app.services.avatar.fal_training_service.training_poller import training_poller
+        task = training_poller.start()
         background_tasks.add(task)
         task.add_done_callback(background_tasks.discard)
         
@@ -82,11 +80,39 @@ async def shutdown_handler():
             if background_tasks:
                 await asyncio.gather(*background_tasks, return_exceptions=True)
         
+        # Отдаем аренду опроса обучений другой реплике
+        from app.services.avatar.fal_training_service.training_poller import training_poller
+        await training_poller.stop()
+
         # Закрываем сессию бота
         if bot_instance and bot_instance.session:
             logger.info("🔐 Закрываем сессию бота...")
             await bot_instance.session.close()
         
+        # Останавливаем процессы обработки аудио
+        from app.services.audio_processing.worker_pool import shutdown_audio_worker_pool
+        shutdown_audio_worker_pool()
+
+        # Останавливаем процессы обработки изображений
+        from app.services.images.worker_pool import shutdown_image_worker_pool
+        shutdown_image_worker_pool()
+
+        # Останавливаем подписку на события генераций (до закрытия Redis)
+        from app.services.generation.core.generation_events import shutdown_generation_event_bus
+        await shutdown_generation_event_bus()
+
+        # Останавливаем подписку на сброс кеша пользователей
+        from app.services.user_identity import shutdown_user_identity_cache
+        await shutdown_user_identity_cache()
+
+        # Закрываем общие HTTP-сессии (OpenAI, FAL, загрузка изображений)
+        from app.core.di import shutdown_http_client
+        await shutdown_http_client()
+
+        # Закрываем пул соединений к MinIO
+        from app.services.storage import shutdown_storage_service
+        await shutdown_storage_service()
+
         # Закрываем подключения к базе данных
         try:
             from app.core.di import _engine, _redis_client
@@ -117,29 +143,25 @@ def signal_handler(signum, frame):
     raise KeyboardInterrupt()
 
 
-async def main():
-    """
-    Основная функция запуска бота
+async def create_dispatcher() -> Dispatcher:
     """
-    global bot_instance
-    
-    logger.info(f"🚀 Запуск бота - Экземпляр: {INSTANCE_ID}")
-    logger.info(f"📋 Режим работы: {BOT_MODE}")
-    logger.info(f"📡 Polling разрешен: {SET_POLLING}")
+    Создает диспетчер со всеми роутерами
 
-    # Инициализация бота и диспетчера с явной конфигурацией timeout
-    try:
-        # Создаем Bot стандартным способом - aiogram 3.x сам управляет сессией
-        bot_instance = Bot(token=settings.effective_telegram_token)
-        logger.info(f"✅ Bot создан с токеном для окружения: {settings.ENVIRONMENT}")
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка создания Bot: {e}")
-        raise
-    
-    storage = MemoryStorage()
+    FSM хранится в Redis (общий для всех экземпляров бота);
+    FSM_STORAGE=memory оставлен для локальной отладки в одном процессе.
+    """
+    if settings.FSM_STORAGE == "memory":
+        logger.warning("⚠️ FSM в памяти процесса - состояние не разделяется между экземплярами")
+        storage = MemoryStorage()
+    else:
+        from app.core.di import get_state_storage
+        storage = get_state_storage()
     dp = Dispatcher(storage=storage)
 
+    # Пользователь определяется один раз на обновление (LRU -> Redis -> БД)
+    from app.shared.middlewares.user_middleware import UserMiddleware
+    dp.update.outer_middleware(UserMiddleware())
+
     # Регистрация роутеров
     dp.include_router(main_router)
     dp.include_router(debug_router)
@@ -173,8 +195,33 @@ async def main():
     # Регистрируем fallback_router последним для ловли необработанных сообщений
     dp.include_router(fallback_router)
 
+    return dp
+
+
+async def main():
+    """
+    Основная функция запуска бота
+    """
+    global bot_instance
+    
+    logger.info(f"🚀 Запуск бота - Экземпляр: {INSTANCE_ID}")
+    logger.info(f"📋 Режим работы: {BOT_MODE}")
+    logger.info(f"📡 Polling разрешен: {SET_POLLING}")
+
+    # Инициализация бота и диспетчера с явной конфигурацией timeout
+    try:
+        # Создаем Bot стандартным способом - aiogram 3.x сам управляет сессией
+        bot_instance = Bot(token=settings.effective_telegram_token)
+        logger.info(f"✅ Bot создан с токеном для окружения: {settings.ENVIRONMENT}")
+        
+    except Exception as e:
+        logger.error(f"❌ Ошибка создания Bot: {e}")
+        raise
+    
+    dp = await create_dispatcher()
+
     # Выполняем задачи запуска
-    # await startup_tasks()
+    await startup_tasks()
 
     # Запуск бота в зависимости от режима
     try:
@@ -197,10 +244,23 @@ async def main():
                 
         elif BOT_MODE == "webhook":
             logger.info("🌐 Запуск в режиме webhook...")
-            # В режиме webhook не запускаем polling
-            logger.info("🌐 Webhook режим - polling отключен")
-            await asyncio.sleep(float('inf'))
-            
+            # Webhook кладет обновления в очередь, этот же процесс - одна из реплик-обработчиков
+            from app.core.update_queue import UpdateQueue
+            from app.core.webhook_server import start_webhook_server
+            from app.workers.update_worker import UpdateWorker
+
+            queue = UpdateQueue()
+            runner = await start_webhook_server(bot_instance, dp, queue)
+            try:
+                await UpdateWorker(dp, bot_instance, queue).start()
+            finally:
+                await runner.cleanup()
+
+        elif BOT_MODE == "update_worker":
+            logger.info("⚙️ Запуск реплики обработки обновлений (без приема webhook)...")
+            from app.workers.update_worker import UpdateWorker
+            await UpdateWorker(dp, bot_instance).start()
+
         else:  # polling mode (default)
             if SET_POLLING:
                 logger.info("📡 Запуск polling...")
@@ -0,0 +1,112 @@
+"""
+Синхронные задачи pydub для выполнения в пуле аудио-воркеров
+
+Все функции работают только с путями к файлам: через pipe между процессами
+передаются пути, а не мегабайты аудио. Модуль намеренно не импортирует
+настройки и сервисы приложения, чтобы воркер стартовал быстро.
+"""
+import os
+from typing import List, Optional
+
+from pydub import AudioSegment
+from pydub.silence import split_on_silence
+
+
+def _configure(converter: Optional[str]) -> None:
+    """Настраивает путь к ffmpeg в процессе воркера"""
+    if converter:
+        AudioSegment.converter = converter
+
+
+def _export_chunks(
+    chunks: List[AudioSegment],
+    output_dir: str,
+    fmt: str,
+    min_size: int,
+    **export_kwargs
+) -> List[str]:
+    """Экспортирует сегменты в файлы, отбрасывая слишком маленькие"""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for i, chunk in enumerate(chunks):
+        out_path = os.path.join(output_dir, f"chunk_{i + 1:04d}.{fmt}")
+        chunk.export(out_path, format=fmt, **export_kwargs)
+        if os.path.getsize(out_path) > min_size:
+            paths.append(out_path)
+        else:
+            os.unlink(out_path)
+    return paths
+
+
+def probe_duration_ms(input_path: str, converter: Optional[str] = None) -> int:
+    """Декодирует файл и возвращает длительность в миллисекундах"""
+    _configure(converter)
+    return len(AudioSegment.from_file(input_path))
+
+
+def split_for_transcription(
+    input_path: str,
+    output_dir: str,
+    converter: Optional[str] = None,
+    max_duration_ms: int = 600_000,
+) -> List[str]:
+    """
+    Разбивает аудио на куски для Whisper (fallback без ffmpeg-нарезки)
+
+    Длинное аудио режется по 60 секунд, короткое - по тишине.
+    """
+    _configure(converter)
+    audio = AudioSegment.from_file(input_path)
+
+    if len(audio) > max_duration_ms:
+        audio = audio[:max_duration_ms]
+
+    if len(audio) > 120_000:
+        chunk_duration = 60_000
+        chunks = [
+            audio[i:i + chunk_duration]
+            for i in range(0, len(audio), chunk_duration)
+            if len(audio[i:i + chunk_duration]) > 5_000
+        ]
+    else:
+        chunks = split_on_silence(
+            audio,
+            min_silence_len=500,
+            silence_thresh=-35,
+            keep_silence=200
+        )
+
+    if not chunks:
+        chunks = [audio]
+
+    return _export_chunks(chunks, output_dir, "mp3", 5_000, bitrate="128k")
+
+
+def normalize_file(input_path: str, output_path: str, converter: Optional[str] = None) -> str:
+    """Нормализует громкость и сохраняет mp3"""
+    _configure(converter)
+    AudioSegment.from_file(input_path).normalize().export(output_path, format="mp3")
+    return output_path
+
+
+def trim_silence_file(input_path: str, output_path: str, converter: Optional[str] = None) -> str:
+    """Обрезает тишину в начале и конце и сохраняет mp3"""
+    _configure(converter)
+    audio = AudioSegment.from_file(input_path)
+
+    start = 0
+    end = len(audio)
+
+    for i in range(0, len(audio), 100):
+        if audio[i:i + 100].dBFS > -50:
+            start = i
+            break
+
+    for i in range(len(audio), 0, -100):
+        if audio[i - 100:i].dBFS > -50:
+            end = i
+            break
+
+    audio[start:end].export(output_path, format="mp3")
+    return output_path
+
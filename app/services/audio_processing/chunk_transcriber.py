@@ -0,0 +1,184 @@
+"""
+Параллельная транскрибация чанков аудио
+"""
+import asyncio
+import logging
+import os
+from typing import AsyncIterable, Awaitable, Callable, List, Optional, Sequence
+
+import aiofiles
+
+from app.core.config import settings
+from app.services.audio_processing.types import AudioRecognizer, TranscribeResult
+
+logger = logging.getLogger(__name__)
+
+# Колбэк прогресса: (готово чанков, всего чанков)
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+class ParallelChunkTranscriber:
+    """
+    Транскрибирует чанки параллельно с ограничением через семафор
+
+    - Результаты возвращаются в исходном порядке чанков
+    - Ошибка чанка не прерывает остальные: он попадает в результат неуспешным
+    - Повторы и бэкофф при 429 держит распознаватель, здесь чанк не повторяется
+    """
+
+    def __init__(
+        self,
+        recognizer: AudioRecognizer,
+        concurrency: Optional[int] = None,
+    ):
+        self.recognizer = recognizer
+        self.concurrency = max(1, concurrency or settings.AUDIO_TRANSCRIBE_CONCURRENCY)
+
+    async def transcribe_chunks(
+        self,
+        chunks: Sequence[bytes],
+        language: str = "ru",
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> List[TranscribeResult]:
+        """
+        Транскрибирует все чанки
+
+        Args:
+            chunks: Аудио чанки в порядке воспроизведения
+            language: Язык аудио
+            progress_callback: Вызывается после завершения каждого чанка
+
+        Returns:
+            List[TranscribeResult]: Результаты в порядке чанков
+        """
+        total = len(chunks)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        completed = 0
+
+        async def _worker(idx: int, chunk: bytes) -> TranscribeResult:
+            nonlocal completed
+            async with semaphore:
+                result = await self._transcribe_one(idx, total, chunk, language)
+
+            completed += 1
+            if progress_callback:
+                try:
+                    await progress_callback(completed, total)
+                except Exception as e:
+                    logger.warning(f"[ChunkTranscriber] Ошибка колбэка прогресса: {e}")
+            return result
+
+        logger.info(f"[ChunkTranscriber] Транскрибация {total} чанков, параллельность {self.concurrency}")
+        return list(await asyncio.gather(*(_worker(idx, chunk) for idx, chunk in enumerate(chunks))))
+
+    async def transcribe_stream(
+        self,
+        chunk_paths: AsyncIterable[str],
+        language: str = "ru",
+        progress_callback: Optional[ProgressCallback] = None,
+        expected_total: Optional[int] = None,
+    ) -> List[TranscribeResult]:
+        """
+        Транскрибирует файлы чанков по мере их появления
+
+        Чанк читается с диска только когда для него освободился слот,
+        а после распознавания файл удаляется - в памяти одновременно
+        находится не больше `concurrency` чанков.
+
+        Args:
+            chunk_paths: Асинхронный поток путей к чанкам в порядке воспроизведения
+            language: Язык аудио
+            progress_callback: Вызывается после завершения каждого чанка
+            expected_total: Ожидаемое количество чанков (для прогресса)
+
+        Returns:
+            List[TranscribeResult]: Результаты в порядке чанков
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks: List[asyncio.Task] = []
+        completed = 0
+        producer_done = False
+
+        def _total() -> int:
+            if producer_done:
+                return len(tasks)
+            return max(expected_total or 0, len(tasks))
+
+        async def _worker(idx: int, path: str) -> TranscribeResult:
+            nonlocal completed
+            try:
+                async with semaphore:
+                    async with aiofiles.open(path, "rb") as f:
+                        chunk = await f.read()
+                    result = await self._transcribe_one(idx, _total(), chunk, language)
+            finally:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+            completed += 1
+            if progress_callback:
+                try:
+                    await progress_callback(completed, _total())
+                except Exception as e:
+                    logger.warning(f"[ChunkTranscriber] Ошибка колбэка прогресса: {e}")
+            return result
+
+        try:
+            async for path in chunk_paths:
+                tasks.append(asyncio.create_task(_worker(len(tasks), path)))
+            producer_done = True
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            # Генератор сегментов закрываем явно - его finally останавливает ffmpeg
+            aclose = getattr(chunk_paths, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    async def _transcribe_one(
+        self,
+        idx: int,
+        total: int,
+        chunk: bytes,
+        language: str,
+    ) -> TranscribeResult:
+        """Транскрибирует один чанк (повторы внутри распознавателя)"""
+        logger.info(f"[ChunkTranscriber] Чанк {idx + 1}/{total}")
+        try:
+            result = await self.recognizer.transcribe_chunk(chunk, language)
+        except Exception as e:
+            result = TranscribeResult(success=False, error=str(e))
+
+        if not result.success:
+            logger.warning(f"[ChunkTranscriber] Ошибка чанка {idx + 1}/{total}: {result.error}")
+        return result
+
+
+def join_transcribed_chunks(results: Sequence[TranscribeResult]) -> TranscribeResult:
+    """
+    Собирает итоговый текст из результатов чанков
+
+    Args:
+        results: Результаты в порядке чанков
+
+    Returns:
+        TranscribeResult: Успешный, если распознан хотя бы один чанк
+    """
+    texts = [r.text for r in results if r.success and r.text]
+    failed = [str(idx + 1) for idx, r in enumerate(results) if not r.success]
+
+    if not texts:
+        return TranscribeResult(
+            success=False,
+            text="",
+            error=f"Не удалось транскрибировать ни одного чанка из {len(results)}",
+        )
+
+    error = f"Не распознаны чанки: {', '.join(failed)}" if failed else None
+    return TranscribeResult(success=True, text="\n".join(texts), error=error)
@@ -13,7 +13,10 @@ from datetime import datetime
 from pydub import AudioSegment
 from app.core.temp_files import NamedTemporaryFile, mkdtemp
 from app.core.config import settings
+from app.services.audio_processing import audio_jobs
+from app.services.audio_processing.segmenter import resolve_ffmpeg_path
 from app.services.audio_processing.types import AudioConverter, AudioMetadata
+from app.services.audio_processing.worker_pool import get_audio_worker_pool
 from app.core.exceptions.audio_exceptions import AudioProcessingError
 
 logger = logging.getLogger(__name__)
@@ -25,24 +28,7 @@ async def convert_to_mp3_ffmpeg(input_path: str) -> str:
     :return: путь к mp3-файлу
     :raises RuntimeError: если ffmpeg не установлен или произошла ошибка конвертации
     """
-    # Пробуем найти ffmpeg в разных местах
-    ffmpeg_candidates = [
-        settings.FFMPEG_PATH,
-        '/usr/bin/ffmpeg',
-        '/usr/local/bin/ffmpeg',
-        '/bin/ffmpeg',
-        shutil.which('ffmpeg')
-    ]
-    
-    ffmpeg_path = None
-    for candidate in ffmpeg_candidates:
-        if candidate and os.path.exists(candidate):
-            ffmpeg_path = candidate
-            break
-    
-    if not ffmpeg_path:
-        # Последняя попытка через which
-        ffmpeg_path = shutil.which('ffmpeg')
+    ffmpeg_path = resolve_ffmpeg_path()
     
     if not ffmpeg_path:
         raise AudioProcessingError(f"ffmpeg не найден. Проверьте установку: sudo apt install ffmpeg")
@@ -152,7 +138,9 @@ class PydubAudioConverter(AudioConverter):
                     result = f.read()
                 # Проверка валидности mp3
                 try:
-                    test_audio = AudioSegment.from_file(temp_out_path)
+                    await get_audio_worker_pool().run(
+                        audio_jobs.probe_duration_ms, temp_out_path, self.ffmpeg_path
+                    )
                     if len(result) < 10_000:
                         raise Exception('Файл слишком маленький, возможно битый')
                 except Exception as e:
@@ -5,7 +5,7 @@ import asyncio
 import subprocess
 import tempfile
 import os
-from typing import Optional
+from typing import Optional, Union
 
 from app.core.logger import get_logger
 from app.core.exceptions.audio_exceptions import AudioProcessingError
@@ -19,12 +19,12 @@ class AudioDurationService:
     def __init__(self):
         self.ffmpeg_path = "ffmpeg"  # Можно настроить в конфигурации
         
-    async def get_audio_duration(self, audio_data: bytes) -> float:
+    async def get_audio_duration(self, audio_data: Union[bytes, str]) -> float:
         """
         Определяет длительность аудио в секундах
         
         Args:
-            audio_data: Аудио данные в байтах
+            audio_data: Аудио данные в байтах или путь к файлу
             
         Returns:
             float: Длительность в секундах
@@ -34,13 +34,17 @@ class AudioDurationService:
         """
         temp_file = None
         try:
-            # Создаем временный файл
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.tmp') as f:
-                f.write(audio_data)
-                temp_file = f.name
+            if isinstance(audio_data, str):
+                file_path = audio_data
+            else:
+                # Создаем временный файл
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.tmp') as f:
+                    f.write(audio_data)
+                    temp_file = f.name
+                file_path = temp_file
             
             # Получаем длительность через ffprobe
-            duration = await self._get_duration_with_ffprobe(temp_file)
+            duration = await self._get_duration_with_ffprobe(file_path)
             
             if duration is None:
                 raise AudioProcessingError("Не удалось определить длительность аудио")
@@ -103,25 +107,29 @@ class AudioDurationService:
             logger.exception(f"Ошибка выполнения ffprobe: {e}")
             return None
     
-    async def get_audio_info(self, audio_data: bytes) -> dict:
+    async def get_audio_info(self, audio_data: Union[bytes, str]) -> dict:
         """
         Получает полную информацию об аудио файле
         
         Args:
-            audio_data: Аудио данные в байтах
+            audio_data: Аудио данные в байтах или путь к файлу
             
         Returns:
             dict: Информация об аудио (duration, format, etc.)
         """
         temp_file = None
         try:
-            # Создаем временный файл
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.tmp') as f:
-                f.write(audio_data)
-                temp_file = f.name
+            if isinstance(audio_data, str):
+                file_path = audio_data
+            else:
+                # Создаем временный файл
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.tmp') as f:
+                    f.write(audio_data)
+                    temp_file = f.name
+                file_path = temp_file
             
             # Получаем информацию через ffprobe
-            info = await self._get_audio_info_with_ffprobe(temp_file)
+            info = await self._get_audio_info_with_ffprobe(file_path)
             
             return info
             
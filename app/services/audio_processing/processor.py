@@ -9,9 +9,10 @@ from typing import List, Optional
 from pathlib import Path
 
 from pydub import AudioSegment
-from pydub.silence import split_on_silence
 from app.core.config import settings
+from app.services.audio_processing import audio_jobs
 from app.services.audio_processing.types import AudioProcessor
+from app.services.audio_processing.worker_pool import get_audio_worker_pool
 from app.core.exceptions.audio_exceptions import AudioProcessingError
 from app.core.temp_files import NamedTemporaryFile, mkdtemp
 
@@ -75,73 +76,29 @@ class AudioProcessor(AudioProcessor):
             except Exception as e:
                 logger.error(f"[AUDIO SPLIT] Критическая ошибка ffmpeg: {e}, переключаемся на pydub")
         
-        # ✅ Fallback на pydub или основной метод
+        # ✅ Fallback на pydub в пуле аудио-воркеров
         logger.info(f"[AUDIO SPLIT] Попытка 2: pydub разбиение")
         
+        with NamedTemporaryFile(suffix='.mp3', delete=False) as temp:
+            temp.write(audio_data)
+            temp_path = temp.name
+        output_dir = mkdtemp()
+        
         try:
-            # Создаем временный файл
-            with NamedTemporaryFile(suffix='.mp3', delete=False) as temp:
-                temp.write(audio_data)
-                temp_path = temp.name
-            
-            # ✅ Добавляем timeout для pydub операций
-            async def _split_with_pydub():
-                # Загружаем аудио
-                audio = AudioSegment.from_file(temp_path)
-                logger.info(f"[AUDIO SPLIT] Длительность аудио: {len(audio)/1000:.2f} сек")
-                
-                # ✅ Ограничиваем максимальную длительность
-                MAX_DURATION_MS = 600_000  # 10 минут
-                if len(audio) > MAX_DURATION_MS:
-                    logger.warning(f"[AUDIO SPLIT] Обрезаем длинное аудио с {len(audio)/1000:.2f}s до {MAX_DURATION_MS/1000:.2f}s")
-                    audio = audio[:MAX_DURATION_MS]
-                
-                # ✅ Упрощенное разбиение для длинных файлов
-                if len(audio) > 120_000:  # Больше 2 минут - простое разбиение
-                    logger.info(f"[AUDIO SPLIT] Длинное аудио, используем простое разбиение по 60 сек")
-                    chunks = []
-                    chunk_duration = 60_000  # 60 секунд
-                    for i in range(0, len(audio), chunk_duration):
-                        chunk = audio[i:i + chunk_duration]
-                        if len(chunk) > 5_000:  # Минимум 5 секунд
-                            chunks.append(chunk)
-                else:
-                    # Обычное разбиение по тишине для коротких файлов
-                    logger.info(f"[AUDIO SPLIT] Короткое аудио, используем разбиение по тишине")
-                    chunks = split_on_silence(
-                        audio,
-                        min_silence_len=500,  # Уменьшили с 700 до 500 мс
-                        silence_thresh=-35,   # Более чувствительно к тишине  
-                        keep_silence=200      # Меньше тишины в начале/конце
-                    )
-                
-                # Если не удалось разбить - возвращаем весь файл
-                if not chunks:
-                    logger.warning(f"[AUDIO SPLIT] Не удалось разбить, возвращаем весь файл")
-                    chunks = [audio]
-                
-                # Конвертируем части обратно в байты
-                result = []
-                for i, chunk in enumerate(chunks):
-                    with NamedTemporaryFile(suffix='.mp3', delete=False) as temp_chunk:
-                        chunk.export(temp_chunk.name, format="mp3", bitrate="128k")  # Понижаем битрейт
-                        try:
-                            with open(temp_chunk.name, 'rb') as f:
-                                chunk_bytes = f.read()
-                            if len(chunk_bytes) > 5_000:  # Понижаем минимальный размер
-                                result.append(chunk_bytes)
-                                logger.info(f"[AUDIO SPLIT] Кусок {i+1}: {len(chunk_bytes)} байт")
-                            else:
-                                logger.warning(f"[AUDIO SPLIT] Пропущен маленький кусок {i+1}")
-                        except Exception as e:
-                            logger.warning(f"[AUDIO SPLIT] Битый кусок {i+1}: {e}")
-                        finally:
-                            Path(temp_chunk.name).unlink(missing_ok=True)
-                
-                return result
+            chunk_paths = await get_audio_worker_pool().run(
+                audio_jobs.split_for_transcription,
+                temp_path,
+                output_dir,
+                self.ffmpeg_path,
+                timeout=180.0  # 3 минуты на pydub
+            )
             
-            # Выполняем с timeout
-            result = await asyncio.wait_for(_split_with_pydub(), timeout=180.0)  # 3 минуты на pydub
+            result = []
+            for i, path in enumerate(chunk_paths):
+                with open(path, 'rb') as f:
+                    chunk_bytes = f.read()
+                result.append(chunk_bytes)
+                logger.info(f"[AUDIO SPLIT] Кусок {i+1}: {len(chunk_bytes)} байт")
             
             if result:
                 logger.info(f"[AUDIO SPLIT] pydub успешно: создано {len(result)} кусков")
@@ -150,17 +107,14 @@ class AudioProcessor(AudioProcessor):
                 logger.error(f"[AUDIO SPLIT] pydub не создал кусков")
                 raise AudioProcessingError("Не удалось разбить аудио на куски")
                 
-        except asyncio.TimeoutError:
-            logger.error(f"[AUDIO SPLIT] pydub timeout")
-            raise AudioProcessingError("Превышено время ожидания при разбиении аудио")
+        except AudioProcessingError:
+            raise
         except Exception as e:
             logger.error(f"[AUDIO SPLIT] pydub ошибка: {e}")
             raise AudioProcessingError(f"Ошибка разбиения: {str(e)}")
         finally:
-            try:
-                Path(temp_path).unlink(missing_ok=True)
-            except Exception as e:
-                logger.warning(f"[AUDIO SPLIT] Не удалось удалить временный файл {temp_path}: {e}")
+            Path(temp_path).unlink(missing_ok=True)
+            shutil.rmtree(output_dir, ignore_errors=True)
     
     async def normalize_audio(self, audio_data: bytes) -> bytes:
         """
@@ -175,36 +129,7 @@ class AudioProcessor(AudioProcessor):
         Raises:
             AudioProcessingError: При ошибке нормализации
         """
-        try:
-            # Создаем временный файл
-            with NamedTemporaryFile(suffix='.mp3', delete=False) as temp:
-                temp.write(audio_data)
-                temp_path = temp.name
-            
-            # Загружаем аудио
-            audio = AudioSegment.from_file(temp_path)
-            
-            # Нормализуем громкость
-            normalized = audio.normalize()
-            
-            # Экспортируем результат
-            with NamedTemporaryFile(suffix='.mp3', delete=False) as temp_out:
-                normalized.export(temp_out.name, format="mp3")
-                with open(temp_out.name, 'rb') as f:
-                    result = f.read()
-                Path(temp_out.name).unlink()
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"Ошибка при нормализации аудио: {e}")
-            raise AudioProcessingError(f"Ошибка нормализации: {str(e)}")
-            
-        finally:
-            try:
-                Path(temp_path).unlink()
-            except Exception as e:
-                logger.warning(f"Не удалось удалить временный файл {temp_path}: {e}")
+        return await self._run_file_job(audio_jobs.normalize_file, audio_data, "нормализации")
     
     async def remove_silence(self, audio_data: bytes) -> bytes:
         """
@@ -219,52 +144,31 @@ class AudioProcessor(AudioProcessor):
         Raises:
             AudioProcessingError: При ошибке обработки
         """
+        return await self._run_file_job(audio_jobs.trim_silence_file, audio_data, "обработки")
+    
+    async def _run_file_job(self, job, audio_data: bytes, stage: str) -> bytes:
+        """Выполняет задачу файл→файл в пуле аудио-воркеров"""
+        with NamedTemporaryFile(suffix='.mp3', delete=False) as temp:
+            temp.write(audio_data)
+            temp_path = temp.name
+        with NamedTemporaryFile(suffix='.mp3', delete=False) as temp_out:
+            temp_out_path = temp_out.name
+        
         try:
-            # Создаем временный файл
-            with NamedTemporaryFile(suffix='.mp3', delete=False) as temp:
-                temp.write(audio_data)
-                temp_path = temp.name
-            
-            # Загружаем аудио
-            audio = AudioSegment.from_file(temp_path)
-            
-            # Находим начало и конец звука
-            start = 0
-            end = len(audio)
-            
-            # Ищем начало звука
-            for i in range(0, len(audio), 100):
-                if audio[i:i+100].dBFS > -50:
-                    start = i
-                    break
-            
-            # Ищем конец звука
-            for i in range(len(audio), 0, -100):
-                if audio[i-100:i].dBFS > -50:
-                    end = i
-                    break
-            
-            # Обрезаем тишину
-            trimmed = audio[start:end]
-            
-            # Экспортируем результат
-            with NamedTemporaryFile(suffix='.mp3', delete=False) as temp_out:
-                trimmed.export(temp_out.name, format="mp3")
-                with open(temp_out.name, 'rb') as f:
-                    result = f.read()
-                Path(temp_out.name).unlink()
-            
-            return result
-            
+            await get_audio_worker_pool().run(job, temp_path, temp_out_path, self.ffmpeg_path)
+            with open(temp_out_path, 'rb') as f:
+                return f.read()
+        except AudioProcessingError:
+            raise
         except Exception as e:
-            logger.error(f"Ошибка при удалении тишины: {e}")
-            raise AudioProcessingError(f"Ошибка обработки: {str(e)}")
-            
+            logger.error(f"Ошибка при {stage} аудио: {e}")
+            raise AudioProcessingError(f"Ошибка {stage}: {str(e)}")
         finally:
-            try:
-                Path(temp_path).unlink()
-            except Exception as e:
-                logger.warning(f"Не удалось удалить временный файл {temp_path}: {e}")
+            for path in (temp_path, temp_out_path):
+                try:
+                    Path(path).unlink(missing_ok=True)
+                except Exception as e:
+                    logger.warning(f"Не удалось удалить временный файл {path}: {e}")
 
     async def split_audio_by_silence_ffmpeg(self, input_path: str, output_dir: str, min_silence_len: float = 0.7, silence_thresh: int = -30) -> list:
         """
@@ -13,6 +13,10 @@ import aiohttp
 from app.core.temp_files import NamedTemporaryFile
 from app.core.config import settings
 from app.services.audio_processing.types import AudioRecognizer, TranscribeResult, AudioMetadata
+from app.services.audio_processing.chunk_transcriber import (
+    ParallelChunkTranscriber,
+    join_transcribed_chunks
+)
 from app.core.exceptions.audio_exceptions import AudioProcessingError
 
 logger = logging.getLogger(__name__)
@@ -25,6 +29,22 @@ class WhisperRecognizer(AudioRecognizer):
         self.api_url = "https://api.openai.com/v1/audio/transcriptions"
         self.max_retries = 3
         self.retry_delay = 1.0
+        # Момент (loop.time()), до которого все запросы ждут после 429.
+        # Общий для всех параллельных воркеров, использующих этот экземпляр.
+        self._rate_limited_until = 0.0
+    
+    async def _wait_for_rate_limit(self) -> None:
+        """Ждет окончания общего бэкоффа после ответа 429"""
+        loop = asyncio.get_running_loop()
+        delay = self._rate_limited_until - loop.time()
+        if delay > 0:
+            logger.info(f"[Whisper] Общий бэкофф после 429, ждем {delay:.1f} сек")
+            await asyncio.sleep(delay)
+    
+    def _register_rate_limit(self, delay: float) -> None:
+        """Продлевает общий бэкофф для всех воркеров"""
+        loop = asyncio.get_running_loop()
+        self._rate_limited_until = max(self._rate_limited_until, loop.time() + delay)
     
     async def transcribe(self, audio_data: bytes, language: str = "ru") -> TranscribeResult:
         """
@@ -54,62 +74,69 @@ class WhisperRecognizer(AudioRecognizer):
                 logger.info(f"Аудио слишком длинное ({metadata.duration} сек), разбиваем на части")
                 return await self._transcribe_large_file(temp_path, language)
             
-            # Транскрибируем файл
+            # Транскрибируем файл через общий пул соединений к OpenAI.
+            # Повторы здесь, а не в клиенте: FormData нельзя отправить дважды
+            from app.core.di import get_http_client
+            http = get_http_client()
             timeout = aiohttp.ClientTimeout(total=60.0)  # 60 секунд общий таймаут
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                for attempt in range(self.max_retries):
-                    try:
-                        form = aiohttp.FormData()
-                        form.add_field(
-                            "file",
-                            io.BytesIO(audio_data),
-                            filename="audio.mp3",
-                            content_type="audio/mpeg"
-                        )
-                        form.add_field("model", "whisper-1")
-                        form.add_field("language", language)
-                        form.add_field("response_format", "json")
+            for attempt in range(self.max_retries):
+                try:
+                    form = aiohttp.FormData()
+                    form.add_field(
+                        "file",
+                        io.BytesIO(audio_data),
+                        filename="audio.mp3",
+                        content_type="audio/mpeg"
+                    )
+                    form.add_field("model", "whisper-1")
+                    form.add_field("language", language)
+                    form.add_field("response_format", "json")
+                    
+                    await self._wait_for_rate_limit()
+                    logger.info(f"[Whisper] Отправка запроса к OpenAI API (попытка {attempt + 1}/{self.max_retries})")
+                    
+                    async with http.request(
+                        "openai", "POST", self.api_url,
+                        endpoint="openai/audio/transcriptions",
+                        retries=0,
+                        headers={"Authorization": f"Bearer {self.api_key}"},
+                        data=form,
+                        timeout=timeout
+                    ) as response:
+                        logger.info(f"[Whisper] Получен ответ от OpenAI API: status={response.status}")
                         
-                        logger.info(f"[Whisper] Отправка запроса к OpenAI API (попытка {attempt + 1}/{self.max_retries})")
-                        
-                        async with session.post(
-                            self.api_url,
-                            headers={"Authorization": f"Bearer {self.api_key}"},
-                            data=form
-                        ) as response:
-                            logger.info(f"[Whisper] Получен ответ от OpenAI API: status={response.status}")
-                            
-                            if response.status == 200:
-                                result = await response.json()
-                                logger.info(f"[Whisper] Успешная транскрибация, длина текста: {len(result['text'])} символов")
-                                return TranscribeResult(
-                                    success=True,
-                                    text=result["text"],
-                                    metadata=metadata
-                                )
-                            elif response.status == 429:  # Rate limit
-                                logger.warning(f"[Whisper] Rate limit (429), ждем {self.retry_delay * (attempt + 1)} секунд")
-                                if attempt < self.max_retries - 1:
-                                    await asyncio.sleep(self.retry_delay * (attempt + 1))
-                                    continue
-                            else:
-                                error_text = await response.text()
-                                logger.error(f"[Whisper] Ошибка API: {response.status} - {error_text}")
-                                raise AudioProcessingError(
-                                    f"Ошибка API: {response.status} - {error_text}"
-                                )
-                    except asyncio.TimeoutError:
-                        logger.error(f"[Whisper] Таймаут при запросе к OpenAI API (попытка {attempt + 1})")
-                        if attempt < self.max_retries - 1:
-                            await asyncio.sleep(self.retry_delay * (attempt + 1))
-                            continue
-                        raise AudioProcessingError("Таймаут при запросе к OpenAI API")
-                    except aiohttp.ClientError as e:
-                        logger.error(f"[Whisper] Ошибка сети (попытка {attempt + 1}): {e}")
-                        if attempt < self.max_retries - 1:
-                            await asyncio.sleep(self.retry_delay * (attempt + 1))
-                            continue
-                        raise AudioProcessingError(f"Ошибка сети: {str(e)}")
+                        if response.status == 200:
+                            result = await response.json()
+                            logger.info(f"[Whisper] Успешная транскрибация, длина текста: {len(result['text'])} символов")
+                            return TranscribeResult(
+                                success=True,
+                                text=result["text"],
+                                metadata=metadata
+                            )
+                        elif response.status == 429:  # Rate limit
+                            delay = self._retry_after(response) or self.retry_delay * (2 ** attempt)
+                            logger.warning(f"[Whisper] Rate limit (429), ждем {delay} секунд")
+                            self._register_rate_limit(delay)
+                            if attempt < self.max_retries - 1:
+                                continue
+                        else:
+                            error_text = await response.text()
+                            logger.error(f"[Whisper] Ошибка API: {response.status} - {error_text}")
+                            raise AudioProcessingError(
+                                f"Ошибка API: {response.status} - {error_text}"
+                            )
+                except asyncio.TimeoutError:
+                    logger.error(f"[Whisper] Таймаут при запросе к OpenAI API (попытка {attempt + 1})")
+                    if attempt < self.max_retries - 1:
+                        await asyncio.sleep(self.retry_delay * (attempt + 1))
+                        continue
+                    raise AudioProcessingError("Таймаут при запросе к OpenAI API")
+                except aiohttp.ClientError as e:
+                    logger.error(f"[Whisper] Ошибка сети (попытка {attempt + 1}): {e}")
+                    if attempt < self.max_retries - 1:
+                        await asyncio.sleep(self.retry_delay * (attempt + 1))
+                        continue
+                    raise AudioProcessingError(f"Ошибка сети: {str(e)}")
             
             return TranscribeResult(
                 success=False,
@@ -129,6 +156,15 @@ class WhisperRecognizer(AudioRecognizer):
             except Exception as e:
                 logger.warning(f"Не удалось удалить временный файл {temp_path}: {e}")
     
+    @staticmethod
+    def _retry_after(response: aiohttp.ClientResponse) -> Optional[float]:
+        """Извлекает задержку из заголовка Retry-After"""
+        value = response.headers.get("Retry-After")
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
+    
     async def transcribe_chunk(self, audio_data: bytes, language: str = "ru") -> TranscribeResult:
         """
         Транскрибирует часть аудио
@@ -182,21 +218,7 @@ class WhisperRecognizer(AudioRecognizer):
         except Exception as e:
             logger.error(f"[WhisperRecognizer] Ошибка при разбиении: {e}")
             return TranscribeResult(success=False, text="", error=str(e))
-        texts = []
-        errors = []
-        for idx, chunk in enumerate(chunks):
-            try:
-                logger.info(f"[WhisperRecognizer] Транскрибация части {idx+1}/{len(chunks)}")
-                result = await self.transcribe_chunk(chunk, language)
-                if result.success:
-                    texts.append(result.text)
-                else:
-                    errors.append(result.error or "Unknown error")
-            except Exception as e:
-                logger.error(f"[WhisperRecognizer] Ошибка транскрибации части {idx+1}: {e}")
-                errors.append(str(e))
-        final_text = "\n".join(texts)
-        success = bool(texts)
-        error_msg = "; ".join(errors) if errors else None
-        logger.info(f"[WhisperRecognizer] Итоговая транскрибация: success={success}, ошибок={len(errors)}")
-        return TranscribeResult(success=success, text=final_text, error=error_msg) 
\ No newline at end of file
+        results = await ParallelChunkTranscriber(self).transcribe_chunks(chunks, language)
+        result = join_transcribed_chunks(results)
+        logger.info(f"[WhisperRecognizer] Итоговая транскрибация: success={result.success}, ошибка={result.error}")
+        return result
\ No newline at end of file
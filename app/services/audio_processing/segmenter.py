@@ -0,0 +1,153 @@
+"""
+Потоковая нарезка аудио одним проходом ffmpeg
+
+ffmpeg перекодирует вход и сразу режет его на сегменты (-f segment).
+Имена закрытых сегментов приходят через stdout (-segment_list pipe:1),
+поэтому распознавание первых частей начинается до окончания нарезки,
+а в памяти процесса никогда не оказывается весь файл.
+"""
+import asyncio
+import logging
+import math
+import os
+import shutil
+from typing import AsyncIterator, Optional
+
+from app.core.config import settings
+from app.core.exceptions.audio_exceptions import AudioProcessingError, FFmpegNotAvailableError
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_ffmpeg_path() -> Optional[str]:
+    """Ищет ffmpeg: путь из настроек, стандартные пути, затем PATH"""
+    candidates = [
+        settings.FFMPEG_PATH,
+        '/usr/bin/ffmpeg',
+        '/usr/local/bin/ffmpeg',
+        '/bin/ffmpeg',
+        shutil.which('ffmpeg')
+    ]
+    for candidate in candidates:
+        if candidate and os.path.exists(candidate):
+            return candidate
+    return None
+
+
+class FFmpegSegmenter:
+    """Нарезка аудио файла на сегменты для Whisper"""
+
+    def __init__(
+        self,
+        segment_seconds: Optional[int] = None,
+        bitrate: str = "64k",
+        timeout: Optional[float] = None,
+    ):
+        self.segment_seconds = segment_seconds or settings.AUDIO_SEGMENT_SECONDS
+        self.bitrate = bitrate
+        self.timeout = timeout or settings.AUDIO_SEGMENT_TIMEOUT
+
+    async def probe_duration(self, input_path: str) -> Optional[float]:
+        """Длительность файла в секундах через ffprobe (None если неизвестна)"""
+        ffprobe_path = shutil.which('ffprobe') or 'ffprobe'
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                ffprobe_path, '-v', 'error', '-show_entries', 'format=duration',
+                '-of', 'default=noprint_wrappers=1:nokey=1', input_path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=30.0)
+            if proc.returncode == 0:
+                return float(stdout.decode().strip())
+        except (asyncio.TimeoutError, ValueError, OSError) as e:
+            logger.warning(f"[SEGMENTER] Не удалось определить длительность {input_path}: {e}")
+        return None
+
+    def expected_segments(self, duration: Optional[float]) -> Optional[int]:
+        """Ожидаемое количество сегментов для длительности"""
+        if not duration:
+            return None
+        return max(1, math.ceil(duration / self.segment_seconds))
+
+    async def iter_segments(self, input_path: str, output_dir: str) -> AsyncIterator[str]:
+        """
+        Выдает пути к сегментам по мере того, как ffmpeg их закрывает
+
+        Args:
+            input_path: Исходный файл в любом формате, понятном ffmpeg
+            output_dir: Директория для сегментов (ее очищает вызывающий)
+
+        Raises:
+            FFmpegNotAvailableError: ffmpeg не найден
+            AudioProcessingError: ffmpeg завершился с ошибкой или по таймауту
+        """
+        ffmpeg_path = resolve_ffmpeg_path()
+        if not ffmpeg_path:
+            raise FFmpegNotAvailableError("ffmpeg не найден. Проверьте установку: sudo apt install ffmpeg")
+
+        pattern = os.path.join(output_dir, "chunk_%05d.mp3")
+
+        proc = await asyncio.create_subprocess_exec(
+            ffmpeg_path,
+            '-nostdin', '-hide_banner', '-loglevel', 'error',
+            '-y',
+            '-i', input_path,
+            '-vn',
+            '-ac', '1',          # Моно и 16 кГц достаточно для распознавания речи
+            '-ar', '16000',
+            '-c:a', 'libmp3lame',
+            '-b:a', self.bitrate,
+            '-f', 'segment',
+            '-segment_time', str(self.segment_seconds),
+            '-reset_timestamps', '1',
+            '-segment_list', 'pipe:1',
+            '-segment_list_type', 'flat',
+            pattern,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        # stderr читается параллельно, чтобы ffmpeg не заблокировался на полном pipe
+        stderr_task = asyncio.create_task(proc.stderr.read())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        count = 0
+
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                line = await asyncio.wait_for(proc.stdout.readline(), timeout=remaining)
+                if not line:
+                    break
+
+                name = os.path.basename(line.decode().strip())
+                if not name:
+                    continue
+                count += 1
+                logger.debug(f"[SEGMENTER] Сегмент {count} готов: {name}")
+                yield os.path.join(output_dir, name)
+
+            returncode = await asyncio.wait_for(proc.wait(), timeout=max(deadline - loop.time(), 1.0))
+            stderr = (await stderr_task).decode(errors="replace")
+            if returncode != 0:
+                raise AudioProcessingError(
+                    f"ffmpeg error: {stderr[-1000:]}",
+                    audio_file=input_path,
+                    processing_stage="segmentation"
+                )
+            logger.info(f"[SEGMENTER] Нарезка завершена: {count} сегментов по {self.segment_seconds} сек")
+
+        except asyncio.TimeoutError:
+            raise AudioProcessingError(
+                f"Превышено время нарезки аудио ({self.timeout} сек)",
+                audio_file=input_path,
+                processing_stage="segmentation"
+            )
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            if not stderr_task.done():
+                stderr_task.cancel()
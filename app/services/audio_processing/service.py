@@ -3,14 +3,14 @@
 """
 import logging
 from typing import Optional
-import tempfile
 import os
-import uuid
+import shutil
 import asyncio
 
 import aiofiles
 
 from app.core.config import settings
+from app.core.temp_files import get_temp_file_path, mkdtemp
 from app.services.audio_processing.types import (
     AudioConverter,
     AudioRecognizer,
@@ -18,6 +18,12 @@ from app.services.audio_processing.types import (
     AudioStorage,
     TranscribeResult
 )
+from app.services.audio_processing.chunk_transcriber import (
+    ParallelChunkTranscriber,
+    ProgressCallback,
+    join_transcribed_chunks
+)
+from app.services.audio_processing.segmenter import FFmpegSegmenter
 from app.core.exceptions.audio_exceptions import AudioProcessingError
 
 logger = logging.getLogger(__name__)
@@ -36,6 +42,8 @@ class AudioService:
         self.recognizer = recognizer
         self.processor = processor
         self.storage = storage
+        self.chunk_transcriber = ParallelChunkTranscriber(recognizer)
+        self.segmenter = FFmpegSegmenter()
     
     async def process_audio(
         self,
@@ -43,10 +51,14 @@ class AudioService:
         language: str = "ru",
         save_original: bool = True,
         normalize: bool = True,
-        remove_silence: bool = True
+        remove_silence: bool = True,
+        progress_callback: Optional[ProgressCallback] = None
     ) -> TranscribeResult:
         """
         Обрабатывает аудио и транскрибирует его (через ffmpeg, как в v1)
+        
+        Чанки транскрибируются параллельно, progress_callback получает
+        (готово чанков, всего чанков) после каждого завершенного чанка.
         """
         try:
             logger.info("[AudioService] Начало process_audio (ffmpeg pipeline)")
@@ -73,66 +85,84 @@ class AudioService:
                 
                 logger.info(f"[AudioService] Определен формат: {detected_format}")
             
-            # Используем правильный путь для контейнера
-            temp_dir = "/app/storage/temp"
-            await asyncio.get_event_loop().run_in_executor(
-                None, lambda: os.makedirs(temp_dir, exist_ok=True)
-            )
-            ogg_path = os.path.join(temp_dir, f"{uuid.uuid4()}.ogg")
-            mp3_path = os.path.join(temp_dir, f"{uuid.uuid4()}.mp3")
-            
-            # 1. Сохраняем исходный файл в storage/temp асинхронно
-            async with aiofiles.open(ogg_path, "wb") as f:
+            # Сохраняем исходный файл на диск: дальше работаем только с путями
+            input_path = get_temp_file_path(suffix=".audio")
+            async with aiofiles.open(input_path, "wb") as f:
                 await f.write(audio_data)
             
             try:
-                # 2. Конвертируем в mp3 через ffmpeg
-                logger.info(f"[AudioService] Конвертация {ogg_path} в mp3 через ffmpeg")
-                mp3_bytes = await self.converter.convert_to_mp3(audio_data, use_ffmpeg=True)
-                async with aiofiles.open(mp3_path, "wb") as f:
-                    await f.write(mp3_bytes)
-                logger.info(f"[AudioService] mp3-файл создан: {mp3_path}")
-                
-                # 3. Разбиваем mp3 на чанки через ffmpeg
-                logger.info(f"[AudioService] Нарезка {mp3_path} на чанки через ffmpeg")
-                chunks = await self.processor.split_audio(mp3_bytes, use_ffmpeg=True)
-                logger.info(f"[AudioService] Получено чанков: {len(chunks)}")
-                
-                if not chunks:
-                    logger.error(f"[AudioService] Не удалось нарезать аудио на чанки. mp3_path={mp3_path}")
-                    raise AudioProcessingError(f"Не удалось нарезать аудио на чанки. mp3_path={mp3_path}")
-                
-                # 4. Транскрибируем каждый chunk
-                texts = []
-                for idx, chunk in enumerate(chunks):
-                    logger.info(f"[AudioService] Транскрибация чанка {idx+1}/{len(chunks)}")
-                    result = await self.recognizer.transcribe_chunk(chunk, language)
-                    if result.success:
-                        texts.append(result.text)
-                    else:
-                        logger.warning(f"[AudioService] Ошибка транскрибации чанка {idx+1}: {result.error}")
-                
-                final_text = "\n".join(texts)
-                success = bool(texts)
-                
-                if success:
-                    logger.info(f"[AudioService] ✅ Транскрибация успешна: {len(texts)} чанков, общая длина текста: {len(final_text)} символов")
-                    return TranscribeResult(success=True, text=final_text, error=None)
-                else:
-                    error_msg = f"Не удалось транскрибировать ни одного чанка из {len(chunks)}"
-                    logger.error(f"[AudioService] ❌ {error_msg}")
-                    return TranscribeResult(success=False, text="", error=error_msg)
+                return await self.process_audio_file(
+                    input_path,
+                    language=language,
+                    progress_callback=progress_callback
+                )
             finally:
-                # Асинхронное удаление временных файлов
-                if await asyncio.get_event_loop().run_in_executor(None, os.path.exists, ogg_path):
-                    await asyncio.get_event_loop().run_in_executor(None, os.unlink, ogg_path)
-                if await asyncio.get_event_loop().run_in_executor(None, os.path.exists, mp3_path):
-                    await asyncio.get_event_loop().run_in_executor(None, os.unlink, mp3_path)
+                await asyncio.get_running_loop().run_in_executor(None, self._remove_file, input_path)
                     
+        except AudioProcessingError:
+            raise
         except Exception as e:
             logger.error(f"[AudioService] Ошибка при обработке аудио (ffmpeg pipeline): {e}", exc_info=True)
             raise AudioProcessingError(f"Ошибка обработки: {str(e)}")
     
+    async def process_audio_file(
+        self,
+        input_path: str,
+        language: str = "ru",
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> TranscribeResult:
+        """
+        Транскрибирует аудио файл потоково
+        
+        Один проход ffmpeg перекодирует и нарезает файл на сегменты, каждый
+        закрытый сегмент сразу уходит в распознавание. Пиковое потребление
+        памяти не зависит от длины записи.
+        
+        Args:
+            input_path: Путь к исходному файлу на диске
+            language: Язык аудио
+            progress_callback: Получает (готово чанков, всего чанков)
+            
+        Returns:
+            TranscribeResult: Результат транскрибации
+        """
+        duration = await self.segmenter.probe_duration(input_path)
+        expected = self.segmenter.expected_segments(duration)
+        logger.info(f"[AudioService] Потоковая нарезка {input_path}: длительность={duration}, ожидается чанков={expected}")
+        
+        output_dir = mkdtemp(prefix="segments_")
+        try:
+            results = await self.chunk_transcriber.transcribe_stream(
+                self.segmenter.iter_segments(input_path, output_dir),
+                language,
+                progress_callback=progress_callback,
+                expected_total=expected
+            )
+        finally:
+            await asyncio.get_running_loop().run_in_executor(
+                None, lambda: shutil.rmtree(output_dir, ignore_errors=True)
+            )
+        
+        if not results:
+            raise AudioProcessingError(f"Не удалось нарезать аудио на чанки: {input_path}")
+        
+        result = join_transcribed_chunks(results)
+        if result.success:
+            logger.info(f"[AudioService] ✅ Транскрибация успешна: {len(results)} чанков, общая длина текста: {len(result.text)} символов")
+            if result.error:
+                logger.warning(f"[AudioService] {result.error}")
+        else:
+            logger.error(f"[AudioService] ❌ {result.error}")
+        return result
+    
+    @staticmethod
+    def _remove_file(path: str) -> None:
+        """Удаляет временный файл, если он существует"""
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    
     async def transcribe_file(
         self,
         filename: str,
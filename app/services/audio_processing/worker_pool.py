@@ -0,0 +1,227 @@
+"""
+Пул процессов для CPU-тяжелой обработки аудио (pydub/ffmpeg)
+
+Декодирование, поиск тишины и кодирование выполняются в отдельных
+процессах, поэтому не блокируют event loop бота. Зависший или слишком
+долгий воркер убивается по таймауту и пересоздается - в отличие от
+потока, процесс действительно можно прервать.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.exceptions.audio_exceptions import AudioProcessingError, AudioWorkerBusyError
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(conn: Connection) -> None:
+    """Цикл процесса-воркера: получает задачу, возвращает результат"""
+    # Завершением управляет родительский процесс
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+
+        func, args, kwargs = task
+        try:
+            conn.send((True, func(*args, **kwargs)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+
+class _AudioWorker:
+    """Один процесс-воркер и pipe к нему"""
+
+    def __init__(self, ctx: multiprocessing.context.BaseContext):
+        parent_conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+    async def call(self, func: Callable, args: tuple, kwargs: Dict[str, Any]) -> Tuple[bool, Any]:
+        """Отправляет задачу и ждет ответ, не блокируя event loop"""
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        fd = self.conn.fileno()
+
+        def _on_readable() -> None:
+            if not ready.done():
+                ready.set_result(None)
+
+        # Передаются только пути и параметры, поэтому send не блокирует
+        self.conn.send((func, args, kwargs))
+        loop.add_reader(fd, _on_readable)
+        try:
+            await ready
+        finally:
+            loop.remove_reader(fd)
+
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise AudioProcessingError(
+                f"Аудио-воркер завершился аварийно (exitcode={self.process.exitcode})",
+                processing_stage=getattr(func, "__name__", None),
+                cause=e
+            )
+
+    def kill(self) -> None:
+        """
+        Принудительно завершает процесс, не блокируя event loop
+
+        SIGKILL отправляется сразу, а ожидание завершения (join) идет в
+        потоке executor.
+        """
+        self._kill()
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self.process.join, 1)
+        except RuntimeError:
+            # Вне event loop или executor уже остановлен - можно ждать здесь
+            self.process.join(timeout=1)
+
+    def stop(self) -> None:
+        """Штатно завершает процесс (при остановке пула)"""
+        try:
+            self.conn.send(None)
+            self.process.join(timeout=2)
+        except (OSError, ValueError):
+            pass
+        self._kill()
+        self.process.join(timeout=1)
+
+    def _kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class AudioWorkerPool:
+    """
+    Пул процессов для задач из audio_jobs
+
+    - Размер по числу ядер (AUDIO_WORKER_PROCESSES переопределяет)
+    - Ограниченная очередь: при переполнении AudioWorkerBusyError,
+      чтобы один огромный файл не копил бесконечную очередь
+    - Таймаут и отмена убивают процесс-воркер
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_queue: Optional[int] = None):
+        self.max_workers = max_workers or settings.AUDIO_WORKER_PROCESSES or os.cpu_count() or 1
+        self.max_queue = settings.AUDIO_WORKER_QUEUE_SIZE if max_queue is None else max_queue
+
+        # spawn не наследует event loop и потоки родителя
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: List[_AudioWorker] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        self._closed = False
+
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._rejected = 0
+
+    async def run(self, func: Callable, *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        Выполняет func(*args, **kwargs) в процессе-воркере
+
+        Args:
+            func: Функция уровня модуля (должна сериализоваться pickle)
+            timeout: Таймаут выполнения, по умолчанию AUDIO_WORKER_TIMEOUT
+
+        Raises:
+            AudioWorkerBusyError: Очередь переполнена
+            AudioProcessingError: Ошибка или таймаут задачи
+        """
+        if self._closed:
+            raise AudioProcessingError("Пул аудио-воркеров остановлен")
+
+        if self._pending >= self.max_workers + self.max_queue:
+            self._rejected += 1
+            raise AudioWorkerBusyError(
+                "Сервер обработки аудио перегружен, попробуйте позже",
+                processing_stage=func.__name__
+            )
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        timeout = timeout or settings.AUDIO_WORKER_TIMEOUT
+        self._pending += 1
+        try:
+            async with self._semaphore:
+                worker = self._idle.pop() if self._idle else _AudioWorker(self._ctx)
+                try:
+                    ok, payload = await asyncio.wait_for(worker.call(func, args, kwargs), timeout=timeout)
+                except asyncio.TimeoutError:
+                    worker.kill()
+                    self._timeouts += 1
+                    raise AudioProcessingError(
+                        f"Превышено время обработки аудио ({timeout} сек)",
+                        processing_stage=func.__name__
+                    )
+                except BaseException:
+                    # Отмена или падение процесса - воркер в неизвестном состоянии
+                    worker.kill()
+                    self._failed += 1
+                    raise
+
+                self._idle.append(worker)
+                if not ok:
+                    self._failed += 1
+                    raise AudioProcessingError(payload, processing_stage=func.__name__)
+
+                self._completed += 1
+                return payload
+        finally:
+            self._pending -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики пула"""
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "idle_workers": len(self._idle),
+            "completed": self._completed,
+            "failed": self._failed,
+            "timeouts": self._timeouts,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self) -> None:
+        """Останавливает простаивающие воркеры"""
+        self._closed = True
+        while self._idle:
+            self._idle.pop().stop()
+
+
+_audio_worker_pool: Optional[AudioWorkerPool] = None
+
+
+def get_audio_worker_pool() -> AudioWorkerPool:
+    """Получить пул аудио-воркеров процесса (Singleton)"""
+    global _audio_worker_pool
+    if _audio_worker_pool is None:
+        _audio_worker_pool = AudioWorkerPool()
+    return _audio_worker_pool
+
+
+def shutdown_audio_worker_pool() -> None:
+    """Останавливает пул аудио-воркеров, если он был создан"""
+    global _audio_worker_pool
+    if _audio_worker_pool is not None:
+        _audio_worker_pool.shutdown()
+        _audio_worker_pool = None
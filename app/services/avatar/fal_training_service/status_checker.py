@@ -2,9 +2,7 @@
 Модуль для активного опрашивания статуса обучения в FAL AI
 Резервный механизм на случай если webhook не доходит
 """
-import asyncio
-import aiohttp
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional, Dict, Any
 from uuid import UUID
 
@@ -19,11 +17,6 @@ logger = get_logger(__name__)
 class FALStatusChecker:
     """Активное опрашивание статуса обучения в FAL AI"""
     
-    def __init__(self):
-        self.fal_api_key = settings.FAL_API_KEY or settings.FAL_KEY
-        self.check_interval = 60  # Проверяем каждую минуту
-        self.max_check_duration = 3600  # Максимум 1 час проверок
-        
     async def start_status_monitoring(self, avatar_id: UUID, request_id: str, training_type: str) -> None:
         """
         Запускает мониторинг статуса обучения
@@ -35,8 +28,9 @@ class FALStatusChecker:
         """
         logger.info(f"🔍 Запуск мониторинга статуса для аватара {avatar_id}, request_id: {request_id}")
         
-        # Запускаем в фоне
-        asyncio.create_task(self._monitor_training_status(avatar_id, request_id, training_type))
+        # Опрос ведет общий планировщик: реестр в Redis переживает рестарт
+        from .training_poller import training_poller
+        await training_poller.register(avatar_id, request_id, training_type)
     
     async def update_finetune_id_if_needed(
         self, 
@@ -140,128 +134,6 @@ class FALStatusChecker:
             logger.error(f"🔍 ❌ Ошибка проверки некорректных finetune_id: {e}")
             return {"error": str(e)}
     
-    async def _monitor_training_status(self, avatar_id: UUID, request_id: str, training_type: str) -> None:
-        """
-        Мониторит статус обучения до завершения
-        
-        Args:
-            avatar_id: ID аватара
-            request_id: ID запроса в FAL AI
-            training_type: Тип обучения (portrait/style)
-        """
-        start_time = datetime.utcnow()
-        max_end_time = start_time + timedelta(seconds=self.max_check_duration)
-        
-        # Определяем endpoint для проверки статуса
-        if training_type == "portrait":
-            endpoint = "fal-ai/flux-lora-portrait-trainer"
-        else:  
-            # LEGACY: style больше не поддерживается
-            logger.error(f"Неподдерживаемый тип обучения: {training_type}")
-            return
-            # endpoint = "fal-ai/flux-pro-trainer"  # LEGACY: убрано
-        
-        status_url = f"https://queue.fal.run/{endpoint}/requests/{request_id}/status"
-        
-        # Даём время на инициализацию обучения (30 секунд)
-        logger.info(f"🔍 Ожидание инициализации обучения для аватара {avatar_id}...")
-        await asyncio.sleep(90)
-        
-        consecutive_not_training_checks = 0
-        max_consecutive_checks = 3  # Максимум 3 проверки подряд с неправильным статусом
-        
-        while datetime.utcnow() < max_end_time:
-            try:
-                # Сначала проверяем статус в FAL AI
-                status_data = await self._check_fal_status(status_url)
-                
-                if status_data:
-                    fal_status = status_data.get("status")
-                    logger.debug(f"🔍 FAL AI статус для {avatar_id}: {fal_status}")
-                    
-                    # Если FAL AI показывает что обучение активно, продолжаем мониторинг
-                    if fal_status in ["IN_QUEUE", "IN_PROGRESS"]:
-                        consecutive_not_training_checks = 0
-                        await self._process_status_update(avatar_id, request_id, training_type, status_data)
-                        
-                    elif fal_status == "COMPLETED":
-                        logger.info(f"🔍 Обучение завершено для аватара {avatar_id}")
-                        await self._process_status_update(avatar_id, request_id, training_type, status_data)
-                        return
-                        
-                    elif fal_status in ["FAILED", "CANCELLED"]:
-                        logger.warning(f"🔍 Обучение прервано для аватара {avatar_id}: {fal_status}")
-                        await self._process_status_update(avatar_id, request_id, training_type, status_data)
-                        return
-                
-                # Проверяем статус аватара в БД только если FAL AI не отвечает
-                if not status_data:
-                    async with get_session() as session:
-                        avatar = await session.get(Avatar, avatar_id)
-                        if not avatar:
-                            logger.warning(f"🔍 Аватар {avatar_id} не найден в БД")
-                            return
-                            
-                        if avatar.status != "TRAINING":
-                            consecutive_not_training_checks += 1
-                            logger.info(f"🔍 Аватар {avatar_id} не в статусе TRAINING ({consecutive_not_training_checks}/{max_consecutive_checks})")
-                            
-                            # Останавливаем только после нескольких проверок подряд
-                            if consecutive_not_training_checks >= max_consecutive_checks:
-                                logger.info(f"🔍 Останавливаем мониторинг для аватара {avatar_id} (статус: {avatar.status})")
-                                return
-                        else:
-                            consecutive_not_training_checks = 0
-                
-                # Ждём до следующей проверки
-                await asyncio.sleep(self.check_interval)
-                
-            except Exception as e:
-                logger.error(f"🔍 Ошибка мониторинга статуса для аватара {avatar_id}: {e}")
-                await asyncio.sleep(self.check_interval)
-        
-        logger.warning(f"🔍 Превышено время мониторинга для аватара {avatar_id}")
-    
-    async def _check_fal_status(self, status_url: str) -> Optional[Dict[str, Any]]:
-        """
-        Проверяет статус запроса в FAL AI
-        
-        Args:
-            status_url: URL для проверки статуса
-            
-        Returns:
-            Данные статуса или None при ошибке
-        """
-        headers = {
-            "Authorization": f"Key {self.fal_api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(status_url, headers=headers) as response:
-                    # 200 - статус получен, 202 - запрос принят и обрабатывается
-                    if response.status in [200, 202]:
-                        try:
-                            data = await response.json()
-                            logger.debug(f"🔍 Статус FAL AI (HTTP {response.status}): {data}")
-                            return data
-                        except Exception as json_error:
-                            # Если 202 без JSON - это нормально, запрос ещё обрабатывается
-                            if response.status == 202:
-                                logger.debug(f"🔍 FAL AI обрабатывает запрос (HTTP 202)")
-                                return {"status": "IN_PROGRESS", "message": "Request is being processed"}
-                            else:
-                                logger.warning(f"🔍 Ошибка парсинга JSON от FAL AI: {json_error}")
-                                return None
-                    else:
-                        logger.warning(f"🔍 Ошибка запроса статуса FAL AI: HTTP {response.status}")
-                        return None
-                        
-        except Exception as e:
-            logger.error(f"🔍 Ошибка запроса к FAL AI: {e}")
-            return None
-    
     async def _process_status_update(self, avatar_id: UUID, request_id: str, training_type: str, status_data: Dict[str, Any]) -> None:
         """
         Обрабатывает обновление статуса от FAL AI
@@ -480,43 +352,12 @@ class FALStatusChecker:
         Returns:
             Результат обучения или None при ошибке
         """
-        # Определяем endpoint
-        if training_type == "portrait":
-            endpoint = "fal-ai/flux-lora-portrait-trainer"
-        else:  # style
-            endpoint = "fal-ai/flux-pro-trainer"
-        
-        result_url = f"https://queue.fal.run/{endpoint}/requests/{request_id}"
-        
-        headers = {
-            "Authorization": f"Key {self.fal_api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(result_url, headers=headers) as response:
-                    # 200 - результат получен, 202 - запрос принят и обрабатывается
-                    if response.status in [200, 202]:
-                        try:
-                            data = await response.json()
-                            logger.info(f"🔍 Получен результат обучения (HTTP {response.status}): {data}")
-                            return data
-                        except Exception as json_error:
-                            # Если 202 без JSON - это нормально, запрос ещё обрабатывается
-                            if response.status == 202:
-                                logger.debug(f"🔍 FAL AI ещё обрабатывает запрос результата (HTTP 202)")
-                                return None  # Результат ещё не готов
-                            else:
-                                logger.warning(f"🔍 Ошибка парсинга JSON результата от FAL AI: {json_error}")
-                                return None
-                    else:
-                        logger.warning(f"🔍 Ошибка получения результата: HTTP {response.status}")
-                        return None
-                        
-        except Exception as e:
-            logger.error(f"🔍 Ошибка запроса результата: {e}")
-            return None
+        from .training_poller import training_poller
+
+        data = await training_poller.fetch_result(request_id, training_type)
+        if data:
+            logger.info(f"🔍 Получен результат обучения: {data}")
+        return data
     
     async def _update_avatar_status(self, avatar_id: UUID, status: str) -> None:
         """
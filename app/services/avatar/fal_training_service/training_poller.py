@@ -0,0 +1,485 @@
+"""
+Централизованный опрос статуса обучения аватаров в FAL AI
+
+Один планировщик на все реплики вместо фоновой задачи на каждое обучение:
+реестр обучений хранится в Redis и переживает рестарт, опрос идет пачками
+через общую keep-alive сессию, интервал подстраивается под статус.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+import aiohttp
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Ключи Redis
+REGISTRY_KEY = "aisha:v2:training:registry"        # HASH request_id -> JSON записи
+DUE_KEY = "aisha:v2:training:due"                   # ZSET request_id -> время следующей проверки
+LEASE_KEY = "aisha:v2:training:poller:lease"        # Реплика, которая сейчас опрашивает
+DELIVERED_PREFIX = "aisha:v2:training:delivered:"   # Webhook уже доставил результат
+
+# Сколько помним о доставленном webhook (защита от гонки с опросом)
+DELIVERED_TTL = 24 * 3600
+
+# Тик планировщика и аренда
+TICK_SECONDS = 5
+LEASE_TTL_MS = 30_000
+# Продление аренды во время прохода (опрос пачки может идти дольше аренды)
+LEASE_RENEW_SECONDS = LEASE_TTL_MS / 3000
+
+# Сверка реестра с БД (обучения, начатые до развертывания реестра или потерянные)
+RECONCILE_INTERVAL = 600
+
+# Записей реестра за один проход
+BATCH_SIZE = 50
+
+FINAL_FAL_STATUSES = frozenset({"COMPLETED", "FAILED", "CANCELLED"})
+
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def training_endpoint(training_type: str) -> str:
+    """Endpoint очереди FAL для типа обучения"""
+    if training_type == "portrait":
+        return "fal-ai/flux-lora-portrait-trainer"
+    return "fal-ai/flux-pro-trainer"
+
+
+def next_poll_interval(status_data: Optional[Dict[str, Any]], entry: Dict[str, Any], now: float) -> float:
+    """
+    Интервал до следующей проверки
+
+    - Ошибка запроса: экспоненциальный backoff
+    - IN_QUEUE: пропорционально позиции в очереди
+    - IN_PROGRESS: ~10% от времени с начала обучения - молодые обучения
+      проверяются часто, долгие реже
+    """
+    min_interval = settings.FAL_TRAINING_POLL_MIN_INTERVAL
+    max_interval = settings.FAL_TRAINING_POLL_MAX_INTERVAL
+
+    if not status_data:
+        interval = min_interval * (2 ** min(entry.get("errors", 0), 5))
+    elif status_data.get("status") == "IN_QUEUE":
+        position = status_data.get("queue_position")
+        interval = 60 * (int(position) + 1) if isinstance(position, int) else 120
+    else:
+        interval = (now - entry.get("registered_at", now)) * 0.1
+
+    return float(min(max(interval, min_interval), max_interval))
+
+
+class TrainingPoller:
+    """
+    Планировщик опроса обучений
+
+    - register() кладет обучение в реестр (HASH) и расписание (ZSET)
+    - Опрашивает одна реплика - владелец аренды в Redis; остальные ждут
+    - За тик берутся все записи, чей срок подошел, и опрашиваются параллельно
+      (не больше FAL_TRAINING_POLL_CONCURRENCY) через общий HTTP-клиент
+    - mark_delivered() из обработчика webhook снимает обучение с опроса
+    """
+
+    def __init__(self, redis=None):
+        self._redis = redis
+        self.replica_id = f"{settings.INSTANCE_ID}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._is_leader = False
+        self._last_reconcile = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _get_redis(self):
+        if self._redis is None:
+            from app.core.di import get_redis
+            self._redis = await get_redis()
+        return self._redis
+
+    @staticmethod
+    def _get(url: str, endpoint: str, headers: Dict[str, str]):
+        """GET к очереди FAL через общий пул соединений (keep-alive к queue.fal.run)"""
+        from app.core.di import get_http_client
+        return get_http_client().request(
+            "fal", "GET", url, endpoint=endpoint, headers=headers,
+            timeout=aiohttp.ClientTimeout(total=30, sock_connect=10)
+        )
+
+    # ------------------------------------------------------------------
+    # Реестр
+    # ------------------------------------------------------------------
+
+    async def register(
+        self,
+        avatar_id: UUID,
+        request_id: str,
+        training_type: str,
+        initial_delay: Optional[float] = None,
+    ) -> None:
+        """
+        Ставит обучение на опрос
+
+        Повторная регистрация того же request_id не сбрасывает расписание.
+        """
+        redis = await self._get_redis()
+        if await redis.exists(f"{DELIVERED_PREFIX}{request_id}"):
+            logger.info(f"🔍 Обучение {request_id} уже завершено через webhook, опрос не нужен")
+            return
+
+        now = time.time()
+        entry = {
+            "avatar_id": str(avatar_id),
+            "request_id": request_id,
+            "training_type": training_type,
+            "registered_at": now,
+            "errors": 0,
+            "checks": 0,
+            "last_status": None,
+        }
+        delay = settings.FAL_TRAINING_POLL_INITIAL_DELAY if initial_delay is None else initial_delay
+        if await redis.hsetnx(REGISTRY_KEY, request_id, json.dumps(entry)):
+            await redis.zadd(DUE_KEY, {request_id: now + delay}, nx=True)
+            logger.info(f"🔍 Обучение {request_id} (аватар {avatar_id}) поставлено на опрос через {delay:.0f}с")
+
+    async def mark_delivered(self, request_id: str, status: Optional[str] = None) -> None:
+        """
+        Webhook доставил статус обучения
+
+        Финальный статус снимает обучение с опроса; промежуточный
+        откладывает следующую проверку - webhook и так приходит.
+        """
+        if not request_id:
+            return
+        try:
+            redis = await self._get_redis()
+            if status is None or str(status).upper() in FINAL_FAL_STATUSES:
+                await redis.setex(f"{DELIVERED_PREFIX}{request_id}", DELIVERED_TTL, str(status or "COMPLETED"))
+                await self._unregister(request_id)
+                logger.info(f"🔍 Webhook доставил результат {request_id} - опрос остановлен")
+            else:
+                await redis.zadd(
+                    DUE_KEY,
+                    {request_id: time.time() + settings.FAL_TRAINING_POLL_MAX_INTERVAL},
+                    xx=True,
+                )
+        except Exception as e:
+            logger.warning(f"🔍 Не удалось отметить доставку webhook для {request_id}: {e}")
+
+    async def _unregister(self, request_id: str) -> None:
+        redis = await self._get_redis()
+        await redis.hdel(REGISTRY_KEY, request_id)
+        await redis.zrem(DUE_KEY, request_id)
+
+    # ------------------------------------------------------------------
+    # Планировщик
+    # ------------------------------------------------------------------
+
+    def start(self) -> asyncio.Task:
+        """Запускает цикл планировщика в фоне (идемпотентно)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        """Останавливает планировщик и отдает аренду"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+        if self._is_leader:
+            try:
+                redis = await self._get_redis()
+                await redis.eval(_RELEASE_SCRIPT, 1, LEASE_KEY, self.replica_id)
+            except Exception as e:
+                logger.debug(f"🔍 Ошибка освобождения аренды опроса: {e}")
+            self._is_leader = False
+
+    async def run(self) -> None:
+        """Цикл: держим аренду и опрашиваем подошедшие обучения"""
+        logger.info(f"🔄 Планировщик опроса обучений запущен ({self.replica_id})")
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка планировщика опроса обучений: {e}")
+            await asyncio.sleep(TICK_SECONDS)
+
+    async def tick(self) -> None:
+        """Один проход: сверка с БД и опрос, если аренда у этой реплики"""
+        if not await self._hold_lease():
+            return
+
+        keeper = asyncio.create_task(self._keep_lease())
+        try:
+            now = time.time()
+            if now - self._last_reconcile >= RECONCILE_INTERVAL:
+                self._last_reconcile = now
+                await self.reconcile()
+            await self.poll_due()
+        finally:
+            keeper.cancel()
+            await asyncio.gather(keeper, return_exceptions=True)
+
+    async def _hold_lease(self) -> bool:
+        redis = await self._get_redis()
+        if self._is_leader:
+            self._is_leader = bool(await redis.eval(_RENEW_SCRIPT, 1, LEASE_KEY, self.replica_id, LEASE_TTL_MS))
+            if not self._is_leader:
+                logger.warning("🔍 Аренда опроса обучений потеряна")
+        else:
+            self._is_leader = bool(await redis.set(LEASE_KEY, self.replica_id, nx=True, px=LEASE_TTL_MS))
+            if self._is_leader:
+                logger.info(f"🔍 Реплика {self.replica_id} опрашивает обучения")
+                self._last_reconcile = 0.0
+        return self._is_leader
+
+    async def _keep_lease(self) -> None:
+        """Продлевает аренду, пока идет проход; при потере новые опросы не начинаются"""
+        while self._is_leader:
+            await asyncio.sleep(LEASE_RENEW_SECONDS)
+            try:
+                await self._hold_lease()
+            except Exception as e:
+                logger.warning(f"🔍 Ошибка продления аренды опроса: {e}")
+
+    async def poll_due(self) -> int:
+        """
+        Опрашивает все обучения, чей срок проверки подошел
+
+        Returns:
+            int: Сколько обучений опрошено
+        """
+        redis = await self._get_redis()
+        now = time.time()
+        request_ids = [
+            rid.decode() if isinstance(rid, bytes) else rid
+            for rid in await redis.zrangebyscore(DUE_KEY, "-inf", now, start=0, num=BATCH_SIZE)
+        ]
+        if not request_ids:
+            return 0
+
+        raw_entries = await redis.hmget(REGISTRY_KEY, request_ids)
+        delivered = await redis.mget([f"{DELIVERED_PREFIX}{rid}" for rid in request_ids])
+
+        entries: List[Dict[str, Any]] = []
+        for rid, raw, done in zip(request_ids, raw_entries, delivered):
+            if raw is None or done:
+                await self._unregister(rid)
+                continue
+            entries.append(json.loads(raw))
+
+        semaphore = asyncio.Semaphore(max(1, settings.FAL_TRAINING_POLL_CONCURRENCY))
+
+        async def _poll(entry: Dict[str, Any]) -> None:
+            async with semaphore:
+                # Аренду забрала другая реплика - оставшиеся обучения опросит она
+                if self._is_leader:
+                    await self._poll_one(entry)
+
+        await asyncio.gather(*(_poll(entry) for entry in entries))
+        return len(entries)
+
+    async def _poll_one(self, entry: Dict[str, Any]) -> None:
+        redis = await self._get_redis()
+        request_id = entry["request_id"]
+        now = time.time()
+
+        status_data = await self.fetch_status(request_id, entry["training_type"])
+        entry["checks"] = entry.get("checks", 0) + 1
+
+        if status_data and status_data.get("status") in FINAL_FAL_STATUSES:
+            await self._finish(entry, status_data)
+            return
+
+        if now - entry.get("registered_at", now) > settings.FAL_TRAINING_POLL_MAX_AGE:
+            await self._expire(entry)
+            return
+
+        if status_data:
+            entry["errors"] = 0
+            if status_data.get("status") != entry.get("last_status"):
+                logger.info(f"🔍 FAL AI статус {request_id}: {status_data.get('status')}")
+            entry["last_status"] = status_data.get("status")
+        else:
+            entry["errors"] = entry.get("errors", 0) + 1
+
+        await redis.hset(REGISTRY_KEY, request_id, json.dumps(entry))
+        await redis.zadd(DUE_KEY, {request_id: now + next_poll_interval(status_data, entry, now)}, xx=True)
+
+    async def _finish(self, entry: Dict[str, Any], status_data: Dict[str, Any]) -> None:
+        """Финальный статус: обрабатываем, если webhook не успел раньше"""
+        redis = await self._get_redis()
+        request_id = entry["request_id"]
+        avatar_id = UUID(entry["avatar_id"])
+
+        # Webhook мог прийти, пока шел запрос статуса
+        if await redis.exists(f"{DELIVERED_PREFIX}{request_id}") or not await self._is_still_training(avatar_id):
+            logger.info(f"🔍 Обучение {request_id} уже обработано - только снимаем с опроса")
+            await self._unregister(request_id)
+            return
+
+        from .status_checker import status_checker
+
+        logger.info(f"🔍 Обучение {request_id} завершено в FAL AI ({status_data.get('status')}), обрабатываем")
+        await status_checker._process_status_update(avatar_id, request_id, entry["training_type"], status_data)
+        await redis.setex(f"{DELIVERED_PREFIX}{request_id}", DELIVERED_TTL, status_data.get("status"))
+        await self._unregister(request_id)
+
+    async def _expire(self, entry: Dict[str, Any]) -> None:
+        """
+        Время опроса вышло, а FAL так и не вернул финальный статус
+
+        Аватар переводится в ошибку: иначе он навсегда остался бы в
+        TRAINING, а сверка с БД не берет обучения старше FAL_TRAINING_POLL_MAX_AGE.
+        """
+        request_id = entry["request_id"]
+        avatar_id = UUID(entry["avatar_id"])
+        logger.warning(f"🔍 Превышено время опроса обучения {request_id} (аватар {avatar_id})")
+
+        if await self._is_still_training(avatar_id):
+            from .status_checker import status_checker
+
+            await status_checker._process_status_update(
+                avatar_id, request_id, entry["training_type"], {"status": "FAILED"}
+            )
+        await self._unregister(request_id)
+
+    @staticmethod
+    async def _is_still_training(avatar_id: UUID) -> bool:
+        try:
+            from app.core.database import get_session
+            from app.database.models import Avatar, AvatarStatus
+
+            async with get_session() as session:
+                avatar = await session.get(Avatar, avatar_id)
+                if not avatar:
+                    return False
+                status = getattr(avatar.status, "value", avatar.status)
+                return str(status).lower() == AvatarStatus.TRAINING.value.lower()
+        except Exception as e:
+            # Не удалось проверить - обрабатываем результат как раньше
+            logger.debug(f"🔍 Ошибка проверки статуса аватара {avatar_id}: {e}")
+            return True
+
+    async def reconcile(self) -> int:
+        """
+        Ставит на опрос обучения из БД, которых нет в реестре
+
+        Returns:
+            int: Сколько обучений добавлено
+        """
+        try:
+            from sqlalchemy import select
+
+            from app.core.database import get_session
+            from app.database.models import Avatar, AvatarStatus
+
+            cutoff = datetime.utcnow() - timedelta(seconds=settings.FAL_TRAINING_POLL_MAX_AGE)
+            async with get_session() as session:
+                result = await session.execute(
+                    select(Avatar).where(
+                        Avatar.fal_request_id.isnot(None),
+                        Avatar.training_started_at > cutoff,
+                    )
+                )
+                avatars = [
+                    a for a in result.scalars().all()
+                    if str(getattr(a.status, "value", a.status)).lower() == AvatarStatus.TRAINING.value.lower()
+                ]
+        except Exception as e:
+            logger.error(f"❌ Ошибка сверки обучений с БД: {e}")
+            return 0
+
+        if not avatars:
+            return 0
+
+        redis = await self._get_redis()
+        known = await redis.hmget(REGISTRY_KEY, [a.fal_request_id for a in avatars])
+        added = 0
+        for avatar, entry in zip(avatars, known):
+            if entry is not None:
+                continue
+            training_type = avatar.training_type.value if avatar.training_type else "portrait"
+            # Обучение могло завершиться, пока за ним никто не следил - проверяем сразу
+            await self.register(avatar.id, avatar.fal_request_id, training_type, initial_delay=0)
+            added += 1
+
+        if added:
+            logger.info(f"🔍 Сверка с БД: на опрос поставлено {added} обучений")
+        return added
+
+    # ------------------------------------------------------------------
+    # FAL queue API
+    # ------------------------------------------------------------------
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Key {settings.effective_fal_api_key}",
+            "Content-Type": "application/json",
+        }
+
+    async def fetch_status(self, request_id: str, training_type: str) -> Optional[Dict[str, Any]]:
+        """
+        Статус запроса в очереди FAL
+
+        Returns:
+            Данные статуса или None при ошибке
+        """
+        url = f"https://queue.fal.run/{training_endpoint(training_type)}/requests/{request_id}/status"
+        try:
+            async with self._get(url, "fal/queue/status", headers=self._headers()) as response:
+                # 200 - статус получен, 202 - запрос принят и обрабатывается
+                if response.status not in (200, 202):
+                    logger.warning(f"🔍 Ошибка запроса статуса FAL AI {request_id}: HTTP {response.status}")
+                    return None
+                try:
+                    return await response.json()
+                except Exception:
+                    if response.status == 202:
+                        return {"status": "IN_PROGRESS"}
+                    return None
+        except Exception as e:
+            logger.warning(f"🔍 Ошибка запроса к FAL AI {request_id}: {e}")
+            return None
+
+    async def fetch_result(self, request_id: str, training_type: str) -> Optional[Dict[str, Any]]:
+        """
+        Результат завершенного обучения
+
+        Returns:
+            Результат обучения или None, если он недоступен
+        """
+        url = f"https://queue.fal.run/{training_endpoint(training_type)}/requests/{request_id}"
+        try:
+            async with self._get(url, "fal/queue/result", headers=self._headers()) as response:
+                if response.status != 200:
+                    logger.warning(f"🔍 Ошибка получения результата {request_id}: HTTP {response.status}")
+                    return None
+                return await response.json()
+        except Exception as e:
+            logger.error(f"🔍 Ошибка запроса результата {request_id}: {e}")
+            return None
+
+
+# Глобальный экземпляр
+training_poller = TrainingPoller()
@@ -0,0 +1,94 @@
+"""
+Размещение пакета фотографий аватара в MinIO
+
+Порядок загрузки (upload_order) назначается каждому фото пакета один раз,
+до загрузки, и используется и для ключа photo_<n> в MinIO, и для записи
+в БД. Если часть файлов не загрузилась, в нумерации остаются пропуски,
+зато следующий max(upload_order) + 1 никогда не совпадет с ключом уже
+сохраненного файла.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+
+@dataclass
+class BatchPhoto:
+    """Фото пакета с назначенным порядком и ключом"""
+    index: int                  # Индекс в пакете
+    data: bytes
+    filename: Optional[str]
+    validation: Any             # PhotoValidationResult
+    upload_order: int
+    extension: str
+    object_name: str
+    minio_key: Optional[str] = None  # Ключ, под которым файл сохранен
+
+
+def photo_object_name(user_id: UUID, avatar_id: UUID, upload_order: int, extension: str) -> str:
+    """Ключ фотографии аватара в MinIO"""
+    return f"avatars/{user_id}/{avatar_id}/photo_{upload_order}.{extension}"
+
+
+def assign_upload_orders(
+    candidates: Sequence[Tuple[int, bytes, Optional[str], Any]],
+    user_id: UUID,
+    avatar_id: UUID,
+    max_order: int
+) -> List[BatchPhoto]:
+    """
+    Назначает порядок и ключ каждому фото пакета
+
+    Args:
+        candidates: (индекс в пакете, данные, имя файла, результат валидации)
+        max_order: Наибольший upload_order среди уже загруженных фото
+    """
+    photos = []
+    for offset, (index, data, filename, validation) in enumerate(candidates, start=1):
+        extension = validation.metadata.get('format', 'jpg').lower()
+        upload_order = max_order + offset
+        photos.append(BatchPhoto(
+            index=index,
+            data=data,
+            filename=filename,
+            validation=validation,
+            upload_order=upload_order,
+            extension=extension,
+            object_name=photo_object_name(user_id, avatar_id, upload_order, extension),
+        ))
+    return photos
+
+
+async def store_batch(
+    storage,
+    photos: Sequence[BatchPhoto],
+    bucket: str = "avatars"
+) -> Tuple[List[BatchPhoto], List[Tuple[BatchPhoto, BaseException]]]:
+    """
+    Параллельно загружает фото пакета в MinIO
+
+    Returns:
+        Tuple: Загруженные фото (с minio_key) и пары (фото, ошибка)
+    """
+    results = await asyncio.gather(
+        *(
+            storage.upload_file(
+                bucket=bucket,
+                object_name=photo.object_name,
+                data=photo.data,
+                content_type=f"image/{photo.extension}"
+            )
+            for photo in photos
+        ),
+        return_exceptions=True
+    )
+
+    stored, failed = [], []
+    for photo, result in zip(photos, results):
+        if isinstance(result, BaseException):
+            failed.append((photo, result))
+        else:
+            photo.minio_key = result
+            stored.append(photo)
+    return stored, failed
@@ -1,13 +1,14 @@
 """
 Сервис для работы с фотографиями аватаров
 """
+import asyncio
 import hashlib
 import io
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import List, Optional, Tuple, Dict, Any
 from uuid import UUID
 
-from PIL import Image
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, update, delete
 from sqlalchemy.orm import selectinload
@@ -16,7 +17,9 @@ from ...core.config import settings
 from ...core.logger import get_logger
 from ...database.models import Avatar, AvatarPhoto, PhotoValidationStatus
 from ..base import BaseService
-from ..storage import StorageService
+from ..images.renditions import get_rendition_service
+from ..storage import get_storage_service
+from .photo_batch import assign_upload_orders, photo_object_name, store_batch
 
 logger = get_logger(__name__)
 
@@ -25,6 +28,14 @@ logger = get_logger(__name__)
 from .photo_validation import PhotoValidationResult
 
 
+@dataclass
+class PhotoBatchUploadResult:
+    """Результат пакетной загрузки фотографий"""
+    uploaded: List[AvatarPhoto] = field(default_factory=list)
+    rejected: List[Tuple[int, str]] = field(default_factory=list)  # (индекс в пакете, причина)
+    photos_count: int = 0  # Фото у аватара после загрузки
+
+
 class PhotoUploadService(BaseService):
     """
     Сервис для загрузки и валидации фотографий аватаров.
@@ -40,7 +51,8 @@ class PhotoUploadService(BaseService):
     def __init__(self, session: AsyncSession):
         super().__init__(session)
         self.session = session
-        self.storage = StorageService()
+        self.storage = get_storage_service()
+        self.renditions = get_rendition_service()
 
     async def upload_photo(
         self, 
@@ -82,7 +94,7 @@ class PhotoUploadService(BaseService):
             
             # Создаем путь в MinIO
             file_extension = validation.metadata.get('format', 'jpg').lower()
-            object_name = f"avatars/{user_id}/{avatar_id}/photo_{upload_order}.{file_extension}"
+            object_name = photo_object_name(user_id, avatar_id, upload_order, file_extension)
             
             # Загружаем в MinIO
             minio_path = await self.storage.upload_file(
@@ -120,6 +132,9 @@ class PhotoUploadService(BaseService):
             # Обновляем счетчик фотографий в аватаре
             await self._update_avatar_photos_count(avatar_id)
             
+            # Уменьшенные копии для карточек и галереи
+            await self.renditions.generate("avatars", minio_path, photo_data)
+            
             logger.info(
                 f"Загружена фотография {photo.id} для аватара {avatar_id}: "
                 f"size={len(photo_data)}, order={upload_order}"
@@ -132,6 +147,155 @@ class PhotoUploadService(BaseService):
             logger.exception(f"Ошибка при загрузке фотографии: {e}")
             raise
 
+    async def upload_photos_batch(
+        self,
+        avatar_id: UUID,
+        user_id: UUID,
+        photos: List[Tuple[bytes, Optional[str]]]
+    ) -> PhotoBatchUploadResult:
+        """
+        Загружает пакет фотографий (альбом) одной транзакцией
+        
+        Вместо ~7 обращений к БД на каждое фото: файлы проверяются
+        параллельно в пуле image-воркеров, дубликаты ищутся одним IN запросом,
+        количество и порядок - одним запросом, файлы грузятся в MinIO
+        параллельно, записи вставляются одним INSERT, счетчик обновляется
+        один раз. Неподходящие фото отклоняются, остальные загружаются.
+        
+        Args:
+            avatar_id: ID аватара
+            user_id: ID пользователя
+            photos: Пары (данные фотографии, имя файла)
+            
+        Returns:
+            PhotoBatchUploadResult: Загруженные и отклоненные фото
+        """
+        from .photo_validation import PhotoValidationService
+        
+        batch = PhotoBatchUploadResult()
+        validator = PhotoValidationService(self.session)
+        uploaded_keys: List[str] = []
+        
+        try:
+            # 1. Проверки файлов без БД
+            validations = await asyncio.gather(
+                *(validator.validate_photo_content(data, filename) for data, filename in photos)
+            )
+            
+            candidates = []
+            batch_hashes = set()
+            for index, ((data, filename), validation) in enumerate(zip(photos, validations)):
+                if not validation.is_valid:
+                    batch.rejected.append((index, f"Фото не прошло валидацию: {', '.join(validation.errors)}"))
+                    continue
+                photo_hash = validation.metadata['photo_hash']
+                if photo_hash in batch_hashes:
+                    batch.rejected.append((index, "Фото не прошло валидацию: Это фото уже загружено"))
+                    continue
+                batch_hashes.add(photo_hash)
+                candidates.append((index, data, filename, validation))
+            
+            # 2. Дубликаты среди уже загруженных - одним запросом
+            if candidates:
+                existing_query = (
+                    select(AvatarPhoto.file_hash)
+                    .where(
+                        AvatarPhoto.avatar_id == avatar_id,
+                        AvatarPhoto.file_hash.in_(batch_hashes)
+                    )
+                )
+                existing = set((await self.session.execute(existing_query)).scalars().all())
+                for candidate in [c for c in candidates if c[3].metadata['photo_hash'] in existing]:
+                    batch.rejected.append((candidate[0], "Фото не прошло валидацию: Это фото уже загружено"))
+                    candidates.remove(candidate)
+            
+            # 3. Лимит и порядок загрузки - одним запросом
+            stats_query = (
+                select(func.count(AvatarPhoto.id), func.max(AvatarPhoto.upload_order))
+                .where(AvatarPhoto.avatar_id == avatar_id)
+            )
+            photos_count, max_order = (await self.session.execute(stats_query)).one()
+            photos_count, max_order = photos_count or 0, max_order or 0
+            batch.photos_count = photos_count
+            
+            free_slots = max(0, settings.AVATAR_MAX_PHOTOS - photos_count)
+            for candidate in candidates[free_slots:]:
+                batch.rejected.append((
+                    candidate[0],
+                    f"Превышен лимит фотографий: {settings.AVATAR_MAX_PHOTOS}/{settings.AVATAR_MAX_PHOTOS}"
+                ))
+            candidates = candidates[:free_slots]
+            
+            if not candidates:
+                batch.rejected.sort()
+                return batch
+            
+            # 4. Параллельная загрузка в MinIO (порядок и ключ назначены до загрузки)
+            planned = assign_upload_orders(candidates, user_id, avatar_id, max_order)
+            stored, failed = await store_batch(self.storage, planned)
+            uploaded_keys.extend(photo.minio_key for photo in stored)
+            for photo, error in failed:
+                logger.error(f"Ошибка загрузки фото {photo.index} альбома в MinIO: {error}")
+                batch.rejected.append((photo.index, "Ошибка сохранения фото"))
+            
+            # 5. Записи в БД одним INSERT и один пересчет счетчика
+            upload_timestamp = datetime.utcnow().isoformat()
+            for photo in stored:
+                validation = photo.validation
+                batch.uploaded.append(AvatarPhoto(
+                    avatar_id=avatar_id,
+                    user_id=user_id,
+                    minio_key=photo.minio_key,
+                    file_hash=validation.metadata['photo_hash'],
+                    upload_order=photo.upload_order,
+                    validation_status=PhotoValidationStatus.VALID,
+                    file_size=len(photo.data),
+                    width=validation.metadata.get('width'),
+                    height=validation.metadata.get('height'),
+                    format=photo.extension,
+                    has_face=validation.metadata.get('has_face'),
+                    quality_score=validation.metadata.get('quality_score'),
+                    photo_metadata={
+                        'original_filename': photo.filename,
+                        'validation_warnings': validation.warnings,
+                        'upload_timestamp': upload_timestamp,
+                    }
+                ))
+            
+            if batch.uploaded:
+                self.session.add_all(batch.uploaded)
+                await self.session.flush()
+                
+                batch.photos_count = photos_count + len(batch.uploaded)
+                await self.session.execute(
+                    update(Avatar)
+                    .where(Avatar.id == avatar_id)
+                    .values(photos_count=batch.photos_count, updated_at=datetime.utcnow())
+                )
+                await self.session.commit()
+                
+                # Уменьшенные копии для карточек и галереи
+                await asyncio.gather(
+                    *(self.renditions.generate("avatars", photo.minio_key, photo.data) for photo in stored)
+                )
+            
+            batch.rejected.sort()
+            logger.info(
+                f"Загружен альбом для аватара {avatar_id}: принято {len(batch.uploaded)}, "
+                f"отклонено {len(batch.rejected)}, всего {batch.photos_count}"
+            )
+            return batch
+            
+        except Exception as e:
+            await self.session.rollback()
+            # Файлы без записей в БД не нужны
+            await asyncio.gather(
+                *(self.storage.delete_file("avatars", key) for key in uploaded_keys),
+                return_exceptions=True
+            )
+            logger.exception(f"Ошибка при пакетной загрузке фотографий: {e}")
+            raise
+
     async def get_avatar_photos(
         self, 
         avatar_id: UUID, 
@@ -208,9 +372,10 @@ class PhotoUploadService(BaseService):
                 logger.warning(f"Попытка удалить чужую фотографию {photo_id} пользователем {user_id}")
                 return False
             
-            # Удаляем из MinIO
+            # Удаляем из MinIO вместе с уменьшенными копиями
             try:
                 await self.storage.delete_file("avatars", photo.minio_key)
+                await self.renditions.delete("avatars", photo.minio_key)
             except Exception as e:
                 logger.warning(f"Ошибка при удалении файла из MinIO {photo.minio_key}: {e}")
             
@@ -4,11 +4,9 @@
 """
 
 import hashlib
-import io
 import mimetypes
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
-from PIL import Image, ImageStat
 from uuid import UUID
 
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -17,6 +15,7 @@ from sqlalchemy import select, func
 from ...core.config import settings
 from ...core.logger import get_logger
 from ...database.models import AvatarPhoto
+from ..images.worker_pool import get_image_worker_pool
 
 logger = get_logger(__name__)
 
@@ -48,6 +47,8 @@ class PhotoValidationService:
     ✅ Валидация формата файла
     ✅ Проверка качества изображения
     ✅ Анализ содержимого (яркость, контраст)
+    
+    Декодирование и статистика изображения выполняются в пуле image-воркеров
     """
     
     def __init__(self, session: AsyncSession):
@@ -81,35 +82,17 @@ class PhotoValidationService:
         result = PhotoValidationResult(is_valid=True)
         
         try:
-            # 1. Базовые проверки размера файла
-            self._validate_file_size(photo_data, result)
-            
-            # 2. Проверка MIME типа
-            self._validate_mime_type(photo_data, filename, result)
-            
-            # 3. Анализ изображения через PIL
-            image = self._load_image(photo_data, result)
+            # 1-5. Проверки самого файла (размер, тип, разрешение, формат, качество)
+            image = await self._validate_content(photo_data, filename, result)
             if image is None:
                 return result
             
-            # 4. Проверка разрешения
-            self._validate_resolution(image, result)
-            
-            # 5. Проверка формата
-            self._validate_format(image, result)
-            
             # 6. Проверка дубликатов по MD5
             await self._validate_duplicates(photo_data, avatar_id, result)
             
             # 7. Проверка лимитов количества фото
             await self._validate_photo_limits(avatar_id, result)
             
-            # 8. Анализ качества изображения
-            self._analyze_image_quality(image, result)
-            
-            # 9. Сохраняем метаданные
-            self._collect_metadata(image, photo_data, result)
-            
             logger.info(
                 f"Валидация фото завершена: valid={result.is_valid}, "
                 f"errors={len(result.errors)}, warnings={len(result.warnings)}"
@@ -122,6 +105,67 @@ class PhotoValidationService:
         
         return result
     
+    async def validate_photo_content(
+        self,
+        photo_data: bytes,
+        filename: Optional[str] = None
+    ) -> PhotoValidationResult:
+        """
+        Валидация файла фотографии без запросов к БД
+        
+        Используется пакетной загрузкой альбома: дубликаты и лимиты
+        проверяются одним запросом на весь пакет.
+        
+        Args:
+            photo_data: Данные фотографии
+            filename: Имя файла (опционально)
+            
+        Returns:
+            PhotoValidationResult: Результат валидации (MD5 в metadata['photo_hash'])
+        """
+        result = PhotoValidationResult(is_valid=True)
+        
+        try:
+            result.metadata['photo_hash'] = self.calculate_photo_hash(photo_data)
+            await self._validate_content(photo_data, filename, result)
+        except Exception as e:
+            logger.exception(f"Ошибка при валидации фотографии: {e}")
+            result.is_valid = False
+            result.errors.append(f"Внутренняя ошибка валидации: {str(e)}")
+        
+        return result
+    
+    async def _validate_content(
+        self,
+        photo_data: bytes,
+        filename: Optional[str],
+        result: PhotoValidationResult
+    ) -> Optional[Dict[str, Any]]:
+        """Проверки файла; возвращает метаданные изображения или None, если оно не читается"""
+        # Базовые проверки размера файла
+        self._validate_file_size(photo_data, result)
+        
+        # Проверка MIME типа
+        self._validate_mime_type(photo_data, filename, result)
+        
+        # Анализ изображения через PIL (в пуле image-воркеров)
+        image = await self._load_image(photo_data, result)
+        if image is None:
+            return None
+        
+        # Проверка разрешения
+        self._validate_resolution(image, result)
+        
+        # Проверка формата
+        self._validate_format(image, result)
+        
+        # Анализ качества изображения
+        await self._analyze_image_quality(photo_data, image, result)
+        
+        # Сохраняем метаданные
+        self._collect_metadata(image, photo_data, result)
+        return image
+    
     def _validate_file_size(self, photo_data: bytes, result: PhotoValidationResult) -> None:
         """Проверка размера файла (из legacy)"""
         file_size = len(photo_data)
@@ -167,21 +211,18 @@ class PhotoValidationService:
             result.is_valid = False
             result.errors.append("Неподдерживаемый тип файла")
     
-    def _load_image(self, photo_data: bytes, result: PhotoValidationResult) -> Optional[Image.Image]:
-        """Загрузка изображения через PIL"""
+    async def _load_image(self, photo_data: bytes, result: PhotoValidationResult) -> Optional[Dict[str, Any]]:
+        """Проверка, что изображение декодируется; возвращает его метаданные"""
         try:
-            image = Image.open(io.BytesIO(photo_data))
-            # Убеждаемся что изображение загружено
-            image.load()
-            return image
+            return await get_image_worker_pool().decode_meta(photo_data)
         except Exception as e:
             result.is_valid = False
             result.errors.append(f"Ошибка при открытии изображения: {str(e)}")
             return None
     
-    def _validate_resolution(self, image: Image.Image, result: PhotoValidationResult) -> None:
+    def _validate_resolution(self, image: Dict[str, Any], result: PhotoValidationResult) -> None:
         """Проверка разрешения (из legacy проекта)"""
-        width, height = image.size
+        width, height = image['width'], image['height']
         min_dimension = min(width, height)
         max_dimension = max(width, height)
         
@@ -207,9 +248,9 @@ class PhotoValidationService:
                 f"Необычное соотношение сторон: {aspect_ratio:.1f}:1"
             )
     
-    def _validate_format(self, image: Image.Image, result: PhotoValidationResult) -> None:
+    def _validate_format(self, image: Dict[str, Any], result: PhotoValidationResult) -> None:
         """Проверка формата изображения"""
-        format_name = image.format
+        format_name = image['format']
         if not format_name:
             result.is_valid = False
             result.errors.append("Не удалось определить формат изображения")
@@ -285,26 +326,28 @@ class PhotoValidationService:
             logger.exception(f"Ошибка при проверке лимитов: {e}")
             result.warnings.append("Не удалось проверить лимиты")
     
-    def _analyze_image_quality(self, image: Image.Image, result: PhotoValidationResult) -> None:
+    async def _analyze_image_quality(
+        self,
+        photo_data: bytes,
+        image: Dict[str, Any],
+        result: PhotoValidationResult
+    ) -> None:
         """Анализ качества изображения (улучшенная версия из legacy)"""
         try:
-            # Конвертируем в RGB если нужно
-            if image.mode in ('RGBA', 'P'):
-                image = image.convert('RGB')
-            
-            # Анализ статистики изображения
-            stat = ImageStat.Stat(image)
+            # Статистика по уменьшенной копии: средние не меняются, а
+            # полноразмерное фото не декодируется ради двух чисел
+            stat = await get_image_worker_pool().stats(photo_data)
             
             # Средняя яркость (0-255)
-            brightness = sum(stat.mean) / len(stat.mean)
+            brightness = stat['brightness']
             result.metadata['brightness'] = brightness
             
             # Стандартное отклонение (контраст)
-            contrast = sum(stat.stddev) / len(stat.stddev)
+            contrast = stat['contrast']
             result.metadata['contrast'] = contrast
             
             # Оценка качества на основе размера и метрик
-            width, height = image.size
+            width, height = image['width'], image['height']
             min_dimension = min(width, height)
             
             # Базовая оценка по разрешению
@@ -338,39 +381,26 @@ class PhotoValidationService:
     
     def _collect_metadata(
         self, 
-        image: Image.Image, 
+        image: Dict[str, Any], 
         photo_data: bytes, 
         result: PhotoValidationResult
     ) -> None:
         """Сбор метаданных изображения"""
-        width, height = image.size
+        width, height = image['width'], image['height']
         
         result.metadata.update({
             'width': width,
             'height': height,
-            'format': image.format,
-            'mode': image.mode,
+            'format': image['format'],
+            'mode': image['mode'],
             'file_size': len(photo_data),
             'aspect_ratio': width / height,
             'megapixels': (width * height) / 1_000_000,
         })
         
-        # EXIF данные (если есть)
-        try:
-            if hasattr(image, '_getexif') and image._getexif():
-                exif_data = image._getexif()
-                if exif_data:
-                    # Извлекаем только безопасные EXIF теги
-                    safe_exif = {}
-                    if 271 in exif_data:  # Make
-                        safe_exif['camera_make'] = str(exif_data[271])[:50]
-                    if 272 in exif_data:  # Model
-                        safe_exif['camera_model'] = str(exif_data[272])[:50]
-                    
-                    result.metadata['exif'] = safe_exif
-        except Exception:
-            # EXIF данные не критичны
-            pass
+        # EXIF данные (только безопасные теги, извлекаются в воркере)
+        if image.get('exif'):
+            result.metadata['exif'] = image['exif']
 
     def calculate_photo_hash(self, photo_data: bytes) -> str:
         """Вычисляет MD5 хеш фотографии (из legacy проекта)"""
@@ -62,7 +62,11 @@ class WebhookHandler:
             else:
                 # Обновляем статус аватара для промежуточных состояний
                 await self._process_training_status_update(avatar.id, webhook)
-            
+
+            # Webhook дошел - резервный опрос FAL AI больше не нужен
+            from app.services.avatar.fal_training_service.training_poller import training_poller
+            await training_poller.mark_delivered(webhook.request_id, webhook.status)
+
             return True
             
         except Exception as e:
@@ -175,7 +179,8 @@ class WebhookHandler:
         try:
             from app.core.config import settings
             from app.database.models import AvatarPhoto
-            from app.services.storage import StorageService
+            from app.services.images.renditions import get_rendition_service
+            from app.services.storage import get_storage_service
             from sqlalchemy import select
             
             # Проверяем настройку - нужно ли удалять фото после обучения
@@ -197,7 +202,7 @@ class WebhookHandler:
                 return
             
             # Удаляем фотографии из MinIO
-            storage = StorageService()
+            storage = get_storage_service()
             
             # Проверяем настройку - оставлять ли первое фото как превью
             keep_preview = getattr(settings, 'KEEP_PREVIEW_PHOTO', True)
@@ -210,8 +215,9 @@ class WebhookHandler:
                     continue
                 
                 try:
-                    # Удаляем файл из MinIO
+                    # Удаляем файл из MinIO вместе с уменьшенными копиями
                     await storage.delete_file("avatars", photo.minio_key)
+                    await get_rendition_service().delete("avatars", photo.minio_key)
                     
                     # Удаляем запись из БД
                     await self.session.delete(photo)
@@ -42,50 +42,56 @@ class BalanceService(BaseService):
         self, 
         user_id: UUID, 
         amount: float, 
-        description: str = "Списание"
+        description: str = "Списание",
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Списывает средства с баланса пользователя
         
+        Проверка достаточности средств и списание - один условный UPDATE,
+        поэтому параллельные списания не уводят баланс в минус.
+        
         Args:
             user_id: ID пользователя
             amount: Сумма к списанию
             description: Описание операции
+            idempotency_key: Ключ операции - повтор с тем же ключом не списывает повторно
             
         Returns:
             Dict: Результат операции
         """
         try:
-            # Используем существующую сессию
-            # Проверяем текущий баланс
-            current_balance = await self.user_service.get_user_balance(user_id)
+            result = await self.user_service.charge(
+                user_id, amount, kind="charge", description=description, idempotency_key=idempotency_key
+            )
             
-            if current_balance < amount:
+            if result.duplicate:
+                logger.info(f"Списание {idempotency_key} для пользователя {user_id} уже выполнено ранее")
                 return {
-                    "success": False,
-                    "error": f"Недостаточно средств. Требуется: {amount}, доступно: {current_balance}",
-                    "current_balance": current_balance,
-                    "required_amount": amount
+                    "success": True,
+                    "duplicate": True,
+                    "amount_charged": amount,
+                    "new_balance": result.balance,
+                    "description": description,
                 }
             
-            # Списываем средства
-            new_balance = await self.user_service.remove_coins(user_id, amount)
-            
-            if new_balance is None:
+            if not result.applied:
+                current_balance = result.balance or 0.0
                 return {
                     "success": False,
-                    "error": "Ошибка списания средств",
-                    "current_balance": current_balance
+                    "error": f"Недостаточно средств. Требуется: {amount}, доступно: {current_balance}",
+                    "current_balance": current_balance,
+                    "required_amount": amount
                 }
             
-            logger.info(f"Списано {amount} монет с баланса пользователя {user_id}. Новый баланс: {new_balance}")
+            logger.info(f"Списано {amount} монет с баланса пользователя {user_id}. Новый баланс: {result.balance}")
             
             return {
                 "success": True,
                 "amount_charged": amount,
-                "new_balance": new_balance,
+                "new_balance": result.balance,
                 "description": description,
-                "transaction_id": f"charge_{user_id}_{int(amount * 100)}_{hash(description) % 10000}"
+                "transaction_id": str(result.transaction_id)
             }
                 
         except Exception as e:
@@ -99,7 +105,8 @@ class BalanceService(BaseService):
         self, 
         user_id: UUID, 
         amount: float, 
-        description: str = "Пополнение"
+        description: str = "Пополнение",
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Добавляет средства на баланс пользователя
@@ -108,33 +115,41 @@ class BalanceService(BaseService):
             user_id: ID пользователя
             amount: Сумма к добавлению
             description: Описание операции
+            idempotency_key: Ключ операции - повтор (например, ретрай webhook) не зачисляет повторно
             
         Returns:
             Dict: Результат операции
         """
         try:
-            # Используем существующую сессию
-            # Получаем текущий баланс
-            current_balance = await self.user_service.get_user_balance(user_id)
+            result = await self.user_service.credit(
+                user_id, amount, kind="credit", description=description, idempotency_key=idempotency_key
+            )
             
-            # Добавляем средства
-            new_balance = await self.user_service.add_coins(user_id, amount)
+            if result.duplicate:
+                logger.info(f"Зачисление {idempotency_key} для пользователя {user_id} уже выполнено ранее")
+                return {
+                    "success": True,
+                    "duplicate": True,
+                    "amount_added": amount,
+                    "new_balance": result.balance,
+                    "description": description,
+                }
             
-            if new_balance is None:
+            if not result.applied:
                 return {
                     "success": False,
                     "error": "Ошибка добавления средств",
-                    "current_balance": current_balance
+                    "current_balance": result.balance
                 }
             
-            logger.info(f"Добавлено {amount} монет на баланс пользователя {user_id}. Новый баланс: {new_balance}")
+            logger.info(f"Добавлено {amount} монет на баланс пользователя {user_id}. Новый баланс: {result.balance}")
             
             return {
                 "success": True,
                 "amount_added": amount,
-                "new_balance": new_balance,
+                "new_balance": result.balance,
                 "description": description,
-                "transaction_id": f"add_{user_id}_{int(amount * 100)}_{hash(description) % 10000}"
+                "transaction_id": str(result.transaction_id)
             }
                 
         except Exception as e:
@@ -2,16 +2,30 @@
 Универсальный сервис кеширования с Redis
 Оптимизирует частые запросы к БД и внешним API
 """
-import json
 import asyncio
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Union, Callable
+from datetime import datetime
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Union, Callable
 from uuid import UUID
 
+import orjson
+
+from app.core.config import settings
 from app.core.logger import get_logger
+from app.core.lru import TTLCache
 
 logger = get_logger(__name__)
 
+# Счетчик версии пространства имен живет дольше любой записи в нем:
+# после истечения версия снова 0, но ключей версии 0 к тому времени нет
+NAMESPACE_VERSION_TTL = 7 * 24 * 3600
+
+_MISSING = object()
+
+
+def _dumps(value: Any) -> bytes:
+    # orjson сам пишет UUID и datetime; прочее (Decimal и т.п.) - через str, как раньше
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+
 
 class CacheService:
     """
@@ -23,11 +37,46 @@ class CacheService:
     3. Статусы FAL AI тренировок
     4. Галереи изображений  
     5. Метаданные аватаров
+    
+    Два уровня:
+    - L1: LRU процесса, ограничен числом записей и байтами. Хранит
+      сериализованные значения, поэтому каждый get отдает новую копию.
+      Пока Redis доступен, запись живет не дольше CACHE_L1_TTL и не
+      дольше остатка TTL в Redis; без Redis - полный TTL (fallback).
+    - L2: Redis, значения в orjson, GET и PTTL одним pipeline.
+    
+    Одновременные промахи по одному ключу ждут одно чтение из Redis,
+    get_or_set - одну загрузку значения.
+    
+    Группы ключей (галерея пользователя, его фильтры) хранятся в
+    пространствах имен с версией: ключ содержит текущую версию, а
+    инвалидация - один INCR счетчика. Старые ключи становятся
+    недостижимы и истекают по своему TTL, KEYS/SCAN не нужны.
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        l1_max_items: Optional[int] = None,
+        l1_max_bytes: Optional[int] = None,
+        l1_ttl: Optional[float] = None,
+    ):
         self.redis = None
-        self.memory_fallback = {}  # Fallback для случаев недоступности Redis
+        self.l1_ttl = settings.CACHE_L1_TTL if l1_ttl is None else l1_ttl
+        self.local: TTLCache[bytes] = TTLCache(
+            l1_max_items or settings.CACHE_L1_MAX_ITEMS,
+            self.l1_ttl,
+            maxbytes=l1_max_bytes or settings.CACHE_L1_MAX_BYTES,
+        )
+        # Версии пространств имен на время недоступности Redis
+        self._namespace_versions: TTLCache[int] = TTLCache(
+            l1_max_items or settings.CACHE_L1_MAX_ITEMS, NAMESPACE_VERSION_TTL
+        )
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        self.coalesced = 0
         
     async def _get_redis(self):
         """Ленивая инициализация Redis клиента"""
@@ -40,55 +89,204 @@ class CacheService:
                 await self.redis.ping()
                 logger.debug("✅ Redis соединение установлено")
             except Exception as e:
-                logger.warning(f"⚠️ Redis недоступен, использую memory fallback: {e}")
+                logger.warning(f"⚠️ Redis недоступен, использую кеш процесса: {e}")
                 self.redis = None
         return self.redis
     
-    async def get(self, key: str, default: Any = None) -> Any:
-        """Получить значение из кеша"""
+    def _remember(self, key: str, payload: bytes, ttl: float, in_redis: bool) -> None:
+        """Кладет значение в L1 (без Redis - на полный TTL)"""
+        self.local.set(key, payload, ttl=min(self.l1_ttl, ttl) if in_redis else ttl)
+    
+    async def get(self, key: str, default: Any = None, local: bool = True) -> Any:
+        """
+        Получить значение из кеша
+        
+        Args:
+            local: Использовать L1. False - для значений, которые другие
+                процессы меняют чаще, чем истекает L1 (баланс).
+        """
+        payload = self.local.get(key) if local else None
+        if payload is None:
+            payload = await self._fetch(key, local)
+        if payload is None:
+            return default
+        return orjson.loads(payload)
+    
+    async def _fetch(self, key: str, local: bool) -> Optional[bytes]:
+        """Чтение из Redis; одновременные промахи по ключу ждут одно чтение"""
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            payload = await self._read_l2(key, local)
+            future.set_result(payload)
+            return payload
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+    
+    async def _read_l2(self, key: str, local: bool) -> Optional[bytes]:
         try:
             redis = await self._get_redis()
-            if redis:
-                value = await redis.get(key)
-                if value:
-                    return json.loads(value)
-            
-            # Fallback на memory
-            return self.memory_fallback.get(key, default)
-            
+            if not redis:
+                return None
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.pttl(key)
+                payload, pttl = await pipe.execute()
         except Exception as e:
+            self.l2_errors += 1
             logger.warning(f"Ошибка чтения кеша {key}: {e}")
-            return self.memory_fallback.get(key, default)
-    
-    async def set(self, key: str, value: Any, ttl: int = 3600):
+            return None
+        
+        if payload is None:
+            self.l2_misses += 1
+            return None
+        
+        self.l2_hits += 1
+        if local:
+            # В L1 не дольше, чем ключ проживет в Redis
+            self._remember(key, payload, pttl / 1000 if pttl and pttl > 0 else self.l1_ttl, in_redis=True)
+        return payload
+    
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Получить несколько значений: промахи L1 читаются одним pipeline"""
+        result: Dict[str, Any] = {}
+        missing: List[str] = []
+        for key in keys:
+            payload = self.local.get(key)
+            if payload is None:
+                missing.append(key)
+            else:
+                result[key] = orjson.loads(payload)
+        if not missing:
+            return result
+        
+        try:
+            redis = await self._get_redis()
+            if not redis:
+                return result
+            async with redis.pipeline(transaction=False) as pipe:
+                for key in missing:
+                    pipe.get(key)
+                    pipe.pttl(key)
+                replies = await pipe.execute()
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning(f"Ошибка пакетного чтения кеша ({len(missing)} ключей): {e}")
+            return result
+        
+        for key, payload, pttl in zip(missing, replies[::2], replies[1::2]):
+            if payload is None:
+                self.l2_misses += 1
+                continue
+            self.l2_hits += 1
+            self._remember(key, payload, pttl / 1000 if pttl and pttl > 0 else self.l1_ttl, in_redis=True)
+            result[key] = orjson.loads(payload)
+        return result
+    
+    async def set(self, key: str, value: Any, ttl: int = 3600, local: bool = True):
         """Установить значение в кеш с TTL"""
         try:
-            serialized = json.dumps(value, default=str)  # default=str для UUID и datetime
-            
+            payload = _dumps(value)
+        except TypeError as e:
+            logger.warning(f"Значение для кеша {key} не сериализуется: {e}")
+            return
+        
+        in_redis = False
+        try:
             redis = await self._get_redis()
             if redis:
-                await redis.setex(key, ttl, serialized)
-            
-            # Дублируем в memory fallback
-            self.memory_fallback[key] = value
-            
+                await redis.setex(key, ttl, payload)
+                in_redis = True
         except Exception as e:
+            self.l2_errors += 1
             logger.warning(f"Ошибка записи кеша {key}: {e}")
-            # Сохраняем только в memory
-            self.memory_fallback[key] = value
+        
+        if local or not in_redis:
+            self._remember(key, payload, ttl, in_redis)
+        else:
+            self.local.pop(key)
+    
+    async def set_many(self, items: Dict[str, Any], ttl: int = 3600):
+        """Установить несколько значений одним pipeline"""
+        payloads = {}
+        for key, value in items.items():
+            try:
+                payloads[key] = _dumps(value)
+            except TypeError as e:
+                logger.warning(f"Значение для кеша {key} не сериализуется: {e}")
+        if not payloads:
+            return
+        
+        in_redis = False
+        try:
+            redis = await self._get_redis()
+            if redis:
+                async with redis.pipeline(transaction=False) as pipe:
+                    for key, payload in payloads.items():
+                        pipe.setex(key, ttl, payload)
+                    await pipe.execute()
+                in_redis = True
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning(f"Ошибка пакетной записи кеша ({len(payloads)} ключей): {e}")
+        
+        for key, payload in payloads.items():
+            self._remember(key, payload, ttl, in_redis)
+    
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int = 3600,
+    ) -> Any:
+        """
+        Значение из кеша или из loader с записью в кеш
+        
+        Одновременные промахи по ключу вызывают loader один раз. None
+        не кешируется.
+        """
+        value = await self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        
+        pending = self._loading.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await loader()
+            if value is not None:
+                await self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._loading.pop(key, None)
     
     async def delete(self, key: str):
         """Удалить ключ из кеша"""
+        self.local.pop(key)
         try:
             redis = await self._get_redis()
             if redis:
                 await redis.delete(key)
-            
-            self.memory_fallback.pop(key, None)
-            
         except Exception as e:
             logger.warning(f"Ошибка удаления кеша {key}: {e}")
-            self.memory_fallback.pop(key, None)
     
     async def exists(self, key: str) -> bool:
         """Проверить существование ключа"""
@@ -96,12 +294,9 @@ class CacheService:
             redis = await self._get_redis()
             if redis:
                 return bool(await redis.exists(key))
-            
-            return key in self.memory_fallback
-            
         except Exception as e:
             logger.warning(f"Ошибка проверки кеша {key}: {e}")
-            return key in self.memory_fallback
+        return self.local.get(key) is not None
     
     async def expire(self, key: str, ttl: int):
         """Установить TTL для существующего ключа"""
@@ -113,27 +308,100 @@ class CacheService:
         except Exception as e:
             logger.warning(f"Ошибка установки TTL {key}: {e}")
     
+    # ======================== ПРОСТРАНСТВА ИМЕН ========================
+    
+    @staticmethod
+    def _namespace_version_key(namespace: str) -> str:
+        return f"cache_ns:{namespace}"
+    
+    async def _namespace_version(self, namespace: str) -> int:
+        """Текущая версия пространства имен"""
+        try:
+            redis = await self._get_redis()
+            if redis:
+                value = await redis.get(self._namespace_version_key(namespace))
+                return int(value) if value else 0
+        except Exception as e:
+            logger.warning(f"Ошибка чтения версии пространства {namespace}: {e}")
+        return self._namespace_versions.get(namespace) or 0
+    
+    async def namespace_version(self, namespace: str) -> int:
+        """
+        Версия пространства для записи после долгой загрузки
+        
+        Версию читают до загрузки из БД и передают в namespaced_key:
+        если пространство инвалидировали во время загрузки, устаревшие
+        данные запишутся в старую версию и читаться не будут.
+        """
+        return await self._namespace_version(namespace)
+    
+    async def namespaced_key(self, namespace: str, key: str, version: Optional[int] = None) -> str:
+        """Ключ в текущей (или заданной) версии пространства имен"""
+        if version is None:
+            version = await self._namespace_version(namespace)
+        return f"{namespace}:v{version}:{key}"
+    
+    async def get_namespaced(self, namespace: str, key: str, default: Any = None) -> Any:
+        """Получить значение из пространства имен"""
+        return await self.get(await self.namespaced_key(namespace, key), default)
+    
+    async def set_namespaced(self, namespace: str, key: str, value: Any, ttl: int = 3600):
+        """
+        Установить значение в пространстве имен
+        
+        Если пространство инвалидировали между чтением версии и записью,
+        значение попадет в старую версию и читаться уже не будет.
+        """
+        await self.set(await self.namespaced_key(namespace, key), value, ttl)
+    
+    async def invalidate_namespace(self, namespace: str) -> int:
+        """
+        Инвалидировать все ключи пространства имен за O(1)
+        
+        Записи старой версии в L1 недостижимы и вытесняются LRU/TTL.
+        
+        Returns:
+            int: Новая версия пространства
+        """
+        try:
+            redis = await self._get_redis()
+            if redis:
+                version_key = self._namespace_version_key(namespace)
+                async with redis.pipeline(transaction=False) as pipe:
+                    pipe.incr(version_key)
+                    pipe.expire(version_key, NAMESPACE_VERSION_TTL)
+                    version, _ = await pipe.execute()
+                return version
+        except Exception as e:
+            logger.warning(f"Ошибка инвалидации пространства {namespace}: {e}")
+        
+        version = (self._namespace_versions.get(namespace) or 0) + 1
+        self._namespace_versions.set(namespace, version)
+        return version
+    
     # ======================== ПОЛЬЗОВАТЕЛЬСКИЕ ДАННЫЕ ========================
     
     async def cache_user(self, telegram_id: Union[str, int], user_data: Dict, ttl: int = 1800):
         """Кешировать данные пользователя (30 минут)"""
         key = f"user:{telegram_id}"
-        await self.set(key, user_data, ttl)
+        # Инвалидация по pub/sub сбрасывает только кеш личностей - L1 не используем
+        await self.set(key, user_data, ttl, local=False)
     
     async def get_cached_user(self, telegram_id: Union[str, int]) -> Optional[Dict]:
         """Получить пользователя из кеша"""
         key = f"user:{telegram_id}"
-        return await self.get(key)
+        return await self.get(key, local=False)
     
     async def cache_user_balance(self, user_id: Union[str, UUID], balance: float, ttl: int = 600):
         """Кешировать баланс пользователя (10 минут)"""
         key = f"balance:{user_id}"
-        await self.set(key, {"balance": balance, "updated_at": datetime.utcnow()}, ttl)
+        # Баланс меняют все процессы - читаем его только из Redis
+        await self.set(key, {"balance": balance, "updated_at": datetime.utcnow()}, ttl, local=False)
     
     async def get_cached_balance(self, user_id: Union[str, UUID]) -> Optional[float]:
         """Получить баланс из кеша"""
         key = f"balance:{user_id}"
-        data = await self.get(key)
+        data = await self.get(key, local=False)
         return data.get("balance") if data else None
     
     # ======================== АВАТАРЫ И FAL AI ========================
@@ -229,13 +497,14 @@ class CacheService:
     
     async def cache_filtered_images(self, user_id: Union[str, UUID], filters_key: str, image_ids: List[str], ttl: int = 1800):
         """Кешировать результаты фильтрации изображений (30 минут)"""
-        key = f"filtered_images:{user_id}:{filters_key}"
-        await self.set(key, {"image_ids": image_ids, "cached_at": datetime.utcnow()}, ttl)
+        await self.set_namespaced(
+            f"filtered_images:{user_id}", filters_key,
+            {"image_ids": image_ids, "cached_at": datetime.utcnow()}, ttl
+        )
     
     async def get_cached_filtered_images(self, user_id: Union[str, UUID], filters_key: str) -> Optional[List[str]]:
         """Получить отфильтрованные изображения из кеша"""
-        key = f"filtered_images:{user_id}:{filters_key}"
-        data = await self.get(key)
+        data = await self.get_namespaced(f"filtered_images:{user_id}", filters_key)
         return data.get("image_ids") if data else None
     
     # ======================== СИСТЕМНЫЕ КЕШИ ========================
@@ -264,28 +533,40 @@ class CacheService:
     
     async def flush_user_cache(self, user_id: Union[str, UUID]):
         """Очистить весь кеш пользователя"""
-        patterns = [
+        keys = [
             f"user:{user_id}",
             f"balance:{user_id}",
             f"user_avatars:{user_id}", 
             f"user_transcripts_count:{user_id}",
             f"user_images_meta:{user_id}",
-            f"filtered_images:{user_id}:*"
         ]
+        try:
+            redis = await self._get_redis()
+            if redis:
+                await redis.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Ошибка очистки кеша пользователя {user_id}: {e}")
+        for key in keys:
+            self.local.pop(key)
         
-        for pattern in patterns:
-            if "*" in pattern:
-                # Для паттернов с * нужно найти все ключи
-                try:
-                    redis = await self._get_redis()
-                    if redis:
-                        keys = await redis.keys(pattern)
-                        if keys:
-                            await redis.delete(*keys)
-                except Exception as e:
-                    logger.warning(f"Ошибка очистки кеша по паттерну {pattern}: {e}")
-            else:
-                await self.delete(pattern)
+        # Галерея и результаты фильтрации - по одному INCR на пространство
+        await self.invalidate_namespace(f"filtered_images:{user_id}")
+        await self.invalidate_namespace(f"gallery_optimized:{user_id}")
+    
+    def _local_stats(self) -> Dict:
+        """Счетчики L1/L2 процесса"""
+        return {
+            "l1_items": len(self.local),
+            "l1_bytes": self.local.currbytes,
+            "l1_max_bytes": self.local.maxbytes,
+            "l1_hits": self.local.hits,
+            "l1_misses": self.local.misses,
+            "l1_evictions": self.local.evictions,
+            "l2_hits": self.l2_hits,
+            "l2_misses": self.l2_misses,
+            "l2_errors": self.l2_errors,
+            "coalesced": self.coalesced,
+        }
     
     async def get_cache_stats(self) -> Dict:
         """Получить статистику использования кеша"""
@@ -297,19 +578,19 @@ class CacheService:
                     "redis_available": True,
                     "used_memory": info.get("used_memory_human", "Unknown"),
                     "connected_clients": info.get("connected_clients", 0),
-                    "memory_fallback_keys": len(self.memory_fallback)
+                    **self._local_stats()
                 }
             else:
                 return {
                     "redis_available": False,
-                    "memory_fallback_keys": len(self.memory_fallback)
+                    **self._local_stats()
                 }
         except Exception as e:
             logger.warning(f"Ошибка получения статистики кеша: {e}")
             return {
                 "redis_available": False,
                 "error": str(e),
-                "memory_fallback_keys": len(self.memory_fallback)
+                **self._local_stats()
             }
 
 
@@ -111,10 +111,6 @@ class FalAIClient:
         except Exception as e:
             logger.exception(f"[FAL AI] Критическая ошибка при обучении аватара {avatar_id}: {e}")
             raise RuntimeError(f"Ошибка обучения аватара: {str(e)}")
-        
-        finally:
-            # Очищаем временные файлы
-            await self.file_manager.cleanup_temp_files()
 
     async def get_training_status(self, request_id: str, training_type: str) -> Dict[str, Any]:
         """
@@ -134,10 +130,6 @@ class FalAIClient:
         """Скачивает фотографии и создает архив"""
         return await self.file_manager.download_and_create_archive(photo_urls, avatar_id)
     
-    async def download_photos_from_minio(self, photo_urls: List[str], avatar_id: UUID) -> List:
-        """Скачивает фотографии из MinIO"""
-        return await self.file_manager.download_photos_from_minio(photo_urls, avatar_id)
-    
     async def create_and_upload_archive(self, photo_paths: List, avatar_id: UUID) -> Optional[str]:
         """Создает и загружает архив"""
         return await self.file_manager.create_and_upload_archive(photo_paths, avatar_id)
@@ -165,10 +157,6 @@ class FalAIClient:
             webhook_url=webhook_url
         )
     
-    async def _cleanup_temp_files(self):
-        """Очищает временные файлы"""
-        await self.file_manager.cleanup_temp_files()
-    
     def parse_webhook_status(self, webhook_data: Dict[str, Any]) -> Dict[str, Any]:
         """Парсит данные webhook"""
         return self.status_checker.parse_webhook_status(webhook_data)
@@ -1,30 +1,83 @@
 """
 Модуль управления файлами для FAL AI
+
+Архив для обучения собирается потоково: фото читаются из MinIO
+параллельно и сразу пишутся в ZIP без сжатия. В MinIO архив уходит
+multipart-загрузкой без записи на диск, для хранилища FAL - через
+временный файл, который клиент FAL читает частями. Ссылка на архив кешируется по хешу набора фото (ключи и ETag
+объектов), поэтому повторный запуск и переобучение на тех же фото не
+собирают архив заново. Архивы в MinIO удаляет правило жизненного цикла
+бакета вскоре после истечения записи кеша, архивы в FAL - срок
+хранения, заданный при загрузке.
 """
 import asyncio
-import io
-import tempfile
-import zipfile
+import hashlib
+import math
+from collections import deque
 from pathlib import Path
-from typing import List, Optional
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
 from uuid import UUID
 
-import aiohttp
-from PIL import Image
-
 from app.core.config import settings
 from app.core.logger import get_logger
-from app.services.storage.minio import MinioStorage
+from app.core.temp_files import NamedTemporaryFile
+from app.services.cache_service import cache_service
+from app.services.storage import get_storage_service
+from .zip_stream import ChunkStreamReader, iter_zip_stored
 
 logger = get_logger(__name__)
 
+# Версия формата архива (менять при изменении имен или состава записей)
+TRAINING_ARCHIVE_SCHEMA = 1
+
+# Префикс архивов в бакете аватаров и ID правила их удаления
+TRAINING_ARCHIVE_PREFIX = "training_archives/"
+TRAINING_ARCHIVE_RULE_ID = "expire-training-archives"
+
+
+class ArchivePhotoError(Exception):
+    """Фото из набора не удалось прочитать - архив не собирается"""
+
+
+def training_archive_cache_key(target: str, photos: List[Tuple[str, str]]) -> str:
+    """
+    Ключ кеша архива: хранилище + набор фото
+
+    Args:
+        target: Куда загружен архив (fal, minio)
+        photos: Пары (ключ MinIO, ETag) в порядке архива
+    """
+    digest = hashlib.sha256("\n".join(f"{key}\0{etag}" for key, etag in photos).encode("utf-8")).hexdigest()
+    return f"fal_training_archive:v{TRAINING_ARCHIVE_SCHEMA}:{target}:{digest}"
+
+
+def _photo_extension(data: bytes) -> str:
+    """Расширение файла по сигнатуре изображения"""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data[8:12] == b"WEBP":
+        return "webp"
+    return "jpg"
+
+
+class _CountingEntries:
+    """Считает записи, прошедшие в архив"""
+    
+    def __init__(self, entries: AsyncIterator[Tuple[str, bytes]]):
+        self._entries = entries
+        self.count = 0
+    
+    async def __aiter__(self):
+        async for entry in self._entries:
+            self.count += 1
+            yield entry
+
 
 class FalFileManager:
     """Управление файлами и архивами для FAL AI"""
     
     def __init__(self):
-        self.temp_files = []
-        self.minio_storage = MinioStorage()
+        self.minio_storage = get_storage_service()
     
     async def download_and_create_archive(
         self, 
@@ -32,7 +85,7 @@ class FalFileManager:
         avatar_id: UUID
     ) -> Optional[str]:
         """
-        Скачивает фотографии и создает архив для обучения
+        Собирает архив фотографий для обучения и загружает его
         
         Args:
             photo_urls: Список ключей MinIO фотографий
@@ -42,117 +95,82 @@ class FalFileManager:
             Optional[str]: URL загруженного архива или None при ошибке
         """
         try:
-            logger.info(f"[FAL Files] Скачивание {len(photo_urls)} фотографий для аватара {avatar_id}")
+            bucket = settings.MINIO_BUCKET_AVATARS
+            target = settings.FAL_ARCHIVE_STORAGE
             
-            # 1. Скачиваем фотографии
-            photo_paths = await self.download_photos_from_minio(photo_urls, avatar_id)
+            # Набор фото определяется ключами и ETag (HEAD запросы параллельно)
+            stats = await asyncio.gather(*(self.minio_storage.stat_object(bucket, key) for key in photo_urls))
+            photos = [(key, stat["etag"]) for key, stat in zip(photo_urls, stats) if stat]
+            for key, stat in zip(photo_urls, stats):
+                if not stat:
+                    logger.error(f"[FAL Files] Фото не найдено в MinIO: {bucket}/{key}")
             
-            if not photo_paths:
-                logger.error(f"[FAL Files] Не удалось скачать фотографии для аватара {avatar_id}")
+            if not photos:
+                logger.error(f"[FAL Files] Не удалось получить фотографии для аватара {avatar_id}")
                 return None
             
-            # 2. Создаем и загружаем архив
-            data_url = await self.create_and_upload_archive(photo_paths, avatar_id)
+            cache_key = training_archive_cache_key(target, photos)
+            set_hash = cache_key.rsplit(":", 1)[-1]
             
-            if data_url:
-                logger.info(f"[FAL Files] Архив создан успешно: {data_url}")
-            else:
+            async def build() -> Optional[Dict[str, str]]:
+                logger.info(f"[FAL Files] Сборка архива из {len(photos)} фотографий для аватара {avatar_id}")
+                entries = self._iter_minio_photos(bucket, [key for key, _ in photos])
+                return await self._upload_archive(entries, set_hash, target)
+            
+            archive = await cache_service.get_or_set(cache_key, build, ttl=settings.FAL_ARCHIVE_CACHE_TTL)
+            if not archive:
                 logger.error(f"[FAL Files] Не удалось создать архив для аватара {avatar_id}")
+                return None
             
+            data_url = await self._archive_url(archive)
+            logger.info(f"[FAL Files] Архив для аватара {avatar_id}: {data_url}")
             return data_url
             
+        except ArchivePhotoError as e:
+            # Неполный архив не загружен и не закеширован
+            logger.error(f"[FAL Files] Архив для аватара {avatar_id} не собран: {e}")
+            return None
         except Exception as e:
             logger.exception(f"[FAL Files] Ошибка создания архива для аватара {avatar_id}: {e}")
             return None
     
-    async def download_photos_from_minio(
-        self, 
-        photo_keys: List[str], 
-        avatar_id: UUID
-    ) -> List[Path]:
+    async def _iter_minio_photos(self, bucket: str, photo_keys: List[str]) -> AsyncIterator[Tuple[str, bytes]]:
         """
-        Скачивает фотографии из MinIO
+        Фотографии из MinIO в порядке ключей, читаемые параллельно
         
-        Args:
-            photo_keys: Список ключей MinIO фотографий
-            avatar_id: ID аватара
+        Вперед читается не больше FAL_ARCHIVE_READ_CONCURRENCY фото:
+        следующее чтение начинается, когда предыдущее фото ушло в архив.
+        
+        Yields:
+            Tuple[str, bytes]: Имя в архиве и данные фото
             
-        Returns:
-            List[Path]: Список путей к скачанным файлам
+        Raises:
+            ArchivePhotoError: Фото не удалось прочитать (архив без него не
+                совпал бы с ключом кеша набора)
         """
-        photo_paths = []
-        
+        window = max(1, settings.FAL_ARCHIVE_READ_CONCURRENCY)
+        keys = iter(photo_keys)
+        reads: Deque[Tuple[str, asyncio.Task]] = deque()
         try:
-            # Создаем временную директорию
-            temp_dir = Path(tempfile.mkdtemp(prefix=f"avatar_{avatar_id}_"))
-            self.temp_files.append(temp_dir)
-            
-            logger.info(f"[FAL Files] Скачивание в {temp_dir}")
-            
-            # ИСПРАВЛЕНИЕ: Используем правильный bucket для аватаров
-            bucket = settings.MINIO_BUCKET_AVATARS  # 'avatars' вместо 'aisha'
-            logger.info(f"[FAL Files] Используем bucket: {bucket}")
-            
-            async with aiohttp.ClientSession() as session:
-                for i, minio_key in enumerate(photo_keys):
-                    try:
-                        logger.debug(f"[FAL Files] Скачивание фото {i+1}/{len(photo_keys)}: {minio_key}")
-                        
-                        # Генерируем presigned URL для скачивания
-                        download_url = await self.minio_storage.generate_presigned_url(
-                            bucket=bucket,
-                            object_name=minio_key,
-                            expires=3600  # 1 час
-                        )
-                        
-                        if not download_url:
-                            logger.error(f"[FAL Files] Не удалось создать presigned URL для {minio_key}")
-                            continue
-                        
-                        logger.debug(f"[FAL Files] Presigned URL создан для {minio_key}")
-                        
-                        async with session.get(download_url) as response:
-                            if response.status == 200:
-                                # Получаем содержимое файла
-                                content = await response.read()
-                                
-                                # Проверяем что это изображение
-                                try:
-                                    img = Image.open(io.BytesIO(content))
-                                    img.verify()  # Проверяем целостность
-                                    
-                                    # Определяем расширение
-                                    format_ext = img.format.lower() if img.format else 'jpg'
-                                    if format_ext == 'jpeg':
-                                        format_ext = 'jpg'
-                                    
-                                    # Сохраняем файл
-                                    file_path = temp_dir / f"photo_{i+1:03d}.{format_ext}"
-                                    
-                                    # Переоткрываем изображение для сохранения
-                                    img = Image.open(io.BytesIO(content))
-                                    img.save(file_path)
-                                    
-                                    photo_paths.append(file_path)
-                                    logger.debug(f"[FAL Files] Сохранено: {file_path}")
-                                    
-                                except Exception as img_error:
-                                    logger.error(f"[FAL Files] Ошибка обработки изображения {minio_key}: {img_error}")
-                                    continue
-                            else:
-                                logger.error(f"[FAL Files] Ошибка скачивания {minio_key}: HTTP {response.status}")
-                                continue
-                                
-                    except Exception as e:
-                        logger.error(f"[FAL Files] Ошибка скачивания фото {minio_key}: {e}")
-                        continue
-            
-            logger.info(f"[FAL Files] Скачано {len(photo_paths)} из {len(photo_keys)} фотографий")
-            return photo_paths
-            
-        except Exception as e:
-            logger.exception(f"[FAL Files] Критическая ошибка скачивания фотографий: {e}")
-            return []
+            number = 0
+            while True:
+                while len(reads) < window:
+                    key = next(keys, None)
+                    if key is None:
+                        break
+                    reads.append((key, asyncio.create_task(self.minio_storage.download_file(bucket, key))))
+                if not reads:
+                    break
+                
+                key, task = reads.popleft()
+                content = await task
+                if not content:
+                    raise ArchivePhotoError(f"Ошибка скачивания фото {bucket}/{key}")
+                number += 1
+                yield f"photo_{number:03d}.{_photo_extension(content)}", content
+        finally:
+            for _, task in reads:
+                task.cancel()
     
     async def create_and_upload_archive(
         self, 
@@ -160,7 +178,7 @@ class FalFileManager:
         avatar_id: UUID
     ) -> Optional[str]:
         """
-        Создает ZIP архив и загружает его в FAL AI
+        Создает ZIP архив из локальных файлов и загружает его в FAL AI
         
         Args:
             photo_paths: Список путей к фотографиям
@@ -174,98 +192,113 @@ class FalFileManager:
                 logger.error(f"[FAL Files] Нет фотографий для создания архива аватара {avatar_id}")
                 return None
             
-            # Создаем временный ZIP файл
-            temp_zip = Path(tempfile.mktemp(suffix=f"_avatar_{avatar_id}.zip"))
-            self.temp_files.append(temp_zip)
-            
-            logger.info(f"[FAL Files] Создание архива {temp_zip} с {len(photo_paths)} фотографиями")
-            
-            # Создаем ZIP архив
-            with zipfile.ZipFile(temp_zip, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            async def entries() -> AsyncIterator[Tuple[str, bytes]]:
                 for photo_path in photo_paths:
                     if photo_path.exists():
-                        # Добавляем файл в архив с простым именем
-                        arcname = photo_path.name
-                        zipf.write(photo_path, arcname)
-                        logger.debug(f"[FAL Files] Добавлен в архив: {arcname}")
+                        yield photo_path.name, await asyncio.to_thread(photo_path.read_bytes)
                     else:
                         logger.warning(f"[FAL Files] Файл не найден: {photo_path}")
             
-            # Проверяем размер архива
-            archive_size = temp_zip.stat().st_size
-            logger.info(f"[FAL Files] Архив создан: {archive_size} байт")
-            
-            # Загружаем архив в FAL AI
-            data_url = await self._upload_archive_to_fal(temp_zip)
-            
-            return data_url
+            archive = await self._upload_archive(entries(), f"avatar_{avatar_id}", "fal")
+            return archive["url"] if archive else None
             
         except Exception as e:
             logger.exception(f"[FAL Files] Ошибка создания архива для аватара {avatar_id}: {e}")
             return None
     
-    async def _upload_archive_to_fal(self, archive_path: Path) -> Optional[str]:
+    async def _upload_archive(
+        self,
+        entries: AsyncIterator[Tuple[str, bytes]],
+        name: str,
+        target: str
+    ) -> Optional[Dict[str, str]]:
+        """
+        Пишет архив из записей и загружает его в хранилище
+        
+        Returns:
+            Optional[Dict[str, str]]: {"url": ...} для FAL, {"object_name": ...}
+                для MinIO; None, если в архив не попало ни одного фото
+        """
+        counted = _CountingEntries(entries)
+        chunks = iter_zip_stored(counted)
+        
+        if target == "minio":
+            bucket = settings.MINIO_BUCKET_AVATARS
+            object_name = f"{TRAINING_ARCHIVE_PREFIX}{name}.zip"
+            await self._ensure_archive_expiration(bucket)
+            reader = ChunkStreamReader(chunks)
+            await self.minio_storage.upload_stream(bucket, object_name, reader, content_type="application/zip")
+            if not counted.count:
+                await self.minio_storage.delete_file(bucket, object_name)
+                return None
+            logger.info(f"[FAL Files] Архив {bucket}/{object_name}: {counted.count} фото, {reader.bytes_read} байт")
+            return {"object_name": object_name}
+        
+        # Клиент FAL не принимает поток: архив пишется во временный файл, не в память
+        with NamedTemporaryFile(suffix=".zip", prefix=f"{name}_") as archive_file:
+            size = 0
+            async for chunk in chunks:
+                await asyncio.to_thread(archive_file.write, chunk)
+                size += len(chunk)
+            archive_file.flush()
+            if not counted.count:
+                return None
+            logger.info(f"[FAL Files] Архив {name}: {counted.count} фото, {size} байт")
+            url = await self._upload_archive_to_fal(archive_file.name)
+        return {"url": url} if url else None
+    
+    async def _ensure_archive_expiration(self, bucket: str) -> None:
+        """
+        Правило удаления архивов из бакета
+        
+        Архив живет на день дольше записи кеша: по последней ссылке из
+        кеша FAL успевает его скачать.
+        """
+        days = math.ceil(settings.FAL_ARCHIVE_CACHE_TTL / 86400) + 1
+        try:
+            await self.minio_storage.ensure_expiration_rule(
+                bucket, TRAINING_ARCHIVE_RULE_ID, TRAINING_ARCHIVE_PREFIX, days
+            )
+        except Exception as e:
+            logger.warning(f"[FAL Files] Не удалось настроить удаление архивов в {bucket}: {e}")
+    
+    async def _archive_url(self, archive: Dict[str, str]) -> str:
+        """URL архива из записи кеша"""
+        if archive.get("object_name"):
+            return await self.minio_storage.generate_presigned_url(
+                settings.MINIO_BUCKET_AVATARS,
+                archive["object_name"],
+                expires=settings.FAL_ARCHIVE_CACHE_TTL
+            )
+        return archive["url"]
+    
+    async def _upload_archive_to_fal(self, file_path: str) -> Optional[str]:
         """
         Загружает архив в FAL AI storage
         
+        Срок хранения в FAL на день дольше записи кеша, как и у архивов
+        в MinIO: ссылка из кеша не указывает на удаленный файл.
+        
         Args:
-            archive_path: Путь к архиву
+            file_path: Путь к файлу архива
             
         Returns:
             Optional[str]: URL загруженного файла
         """
         try:
             import fal_client
-            import os
             
-            logger.info(f"[FAL Files] Загрузка архива {archive_path} в FAL AI")
-            
-            # ИСПРАВЛЕНИЕ: Устанавливаем FAL API ключ из настроек
             fal_api_key = settings.effective_fal_api_key
             if not fal_api_key:
                 raise ValueError("FAL API ключ не настроен в конфигурации")
             
-            # Временно устанавливаем переменную среды для fal_client
-            original_fal_key = os.environ.get('FAL_KEY')
-            os.environ['FAL_KEY'] = fal_api_key
+            lifecycle = fal_client.StorageSettings(expires_in=settings.FAL_ARCHIVE_CACHE_TTL + 86400)
+            logger.info(f"[FAL Files] Загрузка архива {file_path} в FAL AI")
+            file_url = await fal_client.AsyncClient(key=fal_api_key).upload_file(file_path, lifecycle=lifecycle)
             
-            try:
-                # Передаем путь к файлу как строку
-                file_url = fal_client.upload_file(str(archive_path))
-                
-                logger.info(f"[FAL Files] Архив загружен успешно: {file_url}")
-                return file_url
-            finally:
-                # Восстанавливаем оригинальное значение переменной среды
-                if original_fal_key is not None:
-                    os.environ['FAL_KEY'] = original_fal_key
-                else:
-                    os.environ.pop('FAL_KEY', None)
+            logger.info(f"[FAL Files] Архив загружен успешно: {file_url}")
+            return file_url
             
         except Exception as e:
-            logger.exception(f"[FAL Files] Ошибка загрузки архива {archive_path}: {e}")
+            logger.exception(f"[FAL Files] Ошибка загрузки архива {file_path}: {e}")
             return None
-    
-    async def cleanup_temp_files(self):
-        """Очищает временные файлы"""
-        try:
-            for temp_path in self.temp_files:
-                try:
-                    if temp_path.exists():
-                        if temp_path.is_dir():
-                            # Удаляем директорию рекурсивно
-                            import shutil
-                            shutil.rmtree(temp_path)
-                            logger.debug(f"[FAL Files] Удалена временная директория: {temp_path}")
-                        else:
-                            # Удаляем файл
-                            temp_path.unlink()
-                            logger.debug(f"[FAL Files] Удален временный файл: {temp_path}")
-                except Exception as e:
-                    logger.warning(f"[FAL Files] Не удалось удалить {temp_path}: {e}")
-            
-            self.temp_files.clear()
-            logger.debug("[FAL Files] Очистка временных файлов завершена")
-            
-        except Exception as e:
-            logger.exception(f"[FAL Files] Ошибка очистки временных файлов: {e}") 
\ No newline at end of file
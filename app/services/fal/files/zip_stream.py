@@ -0,0 +1,85 @@
+"""
+Потоковая запись ZIP без временных файлов
+
+Фотографии уже сжаты (JPEG/PNG/WebP), поэтому записи пишутся без сжатия
+(ZIP_STORED): архив собирается со скоростью копирования памяти, а куски
+отдаются сразу после каждой записи - их можно грузить в хранилище, пока
+читаются следующие фото.
+"""
+import zipfile
+from typing import AsyncIterable, AsyncIterator, List, Tuple
+
+# Фиксированное время записей: одинаковый набор фото дает одинаковый архив
+ZIP_ENTRY_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+class _ChunkSink:
+    """Неперематываемый приемник для ZipFile: копит записанные байты"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def iter_zip_stored(entries: AsyncIterable[Tuple[str, bytes]]) -> AsyncIterator[bytes]:
+    """
+    ZIP архив (без сжатия) кусками по мере поступления записей
+
+    Args:
+        entries: Пары (имя в архиве, данные)
+
+    Yields:
+        bytes: Очередной кусок архива (последний - центральный каталог)
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        async for name, data in entries:
+            info = zipfile.ZipInfo(name, date_time=ZIP_ENTRY_DATE)
+            info.compress_type = zipfile.ZIP_STORED
+            info.external_attr = 0o644 << 16
+            archive.writestr(info, data)
+            yield sink.drain()
+    tail = sink.drain()
+    if tail:
+        yield tail
+
+
+class ChunkStreamReader:
+    """
+    Файлоподобная обертка над асинхронным потоком кусков
+
+    Нужна для AsyncS3Storage.upload_stream, который читает поток через read(n).
+    """
+
+    def __init__(self, chunks: AsyncIterable[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._buffer = bytearray()
+        self._eof = False
+        self.bytes_read = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            try:
+                self._buffer += await self._chunks.__anext__()
+            except StopAsyncIteration:
+                self._eof = True
+
+        if size < 0 or size >= len(self._buffer):
+            data = bytes(self._buffer)
+            self._buffer.clear()
+        else:
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        self.bytes_read += len(data)
+        return data
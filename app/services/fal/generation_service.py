@@ -11,6 +11,7 @@ import fal_client
 from ...core.config import settings
 from ...core.logger import get_logger
 from ...database.models import Avatar, AvatarTrainingType
+from .scheduler import get_generation_scheduler
 
 logger = get_logger(__name__)
 
@@ -46,6 +47,8 @@ class FALGenerationService:
                 logger.warning("FAL_API_KEY не установлен, автоматическое включение тестового режима")
                 self.test_mode = True
 
+        self.scheduler = get_generation_scheduler()
+
     async def generate_avatar_image(
         self,
         avatar: Avatar,
@@ -71,32 +74,52 @@ class FALGenerationService:
             RuntimeError: При ошибках генерации
         """
         try:
-            if self.test_mode:
-                logger.info(f"[FAL TEST MODE] Симуляция генерации для аватара {avatar.id}")
-                return await self._simulate_generation(avatar, prompt)
-            
-            # Проверяем что аватар обучен
-            if not self._is_avatar_trained(avatar):
-                raise ValueError(f"Аватар {avatar.id} не обучен или имеет неправильные данные")
-            
-            # ✅ СТРОГОЕ РАЗДЕЛЕНИЕ ПО ТИПАМ АВАТАРОВ
-            
-            if avatar.training_type == AvatarTrainingType.PORTRAIT:
-                # Портретные аватары используют LoRA файлы + flux-lora API
-                logger.info(f"👤 Portrait аватар: используем flux-lora для {avatar.id}")
-                return await self._generate_with_lora_legacy(avatar, prompt, generation_config)
-            elif avatar.training_type == AvatarTrainingType.STYLE:
-                # STYLE аватары больше не поддерживаются (LEGACY)
-                logger.error(f"🚫 STYLE аватар {avatar.id} больше не поддерживается")
-                raise ValueError(f"STYLE аватары больше не поддерживаются. Пожалуйста, создайте новый портретный аватар.")
-            else:
-                # Неизвестные типы не поддерживаются
-                raise ValueError(f"Неподдерживаемый тип аватара: {avatar.training_type}")
-                
+            # Слот планировщика ограничивает параллельные запросы к FAL AI
+            async with self.scheduler.slot(avatar.user_id):
+                return await self._dispatch_generation(avatar, prompt, generation_config)
         except Exception as e:
             logger.exception(f"[FAL AI] Ошибка генерации изображения для аватара {avatar.id}: {e}")
             raise
 
+    async def _dispatch_generation(
+        self,
+        avatar: Avatar,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        """
+        Выбирает способ генерации по типу аватара
+        
+        Args:
+            avatar: Модель аватара с данными обучения
+            prompt: Промпт для генерации
+            generation_config: Дополнительные параметры генерации
+            
+        Returns:
+            Optional[str]: URL сгенерированного изображения
+        """
+        if self.test_mode:
+            logger.info(f"[FAL TEST MODE] Симуляция генерации для аватара {avatar.id}")
+            return await self._simulate_generation(avatar, prompt)
+        
+        # Проверяем что аватар обучен
+        if not self._is_avatar_trained(avatar):
+            raise ValueError(f"Аватар {avatar.id} не обучен или имеет неправильные данные")
+        
+        # ✅ СТРОГОЕ РАЗДЕЛЕНИЕ ПО ТИПАМ АВАТАРОВ
+        
+        if avatar.training_type == AvatarTrainingType.PORTRAIT:
+            # Портретные аватары используют LoRA файлы + flux-lora API
+            logger.info(f"👤 Portrait аватар: используем flux-lora для {avatar.id}")
+            return await self._generate_with_lora_legacy(avatar, prompt, generation_config)
+        elif avatar.training_type == AvatarTrainingType.STYLE:
+            # STYLE аватары больше не поддерживаются (LEGACY)
+            logger.error(f"🚫 STYLE аватар {avatar.id} больше не поддерживается")
+            raise ValueError(f"STYLE аватары больше не поддерживаются. Пожалуйста, создайте новый портретный аватар.")
+        else:
+            # Неизвестные типы не поддерживаются
+            raise ValueError(f"Неподдерживаемый тип аватара: {avatar.training_type}")
+
     async def _generate_with_lora_legacy(
         self,
         avatar: Avatar,
@@ -186,11 +209,7 @@ class FALGenerationService:
         logger.debug(f"[FAL AI] LoRA args: {generation_args}")
         
         try:
-            result = fal_client.subscribe(
-                "fal-ai/flux-lora",
-                arguments=generation_args,
-                with_logs=True
-            )
+            result = await self._submit_and_wait("fal-ai/flux-lora", generation_args)
             
             logger.info(f"[FAL AI] ✅ Генерация LoRA завершена успешно")
             logger.debug(f"[FAL AI] LoRA result: {result}")
@@ -213,6 +232,45 @@ class FALGenerationService:
             logger.error(f"[FAL AI] ❌ Ошибка генерации LoRA: {e}")
             raise
 
+    async def _submit_and_wait(self, application: str, arguments: Dict[str, Any]) -> Any:
+        """
+        Отправляет запрос в очередь FAL AI и асинхронно ожидает результат
+        
+        В отличие от синхронного fal_client.subscribe не блокирует event loop:
+        статус опрашивается через асинхронный HTTP клиент.
+        
+        Args:
+            application: Эндпоинт FAL AI
+            arguments: Аргументы генерации
+            
+        Returns:
+            Any: Результат генерации
+            
+        Raises:
+            TimeoutError: Если генерация не завершилась за FAL_GENERATION_TIMEOUT
+        """
+        handle = await fal_client.submit_async(application, arguments=arguments)
+        logger.info(f"[FAL AI] 📨 Запрос поставлен в очередь: {handle.request_id}")
+        
+        async def _wait_result() -> Any:
+            async for status in handle.iter_events(
+                with_logs=False,
+                interval=settings.FAL_GENERATION_POLL_INTERVAL
+            ):
+                if isinstance(status, fal_client.Queued):
+                    logger.debug(f"[FAL AI] {handle.request_id} в очереди, позиция {status.position}")
+            return await handle.get()
+        
+        try:
+            return await asyncio.wait_for(_wait_result(), timeout=settings.FAL_GENERATION_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # Не оставляем в FAL AI висящий запрос, за который никто не ждет результат
+            try:
+                await handle.cancel()
+            except Exception as cancel_error:
+                logger.warning(f"[FAL AI] Не удалось отменить запрос {handle.request_id}: {cancel_error}")
+            raise
+
     async def _simulate_generation(
         self,
         avatar: Avatar,
@@ -336,27 +394,24 @@ class FALGenerationService:
         Returns:
             List[Optional[str]]: Список URL изображений
         """
-        results = []
-        
-        for i, prompt in enumerate(prompts):
+        async def _generate_one(i: int, prompt: str) -> Optional[str]:
             try:
                 logger.info(f"[FAL AI] Генерация {i+1}/{len(prompts)} для аватара {avatar.id}")
                 
-                image_url = await self.generate_avatar_image(
+                return await self.generate_avatar_image(
                     avatar=avatar,
                     prompt=prompt,
                     generation_config=generation_config
                 )
                 
-                results.append(image_url)
-                
-                # Небольшая задержка между генерациями
-                if i < len(prompts) - 1:
-                    await asyncio.sleep(1)
-                    
             except Exception as e:
                 logger.exception(f"[FAL AI] Ошибка генерации {i+1}: {e}")
-                results.append(None)
+                return None
+        
+        # Параллелизм ограничивается планировщиком (в т.ч. лимитом на пользователя)
+        results = list(await asyncio.gather(
+            *(_generate_one(i, prompt) for i, prompt in enumerate(prompts))
+        ))
         
         logger.info(
             f"[FAL AI] Завершена пакетная генерация для аватара {avatar.id}: "
@@ -494,6 +549,7 @@ class FALGenerationService:
                 "fal-ai/flux-pro/v1.1-ultra-finetuned",  # Основная модель для всех типов
             ],
             "presets": list(self.get_generation_config_presets().keys()),
+            "scheduler": self.scheduler.get_stats(),
             "features": {
                 "ultra_quality": True,
                 "lora_support": True,
@@ -0,0 +1,6 @@
+"""
+Модуль планировщика генераций FAL AI
+"""
+from .generation_scheduler import GenerationScheduler, get_generation_scheduler
+
+__all__ = ["GenerationScheduler", "get_generation_scheduler"]
@@ -0,0 +1,177 @@
+"""
+Планировщик генераций FAL AI с ограничением параллелизма
+
+Ограничивает количество одновременных запросов к FAL AI глобально и на
+пользователя. Слоты выдаются по кругу между пользователями (round-robin),
+поэтому один пользователь с десятком генераций не блокирует остальных.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class GenerationScheduler:
+    """
+    Планировщик слотов генерации внутри одного процесса
+
+    Использование:
+        async with scheduler.slot(user_id):
+            result = await fal_client.submit_async(...)
+    """
+
+    def __init__(self, max_concurrency: int, max_per_user: int):
+        if max_concurrency < 1 or max_per_user < 1:
+            raise ValueError("Лимиты параллелизма должны быть положительными")
+
+        self.max_concurrency = max_concurrency
+        self.max_per_user = max_per_user
+
+        self._active_total = 0
+        self._active_per_user: Dict[str, int] = {}
+        # Очереди ожидающих по пользователям; порядок ключей = порядок обхода
+        self._waiters: "OrderedDict[str, Deque[Tuple[asyncio.Future, float]]]" = OrderedDict()
+
+        # Метрики
+        self._total_started = 0
+        self._total_completed = 0
+        self._total_wait_time = 0.0
+        self._max_queue_depth = 0
+
+    @asynccontextmanager
+    async def slot(self, user_id: Any) -> AsyncIterator[None]:
+        """Занимает слот генерации на время выполнения блока"""
+        key = str(user_id)
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    async def acquire(self, user_id: Any) -> None:
+        """Ожидает свободный слот для пользователя"""
+        key = str(user_id)
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+
+        self._waiters.setdefault(key, deque()).append((future, time.monotonic()))
+        self._max_queue_depth = max(self._max_queue_depth, self.queue_depth)
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Слот уже выдан, но ожидающий отменен - возвращаем слот
+                self.release(key)
+            else:
+                self._remove_waiter(key, future)
+            raise
+
+    def release(self, user_id: Any) -> None:
+        """Освобождает слот пользователя"""
+        key = str(user_id)
+        active = self._active_per_user.get(key, 0)
+        if active <= 0:
+            logger.warning(f"[Scheduler] Попытка освободить несуществующий слот пользователя {key}")
+            return
+
+        if active == 1:
+            del self._active_per_user[key]
+        else:
+            self._active_per_user[key] = active - 1
+
+        self._active_total -= 1
+        self._total_completed += 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Раздает свободные слоты ожидающим по кругу"""
+        while self._active_total < self.max_concurrency:
+            key = self._next_eligible_user()
+            if key is None:
+                return
+
+            queue = self._waiters[key]
+            future, enqueued_at = queue.popleft()
+
+            # Пользователь уходит в конец очереди обхода
+            del self._waiters[key]
+            if queue:
+                self._waiters[key] = queue
+
+            if future.done():
+                continue
+
+            future.set_result(None)
+            self._active_total += 1
+            self._active_per_user[key] = self._active_per_user.get(key, 0) + 1
+            self._total_started += 1
+            self._total_wait_time += time.monotonic() - enqueued_at
+
+    def _next_eligible_user(self) -> Optional[str]:
+        """Первый по очереди пользователь, не исчерпавший свой лимит"""
+        for key in self._waiters:
+            if self._active_per_user.get(key, 0) < self.max_per_user:
+                return key
+        return None
+
+    def _remove_waiter(self, key: str, future: asyncio.Future) -> None:
+        """Удаляет отмененного ожидающего из очереди"""
+        queue = self._waiters.get(key)
+        if not queue:
+            return
+
+        for item in list(queue):
+            if item[0] is future:
+                queue.remove(item)
+                break
+
+        if not queue:
+            del self._waiters[key]
+
+    @property
+    def active(self) -> int:
+        """Количество выполняющихся генераций"""
+        return self._active_total
+
+    @property
+    def queue_depth(self) -> int:
+        """Количество генераций в ожидании слота"""
+        return sum(len(queue) for queue in self._waiters.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики планировщика"""
+        started = self._total_started
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_per_user": self.max_per_user,
+            "active": self._active_total,
+            "active_users": len(self._active_per_user),
+            "queue_depth": self.queue_depth,
+            "queued_users": len(self._waiters),
+            "max_queue_depth": self._max_queue_depth,
+            "total_started": started,
+            "total_completed": self._total_completed,
+            "avg_wait_seconds": round(self._total_wait_time / started, 3) if started else 0.0,
+        }
+
+
+_generation_scheduler: Optional[GenerationScheduler] = None
+
+
+def get_generation_scheduler() -> GenerationScheduler:
+    """Получить планировщик генераций процесса (Singleton)"""
+    global _generation_scheduler
+    if _generation_scheduler is None:
+        _generation_scheduler = GenerationScheduler(
+            max_concurrency=settings.FAL_GENERATION_MAX_CONCURRENCY,
+            max_per_user=settings.FAL_GENERATION_MAX_PER_USER,
+        )
+    return _generation_scheduler
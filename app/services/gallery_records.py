@@ -0,0 +1,55 @@
+"""
+Компактные записи изображений галереи для кеша
+
+Запись - словарь только с полями карточки галереи, упакованный msgpack.
+Модуль не зависит от ORM: объект ImageGeneration собирает
+UltraFastGalleryCache из record_attributes().
+"""
+from datetime import datetime
+from typing import Any, Dict
+from uuid import UUID
+
+import msgpack
+
+# Версия схемы записей: при изменении полей старые ключи просто не читаются
+IMAGE_RECORD_SCHEMA = 1
+
+
+def pack_record(value: Any) -> bytes:
+    return msgpack.packb(value, default=str, use_bin_type=True)
+
+
+def unpack_record(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False)
+
+
+def image_record(generation) -> Dict[str, Any]:
+    """Компактная запись изображения галереи (только поля карточки)"""
+    avatar = getattr(generation, "avatar", None)
+    return {
+        "id": str(generation.id),
+        "user_id": str(generation.user_id),
+        "avatar_id": str(generation.avatar_id) if generation.avatar_id else None,
+        "avatar_name": avatar.name if avatar else None,
+        "result_urls": list(generation.result_urls or []),
+        "aspect_ratio": generation.aspect_ratio,
+        "is_favorite": bool(generation.is_favorite),
+        # Колонка не объявлена в модели - читаем как в TelegramFileIdCache
+        "telegram_file_id": getattr(generation, "telegram_file_id", None),
+        "created_at": generation.created_at.timestamp() if generation.created_at else 0.0,
+    }
+
+
+def record_attributes(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Значения полей изображения из записи (UUID и datetime восстановлены)"""
+    return {
+        "id": UUID(record["id"]),
+        "user_id": UUID(record["user_id"]),
+        "avatar_id": UUID(record["avatar_id"]) if record["avatar_id"] else None,
+        "avatar_name": record["avatar_name"],
+        "result_urls": record["result_urls"],
+        "aspect_ratio": record["aspect_ratio"],
+        "is_favorite": record["is_favorite"],
+        "telegram_file_id": record.get("telegram_file_id"),
+        "created_at": datetime.fromtimestamp(record["created_at"]) if record["created_at"] else None,
+    }
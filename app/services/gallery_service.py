@@ -7,11 +7,12 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 
-from sqlalchemy import and_, or_, select
+from sqlalchemy import and_, func, or_, select, tuple_
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.models import ImageGeneration
+from app.database.models.generation import GenerationStatus
 from app.database.repositories import ImageGenerationRepository
 from app.services.cache_service import cache_service
 from app.core.logger import get_logger
@@ -19,6 +20,17 @@ from app.core.logger import get_logger
 logger = get_logger(__name__)
 
 
+def encode_gallery_cursor(created_at: datetime, image_id: UUID) -> str:
+    """Курсор страницы галереи: позиция последнего изображения в порядке (created_at, id)"""
+    return f"{created_at.isoformat()}|{image_id}"
+
+
+def decode_gallery_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Разбирает курсор, созданный encode_gallery_cursor"""
+    created_at, image_id = cursor.rsplit("|", 1)
+    return datetime.fromisoformat(created_at), UUID(image_id)
+
+
 class GalleryService:
     """
     Оптимизированный сервис галереи с многоуровневым кешированием
@@ -28,7 +40,7 @@ class GalleryService:
     2. Batch-запросы для устранения N+1 проблемы  
     3. Eagerly loading связанных аватаров
     4. Кеширование результатов фильтрации
-    5. Инкрементальная загрузка по страницам
+    5. Инкрементальная загрузка по страницам (keyset по created_at, id)
     """
     
     def __init__(self):
@@ -46,87 +58,180 @@ class GalleryService:
         filters: Optional[Dict] = None,
         page: int = 1,
         per_page: int = 20,
-        force_refresh: bool = False
+        force_refresh: bool = False,
+        cursor: Optional[str] = None
     ) -> Tuple[List[Dict], int, bool]:
         """
         Получить изображения пользователя с оптимизацией
         
+        Страницы выбираются по ключу (created_at, id), а не через OFFSET:
+        стоимость запроса не зависит от номера страницы. Для page > 1 без
+        cursor курсор берется из кеша предыдущей страницы.
+        
         Returns:
             Tuple[images_data, total_count, has_more]
         """
+        if cursor is None and page > 1:
+            page_cursor = await self._get_page_cursor(user_id, filters or {}, page, per_page)
+            if not page_cursor:
+                # Страница за пределами галереи
+                return [], await self.count_user_images(user_id, filters), False
+        else:
+            page_cursor = cursor
+        
+        images_data, total_count, next_cursor = await self.get_user_images_page(
+            user_id=user_id,
+            filters=filters,
+            cursor=page_cursor,
+            per_page=per_page,
+            force_refresh=force_refresh
+        )
+        
+        if cursor is None and next_cursor:
+            await self._set_page_cursor(user_id, filters or {}, page + 1, per_page, next_cursor)
+        
+        return images_data, total_count, next_cursor is not None
+    
+    async def get_user_images_page(
+        self,
+        user_id: UUID,
+        filters: Optional[Dict] = None,
+        cursor: Optional[str] = None,
+        per_page: int = 20,
+        force_refresh: bool = False
+    ) -> Tuple[List[Dict], int, Optional[str]]:
+        """
+        Получить страницу изображений по курсору (keyset pagination)
+        
+        Args:
+            user_id: ID пользователя
+            filters: Фильтры галереи
+            cursor: Курсор из предыдущей страницы (None - первая страница)
+            per_page: Размер страницы
+            force_refresh: Игнорировать кеш
+            
+        Returns:
+            Tuple[images_data, total_count, next_cursor]
+        """
         if not self.session:
             raise RuntimeError("Session not set. Call set_session() first.")
         
-        # ✅ 1. Генерируем ключ кеша на основе фильтров
-        filters_key = self._generate_filters_key(filters or {})
-        cache_key = f"gallery_optimized:{user_id}:{filters_key}:p{page}"
+        filters = filters or {}
+        
+        # ✅ 1. Генерируем ключ кеша на основе фильтров и курсора
+        filters_key = self._generate_filters_key(filters)
+        namespace = self._cache_namespace(user_id)
+        cache_key = f"{filters_key}:c{cursor or 'first'}:n{per_page}"
         
         # ✅ 2. Проверяем кеш сначала
         if not force_refresh:
-            cached_data = await cache_service.get(cache_key)
+            cached_data = await cache_service.get_namespaced(namespace, cache_key)
             if cached_data:
-                logger.debug(f"✅ Cache HIT для галереи пользователя {user_id} страница {page}")
+                logger.debug(f"✅ Cache HIT для галереи пользователя {user_id}")
                 return (
                     cached_data["images"], 
                     cached_data["total_count"], 
-                    cached_data["has_more"]
+                    cached_data["next_cursor"]
                 )
         
         logger.debug(f"🔄 Cache MISS для галереи пользователя {user_id}, загружаем из БД")
         
-        # ✅ 3. Строим оптимизированный запрос с JOIN'ами
+        conditions = [
+            ImageGeneration.user_id == user_id,
+            ImageGeneration.status == GenerationStatus.COMPLETED,
+            *self._build_filter_conditions(filters)
+        ]
+        
+        # ✅ 3. Общее количество - COUNT(*) на стороне БД (индекс user_id, status, created_at)
+        total_count = await self.count_user_images(user_id, filters)
+        
+        # ✅ 4. Keyset: следующая страница начинается строго после последней строки предыдущей
         query = (
             select(ImageGeneration)
             .options(selectinload(ImageGeneration.avatar))  # Eager loading аватаров
-            .where(ImageGeneration.user_id == user_id)
-            .where(ImageGeneration.status == "COMPLETED")
+            .where(*conditions)
         )
-        
-        # ✅ 4. Применяем фильтры
-        query = self._apply_filters_to_query(query, filters or {})
-        
-        # ✅ 5. Добавляем сортировку
-        query = query.order_by(ImageGeneration.created_at.desc())
-        
-        # ✅ 6. Выполняем ОДИН запрос для получения общего количества
-        count_query = select(ImageGeneration.id).where(
-            and_(
-                ImageGeneration.user_id == user_id,
-                ImageGeneration.status == "COMPLETED",
-                *self._build_filter_conditions(filters or {})
+        if cursor:
+            cursor_created_at, cursor_id = decode_gallery_cursor(cursor)
+            query = query.where(
+                tuple_(ImageGeneration.created_at, ImageGeneration.id) < tuple_(cursor_created_at, cursor_id)
             )
-        )
-        
-        total_count = len(await self.session.execute(count_query).all())
-        
-        # ✅ 7. Применяем пагинацию к основному запросу
-        offset = (page - 1) * per_page
-        query = query.offset(offset).limit(per_page + 1)  # +1 для проверки has_more
+        query = query.order_by(
+            ImageGeneration.created_at.desc(),
+            ImageGeneration.id.desc()
+        ).limit(per_page + 1)  # +1 для проверки has_more
         
-        # ✅ 8. Выполняем ОДИН запрос для получения данных
         result = await self.session.execute(query)
         images = result.scalars().all()
         
-        # ✅ 9. Определяем есть ли еще страницы
-        has_more = len(images) > per_page
-        if has_more:
+        # ✅ 5. Определяем есть ли еще страницы
+        next_cursor = None
+        if len(images) > per_page:
             images = images[:per_page]  # Убираем лишнее изображение
+            next_cursor = encode_gallery_cursor(images[-1].created_at, images[-1].id)
         
-        # ✅ 10. Сериализуем данные для кеша
+        # ✅ 6. Сериализуем данные для кеша
         images_data = [self._serialize_image_for_cache(img) for img in images]
         
-        # ✅ 11. Кешируем результат на 30 минут
+        # ✅ 7. Кешируем результат на 30 минут
         cache_data = {
             "images": images_data,
             "total_count": total_count,
-            "has_more": has_more,
+            "next_cursor": next_cursor,
             "cached_at": datetime.utcnow().isoformat()
         }
-        await cache_service.set(cache_key, cache_data, ttl=1800)
+        await cache_service.set_namespaced(namespace, cache_key, cache_data, ttl=1800)
         
         logger.info(f"✅ Загружено {len(images_data)} изображений для пользователя {user_id} за один запрос")
         
-        return images_data, total_count, has_more
+        return images_data, total_count, next_cursor
+    
+    async def count_user_images(self, user_id: UUID, filters: Optional[Dict] = None) -> int:
+        """Количество завершенных изображений пользователя с учетом фильтров"""
+        if not self.session:
+            raise RuntimeError("Session not set. Call set_session() first.")
+        
+        count_query = select(func.count()).select_from(ImageGeneration).where(
+            ImageGeneration.user_id == user_id,
+            ImageGeneration.status == GenerationStatus.COMPLETED,
+            *self._build_filter_conditions(filters or {})
+        )
+        return (await self.session.execute(count_query)).scalar_one()
+    
+    async def _get_page_cursor(self, user_id: UUID, filters: Dict, page: int, per_page: int) -> Optional[str]:
+        """Курсор начала страницы page (сохраняется при загрузке предыдущей)"""
+        if page <= 1:
+            return None
+        
+        cursor = await cache_service.get_namespaced(
+            self._cache_namespace(user_id), self._page_cursor_key(filters, page, per_page)
+        )
+        if cursor:
+            return cursor
+        
+        # Курсора нет (кеш истек) - доходим до страницы по цепочке курсоров
+        cursor = None
+        for current in range(1, page):
+            _, _, cursor = await self.get_user_images_page(user_id, filters, cursor=cursor, per_page=per_page)
+            if not cursor:
+                break
+            await self._set_page_cursor(user_id, filters, current + 1, per_page, cursor)
+        return cursor
+    
+    async def _set_page_cursor(self, user_id: UUID, filters: Dict, page: int, per_page: int, cursor: str):
+        """Сохраняет курсор начала страницы page"""
+        await cache_service.set_namespaced(
+            self._cache_namespace(user_id), self._page_cursor_key(filters, page, per_page), cursor, ttl=1800
+        )
+    
+    @staticmethod
+    def _cache_namespace(user_id: UUID) -> str:
+        """Пространство имен кеша галереи пользователя (страницы и курсоры)"""
+        return f"gallery_optimized:{user_id}"
+    
+    def _page_cursor_key(self, filters: Dict, page: int, per_page: int) -> str:
+        """Ключ кеша курсора страницы в пространстве галереи"""
+        return f"{self._generate_filters_key(filters)}:cursor:p{page}:n{per_page}"
     
     def _apply_filters_to_query(self, query, filters: Dict):
         """Применить фильтры к запросу"""
@@ -227,69 +332,48 @@ class GalleryService:
         if not self.session:
             raise RuntimeError("Session not set. Call set_session() first.")
         
-        cache_key = f"single_image:{image_id}"
-        
-        # ✅ Проверяем кеш
-        cached_image = await cache_service.get(cache_key)
-        if cached_image:
-            logger.debug(f"✅ Cache HIT для изображения {image_id}")
-            return cached_image
+        async def load_image() -> Optional[Dict]:
+            # ✅ Один запрос с JOIN'ом
+            query = (
+                select(ImageGeneration)
+                .options(selectinload(ImageGeneration.avatar))
+                .where(and_(
+                    ImageGeneration.id == image_id,
+                    ImageGeneration.user_id == user_id
+                ))
+            )
+            
+            result = await self.session.execute(query)
+            image = result.scalar_one_or_none()
+            return self._serialize_image_for_cache(image) if image else None
         
-        # ✅ Один запрос с JOIN'ом
-        query = (
-            select(ImageGeneration)
-            .options(selectinload(ImageGeneration.avatar))
-            .where(and_(
-                ImageGeneration.id == image_id,
-                ImageGeneration.user_id == user_id
-            ))
+        # ✅ Кеш с защитой от одновременных промахов; ключ включает владельца
+        return await cache_service.get_or_set(
+            f"single_image:{user_id}:{image_id}", load_image, ttl=3600
         )
-        
-        result = await self.session.execute(query)
-        image = result.scalar_one_or_none()
-        
-        if not image:
-            return None
-        
-        # ✅ Сериализуем и кешируем
-        image_data = self._serialize_image_for_cache(image)
-        await cache_service.set(cache_key, image_data, ttl=3600)
-        
-        return image_data
     
     async def invalidate_user_gallery_cache(self, user_id: UUID):
-        """Инвалидировать кеш галереи пользователя"""
+        """Инвалидировать кеш галереи пользователя (новая версия пространства имен)"""
         try:
-            redis = await cache_service._get_redis()
-            if redis:
-                # Удаляем все ключи галереи пользователя
-                pattern = f"gallery_optimized:{user_id}:*"
-                keys = await redis.keys(pattern)
-                if keys:
-                    await redis.delete(*keys)
-                    logger.info(f"🗑️ Очищен кеш галереи для пользователя {user_id}: {len(keys)} ключей")
-            
-            # Очищаем также memory fallback
-            keys_to_remove = [k for k in cache_service.memory_fallback.keys() 
-                             if k.startswith(f"gallery_optimized:{user_id}:")]
-            for key in keys_to_remove:
-                cache_service.memory_fallback.pop(key, None)
-                
+            version = await cache_service.invalidate_namespace(self._cache_namespace(user_id))
+            logger.info(f"🗑️ Очищен кеш галереи для пользователя {user_id}: версия {version}")
         except Exception as e:
             logger.warning(f"Ошибка очистки кеша галереи: {e}")
     
     async def preload_gallery_cache(self, user_id: UUID, filters: Optional[Dict] = None):
         """Предзагрузить кеш галереи для быстрого доступа"""
         try:
-            # Загружаем первые 3 страницы в кеш
+            # Загружаем первые 3 страницы в кеш по цепочке курсоров
             for page in range(1, 4):
-                await self.get_user_images_optimized(
+                _, _, has_more = await self.get_user_images_optimized(
                     user_id=user_id,
                     filters=filters,
                     page=page,
                     per_page=20,
                     force_refresh=False
                 )
+                if not has_more:
+                    break
             logger.info(f"🚀 Предзагружен кеш галереи для пользователя {user_id}")
         except Exception as e:
             logger.warning(f"Ошибка предзагрузки кеша галереи: {e}")
@@ -297,23 +381,13 @@ class GalleryService:
     async def get_cache_stats(self, user_id: UUID) -> Dict:
         """Получить статистику кеша для отладки"""
         try:
+            namespace = self._cache_namespace(user_id)
             redis = await cache_service._get_redis()
-            if redis:
-                pattern = f"gallery_optimized:{user_id}:*"
-                keys = await redis.keys(pattern)
-                return {
-                    "cached_pages": len(keys),
-                    "redis_available": True,
-                    "sample_keys": keys[:5] if keys else []
-                }
-            else:
-                memory_keys = [k for k in cache_service.memory_fallback.keys() 
-                              if k.startswith(f"gallery_optimized:{user_id}:")]
-                return {
-                    "cached_pages": len(memory_keys),
-                    "redis_available": False,
-                    "sample_keys": memory_keys[:5]
-                }
+            return {
+                "namespace": namespace,
+                "version": await cache_service._namespace_version(namespace),
+                "redis_available": bool(redis),
+            }
         except Exception as e:
             return {"error": str(e), "redis_available": False}
 
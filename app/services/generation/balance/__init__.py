@@ -2,5 +2,6 @@
 Модуль управления балансом при генерации
 """
 from .balance_manager import BalanceManager
+from .refund_batcher import RefundBatcher, get_refund_batcher
 
-__all__ = ["BalanceManager"] 
\ No newline at end of file
+__all__ = ["BalanceManager", "RefundBatcher", "get_refund_batcher"] 
\ No newline at end of file
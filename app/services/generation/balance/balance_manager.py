@@ -2,10 +2,12 @@
 Менеджер баланса для генерации изображений
 Проверка и списание средств пользователя
 """
+from typing import Optional
 from uuid import UUID
 
 from app.core.config import settings
 from app.core.logger import get_logger
+from .refund_batcher import get_refund_batcher
 
 logger = get_logger(__name__)
 
@@ -33,13 +35,22 @@ class BalanceManager:
         """
         return settings.IMAGE_GENERATION_COST * num_images
     
-    async def check_and_charge_balance(self, user_id: UUID, cost: float) -> float:
+    async def check_and_charge_balance(
+        self,
+        user_id: UUID,
+        cost: float,
+        idempotency_key: Optional[str] = None,
+    ) -> float:
         """
         Проверяет баланс и списывает средства
         
+        Проверка и списание - один условный UPDATE, без предварительного
+        чтения баланса: параллельные генерации не могут списать дважды.
+        
         Args:
             user_id: ID пользователя
             cost: Стоимость операции
+            idempotency_key: Ключ операции - повтор не списывает второй раз
             
         Returns:
             float: Остаток баланса после списания
@@ -48,33 +59,36 @@ class BalanceManager:
             ValueError: Если недостаточно средств
         """
         async with self._get_user_service() as user_service:
-            user_balance = await user_service.get_user_balance(user_id)
-            if user_balance < cost:
-                raise ValueError(
-                    f"Недостаточно баланса. Требуется: {cost}, доступно: {user_balance}"
-                )
-            
-            # Списываем баланс
-            remaining_balance = await user_service.remove_coins(user_id, cost)
-            if remaining_balance is None:
-                raise ValueError("Ошибка списания баланса")
-            
-            logger.info(f"Списано {cost} монет баланса. Остаток: {remaining_balance}")
-            return remaining_balance
+            result = await user_service.charge(
+                user_id, cost, kind="generation", description="Генерация изображений", idempotency_key=idempotency_key
+            )
+        
+        if not result.applied and not result.duplicate:
+            raise ValueError(
+                f"Недостаточно баланса. Требуется: {cost}, доступно: {result.balance or 0.0}"
+            )
+        
+        logger.info(f"Списано {cost} монет баланса. Остаток: {result.balance}")
+        return result.balance
     
-    async def refund_balance(self, user_id: UUID, cost: float):
+    async def refund_balance(self, user_id: UUID, cost: float, idempotency_key: Optional[str] = None):
         """
         Возвращает баланс при ошибке
         
+        Возвраты процесса собираются в пакеты (RefundBatcher); с ключом
+        повторный возврат той же операции не зачисляется.
+        
         Args:
             user_id: ID пользователя
             cost: Сумма к возврату
+            idempotency_key: Ключ возврата
         """
         try:
-            async with self._get_user_service() as user_service:
-                await user_service.add_coins(user_id, cost)
+            await get_refund_batcher().refund(
+                user_id, cost, idempotency_key=idempotency_key, description="Возврат за генерацию"
+            )
             
             logger.info(f"Возвращено {cost} монет баланса пользователю {user_id}")
             
         except Exception as e:
-            logger.exception(f"Ошибка возврата баланса: {e}") 
\ No newline at end of file
+            logger.exception(f"Ошибка возврата баланса: {e}")
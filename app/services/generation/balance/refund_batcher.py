@@ -0,0 +1,137 @@
+"""
+Пакетный возврат средств за неудачные генерации
+
+Когда FAL AI падает, ошибки приходят пачкой - каждая генерация делала
+бы свою транзакцию возврата. Батчер собирает возвраты за короткое окно
+и зачисляет их одной транзакцией (UserService.credit_many).
+
+У каждого возврата в пакете есть ключ идемпотентности (без ключа от
+вызывающего - случайный), поэтому неудачный пакет можно безопасно
+записать повторно: уже зачисленные операции не зачислятся второй раз.
+"""
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Sequence, Set, Tuple
+from uuid import UUID, uuid4
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.database.repositories.ledger import LedgerBatchResult, LedgerEntry
+
+logger = get_logger(__name__)
+
+FlushFunc = Callable[[Sequence[LedgerEntry]], Awaitable[LedgerBatchResult]]
+
+
+async def _credit_many(entries: Sequence[LedgerEntry]) -> LedgerBatchResult:
+    from app.core.di import get_user_service
+    async with get_user_service() as user_service:
+        return await user_service.credit_many(entries)
+
+
+class RefundBatcher:
+    """
+    Собирает возвраты в пакеты
+
+    refund() ждет, пока пакет будет записан, и возвращает новый баланс
+    пользователя (None, если зачислять было нечего - возврат с этим ключом
+    уже был).
+    """
+
+    def __init__(
+        self,
+        window_ms: Optional[int] = None,
+        max_batch: Optional[int] = None,
+        flush_func: Optional[FlushFunc] = None,
+        retries: Optional[int] = None,
+        retry_delay: float = 0.5,
+    ):
+        self.window = (settings.BALANCE_REFUND_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_batch = max_batch or settings.BALANCE_REFUND_BATCH_SIZE
+        self._flush_func = flush_func or _credit_many
+        self.retries = settings.BALANCE_REFUND_RETRIES if retries is None else retries
+        self.retry_delay = retry_delay
+        self._pending: List[Tuple[LedgerEntry, asyncio.Future]] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._flushing: Set[asyncio.Task] = set()
+
+    async def refund(
+        self,
+        user_id: UUID,
+        amount: float,
+        idempotency_key: Optional[str] = None,
+        description: Optional[str] = None,
+    ) -> Optional[float]:
+        """Ставит возврат в пакет и ждет его записи"""
+        future = asyncio.get_running_loop().create_future()
+        idempotency_key = idempotency_key or f"refund:{uuid4()}"
+        self._pending.append((LedgerEntry(user_id, amount, "refund", description, idempotency_key), future))
+
+        if len(self._pending) >= self.max_batch:
+            self._start_flush(delay=0)
+        elif self._timer is None:
+            self._start_flush(delay=self.window)
+
+        return await future
+
+    def _start_flush(self, delay: float) -> None:
+        if delay > 0:
+            self._timer = asyncio.create_task(self._flush_later(delay))
+            return
+
+        # Пакет заполнен - пишем сразу, следующие возвраты соберет новый таймер
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        task = asyncio.create_task(self._flush(batch))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _flush_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        batch, self._pending = self._pending, []
+        self._timer = None
+        await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[LedgerEntry, asyncio.Future]]) -> None:
+        if not batch:
+            return
+        entries = [entry for entry, _ in batch]
+        for attempt in range(self.retries + 1):
+            try:
+                result = await self._flush_func(entries)
+                break
+            except Exception as e:
+                if attempt < self.retries:
+                    logger.warning(
+                        f"Ошибка пакетного возврата ({len(entries)} операций), "
+                        f"попытка {attempt + 1}/{self.retries + 1}: {e}"
+                    )
+                    await asyncio.sleep(self.retry_delay * 2 ** attempt)
+                    continue
+                logger.exception(f"Ошибка пакетного возврата ({len(entries)} операций): {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+        logger.info(
+            f"Пакетный возврат: {len(result.applied_keys)}/{len(entries)} операций, "
+            f"{len(result.balances)} пользователей"
+        )
+        for entry, future in batch:
+            if not future.done():
+                # Повтор по ключу ничего не зачислил - баланс пользователя он не сообщает
+                applied = entry.idempotency_key in result.applied_keys
+                future.set_result(result.balances.get(entry.user_id) if applied else None)
+
+
+_refund_batcher: Optional[RefundBatcher] = None
+
+
+def get_refund_batcher() -> RefundBatcher:
+    """Получает батчер возвратов процесса"""
+    global _refund_batcher
+    if _refund_batcher is None:
+        _refund_batcher = RefundBatcher()
+    return _refund_batcher
@@ -4,12 +4,11 @@
 """
 import re
 import random
-import aiohttp
 from typing import Optional, Dict, Any, List
 
 from app.core.config import settings
 from app.core.logger import get_logger
-from app.shared.utils.openai import get_openai_headers
+from app.services.generation.prompt.translation.cache import get_translation_cache
 
 logger = get_logger(__name__)
 
@@ -376,32 +375,13 @@ EXAMPLES:
 
 RESPONSE: only translated prompt without explanations."""
 
-        try:
-            url = "https://api.openai.com/v1/chat/completions"
-            headers = get_openai_headers(self.openai_api_key)
-            data = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": russian_text}
-                ],
-                "temperature": 0.1,
-                "max_tokens": 300
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=data) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        translated = result["choices"][0]["message"]["content"].strip()
-                        return translated
-                    else:
-                        logger.error(f"[Translation] GPT API error: {response.status}")
-                        return self._simple_translate(russian_text)
-        
-        except Exception as e:
-            logger.error(f"[Translation] Ошибка: {e}")
+        # Одинаковые промпты (шаблоны, повторы генераций) переводятся один раз
+        translated = await get_translation_cache().translate(
+            self.model, system_prompt, russian_text, self.openai_api_key, max_tokens=300
+        )
+        if translated is None:
             return self._simple_translate(russian_text)
+        return translated
     
     def _simple_translate(self, text: str) -> str:
         """Простой словарный перевод"""
@@ -3,5 +3,6 @@
 """
 from .generation_manager import GenerationManager
 from .generation_processor import GenerationProcessor
+from .generation_events import GenerationEventBus, get_generation_event_bus
 
-__all__ = ["GenerationManager", "GenerationProcessor"]
\ No newline at end of file
+__all__ = ["GenerationManager", "GenerationProcessor", "GenerationEventBus", "get_generation_event_bus"]
\ No newline at end of file
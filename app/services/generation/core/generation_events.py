@@ -0,0 +1,180 @@
+"""
+Шина событий статуса генераций через Redis pub/sub
+"""
+import asyncio
+import json
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from app.core.logger import get_logger
+from app.core.resources import QueueNames
+
+logger = get_logger(__name__)
+
+# Статусы, после которых генерация больше не меняется
+FINAL_STATUSES = frozenset({"completed", "failed", "cancelled"})
+
+
+def _status_value(status) -> str:
+    """GenerationStatus или строка -> строковое значение в нижнем регистре"""
+    return str(getattr(status, "value", status)).lower()
+
+
+class GenerationEventBus:
+    """
+    Уведомления о смене статуса генерации
+
+    - GenerationProcessor публикует событие при каждой смене статуса
+    - Мониторы ждут событие вместо опроса БД
+    - На процесс одна подписка Redis: события раздаются локальным
+      ожидающим по generation_id, число подключений не растет с числом пользователей
+    - Публикация в том же процессе будит ожидающих сразу, без Redis
+    """
+
+    def __init__(self, channel: str = QueueNames.GENERATION_EVENTS):
+        self.channel = channel
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._subscribed: Optional[asyncio.Event] = None
+
+    async def publish(self, generation_id: UUID, status) -> None:
+        """
+        Публикует смену статуса генерации
+
+        Args:
+            generation_id: ID генерации
+            status: Новый статус (GenerationStatus или строка)
+        """
+        status = _status_value(status)
+        self._resolve(str(generation_id), status)
+
+        try:
+            from app.core.di import get_redis
+            redis = await get_redis()
+            await redis.publish(
+                self.channel,
+                json.dumps({"generation_id": str(generation_id), "status": status})
+            )
+        except Exception as e:
+            # Ожидающие в других процессах дождутся таймаута и проверят БД
+            logger.warning(f"[Generation Events] Не удалось опубликовать событие {generation_id}: {e}")
+
+    async def subscribe(self, generation_id: UUID) -> asyncio.Future:
+        """
+        Регистрирует ожидание финального статуса
+
+        После подписки вызывающий один раз проверяет БД: событие могло
+        быть опубликовано до начала ожидания.
+
+        Returns:
+            asyncio.Future: Завершится строкой финального статуса
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(str(generation_id), []).append(future)
+        await self._ensure_listener()
+        return future
+
+    def unsubscribe(self, generation_id: UUID, future: asyncio.Future) -> None:
+        """Снимает ожидание"""
+        key = str(generation_id)
+        waiters = self._waiters.get(key)
+        if not waiters:
+            return
+        if future in waiters:
+            waiters.remove(future)
+        if not waiters:
+            self._waiters.pop(key, None)
+        if not future.done():
+            future.cancel()
+
+    def _resolve(self, generation_id: str, status: str) -> None:
+        """Будит ожидающих генерацию, если статус финальный"""
+        if status not in FINAL_STATUSES:
+            return
+        for future in self._waiters.pop(generation_id, []):
+            if not future.done():
+                future.set_result(status)
+
+    async def _ensure_listener(self) -> None:
+        """Запускает фоновую подписку и ждет ее готовности (не дольше секунды)"""
+        if self._listener is None or self._listener.done():
+            self._subscribed = asyncio.Event()
+            self._listener = asyncio.create_task(self._listen())
+
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            # Redis недоступен - ожидание закончится таймаутом и проверкой БД
+            logger.debug("[Generation Events] Подписка еще не готова")
+
+    async def _listen(self) -> None:
+        """Читает канал событий и раздает их локальным ожидающим"""
+        from app.core.di import get_redis
+
+        backoff = 1.0
+        while True:
+            pubsub = None
+            try:
+                redis = await get_redis()
+                pubsub = redis.pubsub()
+                await pubsub.subscribe(self.channel)
+                self._subscribed.set()
+                backoff = 1.0
+                logger.info(f"[Generation Events] Подписка на {self.channel}")
+
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        if not self._waiters:
+                            # Никто не ждет - отпускаем подключение.
+                            # Сбрасываем ссылку до первого await, чтобы новый
+                            # подписчик запустил свою подписку, а не ждал эту
+                            self._listener = None
+                            return
+                        continue
+
+                    try:
+                        event = json.loads(message["data"])
+                        self._resolve(event["generation_id"], event["status"])
+                    except (ValueError, KeyError, TypeError) as e:
+                        logger.debug(f"[Generation Events] Некорректное событие: {e}")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._subscribed.clear()
+                logger.warning(f"[Generation Events] Ошибка подписки, повтор через {backoff:.0f}с: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    async def close(self) -> None:
+        """Останавливает подписку"""
+        if self._listener and not self._listener.done():
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        self._listener = None
+
+
+_event_bus: Optional[GenerationEventBus] = None
+
+
+def get_generation_event_bus() -> GenerationEventBus:
+    """Получить шину событий генераций процесса (Singleton)"""
+    global _event_bus
+    if _event_bus is None:
+        _event_bus = GenerationEventBus()
+    return _event_bus
+
+
+async def shutdown_generation_event_bus() -> None:
+    """Останавливает шину событий, если она была создана"""
+    global _event_bus
+    if _event_bus is not None:
+        await _event_bus.close()
+        _event_bus = None
@@ -2,14 +2,18 @@
 Модуль обработки процесса генерации изображений
 """
 import asyncio
-from typing import List
+from typing import List, Set
 from uuid import UUID
 
+from app.core.config import settings
+from app.core.job_queue import PermanentJobError
 from app.core.logger import get_logger
+from app.core.resources import QueueNames
 from app.database.models.generation import ImageGeneration, GenerationStatus
 from app.services.fal.generation_service import FALGenerationService
 from app.services.generation.balance.balance_manager import BalanceManager
 from app.services.generation.config.generation_config import GenerationConfig
+from app.services.generation.core.generation_events import get_generation_event_bus
 from app.services.generation.storage.image_storage import ImageStorage
 
 logger = get_logger(__name__)
@@ -18,6 +22,9 @@ logger = get_logger(__name__)
 class GenerationProcessor:
     """Обработчик процесса генерации"""
     
+    # Ссылки на фоновые задачи, чтобы их не собрал сборщик мусора
+    _background_tasks: Set[asyncio.Task] = set()
+    
     def __init__(self):
         self.fal_service = FALGenerationService()
         self.balance_manager = BalanceManager()
@@ -28,18 +35,68 @@ class GenerationProcessor:
         """
         Запускает процесс генерации асинхронно
         
+        При JOB_QUEUE_ENABLED генерация ставится в очередь задач и
+        выполняется воркером (BOT_MODE=worker) - переживает перезапуск бота.
+        Иначе (или если Redis недоступен) - фоновой задачей этого процесса.
+        Одновременные генерации ограничиваются планировщиком FAL AI.
+        
         Args:
             generation: Объект генерации
         """
-        asyncio.create_task(self._process_generation(generation))
+        if settings.JOB_QUEUE_ENABLED:
+            from app.core.job_queue import get_job_queue
+            from app.workers.jobs import GENERATION_JOB
+            try:
+                await get_job_queue().enqueue(
+                    QueueNames.AVATAR_GENERATION,
+                    GENERATION_JOB,
+                    {"generation_id": str(generation.id)},
+                    job_id=f"generation:{generation.id}",
+                )
+                logger.info(f"Генерация {generation.id} пользователя {generation.user_id} поставлена в очередь")
+                return
+            except Exception as e:
+                logger.warning(f"Не удалось поставить генерацию {generation.id} в очередь, запуск в процессе: {e}")
+        
+        task = asyncio.create_task(self._process_generation(generation))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
         logger.info(f"Запущена генерация {generation.id} для пользователя {generation.user_id}")
     
-    async def _process_generation(self, generation: ImageGeneration):
+    async def run_generation(self, generation_id: UUID, final_attempt: bool = True):
+        """
+        Выполняет генерацию из очереди задач
+        
+        Доставка задач at-least-once: завершенная или уже упавшая
+        генерация повторно не запускается. Ошибка попытки, после которой
+        очередь еще повторит задачу, пробрасывается воркеру; генерация
+        помечается FAILED (с возвратом баланса) только на последней попытке
+        или при ошибке, которую повтор не исправит.
+        
+        Args:
+            generation_id: ID генерации
+            final_attempt: Последняя попытка задачи (повтора не будет)
+        """
+        from app.services.generation.core.generation_manager import GenerationManager
+        generation = await GenerationManager().get_generation_by_id(generation_id)
+        
+        if generation is None:
+            logger.warning(f"[Generation Process] Генерация {generation_id} не найдена, задача пропущена")
+            return
+        if generation.status in (GenerationStatus.COMPLETED, GenerationStatus.FAILED):
+            logger.info(f"[Generation Process] Генерация {generation_id} уже в статусе {generation.status}, пропуск")
+            return
+        
+        await self._process_generation(generation, retry_errors=not final_attempt)
+    
+    async def _process_generation(self, generation: ImageGeneration, retry_errors: bool = False):
         """
         Обрабатывает генерацию изображения
         
         Args:
             generation: Объект генерации
+            retry_errors: Пробрасывать ошибки для повтора задачи вместо
+                перевода генерации в FAILED
         """
         try:
             logger.info(f"[Generation Process] Начинаем обработку генерации {generation.id}")
@@ -61,7 +118,7 @@ class GenerationProcessor:
             avatar = await manager.get_avatar(generation.avatar_id, generation.user_id)
             
             if not avatar:
-                raise Exception(f"Аватар {generation.avatar_id} не найден")
+                raise PermanentJobError(f"Аватар {generation.avatar_id} не найден")
             
             # Запускаем генерацию через FAL AI
             logger.info(f"[Generation Process] Отправляем запрос в FAL AI: {generation.final_prompt[:100]}...")
@@ -95,6 +152,11 @@ class GenerationProcessor:
             await self._notify_user(generation)
             
         except Exception as e:
+            if retry_errors and not isinstance(e, PermanentJobError):
+                # Баланс не возвращаем: генерацию выполнит следующая попытка
+                logger.warning(f"[Generation Process] Попытка генерации {generation.id} не удалась, будет повтор: {e}")
+                raise
+            
             logger.exception(f"[Generation Process] ❌ Ошибка генерации {generation.id}: {e}")
             
             # Обновляем статус на ошибку
@@ -110,7 +172,7 @@ class GenerationProcessor:
     
     async def _update_generation(self, generation: ImageGeneration):
         """
-        Обновляет генерацию в БД
+        Обновляет генерацию в БД и публикует смену статуса
         
         Args:
             generation: Объект генерации
@@ -118,6 +180,14 @@ class GenerationProcessor:
         from app.services.generation.core.generation_manager import GenerationManager
         manager = GenerationManager()
         await manager.update_generation(generation)
+        
+        # Мониторы ждут это событие вместо опроса БД
+        await get_generation_event_bus().publish(generation.id, generation.status)
+        
+        if generation.status == GenerationStatus.COMPLETED:
+            # Новое изображение - галерея пользователя перечитается из БД
+            from app.services.gallery_service import gallery_service
+            await gallery_service.invalidate_user_gallery_cache(generation.user_id)
     
     async def _refund_generation(self, generation: ImageGeneration):
         """
@@ -128,7 +198,10 @@ class GenerationProcessor:
         """
         try:
             cost = self.balance_manager.calculate_cost(generation.num_images)
-            await self.balance_manager.refund_balance(generation.user_id, cost)
+            # Ключ по генерации: повторная обработка той же ошибки не вернет средства дважды
+            await self.balance_manager.refund_balance(
+                generation.user_id, cost, idempotency_key=f"refund:generation:{generation.id}"
+            )
             logger.info(f"Возвращен баланс {cost} за неудачную генерацию {generation.id}")
         except Exception as e:
             logger.exception(f"Ошибка возврата баланса для генерации {generation.id}: {e}")
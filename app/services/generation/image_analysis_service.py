@@ -5,13 +5,13 @@
 import aiohttp
 import base64
 from typing import Optional, Dict, Any
-import io
-from PIL import Image
 
 from app.core.config import settings
 from app.core.logger import get_logger
+from app.services.images.worker_pool import get_image_worker_pool
 from app.shared.utils.openai import get_openai_headers
 from .cinematic_prompt_service import CinematicPromptService
+from .vision_cache import VisionAnalysisCache, get_vision_cache
 
 logger = get_logger(__name__)
 
@@ -24,20 +24,56 @@ class ImageAnalysisService:
         self.model = "gpt-4o"  # GPT-4 с Vision
         self.max_image_size = 2048  # Максимальный размер изображения для API
         self.cinematic_service = CinematicPromptService()
+        self.vision_cache = get_vision_cache()
+    
+    def _cache_variant(self, avatar_type: str, user_prompt: Optional[str]) -> str:
+        """Вариант анализа для кеша: модель, инструкция Vision и тип аватара"""
+        system_prompt = self._create_cinematic_analysis_prompt(avatar_type, user_prompt)
+        return VisionAnalysisCache.variant(self.model, system_prompt, avatar_type)
+    
+    async def get_cached_analysis(
+        self,
+        file_unique_id: str,
+        avatar_type: str = "portrait",
+        user_prompt: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Сохраненный анализ ранее присланного файла Telegram
+        
+        Проверяется до скачивания файла.
+        
+        Args:
+            file_unique_id: file_unique_id фото или документа
+            avatar_type: Тип аватара
+            user_prompt: Дополнительный промпт пользователя
+            
+        Returns:
+            Результат analyze_image_for_prompt или None
+        """
+        result = await self.vision_cache.get_by_file_id(self._cache_variant(avatar_type, user_prompt), file_unique_id)
+        if result:
+            logger.info(f"[Image Analysis] Анализ файла {file_unique_id} взят из кеша")
+        return result
     
     async def analyze_image_for_prompt(
         self, 
         image_data: bytes, 
         avatar_type: str = "portrait",
-        user_prompt: Optional[str] = None
+        user_prompt: Optional[str] = None,
+        file_unique_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Анализирует изображение и создает кинематографический промпт
         
+        Результат Vision кешируется по перцептивному хешу изображения и
+        file_unique_id: копия уже проанализированного изображения
+        возвращается без вызова API.
+        
         Args:
             image_data: Данные изображения
             avatar_type: Тип аватара ("portrait")
             user_prompt: Дополнительный промпт от пользователя для интеграции
+            file_unique_id: file_unique_id Telegram (для кеша)
             
         Returns:
             Dict с анализом и готовым промптом
@@ -49,6 +85,19 @@ class ImageAnalysisService:
                 logger.warning("[Image Analysis] Нет API ключа OpenAI, используем базовый промпт")
                 return await self._fallback_analysis(user_prompt, avatar_type)
             
+            # Создаем системный промпт для анализа
+            system_prompt = self._create_cinematic_analysis_prompt(avatar_type, user_prompt)
+            variant = VisionAnalysisCache.variant(self.model, system_prompt, avatar_type)
+            
+            # 0. Копия уже проанализированного изображения
+            image_hash = await self._image_hash(image_data)
+            if image_hash is not None:
+                cached = await self.vision_cache.get_by_hash(variant, image_hash)
+                if cached:
+                    logger.info("[Image Analysis] Анализ взят из кеша по перцептивному хешу")
+                    await self.vision_cache.store(variant, image_hash, cached, file_unique_id)
+                    return cached
+            
             # 1. Подготавливаем изображение
             processed_image = await self._prepare_image(image_data)
             if not processed_image:
@@ -57,17 +106,14 @@ class ImageAnalysisService:
             # 2. Кодируем в base64
             image_base64 = base64.b64encode(processed_image).decode('utf-8')
             
-            # 3. Создаем системный промпт для анализа
-            system_prompt = self._create_cinematic_analysis_prompt(avatar_type, user_prompt)
-            
-            # 4. Анализируем изображение через GPT Vision
+            # 3. Анализируем изображение через GPT Vision
             analysis_result = await self._call_vision_api(system_prompt, image_base64, user_prompt)
             
             if not analysis_result or not analysis_result.get("prompt"):
                 logger.warning("[Image Analysis] Нет результата от Vision API, используем fallback")
                 return await self._fallback_analysis(user_prompt, avatar_type)
             
-            # 5. Создаем кинематографический промпт на базе анализа
+            # 4. Создаем кинематографический промпт на базе анализа
             base_description = analysis_result.get("analysis", "")
             vision_prompt = analysis_result.get("prompt", "")
             
@@ -80,7 +126,7 @@ class ImageAnalysisService:
             else:
                 integrated_prompt = vision_prompt
             
-            # 6. Применяем кинематографические улучшения с environment_text
+            # 5. Применяем кинематографические улучшения с environment_text
             cinematic_result = await self.cinematic_service.create_cinematic_prompt(
                 user_prompt=integrated_prompt,
                 avatar_type=avatar_type,
@@ -95,7 +141,7 @@ class ImageAnalysisService:
             enhancer = PromptEnhancer()
             negative_prompt = enhancer.get_negative_prompt(avatar_type)
             
-            return {
+            result = {
                 "analysis": base_description,
                 "prompt": cinematic_result["processed"],
                 "negative_prompt": negative_prompt,
@@ -104,11 +150,25 @@ class ImageAnalysisService:
                 "user_prompt_integrated": bool(user_prompt),
                 "style": "cinematic_photorealistic"
             }
+            
+            # Кешируется только ответ Vision, не fallback
+            if image_hash is not None:
+                await self.vision_cache.store(variant, image_hash, result, file_unique_id)
+            
+            return result
                 
         except Exception as e:
             logger.exception(f"[Image Analysis] Ошибка анализа: {e}")
             return await self._fallback_analysis(user_prompt, avatar_type)
     
+    async def _image_hash(self, image_data: bytes) -> Optional[int]:
+        """Перцептивный хеш изображения (None, если изображение не читается)"""
+        try:
+            return await get_image_worker_pool().dhash(image_data)
+        except Exception as e:
+            logger.warning(f"[Image Analysis] Не удалось вычислить хеш изображения: {e}")
+            return None
+    
     def _create_cinematic_analysis_prompt(self, avatar_type: str, user_prompt: str = None) -> str:
         """Создает системный промпт для кинематографического анализа"""
         
@@ -191,26 +251,12 @@ EXAMPLE PROMPT STYLE:
 Create prompt EXACTLY in this style with maximum detail!"""
     
     async def _prepare_image(self, image_data: bytes) -> Optional[bytes]:
-        """Подготавливает изображение для анализа"""
+        """Подготавливает изображение для анализа (JPEG RGB не больше max_image_size)"""
         try:
-            # Открываем изображение
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Конвертируем в RGB если нужно
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Изменяем размер если нужно
-            if max(image.size) > self.max_image_size:
-                ratio = self.max_image_size / max(image.size)
-                new_size = tuple(int(dim * ratio) for dim in image.size)
-                image = image.resize(new_size, Image.Resampling.LANCZOS)
-                logger.info(f"[Image Analysis] Изображение изменено до {new_size}")
-            
-            # Сохраняем в байты
-            output = io.BytesIO()
-            image.save(output, format='JPEG', quality=85)
-            return output.getvalue()
+            # Декодирование, ресайз и кодирование - в пуле image-воркеров
+            return await get_image_worker_pool().reencode(
+                image_data, fmt='JPEG', quality=85, max_side=self.max_image_size
+            )
             
         except Exception as e:
             logger.error(f"[Image Analysis] Ошибка подготовки изображения: {e}")
@@ -252,52 +298,55 @@ Combine EXACT photo composition with REQUEST content. Response in JSON format.""
                 "max_tokens": 1000
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=data, timeout=30) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        content = result["choices"][0]["message"]["content"]
+            from app.core.di import get_http_client
+            async with get_http_client().request(
+                "openai", "POST", url, endpoint="openai/chat/completions:vision",
+                headers=headers, json=data, timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    content = result["choices"][0]["message"]["content"]
+                    
+                    # Парсим JSON ответ
+                    try:
+                        import json
+                        parsed_result = json.loads(content)
+                        return parsed_result
+                    except json.JSONDecodeError:
+                        # Если не JSON, пытаемся извлечь JSON из markdown блока
+                        logger.warning("[Vision API] Ответ не в JSON, извлекаем из markdown")
                         
-                        # Парсим JSON ответ
-                        try:
-                            import json
-                            parsed_result = json.loads(content)
-                            return parsed_result
-                        except json.JSONDecodeError:
-                            # Если не JSON, пытаемся извлечь JSON из markdown блока
-                            logger.warning("[Vision API] Ответ не в JSON, извлекаем из markdown")
-                            
-                            # Пробуем извлечь JSON из markdown блока ```json...```
-                            import re
-                            json_match = re.search(r'```json\s*\n(.*?)\n```', content, re.DOTALL)
-                            if json_match:
-                                try:
-                                    json_content = json_match.group(1)
-                                    parsed_result = json.loads(json_content)
-                                    logger.info(f"[Vision API] JSON успешно извлечен из markdown блока")
-                                    return parsed_result
-                                except json.JSONDecodeError:
-                                    logger.warning("[Vision API] Не удалось парсить JSON из markdown")
-                            
-                            # Если и это не работает, пытаемся извлечь промпт из текста
-                            # Ищем строку с "prompt": "..."
-                            prompt_match = re.search(r'"prompt":\s*"([^"]+)"', content)
-                            if prompt_match:
-                                extracted_prompt = prompt_match.group(1)
-                                return {
-                                    "analysis": "Анализ изображения выполнен",
-                                    "prompt": extracted_prompt
-                                }
-                            
-                            # Последняя попытка - используем весь контент как промпт
+                        # Пробуем извлечь JSON из markdown блока ```json...```
+                        import re
+                        json_match = re.search(r'```json\s*\n(.*?)\n```', content, re.DOTALL)
+                        if json_match:
+                            try:
+                                json_content = json_match.group(1)
+                                parsed_result = json.loads(json_content)
+                                logger.info(f"[Vision API] JSON успешно извлечен из markdown блока")
+                                return parsed_result
+                            except json.JSONDecodeError:
+                                logger.warning("[Vision API] Не удалось парсить JSON из markdown")
+                        
+                        # Если и это не работает, пытаемся извлечь промпт из текста
+                        # Ищем строку с "prompt": "..."
+                        prompt_match = re.search(r'"prompt":\s*"([^"]+)"', content)
+                        if prompt_match:
+                            extracted_prompt = prompt_match.group(1)
                             return {
-                                "analysis": "Анализ изображения выполнен", 
-                                "prompt": content.strip()
+                                "analysis": "Анализ изображения выполнен",
+                                "prompt": extracted_prompt
                             }
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"[Vision API] Ошибка {response.status}: {error_text}")
-                        return {}
+                        
+                        # Последняя попытка - используем весь контент как промпт
+                        return {
+                            "analysis": "Анализ изображения выполнен", 
+                            "prompt": content.strip()
+                        }
+                else:
+                    error_text = await response.text()
+                    logger.error(f"[Vision API] Ошибка {response.status}: {error_text}")
+                    return {}
                         
         except Exception as e:
             logger.error(f"[Vision API] Ошибка вызова API: {e}")
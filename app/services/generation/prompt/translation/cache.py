@@ -0,0 +1,133 @@
+"""
+Кеш переводов промптов через GPT
+
+Ключ - хеш нормализованного текста, модели и системного промпта: правка
+инструкции перевода или смена модели сами дают новые ключи. Одинаковые
+промпты (шаблоны, "Повторить") не ходят в GPT повторно.
+"""
+import hashlib
+import re
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.lru import TTLCache
+from app.services.cache_service import cache_service
+from app.shared.utils.openai import get_openai_headers
+
+logger = get_logger(__name__)
+
+# Версия формата записей кеша (менять при изменении формата значения или нормализации текста)
+TRANSLATION_CACHE_SCHEMA = 2
+
+OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(text: str) -> str:
+    """
+    Текст промпта без различий в пробелах
+
+    Регистр не выравнивается: имена, аббревиатуры и акценты промпта
+    переводятся по-разному ("МИР" и "мир").
+    """
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def translation_cache_key(model: str, system_prompt: str, text: str) -> str:
+    """Ключ перевода: модель + инструкция + нормализованный текст"""
+    digest = hashlib.sha256(
+        "\0".join((model, system_prompt, normalize_prompt(text))).encode("utf-8")
+    ).hexdigest()
+    return f"prompt_translation:v{TRANSLATION_CACHE_SCHEMA}:{digest}"
+
+
+class GPTTranslationCache:
+    """
+    Переводы промптов: LRU процесса -> CacheService (Redis) -> GPT
+
+    - Перевод по ключу неизменен, поэтому L1 хранит его долго
+    - Одновременные одинаковые запросы ждут один вызов GPT
+    - Неудачный вызов (None) не кешируется - вызывающий берет локальный перевод
+    """
+
+    def __init__(self, maxsize: Optional[int] = None, ttl: Optional[int] = None):
+        self.ttl = ttl or settings.PROMPT_TRANSLATION_CACHE_TTL
+        self.local: TTLCache[str] = TTLCache(maxsize or settings.PROMPT_TRANSLATION_L1_SIZE, self.ttl)
+        self.gpt_calls = 0
+
+    async def translate(
+        self,
+        model: str,
+        system_prompt: str,
+        text: str,
+        api_key: str,
+        max_tokens: int = 300,
+    ) -> Optional[str]:
+        """
+        Перевод текста по системному промпту
+
+        Returns:
+            Optional[str]: Перевод или None, если GPT недоступен
+        """
+        key = translation_cache_key(model, system_prompt, text)
+        translated = self.local.get(key)
+        if translated is not None:
+            return translated
+
+        async def load() -> Optional[str]:
+            return await self._request(model, system_prompt, text, api_key, max_tokens)
+
+        translated = await cache_service.get_or_set(key, load, ttl=self.ttl)
+        if translated is not None:
+            self.local.set(key, translated)
+        return translated
+
+    async def _request(
+        self,
+        model: str,
+        system_prompt: str,
+        text: str,
+        api_key: str,
+        max_tokens: int,
+    ) -> Optional[str]:
+        from app.core.di import get_http_client
+
+        self.gpt_calls += 1
+        data = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": text}
+            ],
+            "temperature": 0.1,  # Низкая температура для точного перевода
+            "max_tokens": max_tokens
+        }
+        try:
+            async with get_http_client().request(
+                "openai", "POST", OPENAI_CHAT_URL, endpoint="openai/chat/completions:translation",
+                headers=get_openai_headers(api_key), json=data
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(f"[GPT Translation] Ошибка API {response.status}: {error_text[:500]}")
+                    return None
+                result = await response.json()
+                translated = result["choices"][0]["message"]["content"].strip()
+        except Exception as e:
+            logger.error(f"[GPT Translation] Ошибка запроса: {e}")
+            return None
+
+        return translated or None
+
+
+_translation_cache: Optional[GPTTranslationCache] = None
+
+
+def get_translation_cache() -> GPTTranslationCache:
+    """Получить кеш переводов процесса (Singleton)"""
+    global _translation_cache
+    if _translation_cache is None:
+        _translation_cache = GPTTranslationCache()
+    return _translation_cache
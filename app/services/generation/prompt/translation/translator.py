@@ -2,12 +2,11 @@
 Модуль перевода промптов через GPT API
 """
 import re
-import aiohttp
 from typing import Optional
 
 from app.core.config import settings
 from app.core.logger import get_logger
-from app.shared.utils.openai import get_openai_headers
+from app.services.generation.prompt.translation.cache import get_translation_cache
 
 logger = get_logger(__name__)
 
@@ -45,34 +44,15 @@ class PromptTranslator:
 
 ОТВЕТ: только переведенный промпт без пояснений."""
 
-        try:
-            url = "https://api.openai.com/v1/chat/completions"
-            headers = get_openai_headers(settings.OPENAI_API_KEY)
-            data = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": russian_text}
-                ],
-                "temperature": 0.1,  # Низкая температура для точного перевода
-                "max_tokens": 200
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=data) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        translated = result["choices"][0]["message"]["content"].strip()
-                        logger.info(f"[GPT Translation] Успешно: '{russian_text}' → '{translated}'")
-                        return translated
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"GPT API error: {error_text}")
-                        return self.translate_to_english(russian_text)
-        
-        except Exception as e:
-            logger.error(f"Ошибка GPT перевода: {e}")
+        # Одинаковые промпты (шаблоны, повторы генераций) переводятся один раз
+        translated = await get_translation_cache().translate(
+            self.model, system_prompt, russian_text, settings.OPENAI_API_KEY, max_tokens=200
+        )
+        if translated is None:
             return self.translate_to_english(russian_text)
+        
+        logger.info(f"[GPT Translation] Успешно: '{russian_text}' → '{translated}'")
+        return translated
     
     def needs_translation(self, text: str) -> bool:
         """Определяет нужен ли перевод текста"""
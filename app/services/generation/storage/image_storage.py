@@ -7,11 +7,33 @@ from datetime import datetime
 from typing import List, Optional
 from uuid import UUID
 
+from app.core.config import settings
 from app.core.logger import get_logger
 from app.database.models.generation import ImageGeneration
 
 logger = get_logger(__name__)
 
+# Таймаут скачивания одного изображения из FAL AI (сек)
+DOWNLOAD_TIMEOUT = 60
+
+
+class _ResponseStreamReader:
+    """
+    Поток тела aiohttp-ответа для upload_stream с подсчетом байт
+
+    Хранилище читает тело частями прямо из сокета, ответ
+    не копится в памяти целиком.
+    """
+    
+    def __init__(self, content: aiohttp.StreamReader):
+        self._content = content
+        self.bytes_read = 0
+    
+    async def read(self, size: int = -1) -> bytes:
+        data = await self._content.read(size if size and size > 0 else -1)
+        self.bytes_read += len(data)
+        return data
+
 
 class ImageStorage:
     """Управление хранением изображений"""
@@ -20,16 +42,30 @@ class ImageStorage:
         self._storage = None
     
     def _get_storage(self):
-        """Получает MinIO хранилище"""
+        """Получает MinIO хранилище (общее на процесс)"""
         if not self._storage:
-            from app.services.storage.minio import MinioStorage
-            self._storage = MinioStorage()
+            from app.services.storage import get_storage_service
+            self._storage = get_storage_service()
         return self._storage
     
+    @staticmethod
+    def _download(url: str):
+        """Запрос изображения через общий пул соединений к FAL CDN"""
+        from app.core.di import get_http_client
+        return get_http_client().request(
+            "fal", "GET", url, endpoint="fal/cdn",
+            timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT, sock_connect=10)
+        )
+    
     async def save_images_to_minio(self, generation: ImageGeneration, fal_urls: List[str]) -> List[str]:
         """
         Сохраняет изображения из FAL AI в MinIO для постоянного хранения
         
+        Изображения обрабатываются параллельно (не больше MINIO_UPLOAD_CONCURRENCY
+        одновременно): скачивание идет потоком прямо в хранилище, поэтому
+        генерация из нескольких изображений сохраняется за время самого
+        медленного из них. Порядок URL в результате совпадает с порядком fal_urls.
+        
         Args:
             generation: Объект генерации
             fal_urls: Список URL изображений из FAL AI
@@ -39,52 +75,21 @@ class ImageStorage:
         """
         try:
             storage = self._get_storage()
-            saved_urls = []
+            bucket = "generated"
             
             logger.info(f"[MinIO] Начинаем сохранение {len(fal_urls)} изображений для генерации {generation.id}")
             
-            for i, fal_url in enumerate(fal_urls):
-                try:
-                    logger.info(f"[MinIO] Скачиваем изображение {i+1}/{len(fal_urls)}: {fal_url}")
-                    
-                    # Скачиваем изображение с FAL AI
-                    image_data = await self._download_image(fal_url)
-                    if not image_data:
-                        continue
-                    
-                    # Генерируем путь для сохранения в MinIO
-                    object_path = self._generate_storage_path(generation.id, i + 1)
-                    
-                    # Сохраняем в MinIO
-                    bucket = "generated"
-                    logger.info(f"[MinIO] Загружаем в MinIO: bucket={bucket}, path={object_path}")
-                    
-                    success = await storage.upload_file(
-                        bucket=bucket,
-                        object_name=object_path,
-                        data=image_data,
-                        content_type="image/jpeg"
-                    )
-                    
-                    if success:
-                        # Генерируем presigned URL для доступа
-                        minio_url = await storage.generate_presigned_url(
-                            bucket=bucket,
-                            object_name=object_path,
-                            expires=86400  # 1 день
-                        )
-                        
-                        if minio_url:
-                            saved_urls.append(minio_url)
-                            logger.info(f"[MinIO] ✅ Изображение {i+1} сохранено: {object_path}")
-                        else:
-                            logger.warning(f"[MinIO] ❌ Не удалось получить presigned URL для {object_path}")
-                    else:
-                        logger.warning(f"[MinIO] ❌ Не удалось загрузить изображение {i+1} в MinIO")
-                        
-                except Exception as e:
-                    logger.exception(f"[MinIO] Ошибка сохранения изображения {i+1} в MinIO: {e}")
-                    continue
+            # Проверка бакета один раз на процесс, а не перед каждой загрузкой
+            await storage.ensure_bucket(bucket)
+            
+            semaphore = asyncio.Semaphore(max(1, settings.MINIO_UPLOAD_CONCURRENCY))
+            
+            async def _save(i: int, fal_url: str) -> Optional[str]:
+                async with semaphore:
+                    return await self._save_single_image(storage, bucket, generation.id, i, len(fal_urls), fal_url)
+            
+            results = await asyncio.gather(*(_save(i, url) for i, url in enumerate(fal_urls)))
+            saved_urls = [url for url in results if url]
             
             if saved_urls:
                 logger.info(f"[MinIO] ✅ Успешно сохранено {len(saved_urls)}/{len(fal_urls)} изображений в MinIO")
@@ -97,6 +102,60 @@ class ImageStorage:
             logger.exception(f"[MinIO] Критическая ошибка сохранения в MinIO: {e}")
             return []
     
+    async def _save_single_image(
+        self,
+        storage,
+        bucket: str,
+        generation_id: UUID,
+        i: int,
+        total: int,
+        fal_url: str
+    ) -> Optional[str]:
+        """
+        Скачивает одно изображение потоком в MinIO и возвращает presigned URL
+        
+        Returns:
+            Optional[str]: URL сохраненного изображения или None при ошибке
+        """
+        try:
+            logger.info(f"[MinIO] Скачиваем изображение {i+1}/{total}: {fal_url}")
+            object_path = self._generate_storage_path(generation_id, i + 1)
+            
+            async with self._download(fal_url) as response:
+                if response.status != 200:
+                    logger.warning(f"[MinIO] Ошибка скачивания изображения {fal_url}: HTTP {response.status}")
+                    return None
+                
+                content_type = response.headers.get('content-type', 'image/jpeg')
+                reader = _ResponseStreamReader(response.content)
+                
+                logger.info(f"[MinIO] Загружаем в MinIO: bucket={bucket}, path={object_path}")
+                await storage.upload_stream(
+                    bucket=bucket,
+                    object_name=object_path,
+                    stream=reader,
+                    length=response.content_length,
+                    content_type=content_type
+                )
+            
+            # Генерируем presigned URL для доступа
+            minio_url = await storage.generate_presigned_url(
+                bucket=bucket,
+                object_name=object_path,
+                expires=86400  # 1 день
+            )
+            
+            if not minio_url:
+                logger.warning(f"[MinIO] ❌ Не удалось получить presigned URL для {object_path}")
+                return None
+            
+            logger.info(f"[MinIO] ✅ Изображение {i+1} сохранено: {object_path} ({reader.bytes_read} байт)")
+            return minio_url
+            
+        except Exception as e:
+            logger.exception(f"[MinIO] Ошибка сохранения изображения {i+1} в MinIO: {e}")
+            return None
+    
     async def delete_images_from_minio(self, result_urls: List[str], generation_id: UUID):
         """
         Удаляет изображения из MinIO
@@ -134,16 +193,15 @@ class ImageStorage:
             Optional[bytes]: Данные изображения или None
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        image_data = await response.read()
-                        content_type = response.headers.get('content-type', 'image/jpeg')
-                        logger.info(f"[MinIO] Изображение скачано: {len(image_data)} байт, Content-Type: {content_type}")
-                        return image_data
-                    else:
-                        logger.warning(f"[MinIO] Ошибка скачивания изображения {url}: HTTP {response.status}")
-                        return None
+            async with self._download(url) as response:
+                if response.status == 200:
+                    image_data = await response.read()
+                    content_type = response.headers.get('content-type', 'image/jpeg')
+                    logger.info(f"[MinIO] Изображение скачано: {len(image_data)} байт, Content-Type: {content_type}")
+                    return image_data
+                else:
+                    logger.warning(f"[MinIO] Ошибка скачивания изображения {url}: HTTP {response.status}")
+                    return None
         except Exception as e:
             logger.exception(f"[MinIO] Ошибка скачивания изображения {url}: {e}")
             return None
@@ -0,0 +1,158 @@
+"""
+Кеш анализа референсных изображений (GPT Vision)
+
+Повторно присланное изображение (тот же файл Telegram или его
+перекодированная копия) получает сохраненный анализ и промпт без
+скачивания и вызова Vision API.
+
+- Точное совпадение: file_unique_id Telegram
+- Копии: dHash (64 бита) с поиском соседей по расстоянию Хэмминга через
+  4 полосы по 16 бит - хеши на расстоянии до 3 бит совпадают хотя бы
+  в одной полосе
+"""
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Версия формата записей кеша
+VISION_CACHE_SCHEMA = 1
+
+# Полосы dHash для поиска соседей
+DHASH_BANDS = 4
+DHASH_BAND_BITS = 64 // DHASH_BANDS
+
+# Максимальное расстояние Хэмминга, при котором изображения считаются одним
+MAX_HASH_DISTANCE = 3
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class VisionAnalysisCache:
+    """
+    Результаты анализа по изображению
+
+    Записи разделены по варианту анализа (модель, системный промпт, тип
+    аватара): смена инструкции Vision не отдает старые результаты.
+
+    - vision:v1:<variant>:img:<dhash> - результат анализа (JSON)
+    - vision:v1:<variant>:fid:<file_unique_id> - dhash изображения
+    - vision:v1:<variant>:band:<i>:<значение> - SET хешей с этой полосой
+    """
+
+    def __init__(self, redis=None, ttl: Optional[int] = None):
+        self._redis = redis
+        self.ttl = ttl or settings.VISION_CACHE_TTL
+
+    async def get_redis(self):
+        """Redis клиент (по умолчанию общий клиент приложения)"""
+        if self._redis is None:
+            from app.core.di import get_redis
+            self._redis = await get_redis()
+        return self._redis
+
+    @staticmethod
+    def variant(model: str, system_prompt: str, avatar_type: str) -> str:
+        """Идентификатор варианта анализа"""
+        return hashlib.sha256("\0".join((model, system_prompt, avatar_type)).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _prefix(variant: str) -> str:
+        return f"vision:v{VISION_CACHE_SCHEMA}:{variant}"
+
+    @staticmethod
+    def _bands(image_hash: int):
+        mask = (1 << DHASH_BAND_BITS) - 1
+        return [(i, (image_hash >> (i * DHASH_BAND_BITS)) & mask) for i in range(DHASH_BANDS)]
+
+    async def get_by_file_id(self, variant: str, file_unique_id: str) -> Optional[Dict[str, Any]]:
+        """Анализ ранее присланного файла Telegram"""
+        try:
+            redis = await self.get_redis()
+            prefix = self._prefix(variant)
+            image_hash = await redis.get(f"{prefix}:fid:{file_unique_id}")
+            if not image_hash:
+                return None
+            return await self._load(redis, prefix, _decode(image_hash))
+        except Exception as e:
+            logger.warning(f"[Vision Cache] Ошибка чтения по file_unique_id {file_unique_id}: {e}")
+            return None
+
+    async def get_by_hash(self, variant: str, image_hash: int) -> Optional[Dict[str, Any]]:
+        """Анализ того же или почти того же изображения (расстояние до MAX_HASH_DISTANCE)"""
+        try:
+            redis = await self.get_redis()
+            prefix = self._prefix(variant)
+
+            result = await self._load(redis, prefix, f"{image_hash:016x}")
+            if result is not None:
+                return result
+
+            band_keys = [f"{prefix}:band:{i}:{value:04x}" for i, value in self._bands(image_hash)]
+            candidates = {int(_decode(member), 16) for member in await redis.sunion(band_keys)}
+            if not candidates:
+                return None
+
+            nearest = min(candidates, key=lambda candidate: hamming(candidate, image_hash))
+            distance = hamming(nearest, image_hash)
+            if distance > MAX_HASH_DISTANCE:
+                return None
+
+            result = await self._load(redis, prefix, f"{nearest:016x}")
+            if result is not None:
+                logger.info(f"[Vision Cache] Найдена копия изображения (расстояние {distance})")
+            return result
+        except Exception as e:
+            logger.warning(f"[Vision Cache] Ошибка поиска по хешу: {e}")
+            return None
+
+    async def store(
+        self,
+        variant: str,
+        image_hash: int,
+        result: Dict[str, Any],
+        file_unique_id: Optional[str] = None,
+    ) -> None:
+        """Сохраняет результат анализа изображения"""
+        try:
+            redis = await self.get_redis()
+            prefix = self._prefix(variant)
+            hash_hex = f"{image_hash:016x}"
+
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.setex(f"{prefix}:img:{hash_hex}", self.ttl, json.dumps(result, ensure_ascii=False, default=str))
+                if file_unique_id:
+                    pipe.setex(f"{prefix}:fid:{file_unique_id}", self.ttl, hash_hex)
+                for i, value in self._bands(image_hash):
+                    band_key = f"{prefix}:band:{i}:{value:04x}"
+                    pipe.sadd(band_key, hash_hex)
+                    pipe.expire(band_key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"[Vision Cache] Ошибка сохранения анализа: {e}")
+
+    @staticmethod
+    async def _load(redis, prefix: str, hash_hex: str) -> Optional[Dict[str, Any]]:
+        raw = await redis.get(f"{prefix}:img:{hash_hex}")
+        return json.loads(raw) if raw else None
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+_vision_cache: Optional[VisionAnalysisCache] = None
+
+
+def get_vision_cache() -> VisionAnalysisCache:
+    """Получить кеш анализа изображений (Singleton)"""
+    global _vision_cache
+    if _vision_cache is None:
+        _vision_cache = VisionAnalysisCache()
+    return _vision_cache
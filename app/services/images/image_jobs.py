@@ -0,0 +1,119 @@
+"""
+Синхронные задачи Pillow для выполнения в пуле image-воркеров
+
+Функции принимают и возвращают только байты и простые словари, чтобы
+передаваться между процессами через pickle. Модуль намеренно не
+импортирует настройки и сервисы приложения, чтобы воркер стартовал быстро.
+
+JPEG декодируется через Image.draft(): libjpeg сразу масштабирует DCT
+в 1/2-1/8, поэтому для превью и статистики не разворачивается полное
+изображение на десятки мегапикселей.
+"""
+import io
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, ImageStat
+
+# Сторона изображения, по которой считается статистика яркости/контраста
+STATS_SIZE = 512
+
+# EXIF теги, которые безопасно сохранять в метаданных
+_EXIF_TAGS = {271: "camera_make", 272: "camera_model"}
+
+
+def _open(data: bytes, draft_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """Открывает и декодирует изображение (JPEG - сразу в уменьшенном виде)"""
+    image = Image.open(io.BytesIO(data))
+    if draft_size:
+        image.draft("RGB", draft_size)
+    image.load()
+    return image
+
+
+def _encode(image: Image.Image, fmt: str, quality: int) -> bytes:
+    if fmt.upper() in ("JPEG", "JPG") and image.mode != "RGB":
+        image = image.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format=fmt, quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def decode_meta(data: bytes) -> Dict[str, Any]:
+    """
+    Метаданные изображения с проверкой, что файл декодируется
+
+    Размер и формат берутся из заголовка; сами данные декодируются в
+    уменьшенном виде только для проверки целостности файла.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        width, height = image.size
+        meta: Dict[str, Any] = {
+            "width": width,
+            "height": height,
+            "format": image.format,
+            "mode": image.mode,
+        }
+
+        exif = {}
+        try:
+            raw_exif = image.getexif()
+            for tag, name in _EXIF_TAGS.items():
+                if tag in raw_exif:
+                    exif[name] = str(raw_exif[tag])[:50]
+        except Exception:
+            pass
+        if exif:
+            meta["exif"] = exif
+
+        image.draft("RGB", (STATS_SIZE, STATS_SIZE))
+        image.load()
+
+    return meta
+
+
+def stats(data: bytes, size: int = STATS_SIZE) -> Dict[str, float]:
+    """Средняя яркость и контраст (0-255) по уменьшенной копии изображения"""
+    with _open(data, (size, size)) as image:
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.thumbnail((size, size), Image.Resampling.BILINEAR)
+        stat = ImageStat.Stat(image)
+
+    return {
+        "brightness": sum(stat.mean) / len(stat.mean),
+        "contrast": sum(stat.stddev) / len(stat.stddev),
+    }
+
+
+def thumbnail(data: bytes, max_side: int, fmt: str = "JPEG", quality: int = 85) -> bytes:
+    """Превью со стороной не больше max_side"""
+    with _open(data, (max_side, max_side)) as image:
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        return _encode(image, fmt, quality)
+
+
+def reencode(data: bytes, fmt: str = "JPEG", quality: int = 85, max_side: Optional[int] = None) -> bytes:
+    """Перекодирует изображение, уменьшая его до max_side при необходимости"""
+    with _open(data, (max_side, max_side) if max_side else None) as image:
+        if max_side and max(image.size) > max_side:
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        return _encode(image, fmt, quality)
+
+
+def dhash(data: bytes, size: int = 8) -> int:
+    """
+    Разностный перцептивный хеш (64 бита)
+
+    Устойчив к перекодированию, сжатию и изменению размера.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("L", (size * 8, size * 8))  # JPEG декодируется сразу в уменьшенном виде
+        # Режим "L" - один байт на пиксель, строки подряд
+        pixels = image.convert("L").resize((size + 1, size), Image.Resampling.LANCZOS).tobytes()
+
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
@@ -0,0 +1,211 @@
+"""
+Производные размеры (renditions) фотографий в MinIO
+
+Карточки и галереи показывают фото в Telegram, который все равно ужимает
+его до 1280 px, поэтому скачивать оригинал до 20 МБ на каждый клик не
+нужно. Рядом с оригиналом хранятся уменьшенные копии:
+
+- renditions/v1/<имя>/<ключ оригинала>.<формат> - детерминированный ключ
+- При загрузке фото копии создаются сразу (generate)
+- Для старых фото копия создается при первом запросе и сохраняется
+- Последние отданные копии держатся в памяти процесса
+"""
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.lru import TTLCache
+from app.services.images.worker_pool import get_image_worker_pool
+
+logger = get_logger(__name__)
+
+# Версия набора копий (менять при изменении размеров или качества)
+RENDITION_SCHEMA = 1
+
+# Сторона, до которой Telegram уменьшает фото при отправке
+TELEGRAM_PHOTO_SIDE = 1280
+
+
+@dataclass(frozen=True)
+class Rendition:
+    """Размер и формат производной копии"""
+    name: str
+    max_side: int
+    format: str
+    quality: int
+
+    @property
+    def extension(self) -> str:
+        return "jpg" if self.format == "JPEG" else self.format.lower()
+
+    @property
+    def content_type(self) -> str:
+        return f"image/{'jpeg' if self.format == 'JPEG' else self.format.lower()}"
+
+
+# От меньшей к большей. Все показы идут фото в Telegram, поэтому копия
+# одна; меньший размер добавлять вместе с вызывающим, которому он нужен
+RENDITIONS: List[Rendition] = [
+    Rendition("preview", TELEGRAM_PHOTO_SIDE, "JPEG", 85),
+]
+
+
+def rendition_key(object_name: str, rendition: Rendition) -> str:
+    """Ключ копии рядом с оригиналом"""
+    base, _ = os.path.splitext(object_name)
+    return f"renditions/v{RENDITION_SCHEMA}/{rendition.name}/{base}.{rendition.extension}"
+
+
+def pick_rendition(min_side: int) -> Rendition:
+    """Наименьшая копия со стороной не меньше min_side (иначе самая большая)"""
+    for rendition in RENDITIONS:
+        if rendition.max_side >= min_side:
+            return rendition
+    return RENDITIONS[-1]
+
+
+class RenditionService:
+    """
+    Создание и выдача производных копий фото
+
+    - get() отдает копию из памяти, MinIO или создает ее из оригинала
+    - Одновременные запросы одной отсутствующей копии создают ее один раз
+    - Если копию не удалось создать, отдается оригинал
+    """
+
+    def __init__(self, storage=None, maxbytes: Optional[int] = None, ttl: Optional[int] = None):
+        self._storage = storage
+        self.local: TTLCache[bytes] = TTLCache(
+            maxsize=1024,
+            ttl=ttl or settings.RENDITION_CACHE_TTL,
+            maxbytes=maxbytes or settings.RENDITION_CACHE_MAX_BYTES,
+        )
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.generated = 0
+
+    @property
+    def storage(self):
+        """Хранилище (по умолчанию общий клиент MinIO)"""
+        if self._storage is None:
+            from app.services.storage import get_storage_service
+            self._storage = get_storage_service()
+        return self._storage
+
+    async def generate(
+        self,
+        bucket: str,
+        object_name: str,
+        data: bytes,
+        renditions: Optional[Iterable[Rendition]] = None
+    ) -> Dict[str, bytes]:
+        """
+        Создает копии из данных оригинала и сохраняет их в MinIO
+
+        Returns:
+            Dict[str, bytes]: Копии по имени (созданные успешно)
+        """
+        renditions = list(renditions or RENDITIONS)
+        pool = get_image_worker_pool()
+        encoded = await asyncio.gather(
+            *(pool.thumbnail(data, r.max_side, r.format, r.quality) for r in renditions),
+            return_exceptions=True
+        )
+
+        result: Dict[str, bytes] = {}
+        uploads = []
+        for rendition, content in zip(renditions, encoded):
+            if isinstance(content, BaseException):
+                logger.warning(f"[Renditions] Не удалось создать {rendition.name} для {bucket}/{object_name}: {content}")
+                continue
+            key = rendition_key(object_name, rendition)
+            result[rendition.name] = content
+            self.local.set((bucket, key), content)
+            uploads.append(self.storage.upload_file(bucket, key, content, rendition.content_type))
+
+        stored = await asyncio.gather(*uploads, return_exceptions=True)
+        for error in (s for s in stored if isinstance(s, BaseException)):
+            logger.warning(f"[Renditions] Ошибка сохранения копии {bucket}/{object_name}: {error}")
+
+        self.generated += len(result)
+        return result
+
+    async def get(self, bucket: str, object_name: str, min_side: int = TELEGRAM_PHOTO_SIDE) -> Optional[bytes]:
+        """
+        Наименьшая копия, достаточная для показа стороной min_side
+
+        Returns:
+            Optional[bytes]: Данные копии или None, если оригинала нет
+        """
+        rendition = pick_rendition(min_side)
+        key = rendition_key(object_name, rendition)
+
+        content = self.local.get((bucket, key))
+        if content is not None:
+            return content
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            content = await self._load(bucket, object_name, rendition, key)
+            future.set_result(content)
+            return content
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение получит вызывающий; ожидающих может не быть
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _load(self, bucket: str, object_name: str, rendition: Rendition, key: str) -> Optional[bytes]:
+        content = await self.storage.download_file(bucket, key)
+        if content:
+            self.local.set((bucket, key), content)
+            return content
+
+        # Старое фото без копий: создаем из оригинала
+        original = await self.storage.download_file(bucket, object_name)
+        if not original:
+            return None
+
+        logger.info(f"[Renditions] Создаем копии для {bucket}/{object_name}")
+        renditions = await self.generate(bucket, object_name, original)
+        return renditions.get(rendition.name) or original
+
+    async def delete(self, bucket: str, object_name: str) -> None:
+        """Удаляет копии фото (вместе с оригиналом)"""
+        keys = [rendition_key(object_name, r) for r in RENDITIONS]
+        for key in keys:
+            self.local.pop((bucket, key))
+        await asyncio.gather(*(self.storage.delete_file(bucket, key) for key in keys), return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Метрики кеша копий"""
+        return {
+            "generated": self.generated,
+            "cached": len(self.local),
+            "cached_bytes": self.local.currbytes,
+            "hits": self.local.hits,
+            "misses": self.local.misses,
+        }
+
+
+_rendition_service: Optional[RenditionService] = None
+
+
+def get_rendition_service() -> RenditionService:
+    """Получить сервис производных копий (Singleton)"""
+    global _rendition_service
+    if _rendition_service is None:
+        _rendition_service = RenditionService()
+    return _rendition_service
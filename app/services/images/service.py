@@ -11,7 +11,7 @@ from pydantic import BaseModel
 
 from app.core.config import settings
 from app.core.logger import get_logger
-from app.services.storage import StorageService
+from app.services.storage import get_storage_service
 from app.services.base import BaseService
 
 logger = get_logger(__name__)
@@ -73,7 +73,7 @@ class ImageProcessingService(BaseService):
                 thumbnail_path = await self._create_thumbnail(file_path)
                 
                 # 3. Сохраняем в MinIO
-                storage = StorageService()
+                storage = get_storage_service()
                 
                 # Читаем данные из файла
                 async with aiofiles.open(file_path, 'rb') as f:
@@ -136,7 +136,7 @@ class ImageProcessingService(BaseService):
             List[ImageResult]: Список найденных изображений
         """
         try:
-            storage = StorageService()
+            storage = get_storage_service()
             # TODO: Реализовать поиск по тегам в MinIO
             return []
                 
@@ -0,0 +1,168 @@
+"""
+Пул процессов для CPU-тяжелой обработки изображений (Pillow)
+
+Декодирование, ресайз и кодирование фотографий выполняются в отдельных
+процессах: альбом из 20 фото не блокирует event loop и не держит GIL
+основного процесса. Очередь ограничена - при всплеске загрузок задачи
+ждут свободного места, а не копятся в памяти вместе с байтами фото.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.services.images import image_jobs
+
+logger = get_logger(__name__)
+
+
+class ImageWorkerPool:
+    """
+    Пул процессов для задач из image_jobs
+
+    - Размер по числу ядер (IMAGE_WORKER_PROCESSES переопределяет)
+    - Не больше max_workers + max_queue задач в пуле одновременно,
+      остальные вызывающие ждут
+    - Упавший процесс (например, OOM на огромном файле) пересоздает пул
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_queue: Optional[int] = None):
+        self.max_workers = max_workers or settings.IMAGE_WORKER_PROCESSES or os.cpu_count() or 1
+        self.max_queue = settings.IMAGE_WORKER_QUEUE_SIZE if max_queue is None else max_queue
+
+        # spawn не наследует event loop и потоки родителя
+        self._ctx = multiprocessing.get_context("spawn")
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._closed = False
+
+        self._pending = 0
+        self._waiting = 0
+        self._completed = 0
+        self._failed = 0
+        self._restarts = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._ctx)
+        return self._executor
+
+    async def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Выполняет func(*args, **kwargs) в процессе-воркере
+
+        Args:
+            func: Функция уровня модуля (должна сериализоваться pickle)
+
+        Raises:
+            RuntimeError: Пул остановлен
+            Exception: Исключение, выброшенное задачей
+        """
+        if self._closed:
+            raise RuntimeError("Пул обработки изображений остановлен")
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers + self.max_queue)
+
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._pending += 1
+        try:
+            executor = self._get_executor()
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+            except BrokenProcessPool:
+                self._failed += 1
+                self._restart(executor)
+                raise
+            except Exception:
+                self._failed += 1
+                raise
+
+            self._completed += 1
+            return result
+        finally:
+            self._pending -= 1
+            self._slots.release()
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """Заменяет сломанный пул новым (другие задачи могли уже это сделать)"""
+        if self._executor is broken:
+            logger.warning("[Image Pool] Процесс-воркер завершился аварийно, пул пересоздается")
+            self._executor = None
+            self._restarts += 1
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    async def decode_meta(self, data: bytes) -> Dict[str, Any]:
+        """Размер, формат и EXIF изображения с проверкой декодирования"""
+        return await self.run(image_jobs.decode_meta, data)
+
+    async def stats(self, data: bytes) -> Dict[str, float]:
+        """Средняя яркость и контраст изображения"""
+        return await self.run(image_jobs.stats, data)
+
+    async def thumbnail(self, data: bytes, max_side: int, fmt: str = "JPEG", quality: int = 85) -> bytes:
+        """Превью со стороной не больше max_side"""
+        return await self.run(image_jobs.thumbnail, data, max_side, fmt, quality)
+
+    async def reencode(
+        self,
+        data: bytes,
+        fmt: str = "JPEG",
+        quality: int = 85,
+        max_side: Optional[int] = None
+    ) -> bytes:
+        """Перекодирование с уменьшением до max_side"""
+        return await self.run(image_jobs.reencode, data, fmt, quality, max_side)
+
+    async def dhash(self, data: bytes) -> int:
+        """Перцептивный хеш изображения"""
+        return await self.run(image_jobs.dhash, data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики пула"""
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "waiting": self._waiting,
+            "completed": self._completed,
+            "failed": self._failed,
+            "restarts": self._restarts,
+        }
+
+    def shutdown(self) -> None:
+        """Останавливает процессы-воркеры"""
+        self._closed = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_image_worker_pool: Optional[ImageWorkerPool] = None
+
+
+def get_image_worker_pool() -> ImageWorkerPool:
+    """Получить пул image-воркеров процесса (Singleton)"""
+    global _image_worker_pool
+    if _image_worker_pool is None:
+        _image_worker_pool = ImageWorkerPool()
+    return _image_worker_pool
+
+
+def shutdown_image_worker_pool() -> None:
+    """Останавливает пул image-воркеров, если он был создан"""
+    global _image_worker_pool
+    if _image_worker_pool is not None:
+        _image_worker_pool.shutdown()
+        _image_worker_pool = None
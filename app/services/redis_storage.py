@@ -1,166 +1,377 @@
 """
-Redis хранилище для временных данных платной транскрипции
+Временное хранилище аудио для платной транскрипции
+
+Байты загрузки лежат в спуле - на диске (каталог, общий для процессов бота)
+или в MinIO. В Redis - только небольшая запись с метаданными и расценками.
+Транскрипция получает путь к файлу, а не bytes.
+
+Перед оплатой загрузка забирается из спула (claim_audio_data): запись
+удаляется из Redis и из индекса сборщика, файл с этого момента принадлежит
+вызывающему. Новая загрузка или сборщик его уже не удалят, а повторное
+нажатие "Оплатить" ничего не найдет и не спишет деньги второй раз.
 """
-import pickle
-import base64
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
 from typing import Any, Dict, Optional, Tuple
-from datetime import timedelta
 
+import aiofiles
+
+from app.core.config import settings
 from app.core.logger import get_logger
-from app.core.di import get_redis_client
 
 logger = get_logger(__name__)
 
+# Записей, которые сборщик мусора удаляет за один проход
+GC_BATCH_SIZE = 50
+
+
+class PendingAudioStorage:
+    """
+    Спул загрузок, ожидающих оплаты
+
+    - aisha:paid_transcription:audio:<user_id> - метаданные (JSON, с TTL)
+    - aisha:paid_transcription:spool - ZSET "<backend>:<id>" загрузок по времени истечения
+
+    Метаданные истекают сами, файлы и объекты MinIO по ZSET удаляет
+    collect_garbage (вызывается при каждой новой загрузке).
+    """
 
-class AudioDataRedisStorage:
-    """Redis хранилище для временных аудио данных"""
-    
-    def __init__(self):
+    def __init__(self, backend: Optional[str] = None, spool_dir: Optional[Path] = None, redis=None):
         self.key_prefix = "aisha:paid_transcription:audio:"
-        self.default_ttl = 3600  # 1 час
-    
+        self.expiry_key = "aisha:paid_transcription:spool"
+        self.default_ttl = settings.AUDIO_SPOOL_TTL
+        self.backend = backend or settings.AUDIO_SPOOL_BACKEND
+        self.spool_dir = Path(spool_dir or settings.AUDIO_SPOOL_DIR)
+        self.bucket = settings.MINIO_BUCKET_TEMP or "temp"
+        self._redis = redis
+
+    async def get_redis(self):
+        """Redis клиент (по умолчанию общий клиент приложения)"""
+        if self._redis is None:
+            from app.core.di import get_redis
+            self._redis = await get_redis()
+        return self._redis
+
+    def _local_path(self, spool_id: str) -> Path:
+        return self.spool_dir / f"{spool_id}.audio"
+
+    @staticmethod
+    def _object_name(spool_id: str) -> str:
+        return f"pending-audio/{spool_id}"
+
+    @staticmethod
+    def _member(spool_id: str, backend: str) -> str:
+        """Элемент ZSET: сборщик должен знать, где лежит загрузка"""
+        return f"{backend}:{spool_id}"
+
     async def store_audio_data(
-        self, 
-        user_id: int, 
-        audio_data: bytes, 
-        file_info: Dict[str, Any], 
-        quote: Dict[str, Any],
-        ttl_seconds: int = None
+        self,
+        user_id: int,
+        audio_data: Optional[bytes] = None,
+        file_info: Optional[Dict[str, Any]] = None,
+        quote: Optional[Dict[str, Any]] = None,
+        ttl_seconds: int = None,
+        audio_path: Optional[str] = None
     ) -> bool:
         """
-        Сохраняет данные аудио во временном хранилище Redis
-        
+        Сохраняет аудио в спул, а метаданные - в Redis
+
         Args:
-            user_id: ID пользователя
+            user_id: ID пользователя (Telegram)
             audio_data: Аудио данные
             file_info: Информация о файле
             quote: Расценки на транскрибацию
             ttl_seconds: Время жизни в секундах
-            
+            audio_path: Файл с аудио вместо audio_data (перемещается в спул)
+
         Returns:
             bool: True если успешно сохранено
         """
+        ttl = ttl_seconds or self.default_ttl
+        spool_id = uuid.uuid4().hex
         try:
-            redis_client = await get_redis_client()
-            
-            # Формируем ключ
-            key = f"{self.key_prefix}{user_id}"
-            
-            # Формируем данные для сохранения
-            data = {
-                'audio_data': base64.b64encode(audio_data).decode('utf-8'),
-                'file_info': file_info,
-                'quote': quote
+            redis = await self.get_redis()
+            await self.collect_garbage()
+
+            # Сначала регистрируем загрузку - файл не останется без сборщика
+            await redis.zadd(self.expiry_key, {self._member(spool_id, self.backend): time.time() + ttl})
+
+            size = await self._write_spool(spool_id, audio_data, audio_path)
+
+            # Предыдущая неоплаченная загрузка пользователя больше не нужна
+            await self.clear_audio_data(user_id)
+
+            record = {
+                "spool_id": spool_id,
+                "backend": self.backend,
+                "size": size,
+                "file_info": file_info or {},
+                "quote": quote or {},
             }
-            
-            # Сериализуем данные
-            serialized_data = pickle.dumps(data)
-            
-            # Сохраняем в Redis с TTL
-            ttl = ttl_seconds or self.default_ttl
-            await redis_client.setex(key, ttl, serialized_data)
-            
-            logger.info(f"Аудио данные сохранены в Redis для пользователя {user_id}, TTL: {ttl}s")
+            await redis.setex(f"{self.key_prefix}{user_id}", ttl, json.dumps(record, default=str))
+
+            logger.info(
+                f"Аудио ({size} байт) сохранено в спул {self.backend} для пользователя {user_id}, TTL: {ttl}s"
+            )
             return True
-            
+
         except Exception as e:
-            logger.exception(f"Ошибка сохранения аудио данных в Redis: {e}")
+            logger.exception(f"Ошибка сохранения аудио в спул: {e}")
+            await self._remove_spool(spool_id, self.backend)
             return False
-    
-    async def retrieve_audio_data(self, user_id: int) -> Tuple[Optional[bytes], Optional[Dict], Optional[Dict]]:
+
+    async def _write_spool(self, spool_id: str, audio_data: Optional[bytes], audio_path: Optional[str]) -> int:
+        """Кладет байты в спул, возвращает размер"""
+        loop = asyncio.get_running_loop()
+
+        if self.backend == "minio":
+            from app.services.storage import get_storage_service
+            storage = get_storage_service()
+            if audio_path:
+                size = os.path.getsize(audio_path)
+                async with aiofiles.open(audio_path, "rb") as f:
+                    await storage.upload_stream(self.bucket, self._object_name(spool_id), f, length=size)
+                await loop.run_in_executor(None, _unlink, Path(audio_path))
+                return size
+            await storage.upload_file(self.bucket, self._object_name(spool_id), audio_data)
+            return len(audio_data)
+
+        local_path = self._local_path(spool_id)
+        await loop.run_in_executor(None, lambda: self.spool_dir.mkdir(parents=True, exist_ok=True))
+        if audio_path:
+            await loop.run_in_executor(None, shutil.move, audio_path, str(local_path))
+            return local_path.stat().st_size
+        async with aiofiles.open(local_path, "wb") as f:
+            await f.write(audio_data)
+        return len(audio_data)
+
+    async def claim_audio_data(self, user_id: int) -> Tuple[Optional[str], Optional[Dict], Optional[Dict]]:
         """
-        Извлекает данные аудио из Redis
-        
+        Забирает загрузку пользователя из спула
+
+        Запись атомарно удаляется из Redis и из индекса сборщика, поэтому
+        второй вызов для той же загрузки ничего не вернет. Файл по
+        возвращенному пути принадлежит вызывающему: после обработки его
+        нужно удалить (discard_claimed) или вернуть в спул (restore_audio_data).
+
         Args:
-            user_id: ID пользователя
-            
+            user_id: ID пользователя (Telegram)
+
         Returns:
-            tuple: (audio_data, file_info, quote) или (None, None, None)
+            tuple: (audio_path, file_info, quote) или (None, None, None)
         """
         try:
-            redis_client = await get_redis_client()
-            
-            # Формируем ключ
-            key = f"{self.key_prefix}{user_id}"
-            
-            # Получаем данные из Redis
-            serialized_data = await redis_client.get(key)
-            
-            if not serialized_data:
-                logger.info(f"Аудио данные не найдены в Redis для пользователя {user_id}")
+            redis = await self.get_redis()
+            raw = await self._pop_record(user_id)
+            if not raw:
+                logger.info(f"Аудио в спуле не найдено для пользователя {user_id}")
                 return None, None, None
-            
-            # Десериализуем данные
-            data = pickle.loads(serialized_data)
-            
-            # Декодируем аудио данные
-            audio_data = base64.b64decode(data['audio_data'])
-            file_info = data['file_info']
-            quote = data['quote']
-            
-            logger.info(f"Аудио данные извлечены из Redis для пользователя {user_id}")
-            return audio_data, file_info, quote
-            
+
+            record = json.loads(raw)
+            spool_id, backend = record["spool_id"], record["backend"]
+            await redis.zrem(self.expiry_key, self._member(spool_id, backend))
+        except Exception as e:
+            logger.exception(f"Ошибка извлечения аудио из спула: {e}")
+            return None, None, None
+
+        local_path = self._local_path(spool_id)
+        try:
+            if backend == "minio" and not local_path.exists():
+                await self._download(spool_id, local_path)
         except Exception as e:
-            logger.exception(f"Ошибка извлечения аудио данных из Redis: {e}")
+            logger.exception(f"Ошибка скачивания аудио из спула MinIO: {e}")
+            await self._remove_spool(spool_id, backend)
             return None, None, None
-    
+
+        if backend == "minio":
+            # Локальная копия у вызывающего - объект в MinIO больше не нужен
+            await self._remove_spool_object(spool_id)
+
+        if not local_path.exists():
+            logger.warning(f"Файл спула {local_path} не найден для пользователя {user_id}")
+            return None, None, None
+
+        logger.info(f"Аудио из спула выдано для пользователя {user_id}: {local_path}")
+        return str(local_path), record["file_info"], record["quote"]
+
+    async def discard_claimed(self, audio_path: str) -> None:
+        """Удаляет файл, полученный из claim_audio_data"""
+        await asyncio.get_running_loop().run_in_executor(None, _unlink, Path(audio_path))
+
+    async def restore_audio_data(
+        self,
+        user_id: int,
+        audio_path: str,
+        file_info: Optional[Dict[str, Any]] = None,
+        quote: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        Возвращает забранную загрузку в спул (например, не хватило средств)
+
+        Если пользователь уже прислал новое аудио, старое удаляется.
+
+        Returns:
+            bool: True если загрузка снова ждет оплаты
+        """
+        try:
+            redis = await self.get_redis()
+            if await redis.exists(f"{self.key_prefix}{user_id}"):
+                await self.discard_claimed(audio_path)
+                return False
+        except Exception as e:
+            logger.warning(f"Ошибка проверки спула перед возвратом загрузки: {e}")
+        return await self.store_audio_data(user_id, file_info=file_info, quote=quote, audio_path=audio_path)
+
+    async def _download(self, spool_id: str, local_path: Path) -> None:
+        """Скачивает объект спула потоком в локальный файл"""
+        from app.services.storage import get_storage_service
+        storage = get_storage_service()
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, lambda: self.spool_dir.mkdir(parents=True, exist_ok=True))
+        partial = local_path.with_suffix(".part")
+        try:
+            async with aiofiles.open(partial, "wb") as f:
+                async for chunk in storage.iter_object(self.bucket, self._object_name(spool_id)):
+                    await f.write(chunk)
+            await loop.run_in_executor(None, os.replace, partial, local_path)
+        finally:
+            await loop.run_in_executor(None, _unlink, partial)
+
     async def clear_audio_data(self, user_id: int) -> bool:
         """
-        Удаляет данные аудио из Redis
-        
+        Удаляет аудио пользователя из спула и метаданные из Redis
+
         Args:
-            user_id: ID пользователя
-            
+            user_id: ID пользователя (Telegram)
+
         Returns:
-            bool: True если успешно удалено
+            bool: True если было что удалять
         """
         try:
-            redis_client = await get_redis_client()
-            
-            # Формируем ключ
-            key = f"{self.key_prefix}{user_id}"
-            
-            # Удаляем из Redis
-            deleted_count = await redis_client.delete(key)
-            
-            if deleted_count > 0:
-                logger.info(f"Аудио данные удалены из Redis для пользователя {user_id}")
-            else:
-                logger.info(f"Аудио данные не найдены для удаления для пользователя {user_id}")
-            
-            return deleted_count > 0
-            
+            raw = await self._pop_record(user_id)
+            if not raw:
+                return False
+
+            record = json.loads(raw)
+            await self._remove_spool(record["spool_id"], record["backend"])
+            logger.info(f"Аудио удалено из спула для пользователя {user_id}")
+            return True
+
         except Exception as e:
-            logger.exception(f"Ошибка удаления аудио данных из Redis: {e}")
+            logger.exception(f"Ошибка удаления аудио из спула: {e}")
             return False
-    
+
+    async def _pop_record(self, user_id: int) -> Optional[bytes]:
+        """
+        Атомарно читает и удаляет запись пользователя
+
+        MULTI GET+DEL вместо GETDEL: GETDEL есть только в Redis >= 6.2.
+        """
+        redis = await self.get_redis()
+        key = f"{self.key_prefix}{user_id}"
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.get(key)
+            pipe.delete(key)
+            raw, _ = await pipe.execute()
+        return raw
+
+    async def _remove_spool(self, spool_id: str, backend: str) -> None:
+        """Удаляет файл/объект загрузки и ее запись в ZSET"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, _unlink, self._local_path(spool_id))
+
+        try:
+            if backend == "minio":
+                from app.services.storage import get_storage_service
+                await get_storage_service().delete_file(self.bucket, self._object_name(spool_id))
+
+            redis = await self.get_redis()
+            await redis.zrem(self.expiry_key, self._member(spool_id, backend))
+        except Exception as e:
+            # Запись в ZSET останется - сборщик попробует еще раз
+            logger.warning(f"Не удалось удалить загрузку {spool_id} из спула: {e}")
+
+    async def _remove_spool_object(self, spool_id: str) -> None:
+        """Удаляет объект загрузки в MinIO (локальная копия остается)"""
+        try:
+            from app.services.storage import get_storage_service
+            await get_storage_service().delete_file(self.bucket, self._object_name(spool_id))
+        except Exception as e:
+            logger.warning(f"Не удалось удалить объект спула {spool_id} из MinIO: {e}")
+
+    async def collect_garbage(self) -> int:
+        """
+        Удаляет истекшие загрузки (файлы и объекты MinIO)
+
+        Returns:
+            int: Количество удаленных загрузок
+        """
+        try:
+            redis = await self.get_redis()
+            expired = await redis.zrangebyscore(self.expiry_key, 0, time.time(), start=0, num=GC_BATCH_SIZE)
+        except Exception as e:
+            logger.warning(f"Ошибка чтения истекших загрузок спула: {e}")
+            return 0
+
+        for member in expired:
+            member = member.decode() if isinstance(member, bytes) else member
+            backend, _, spool_id = member.rpartition(":")
+            await self._remove_spool(spool_id, backend or self.backend)
+
+        if expired:
+            logger.info(f"Сборщик спула аудио удалил {len(expired)} истекших загрузок")
+        return len(expired)
+
     async def get_ttl(self, user_id: int) -> Optional[int]:
         """
         Получает оставшееся время жизни аудио данных
-        
+
         Args:
             user_id: ID пользователя
-            
+
         Returns:
             int: Оставшееся время в секундах или None
         """
         try:
-            redis_client = await get_redis_client()
-            
+            redis = await self.get_redis()
+
             # Формируем ключ
             key = f"{self.key_prefix}{user_id}"
-            
+
             # Получаем TTL
-            ttl = await redis_client.ttl(key)
-            
+            ttl = await redis.ttl(key)
+
             if ttl == -2:  # Ключ не существует
                 return None
             elif ttl == -1:  # Ключ существует без TTL
                 return -1
             else:
                 return ttl
-                
+
         except Exception as e:
             logger.exception(f"Ошибка получения TTL аудио данных: {e}")
-            return None 
\ No newline at end of file
+            return None
+
+
+    async def retrieve_audio_data(self, user_id: int) -> Tuple[Optional[str], Optional[Dict], Optional[Dict]]:
+        """Прежнее имя claim_audio_data (возвращает путь к файлу, а не bytes)"""
+        return await self.claim_audio_data(user_id)
+
+
+# Прежнее имя хранилища
+AudioDataRedisStorage = PendingAudioStorage
+
+
+def _unlink(path: Path) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Не удалось удалить файл спула {path}: {e}")
@@ -1,5 +1,13 @@
 from .minio import MinioStorage
+from .s3 import AsyncS3Storage, S3Error, get_storage_service, shutdown_storage_service
 
-StorageService = MinioStorage
+StorageService = AsyncS3Storage
 
-__all__ = ["StorageService"] 
\ No newline at end of file
+__all__ = [
+    "StorageService",
+    "MinioStorage",
+    "AsyncS3Storage",
+    "S3Error",
+    "get_storage_service",
+    "shutdown_storage_service",
+]
@@ -3,9 +3,15 @@ from minio import Minio, S3Error
 from app.core.config import settings
 import asyncio
 from datetime import timedelta
-from typing import List
+from typing import BinaryIO, List, Optional, Set
+
+# Минимальный размер части multipart-загрузки в S3/MinIO
+MIN_PART_SIZE = 5 * 1024 * 1024
 
 class MinioStorage:
+    # Бакеты, существование которых уже проверено (общий кеш процесса)
+    _known_buckets: Set[str] = set()
+
     def __init__(self):
         self.client = Minio(
             settings.MINIO_ENDPOINT,
@@ -32,8 +38,7 @@ class MinioStorage:
         """
         loop = asyncio.get_event_loop()
         try:
-            if not await loop.run_in_executor(None, lambda: self.client.bucket_exists(bucket)):
-                await loop.run_in_executor(None, lambda: self.client.make_bucket(bucket))
+            await self.ensure_bucket(bucket)
             await loop.run_in_executor(
                 None,
                 lambda: self.client.put_object(
@@ -49,6 +54,62 @@ class MinioStorage:
             # Логируем ошибку и пробрасываем исключение
             raise Exception(f"Ошибка загрузки файла в MinIO: {str(e)}")
 
+    async def ensure_bucket(self, bucket: str) -> None:
+        """
+        Создает бакет, если его нет
+
+        Результат кешируется на процесс: bucket_exists выполняется один раз
+        на бакет, а не перед каждой загрузкой.
+        """
+        if bucket in self._known_buckets:
+            return
+        loop = asyncio.get_event_loop()
+        if not await loop.run_in_executor(None, lambda: self.client.bucket_exists(bucket)):
+            await loop.run_in_executor(None, lambda: self.client.make_bucket(bucket))
+        self._known_buckets.add(bucket)
+
+    async def upload_stream(
+        self,
+        bucket: str,
+        object_name: str,
+        stream: BinaryIO,
+        length: Optional[int] = None,
+        content_type: str = None
+    ) -> str:
+        """
+        Загружает файл в MinIO из потока без буферизации целиком
+
+        Args:
+            bucket: Имя бакета
+            object_name: Имя объекта (путь к файлу)
+            stream: Синхронный file-like объект (читается в потоке executor)
+            length: Размер данных, None если неизвестен (multipart по 5MB)
+            content_type: MIME тип файла
+
+        Returns:
+            str: Путь к загруженному файлу (object_name)
+
+        Raises:
+            Exception: При ошибке загрузки
+        """
+        loop = asyncio.get_event_loop()
+        try:
+            await self.ensure_bucket(bucket)
+            await loop.run_in_executor(
+                None,
+                lambda: self.client.put_object(
+                    bucket,
+                    object_name,
+                    stream,
+                    length if length is not None else -1,
+                    content_type=content_type or "application/octet-stream",
+                    part_size=0 if length is not None else MIN_PART_SIZE
+                )
+            )
+            return object_name
+        except S3Error as e:
+            raise Exception(f"Ошибка загрузки файла в MinIO: {str(e)}")
+
     async def download_file(self, bucket: str, object_name: str) -> bytes:
         loop = asyncio.get_event_loop()
         try:
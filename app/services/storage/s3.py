@@ -0,0 +1,690 @@
+"""
+Нативный асинхронный S3-клиент для MinIO (aiohttp + подпись SigV4)
+"""
+import asyncio
+import base64
+import hashlib
+import inspect
+import logging
+import xml.etree.ElementTree as ET
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple, Union
+from urllib.parse import SplitResult
+
+import aiohttp
+from minio import time as s3time
+from minio.credentials import Credentials
+from minio.helpers import queryencode, quote
+from minio.signer import presign_v4, sign_v4_s3
+from yarl import URL
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Минимальный размер части multipart-загрузки в S3/MinIO
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# Допустимый диапазон срока жизни presigned URL (от 1 секунды до 7 дней)
+MIN_PRESIGN_EXPIRES = 1
+MAX_PRESIGN_EXPIRES = 7 * 24 * 3600
+
+# Размер блока при потоковом чтении объекта
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_S3_NS = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+
+
+class S3Error(Exception):
+    """Ошибка ответа S3 API"""
+
+    def __init__(self, status: int, code: str, message: str = ""):
+        self.status = status
+        self.code = code
+        self.message = message
+        super().__init__(f"{code} (HTTP {status}): {message}" if message else f"{code} (HTTP {status})")
+
+
+def _find_text(element: ET.Element, name: str) -> Optional[str]:
+    """Текст дочернего элемента XML с пространством имен S3 или без него"""
+    node = element.find(f"{_S3_NS}{name}")
+    if node is None:
+        node = element.find(name)
+    return node.text if node is not None else None
+
+
+async def _read_exactly(stream, size: int) -> bytes:
+    """
+    Читает из потока до size байт (меньше только в конце потока)
+
+    Поддерживает и асинхронные (aiohttp.StreamReader, aiofiles),
+    и синхронные file-like объекты.
+    """
+    buffer = bytearray()
+    while len(buffer) < size:
+        data = stream.read(size - len(buffer))
+        if inspect.isawaitable(data):
+            data = await data
+        if not data:
+            break
+        buffer += data
+    return bytes(buffer)
+
+
+async def _sha256_hex(data: bytes) -> str:
+    """SHA256 тела запроса; большие части хешируются вне event loop"""
+    if len(data) >= 1024 * 1024:
+        return await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest())
+    return hashlib.sha256(data).hexdigest()
+
+
+class AsyncS3Storage:
+    """
+    Асинхронное хранилище поверх S3 API MinIO
+
+    - Все экземпляры процесса работают через один aiohttp-пул соединений
+      (keep-alive к MinIO), без потоков executor на каждый запрос
+    - Чтение объекта целиком, по диапазону (Range) и потоком блоков
+    - Большие данные и потоки неизвестной длины загружаются multipart-частями
+      по MINIO_PART_SIZE, несколько частей параллельно
+    - Интерфейс совпадает с MinioStorage, поэтому класс подставляется
+      как StorageService без изменений в вызывающем коде
+    """
+
+    # Бакеты, существование которых уже проверено (общий кеш процесса)
+    _known_buckets: Set[str] = set()
+
+    # Уже установленные правила жизненного цикла: (бакет, ID, префикс, дни)
+    _known_rules: Set[Tuple[str, str, str, int]] = set()
+
+    # Общая HTTP-сессия процесса (пул соединений к MinIO)
+    _session: Optional[aiohttp.ClientSession] = None
+    _session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __init__(
+        self,
+        endpoint: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        secure: Optional[bool] = None,
+        region: Optional[str] = None,
+        part_size: Optional[int] = None,
+    ):
+        endpoint = endpoint or settings.MINIO_ENDPOINT
+        secure = settings.MINIO_SECURE if secure is None else secure
+        self.scheme = "https" if secure else "http"
+        self.netloc = endpoint.split("://", 1)[-1].rstrip("/")
+        self.region = region or settings.MINIO_REGION
+        self.credentials = Credentials(
+            access_key if access_key is not None else settings.MINIO_ACCESS_KEY,
+            secret_key if secret_key is not None else settings.MINIO_SECRET_KEY,
+        )
+        self.part_size = max(MIN_PART_SIZE, part_size or settings.MINIO_PART_SIZE)
+        self.multipart_concurrency = max(1, settings.MINIO_MULTIPART_CONCURRENCY)
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _get_session(cls) -> aiohttp.ClientSession:
+        """Получает общую HTTP-сессию процесса"""
+        loop = asyncio.get_running_loop()
+        if cls._session is None or cls._session.closed or cls._session_loop is not loop:
+            cls._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=settings.MINIO_POOL_SIZE,
+                    limit_per_host=settings.MINIO_POOL_SIZE,
+                    ttl_dns_cache=300,
+                ),
+                timeout=aiohttp.ClientTimeout(total=settings.MINIO_REQUEST_TIMEOUT, sock_connect=10),
+                auto_decompress=False,
+            )
+            cls._session_loop = loop
+        return cls._session
+
+    @classmethod
+    async def close(cls) -> None:
+        """Закрывает общую HTTP-сессию"""
+        if cls._session is not None and not cls._session.closed:
+            await cls._session.close()
+        cls._session = None
+        cls._session_loop = None
+
+    def _build_url(
+        self,
+        bucket: str,
+        object_name: Optional[str] = None,
+        query: Optional[Dict[str, str]] = None,
+    ) -> SplitResult:
+        """URL запроса в path-style с каноническим (отсортированным) query"""
+        path = f"/{bucket}"
+        if object_name:
+            path += "/" + quote(object_name.lstrip("/"))
+        query_string = "&".join(
+            f"{queryencode(key)}={queryencode(str(value))}"
+            for key, value in sorted((query or {}).items())
+        )
+        return SplitResult(self.scheme, self.netloc, path, query_string, "")
+
+    async def _request(
+        self,
+        method: str,
+        bucket: str,
+        object_name: Optional[str] = None,
+        query: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        body: bytes = b"",
+    ) -> aiohttp.ClientResponse:
+        """
+        Подписывает и отправляет запрос
+
+        Ответ возвращается непрочитанным; вызывающий отвечает за
+        release() (или использует его как async context manager).
+        Коды ответа >= 300 превращаются в S3Error.
+        """
+        url = self._build_url(bucket, object_name, query)
+        date = s3time.utcnow()
+        content_sha256 = await _sha256_hex(body)
+
+        request_headers = dict(headers or {})
+        request_headers["Host"] = url.netloc
+        request_headers["x-amz-date"] = s3time.to_amz_date(date)
+        request_headers["x-amz-content-sha256"] = content_sha256
+        request_headers = sign_v4_s3(
+            method=method,
+            url=url,
+            region=self.region,
+            headers=request_headers,
+            credentials=self.credentials,
+            content_sha256=content_sha256,
+            date=date,
+        )
+
+        response = await self._get_session().request(
+            method,
+            URL(url.geturl(), encoded=True),
+            headers=request_headers,
+            data=body if body else None,
+        )
+        if response.status >= 300:
+            try:
+                raise await self._error_from_response(response)
+            finally:
+                response.release()
+        return response
+
+    @staticmethod
+    async def _error_from_response(response: aiohttp.ClientResponse) -> S3Error:
+        """Разбирает XML-ошибку S3 (у HEAD-ответов тела нет)"""
+        code, message = "", ""
+        try:
+            payload = await response.read()
+            if payload:
+                root = ET.fromstring(payload)
+                code = _find_text(root, "Code") or ""
+                message = _find_text(root, "Message") or ""
+        except Exception:
+            pass
+        if not code:
+            code = {404: "NoSuchKey", 403: "AccessDenied"}.get(response.status, "S3Error")
+        return S3Error(response.status, code, message)
+
+    # ------------------------------------------------------------------
+    # Бакеты
+    # ------------------------------------------------------------------
+
+    async def ensure_bucket(self, bucket: str) -> None:
+        """
+        Создает бакет, если его нет
+
+        Результат кешируется на процесс: проверка выполняется один раз
+        на бакет, а не перед каждой загрузкой.
+        """
+        if bucket in self._known_buckets:
+            return
+        try:
+            response = await self._request("HEAD", bucket)
+            response.release()
+        except S3Error as e:
+            if e.status != 404:
+                raise
+            try:
+                response = await self._request("PUT", bucket)
+                response.release()
+            except S3Error as create_error:
+                if create_error.code not in ("BucketAlreadyOwnedByYou", "BucketAlreadyExists"):
+                    raise
+        self._known_buckets.add(bucket)
+
+    async def ensure_expiration_rule(self, bucket: str, rule_id: str, prefix: str, days: int) -> None:
+        """
+        Включает удаление объектов с префиксом через days дней после создания
+
+        Конфигурация жизненного цикла бакета читается и записывается
+        целиком: правило с тем же ID заменяется, остальные сохраняются.
+        Выполняется один раз на процесс.
+        """
+        marker = (bucket, rule_id, prefix, days)
+        if marker in self._known_rules:
+            return
+        await self.ensure_bucket(bucket)
+
+        try:
+            response = await self._request("GET", bucket, query={"lifecycle": ""})
+            try:
+                root = ET.fromstring(await response.read())
+            finally:
+                response.release()
+        except S3Error as e:
+            if e.code != "NoSuchLifecycleConfiguration":
+                raise
+            root = ET.Element("LifecycleConfiguration")
+
+        # Правила пишем обратно без пространства имен, как в документации S3
+        for element in root.iter():
+            element.tag = element.tag.rsplit("}", 1)[-1]
+        for rule in root.findall("Rule"):
+            if rule.findtext("ID") == rule_id:
+                root.remove(rule)
+
+        rule = ET.SubElement(root, "Rule")
+        ET.SubElement(rule, "ID").text = rule_id
+        ET.SubElement(ET.SubElement(rule, "Filter"), "Prefix").text = prefix
+        ET.SubElement(rule, "Status").text = "Enabled"
+        ET.SubElement(ET.SubElement(rule, "Expiration"), "Days").text = str(days)
+
+        body = ET.tostring(root)
+        response = await self._request(
+            "PUT", bucket,
+            query={"lifecycle": ""},
+            headers={
+                "Content-Type": "application/xml",
+                "Content-MD5": base64.b64encode(hashlib.md5(body).digest()).decode(),
+            },
+            body=body,
+        )
+        response.release()
+        self._known_rules.add(marker)
+
+    # ------------------------------------------------------------------
+    # Загрузка
+    # ------------------------------------------------------------------
+
+    async def upload_file(self, bucket: str, object_name: str, data: bytes, content_type: str = None) -> str:
+        """
+        Загружает файл в MinIO
+
+        Данные больше MINIO_PART_SIZE загружаются multipart-частями.
+
+        Args:
+            bucket: Имя бакета
+            object_name: Имя объекта (путь к файлу)
+            data: Данные файла
+            content_type: MIME тип файла
+
+        Returns:
+            str: Путь к загруженному файлу (object_name)
+
+        Raises:
+            Exception: При ошибке загрузки
+        """
+        content_type = content_type or "application/octet-stream"
+        try:
+            await self.ensure_bucket(bucket)
+            if len(data) <= self.part_size:
+                await self._put_object(bucket, object_name, bytes(data), content_type)
+            else:
+                view = memoryview(data)
+                parts = (
+                    bytes(view[offset:offset + self.part_size])
+                    for offset in range(0, len(data), self.part_size)
+                )
+                await self._multipart_upload(bucket, object_name, parts, content_type)
+            return object_name
+        except (S3Error, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise Exception(f"Ошибка загрузки файла в MinIO: {str(e)}")
+
+    async def upload_stream(
+        self,
+        bucket: str,
+        object_name: str,
+        stream,
+        length: Optional[int] = None,
+        content_type: str = None
+    ) -> str:
+        """
+        Загружает файл в MinIO из потока без буферизации целиком
+
+        Поток читается частями по MINIO_PART_SIZE: если данных не больше
+        одной части - обычный PUT, иначе multipart-загрузка. В памяти
+        одновременно не больше MINIO_MULTIPART_CONCURRENCY частей.
+
+        Args:
+            bucket: Имя бакета
+            object_name: Имя объекта (путь к файлу)
+            stream: Объект с методом read(n) - асинхронным (aiohttp.StreamReader,
+                aiofiles) или синхронным (io.BytesIO, открытый файл)
+            length: Размер данных, если известен (только для логов)
+            content_type: MIME тип файла
+
+        Returns:
+            str: Путь к загруженному файлу (object_name)
+
+        Raises:
+            Exception: При ошибке загрузки
+        """
+        content_type = content_type or "application/octet-stream"
+        try:
+            await self.ensure_bucket(bucket)
+
+            first = await _read_exactly(stream, self.part_size)
+            if len(first) < self.part_size:
+                await self._put_object(bucket, object_name, first, content_type)
+                return object_name
+
+            async def _parts():
+                chunk = first
+                while chunk:
+                    yield chunk
+                    chunk = await _read_exactly(stream, self.part_size)
+
+            await self._multipart_upload(bucket, object_name, _parts(), content_type)
+            logger.debug(f"[S3] Потоковая загрузка {bucket}/{object_name} завершена (заявлено {length} байт)")
+            return object_name
+        except (S3Error, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise Exception(f"Ошибка загрузки файла в MinIO: {str(e)}")
+
+    async def _put_object(self, bucket: str, object_name: str, data: bytes, content_type: str) -> None:
+        """Загрузка объекта одним запросом"""
+        response = await self._request(
+            "PUT", bucket, object_name,
+            headers={"Content-Type": content_type},
+            body=data,
+        )
+        response.release()
+
+    async def _multipart_upload(
+        self,
+        bucket: str,
+        object_name: str,
+        parts: Union[AsyncIterator[bytes], Iterable[bytes]],
+        content_type: str,
+    ) -> None:
+        """
+        Multipart-загрузка: части отправляются параллельно по мере чтения
+
+        При любой ошибке незавершенная загрузка отменяется (AbortMultipartUpload),
+        чтобы MinIO не хранил осиротевшие части.
+        """
+        response = await self._request(
+            "POST", bucket, object_name,
+            query={"uploads": ""},
+            headers={"Content-Type": content_type},
+        )
+        try:
+            root = ET.fromstring(await response.read())
+        finally:
+            response.release()
+        upload_id = _find_text(root, "UploadId")
+        if not upload_id:
+            raise S3Error(response.status, "InvalidResponse", "нет UploadId в ответе")
+
+        semaphore = asyncio.Semaphore(self.multipart_concurrency)
+        tasks: List[asyncio.Task] = []
+
+        async def _upload_part(number: int, data: bytes) -> Tuple[int, str]:
+            try:
+                part_response = await self._request(
+                    "PUT", bucket, object_name,
+                    query={"partNumber": str(number), "uploadId": upload_id},
+                    body=data,
+                )
+                part_response.release()
+                return number, part_response.headers.get("ETag", "")
+            finally:
+                semaphore.release()
+
+        try:
+            number = 0
+            if hasattr(parts, "__aiter__"):
+                iterator = parts
+            else:
+                async def _wrap():
+                    for item in parts:
+                        yield item
+                iterator = _wrap()
+
+            async for data in iterator:
+                number += 1
+                # Следующая часть читается только когда освободился слот
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(_upload_part(number, data)))
+
+            etags = sorted(await asyncio.gather(*tasks))
+            body = "<CompleteMultipartUpload>" + "".join(
+                f"<Part><PartNumber>{num}</PartNumber><ETag>{etag}</ETag></Part>"
+                for num, etag in etags
+            ) + "</CompleteMultipartUpload>"
+
+            response = await self._request(
+                "POST", bucket, object_name,
+                query={"uploadId": upload_id},
+                headers={"Content-Type": "application/xml"},
+                body=body.encode(),
+            )
+            try:
+                # CompleteMultipartUpload может вернуть ошибку с кодом 200
+                payload = await response.read()
+            finally:
+                response.release()
+            if payload and b"<Error>" in payload:
+                root = ET.fromstring(payload)
+                raise S3Error(200, _find_text(root, "Code") or "S3Error", _find_text(root, "Message") or "")
+
+            logger.debug(f"[S3] Multipart {bucket}/{object_name}: {number} частей")
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._abort_multipart(bucket, object_name, upload_id)
+            raise
+
+    async def _abort_multipart(self, bucket: str, object_name: str, upload_id: str) -> None:
+        """Отменяет незавершенную multipart-загрузку"""
+        try:
+            response = await self._request("DELETE", bucket, object_name, query={"uploadId": upload_id})
+            response.release()
+        except Exception as e:
+            logger.warning(f"[S3] Не удалось отменить multipart {bucket}/{object_name}: {e}")
+
+    # ------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------
+
+    async def download_file(self, bucket: str, object_name: str) -> bytes:
+        """
+        Скачивает объект целиком
+
+        Returns:
+            bytes: Содержимое объекта, b"" при ошибке
+        """
+        try:
+            response = await self._request("GET", bucket, object_name)
+            try:
+                return await response.read()
+            finally:
+                response.release()
+        except Exception as e:
+            logger.debug(f"[S3] Ошибка скачивания {bucket}/{object_name}: {e}")
+            return b""
+
+    async def download_range(self, bucket: str, object_name: str, start: int, end: Optional[int] = None) -> bytes:
+        """
+        Скачивает диапазон байт объекта (HTTP Range)
+
+        Args:
+            bucket: Имя бакета
+            object_name: Путь к объекту
+            start: Смещение первого байта
+            end: Смещение последнего байта включительно (None - до конца)
+
+        Returns:
+            bytes: Данные диапазона, b"" при ошибке
+        """
+        try:
+            response = await self._request(
+                "GET", bucket, object_name,
+                headers={"Range": self._range_header(start, end)},
+            )
+            try:
+                return await response.read()
+            finally:
+                response.release()
+        except Exception as e:
+            logger.debug(f"[S3] Ошибка скачивания диапазона {bucket}/{object_name}: {e}")
+            return b""
+
+    async def iter_object(
+        self,
+        bucket: str,
+        object_name: str,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        start: int = 0,
+        end: Optional[int] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Читает объект потоком блоков, не загружая его в память целиком
+
+        Raises:
+            S3Error: Объект не найден или недоступен
+        """
+        headers = {"Range": self._range_header(start, end)} if start or end is not None else None
+        response = await self._request("GET", bucket, object_name, headers=headers)
+        try:
+            async for chunk in response.content.iter_chunked(chunk_size):
+                yield chunk
+        finally:
+            response.release()
+
+    @staticmethod
+    def _range_header(start: int, end: Optional[int]) -> str:
+        return f"bytes={start}-{'' if end is None else end}"
+
+    async def stat_object(self, bucket: str, object_name: str) -> Optional[Dict[str, Union[int, str]]]:
+        """
+        Метаданные объекта (HEAD)
+
+        Returns:
+            Optional[Dict]: size, content_type, etag или None, если объекта нет
+        """
+        try:
+            response = await self._request("HEAD", bucket, object_name)
+            response.release()
+        except Exception:
+            return None
+        return {
+            "size": int(response.headers.get("Content-Length", 0)),
+            "content_type": response.headers.get("Content-Type", ""),
+            "etag": response.headers.get("ETag", "").strip('"'),
+        }
+
+    async def file_exists(self, bucket: str, object_name: str) -> bool:
+        """
+        Проверяет существование файла в MinIO
+
+        Args:
+            bucket: Имя bucket
+            object_name: Путь к объекту
+
+        Returns:
+            bool: True если файл существует
+        """
+        return await self.stat_object(bucket, object_name) is not None
+
+    async def list_objects_with_prefix(
+        self, bucket: str, prefix: str, limit: int = 10, recursive: bool = False
+    ) -> List[str]:
+        """
+        Получает список объектов с определенным префиксом
+
+        Как и list_objects клиента minio, по умолчанию не рекурсивно:
+        вложенные "директории" возвращаются одним путем с "/" на конце.
+
+        Args:
+            bucket: Имя bucket
+            prefix: Префикс для поиска
+            limit: Максимальное количество объектов
+            recursive: Возвращать объекты во всех вложенных путях
+
+        Returns:
+            List[str]: Список путей объектов
+        """
+        query = {"list-type": "2", "prefix": prefix, "max-keys": str(limit)}
+        if not recursive:
+            query["delimiter"] = "/"
+        try:
+            response = await self._request("GET", bucket, query=query)
+            try:
+                root = ET.fromstring(await response.read())
+            finally:
+                response.release()
+            contents = root.findall(f"{_S3_NS}Contents") or root.findall("Contents")
+            prefixes = root.findall(f"{_S3_NS}CommonPrefixes") or root.findall("CommonPrefixes")
+            names = [_find_text(item, "Key") for item in contents] + [_find_text(item, "Prefix") for item in prefixes]
+            return sorted(name for name in names if name)[:limit]
+        except Exception as e:
+            logger.debug(f"[S3] Ошибка списка объектов {bucket}/{prefix}: {e}")
+            return []
+
+    # ------------------------------------------------------------------
+    # Удаление и ссылки
+    # ------------------------------------------------------------------
+
+    async def delete_file(self, bucket: str, object_name: str) -> bool:
+        try:
+            response = await self._request("DELETE", bucket, object_name)
+            response.release()
+            return True
+        except Exception as e:
+            logger.debug(f"[S3] Ошибка удаления {bucket}/{object_name}: {e}")
+            return False
+
+    async def generate_presigned_url(self, bucket: str, object_name: str, expires: int = 3600) -> str:
+        """
+        Presigned GET URL
+
+        Подпись считается локально, без запроса к MinIO.
+        Срок жизни ограничивается диапазоном MinIO (от 1 секунды до 7 дней).
+        """
+        try:
+            expires = min(max(int(expires), MIN_PRESIGN_EXPIRES), MAX_PRESIGN_EXPIRES)
+            url = presign_v4(
+                method="GET",
+                url=self._build_url(bucket, object_name),
+                region=self.region,
+                credentials=self.credentials,
+                date=s3time.utcnow(),
+                expires=expires,
+            )
+            return url.geturl()
+        except Exception as e:
+            logger.debug(f"[S3] Ошибка presigned URL {bucket}/{object_name}: {e}")
+            return ""
+
+
+_storage_service: Optional[AsyncS3Storage] = None
+
+
+def get_storage_service() -> AsyncS3Storage:
+    """Получить хранилище процесса (Singleton)"""
+    global _storage_service
+    if _storage_service is None:
+        _storage_service = AsyncS3Storage()
+    return _storage_service
+
+
+async def shutdown_storage_service() -> None:
+    """Закрывает пул соединений хранилища"""
+    global _storage_service
+    await AsyncS3Storage.close()
+    _storage_service = None
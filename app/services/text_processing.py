@@ -5,7 +5,6 @@ import io
 import logging
 from typing import Dict, List, Optional
 
-import aiohttp
 from docx import Document
 from docx.shared import Pt, RGBColor
 
@@ -161,15 +160,17 @@ class TextProcessingService(BaseService):
             return "Для обработки текста необходимо настроить API ключ OpenAI."
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=data) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result["choices"][0]["message"]["content"]
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"GPT API error: {error_text}")
-                        return "Ошибка при обработке текста."
+            from app.core.di import get_http_client
+            async with get_http_client().request(
+                "openai", "POST", url, endpoint="openai/chat/completions", headers=headers, json=data
+            ) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    return result["choices"][0]["message"]["content"]
+                else:
+                    error_text = await response.text()
+                    logger.error(f"GPT API error: {error_text}")
+                    return "Ошибка при обработке текста."
         except Exception as e:
             logger.error(f"Error calling GPT API: {e}")
             return "Ошибка при обработке текста."
@@ -3,17 +3,19 @@
 """
 import io
 import logging
+import os
 from datetime import timedelta
 from typing import Dict, List, Optional, Union
 from uuid import UUID
 
+import aiofiles
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.database.models import UserTranscript
 from app.database.repositories import TranscriptRepository
 from app.services.base import BaseService
-from app.services.storage import StorageService
+from app.services.storage import get_storage_service
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +41,7 @@ class TranscriptService(BaseService):
     def __init__(self, session: AsyncSession):
         super().__init__(session)
         self.bucket = settings.MINIO_BUCKET_NAME or "aisha"
-        self.storage = StorageService()  # Создаем один раз как атрибут класса
+        self.storage = get_storage_service()  # Общее хранилище процесса
 
     def _setup_repositories(self):
         """Инициализация репозиториев"""
@@ -59,10 +61,13 @@ class TranscriptService(BaseService):
         user_id: Union[int, str, UUID],
         audio_data: Optional[bytes] = None,
         transcript_data: bytes = None,
-        metadata: Optional[Dict] = None
+        metadata: Optional[Dict] = None,
+        audio_path: Optional[str] = None
     ) -> Dict:
         """
         Сохраняет транскрипт и аудио в базу и MinIO
+        
+        Аудио из audio_path загружается потоком, без чтения файла в память.
         """
         normalized_user_id = _normalize_user_id(user_id)
         logger.info(f"[SAVE] Начало сохранения для user_id={normalized_user_id}")
@@ -79,15 +84,25 @@ class TranscriptService(BaseService):
         logger.info(f"[SAVE] Создана запись в БД: transcript_id={transcript_id}")
         
         # Сохраняем аудио, если есть
-        if audio_data:
+        if audio_data or audio_path:
             audio_key = f"{normalized_user_id}/{transcript_id}/audio.mp3"
             logger.info(f"[SAVE] Сохранение аудио: {audio_key}")
-            success = await self.storage.upload_file(
-                bucket=self.bucket,
-                object_name=audio_key,
-                data=audio_data,
-                content_type="audio/mpeg"
-            )
+            if audio_path:
+                async with aiofiles.open(audio_path, "rb") as f:
+                    success = await self.storage.upload_stream(
+                        bucket=self.bucket,
+                        object_name=audio_key,
+                        stream=f,
+                        length=os.path.getsize(audio_path),
+                        content_type="audio/mpeg"
+                    )
+            else:
+                success = await self.storage.upload_file(
+                    bucket=self.bucket,
+                    object_name=audio_key,
+                    data=audio_data,
+                    content_type="audio/mpeg"
+                )
             if not success:
                 logger.error(f"[SAVE] Ошибка сохранения аудио: {audio_key}")
                 return None
@@ -251,15 +266,11 @@ class TranscriptService(BaseService):
             if not transcript.transcript_key:
                 logger.error(f"[GET_CONTENT] transcript_key отсутствует для transcript_id={transcript_id}")
                 return None
-            try:
-                logger.info(f"[GET_CONTENT] Проверка существования файла в MinIO: bucket={self.bucket}, key={transcript.transcript_key}")
-                import asyncio
-                loop = asyncio.get_event_loop()
-                await loop.run_in_executor(None, lambda: self.storage.client.stat_object(self.bucket, transcript.transcript_key))
-                logger.info(f"[GET_CONTENT] Файл существует в MinIO")
-            except Exception as e:
-                logger.error(f"[GET_CONTENT] Файл не найден в MinIO: {e}")
+            logger.info(f"[GET_CONTENT] Проверка существования файла в MinIO: bucket={self.bucket}, key={transcript.transcript_key}")
+            if not await self.storage.file_exists(self.bucket, transcript.transcript_key):
+                logger.error(f"[GET_CONTENT] Файл не найден в MinIO: {transcript.transcript_key}")
                 return None
+            logger.info(f"[GET_CONTENT] Файл существует в MinIO")
             logger.info(f"[GET_CONTENT] Загрузка файла из MinIO")
             content = await self.storage.download_file(self.bucket, transcript.transcript_key)
             logger.info(f"[GET_CONTENT] Файл загружен, размер={len(content) if content else 0} байт")
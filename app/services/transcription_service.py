@@ -1,8 +1,8 @@
 """
 Платный сервис транскрибации с поддержкой определения длительности через ffmpeg
 """
-from typing import Optional, Dict, Any, Tuple
-from uuid import UUID
+from typing import Optional, Dict, Any, Tuple, Union
+from uuid import UUID, uuid4
 
 from app.core.logger import get_logger
 from app.core.config import settings
@@ -26,12 +26,12 @@ class PaidTranscriptionService(BaseService):
         self.audio_service = get_audio_service()
         self.transcript_service = TranscriptService(session)
     
-    async def calculate_cost(self, audio_data: bytes) -> Tuple[float, float]:
+    async def calculate_cost(self, audio_data: Union[bytes, str]) -> Tuple[float, float]:
         """
         Рассчитывает стоимость транскрибации
         
         Args:
-            audio_data: Аудио данные
+            audio_data: Аудио данные или путь к файлу
             
         Returns:
             Tuple[float, float]: (длительность_в_секундах, стоимость_в_монетах)
@@ -53,13 +53,13 @@ class PaidTranscriptionService(BaseService):
             logger.exception(f"Ошибка расчета стоимости: {e}")
             raise AudioProcessingError(f"Ошибка расчета стоимости: {str(e)}")
     
-    async def check_balance_and_estimate(self, user_id: UUID, audio_data: bytes) -> Dict[str, Any]:
+    async def check_balance_and_estimate(self, user_id: UUID, audio_data: Union[bytes, str]) -> Dict[str, Any]:
         """
         Проверяет баланс и оценивает стоимость транскрибации
         
         Args:
             user_id: ID пользователя
-            audio_data: Аудио данные
+            audio_data: Аудио данные или путь к файлу
             
         Returns:
             Dict: Информация о стоимости и доступности услуги
@@ -95,9 +95,10 @@ class PaidTranscriptionService(BaseService):
     async def transcribe_with_payment(
         self, 
         user_id: UUID, 
-        audio_data: bytes,
+        audio_data: Optional[bytes] = None,
         language: str = "ru",
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        audio_path: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Выполняет платную транскрибацию с списанием средств
@@ -107,13 +108,15 @@ class PaidTranscriptionService(BaseService):
             audio_data: Аудио данные
             language: Язык транскрибации
             metadata: Дополнительные метаданные
+            audio_path: Путь к аудио файлу вместо audio_data (файл не читается в память)
             
         Returns:
             Dict: Результат транскрибации с информацией о платеже
         """
+        audio_source = audio_path or audio_data
         try:
             # Проверяем баланс и рассчитываем стоимость
-            estimate = await self.check_balance_and_estimate(user_id, audio_data)
+            estimate = await self.check_balance_and_estimate(user_id, audio_source)
             
             if not estimate["can_afford"]:
                 raise InsufficientBalanceError(
@@ -122,11 +125,15 @@ class PaidTranscriptionService(BaseService):
                     f"доступно: {estimate['current_balance']} монет"
                 )
             
-            # Списываем средства
+            # Списываем средства. Один ключ возврата на списание (из ключа списания,
+            # transaction_id есть не в каждом ответе): оба пути возврата ниже не зачислят дважды
+            charge_key = f"transcription:{uuid4()}"
+            refund_key = f"refund:{charge_key}"
             payment_result = await self.balance_service.charge_balance(
                 user_id=user_id,
                 amount=estimate["cost"],
-                description=f"Транскрибация аудио ({estimate['duration_minutes']:.1f} мин)"
+                description=f"Транскрибация аудио ({estimate['duration_minutes']:.1f} мин)",
+                idempotency_key=charge_key
             )
             
             if not payment_result["success"]:
@@ -134,20 +141,27 @@ class PaidTranscriptionService(BaseService):
             
             try:
                 # Выполняем транскрибацию
-                transcription_result = await self.audio_service.process_audio(
-                    audio_data=audio_data,
-                    language=language,
-                    save_original=True,
-                    normalize=True,
-                    remove_silence=True
-                )
+                if audio_path:
+                    transcription_result = await self.audio_service.process_audio_file(
+                        audio_path,
+                        language=language
+                    )
+                else:
+                    transcription_result = await self.audio_service.process_audio(
+                        audio_data=audio_data,
+                        language=language,
+                        save_original=True,
+                        normalize=True,
+                        remove_silence=True
+                    )
                 
                 if not transcription_result.success:
                     # Если транскрибация не удалась, возвращаем деньги
                     await self.balance_service.add_balance(
                         user_id=user_id,
                         amount=estimate["cost"],
-                        description=f"Возврат за неудачную транскрибацию"
+                        description=f"Возврат за неудачную транскрибацию",
+                        idempotency_key=refund_key
                     )
                     raise AudioProcessingError(f"Ошибка транскрибации: {transcription_result.error}")
                 
@@ -169,7 +183,8 @@ class PaidTranscriptionService(BaseService):
                     user_id=user_id,
                     audio_data=audio_data,
                     transcript_data=transcription_result.text.encode('utf-8'),
-                    metadata=transcript_metadata
+                    metadata=transcript_metadata,
+                    audio_path=audio_path
                 )
                 
                 logger.info(f"Успешная платная транскрибация для пользователя {user_id}: {estimate['cost']} монет")
@@ -194,7 +209,8 @@ class PaidTranscriptionService(BaseService):
                     await self.balance_service.add_balance(
                         user_id=user_id,
                         amount=estimate["cost"],
-                        description="Возврат за неудачную транскрибацию"
+                        description="Возврат за неудачную транскрибацию",
+                        idempotency_key=refund_key
                     )
                     logger.info(f"Возвращены средства пользователю {user_id}: {estimate['cost']} монет")
                 except Exception as refund_error:
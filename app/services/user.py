@@ -1,14 +1,24 @@
 """
 Сервис для работы с пользователями
 """
-from typing import Dict, Optional
+from typing import Dict, Optional, Sequence
 from datetime import datetime, timedelta
+from uuid import UUID
 import re
 
 from app.database.models import User
-from app.database.repositories import BalanceRepository, StateRepository, UserRepository
+from app.database.repositories import (
+    BalanceRepository,
+    LedgerBatchResult,
+    LedgerEntry,
+    LedgerRepository,
+    LedgerResult,
+    StateRepository,
+    UserRepository,
+)
 from app.services.base import BaseService
 from app.services.cache_service import cache_service
+from app.services.user_identity import get_user_identity_cache, user_from_snapshot, user_snapshot
 
 
 class UserService(BaseService):
@@ -21,10 +31,13 @@ class UserService(BaseService):
         self.user_repo = UserRepository(self.session)
         self.state_repo = StateRepository(self.session)
         self.balance_repo = BalanceRepository(self.session)
+        self.ledger_repo = LedgerRepository(self.session)
 
     async def register_user(self, telegram_data: Dict) -> User:
         """
         Регистрация нового пользователя или обновление существующего
+        
+        Один upsert по telegram_id вместо чтения и последующей записи.
         """
         import logging
         
@@ -38,8 +51,6 @@ class UserService(BaseService):
             logging.error(f"Невозможно зарегистрировать пользователя без telegram_id: {telegram_data}")
             return None
             
-        user = await self.user_repo.get_by_telegram_id(telegram_id)
-        
         # Получаем часовой пояс из сообщения пользователя, если он есть
         timezone = None
         if "location" in telegram_data and "user_location" in telegram_data["location"]:
@@ -57,57 +68,32 @@ class UserService(BaseService):
             "is_blocked": telegram_data.get("is_blocked", False),  # Добавляем поле is_blocked
         }
         
-        # Фильтруем None значения для обновления
-        if user:
-            # Для обновления исключаем None значения, кроме явно разрешенных полей
-            user_data = {k: v for k, v in user_data.items() if v is not None or k in ['last_name', 'username']}
-        
         # Добавляем часовой пояс, только если он был определен
         if timezone:
             user_data["timezone"] = timezone
-
-        if user:
-            updated_user = await self.user_repo.update(user.id, user_data)
-            # ✅ Обновляем кеш пользователя
-            if updated_user:
-                await cache_service.cache_user(telegram_id, {
-                    "id": str(updated_user.id),
-                    "telegram_id": updated_user.telegram_id,
-                    "first_name": updated_user.first_name,
-                    "last_name": updated_user.last_name,
-                    "username": updated_user.username,
-                    "language_code": updated_user.language_code,
-                    "is_premium": updated_user.is_premium,
-                    "timezone": updated_user.timezone,
-                    "created_at": updated_user.created_at,
-                    "updated_at": updated_user.updated_at
-                })
-            return updated_user
+        
+        # У существующего обновляем данные из Telegram: None не затирает значение,
+        # кроме явно разрешенных полей; блокировку регистрация не снимает
+        update_fields = tuple(
+            k for k, v in user_data.items()
+            if k not in ("telegram_id", "is_blocked") and (v is not None or k in ["last_name", "username"])
+        )
         
         try:
-            user = await self.user_repo.create(user_data)
-            await self.balance_repo.create({"user_id": user.id, "coins": 0.0})
+            # Один запрос и для нового, и для существующего пользователя
+            user, created = await self.user_repo.upsert_by_telegram_id(user_data, update_fields)
             
-            # ✅ Кешируем нового пользователя
-            if user:
-                await cache_service.cache_user(telegram_id, {
-                    "id": str(user.id),
-                    "telegram_id": user.telegram_id,
-                    "first_name": user.first_name,
-                    "last_name": user.last_name,
-                    "username": user.username,
-                    "language_code": user.language_code,
-                    "is_premium": user.is_premium,
-                    "timezone": user.timezone,
-                    "created_at": user.created_at,
-                    "updated_at": user.updated_at
-                })
+            if created:
+                await self.balance_repo.create({"user_id": user.id, "coins": 0.0})
                 # ✅ Кешируем начальный баланс
                 await cache_service.cache_user_balance(user.id, 0.0)
             
+            # ✅ Обновляем кеш пользователя во всех процессах
+            await get_user_identity_cache().store(user)
+            
             return user
         except Exception as e:
-            logging.error(f"Ошибка при создании пользователя: {e}")
+            logging.error(f"Ошибка при регистрации пользователя: {e}")
             return None
 
     async def get_user(self, user_id: int) -> Optional[User]:
@@ -121,39 +107,17 @@ class UserService(BaseService):
         
         # ✅ Проверяем кеш сначала
         cached_user_data = await cache_service.get_cached_user(telegram_id_str)
-        if cached_user_data:
+        if cached_user_data and cached_user_data.get("id"):
             # Восстанавливаем объект User из кешированных данных
             # Это не полный объект, но содержит основные поля
-            user = User()
-            user.id = cached_user_data["id"]
-            user.telegram_id = cached_user_data["telegram_id"]
-            user.first_name = cached_user_data["first_name"]
-            user.last_name = cached_user_data.get("last_name")
-            user.username = cached_user_data.get("username")
-            user.language_code = cached_user_data.get("language_code", "ru")
-            user.is_premium = cached_user_data.get("is_premium", False)
-            user.timezone = cached_user_data.get("timezone")
-            user.created_at = cached_user_data.get("created_at")
-            user.updated_at = cached_user_data.get("updated_at")
-            return user
+            return user_from_snapshot(cached_user_data)
         
         # ✅ Если не в кеше, запрашиваем из БД
         user = await self.user_repo.get_by_telegram_id(telegram_id_str)
         
         # ✅ Кешируем результат
         if user:
-            await cache_service.cache_user(telegram_id_str, {
-                "id": str(user.id),
-                "telegram_id": user.telegram_id,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "username": user.username,
-                "language_code": user.language_code,
-                "is_premium": user.is_premium,
-                "timezone": user.timezone,
-                "created_at": user.created_at,
-                "updated_at": user.updated_at
-            })
+            await cache_service.cache_user(telegram_id_str, user_snapshot(user))
         
         return user
     
@@ -179,9 +143,9 @@ class UserService(BaseService):
         user = await self.get_user_by_telegram_id(user_id)
         if user:
             updated_user = await self.user_repo.update(user.id, {"timezone": timezone})
-            # ✅ Сбрасываем кеш пользователя при обновлении
+            # ✅ Сбрасываем кеш пользователя при обновлении (во всех процессах)
             if updated_user:
-                await cache_service.delete(f"user:{user.telegram_id}")
+                await get_user_identity_cache().store(updated_user)
             return updated_user
         return None
     
@@ -266,27 +230,57 @@ class UserService(BaseService):
 
     async def add_coins(self, user_id: int, amount: float) -> float:
         """Добавить монеты пользователю"""
-        balance = await self.balance_repo.add_coins(user_id, amount)
-        new_balance = balance.coins
-        
-        # ✅ Обновляем кеш баланса
-        await cache_service.cache_user_balance(user_id, new_balance)
-        
-        return new_balance
+        result = await self.credit(user_id, amount, kind="credit")
+        return result.balance
 
     async def remove_coins(self, user_id: int, amount: float) -> Optional[float]:
         """Снять монеты с баланса пользователя"""
-        balance = await self.balance_repo.remove_coins(user_id, amount)
-        
-        if balance:
-            new_balance = balance.coins
-            # ✅ Обновляем кеш баланса
-            await cache_service.cache_user_balance(user_id, new_balance)
-            return new_balance
+        result = await self.charge(user_id, amount, kind="debit")
+        return result.balance if result.applied else None
+
+    async def charge(
+        self,
+        user_id: UUID,
+        amount: float,
+        kind: str = "charge",
+        description: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> LedgerResult:
+        """
+        Атомарно списать монеты (один запрос, без чтения баланса заранее)
+
+        Returns:
+            LedgerResult: applied=False - недостаточно средств или повтор по ключу
+        """
+        result = await self.ledger_repo.apply(user_id, -amount, kind, description, idempotency_key)
+        await self._sync_balance_cache(user_id, result)
+        return result
+
+    async def credit(
+        self,
+        user_id: UUID,
+        amount: float,
+        kind: str = "credit",
+        description: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> LedgerResult:
+        """Атомарно зачислить монеты; повтор с тем же ключом не зачисляет второй раз"""
+        result = await self.ledger_repo.apply(user_id, amount, kind, description, idempotency_key)
+        await self._sync_balance_cache(user_id, result)
+        return result
+
+    async def credit_many(self, entries: Sequence[LedgerEntry]) -> LedgerBatchResult:
+        """Пакетное зачисление (возвраты) одной транзакцией"""
+        result = await self.ledger_repo.apply_many(entries)
+        for user_id, balance in result.balances.items():
+            await cache_service.cache_user_balance(user_id, balance)
+        return result
+
+    async def _sync_balance_cache(self, user_id: UUID, result: LedgerResult) -> None:
+        if result.balance is not None:
+            await cache_service.cache_user_balance(user_id, result.balance)
         else:
-            # ✅ Сбрасываем кеш при ошибке
             await cache_service.delete(f"balance:{user_id}")
-            return None
 
     async def has_enough_coins(self, user_id: int, amount: float) -> bool:
         """Проверить, достаточно ли монет у пользователя"""
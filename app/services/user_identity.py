@@ -0,0 +1,294 @@
+"""
+Определение пользователя по Telegram ID: LRU процесса -> Redis -> БД
+
+Пользователь определяется один раз на обновление (UserMiddleware) и
+доступен обработчикам через data["user"] и get_current_user(). Декораторы
+и BaseHandler берут его оттуда вместо собственного запроса к БД.
+"""
+import asyncio
+import json
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Optional, Union
+from uuid import UUID
+
+from aiogram.types import User as TelegramUser
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.lru import TTLCache
+from app.core.resources import QueueNames
+from app.database.models import User
+from app.services.cache_service import cache_service
+
+logger = get_logger(__name__)
+
+# Пользователь текущего обновления (ставит UserMiddleware)
+current_user: ContextVar[Optional[User]] = ContextVar("current_user", default=None)
+
+# Поля снимка пользователя в кеше (совместимы с ключом user:{telegram_id} UserService)
+_SNAPSHOT_FIELDS = (
+    "id", "telegram_id", "first_name", "last_name", "username", "language_code",
+    "is_premium", "is_bot", "is_blocked", "timezone", "created_at", "updated_at",
+)
+_DATETIME_FIELDS = ("created_at", "updated_at")
+
+
+def user_snapshot(user: User) -> Dict[str, Any]:
+    """Снимок полей пользователя для кеша"""
+    snapshot = {field: getattr(user, field, None) for field in _SNAPSHOT_FIELDS}
+    snapshot["id"] = str(snapshot["id"])
+    return snapshot
+
+
+def user_from_snapshot(snapshot: Dict[str, Any]) -> User:
+    """
+    Восстанавливает пользователя из снимка
+
+    Объект не привязан к сессии - для изменений пользователя нужен
+    запрос через UserService.
+    """
+    user = User()
+    for field in _SNAPSHOT_FIELDS:
+        if field not in snapshot:
+            continue
+        value = snapshot[field]
+        if field == "id" and value is not None and not isinstance(value, UUID):
+            value = UUID(str(value))
+        elif field in _DATETIME_FIELDS and isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                value = None
+        setattr(user, field, value)
+    return user
+
+
+def telegram_user_data(tg_user: TelegramUser) -> Dict[str, Any]:
+    """Данные Telegram-пользователя для регистрации"""
+    return {
+        "id": tg_user.id,
+        "first_name": tg_user.first_name,
+        "last_name": tg_user.last_name,
+        "username": tg_user.username,
+        "language_code": tg_user.language_code,
+        "is_premium": getattr(tg_user, "is_premium", False),
+        "is_bot": tg_user.is_bot,
+    }
+
+
+class UserIdentityCache:
+    """
+    Двухуровневый кеш пользователей
+
+    - L1: LRU процесса с коротким TTL, снимки полей (не ORM-объекты)
+    - L2: Redis, ключ user:{telegram_id} (общий с UserService)
+    - Промах: один upsert в БД (UserService.register_user)
+
+    Изменение профиля сбрасывает запись в Redis и публикует telegram_id
+    в канал - остальные процессы удаляют ее из своего LRU.
+    """
+
+    def __init__(
+        self,
+        maxsize: Optional[int] = None,
+        ttl: Optional[float] = None,
+        channel: str = QueueNames.USER_INVALIDATIONS,
+    ):
+        self.local: TTLCache[Dict[str, Any]] = TTLCache(
+            maxsize or settings.USER_CACHE_L1_SIZE,
+            settings.USER_CACHE_L1_TTL if ttl is None else ttl,
+        )
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    async def resolve(self, tg_user: TelegramUser, auto_register: bool = True) -> Optional[User]:
+        """
+        Пользователь бота для Telegram-пользователя
+
+        Одновременные запросы одного пользователя (пачка обновлений)
+        ждут один поход в Redis/БД.
+        """
+        key = str(tg_user.id)
+        snapshot = self.local.get(key)
+        if snapshot is not None:
+            return user_from_snapshot(snapshot)
+
+        self._ensure_listener()
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            # wait() не отменяет чужую загрузку и бросает CancelledError,
+            # только если отменили этот запрос
+            await asyncio.wait({pending})
+            if pending.cancelled():
+                # Отменили ведущий запрос - загружаем сами
+                return await self.resolve(tg_user, auto_register)
+            snapshot = pending.result()
+            return user_from_snapshot(snapshot) if snapshot else None
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            snapshot = await self._load(tg_user, auto_register)
+            future.set_result(snapshot)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Исключение получат ожидающие; здесь не даем ему остаться "не полученным"
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        return user_from_snapshot(snapshot) if snapshot else None
+
+    async def _load(self, tg_user: TelegramUser, auto_register: bool) -> Optional[Dict[str, Any]]:
+        key = str(tg_user.id)
+
+        snapshot = await cache_service.get_cached_user(key)
+        if snapshot and snapshot.get("id"):
+            self.local.set(key, snapshot)
+            return snapshot
+
+        from app.core.di import get_user_service
+
+        async with get_user_service() as user_service:
+            if auto_register:
+                # Один upsert и для нового, и для существующего пользователя
+                user = await user_service.register_user(telegram_user_data(tg_user))
+            else:
+                user = await user_service.user_repo.get_by_telegram_id(key)
+
+        if user is None:
+            return None
+
+        snapshot = user_snapshot(user)
+        self.local.set(key, snapshot)
+        return snapshot
+
+    async def store(self, user: User) -> None:
+        """
+        Запоминает актуальные данные пользователя (после изменения профиля)
+
+        Обновляет Redis и свой LRU, остальным процессам рассылает сброс.
+        """
+        key = str(user.telegram_id)
+        snapshot = user_snapshot(user)
+        self.local.set(key, snapshot)
+        await cache_service.cache_user(key, snapshot)
+        await self._broadcast(key)
+
+    async def invalidate(self, telegram_id: Union[str, int]) -> None:
+        """Сбрасывает пользователя во всех процессах"""
+        key = str(telegram_id)
+        self.local.pop(key)
+        await cache_service.delete(f"user:{key}")
+        await self._broadcast(key)
+
+    async def _broadcast(self, key: str) -> None:
+        try:
+            from app.core.di import get_redis
+            redis = await get_redis()
+            await redis.publish(self.channel, json.dumps({"telegram_id": key, "origin": self.origin}))
+        except Exception as e:
+            # Другие процессы увидят изменение по истечении TTL записи LRU
+            logger.warning(f"[User Cache] Не удалось разослать сброс пользователя {key}: {e}")
+
+    def _ensure_listener(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        """Удаляет из LRU пользователей, измененных в других процессах"""
+        from app.core.di import get_redis
+
+        backoff = 1.0
+        while True:
+            pubsub = None
+            try:
+                redis = await get_redis()
+                pubsub = redis.pubsub()
+                await pubsub.subscribe(self.channel)
+                backoff = 1.0
+                # Пока не было подписки, сбросы могли потеряться
+                self.local.clear()
+
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    try:
+                        event = json.loads(message["data"])
+                        if event.get("origin") != self.origin:
+                            self.local.pop(str(event["telegram_id"]))
+                    except (ValueError, KeyError, TypeError) as e:
+                        logger.debug(f"[User Cache] Некорректное сообщение сброса: {e}")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Без подписки записи LRU живут не дольше TTL
+                logger.warning(f"[User Cache] Ошибка подписки, повтор через {backoff:.0f}с: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    async def close(self) -> None:
+        """Останавливает подписку"""
+        if self._listener and not self._listener.done():
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        self._listener = None
+
+
+_identity_cache: Optional[UserIdentityCache] = None
+
+
+def get_user_identity_cache() -> UserIdentityCache:
+    """Получить кеш пользователей процесса (Singleton)"""
+    global _identity_cache
+    if _identity_cache is None:
+        _identity_cache = UserIdentityCache()
+    return _identity_cache
+
+
+async def shutdown_user_identity_cache() -> None:
+    """Останавливает подписку кеша пользователей, если он был создан"""
+    global _identity_cache
+    if _identity_cache is not None:
+        await _identity_cache.close()
+        _identity_cache = None
+
+
+def get_current_user(telegram_id: Optional[int] = None) -> Optional[User]:
+    """
+    Пользователь, определенный middleware для текущего обновления
+
+    Args:
+        telegram_id: Если передан - пользователь возвращается только при совпадении
+    """
+    user = current_user.get()
+    if user is None:
+        return None
+    if telegram_id is not None and str(user.telegram_id) != str(telegram_id):
+        return None
+    return user
+
+
+async def resolve_user(tg_user: TelegramUser, auto_register: bool = True) -> Optional[User]:
+    """Пользователь текущего обновления или из кеша, если middleware не отработал"""
+    user = get_current_user(tg_user.id)
+    if user is not None:
+        return user
+    return await get_user_identity_cache().resolve(tg_user, auto_register=auto_register)
@@ -11,6 +11,7 @@ from aiogram.fsm.context import FSMContext
 
 from app.core.di import get_user_service, get_avatar_service
 from app.core.logger import get_logger
+from app.services.user_identity import resolve_user
 
 logger = get_logger(__name__)
 
@@ -41,52 +42,33 @@ def require_user(show_error: bool = True, auto_register: bool = True):
             if not callback and not message:
                 raise ValueError("Декоратор require_user требует CallbackQuery или Message в аргументах")
             
-            # Получаем пользователя
-            user_telegram_id = (callback or message).from_user.id
-            
             try:
-                async with get_user_service() as user_service:
-                    user = await user_service.get_user_by_telegram_id(str(user_telegram_id))
-                    
-                    if not user and auto_register:
-                        # Автоматически регистрируем пользователя
-                        telegram_user_data = {
-                            "id": user_telegram_id,
-                            "first_name": (callback or message).from_user.first_name,
-                            "last_name": (callback or message).from_user.last_name,
-                            "username": (callback or message).from_user.username,
-                            "language_code": (callback or message).from_user.language_code,
-                            "is_premium": getattr((callback or message).from_user, 'is_premium', False),
-                            "is_bot": (callback or message).from_user.is_bot,
-                        }
-                        
-                        user = await user_service.register_user(telegram_user_data)
-                        if user:
-                            logger.info(f"Автоматически зарегистрирован пользователь: {user.telegram_id}")
-                        else:
-                            logger.error(f"Не удалось зарегистрировать пользователя {user_telegram_id}")
-                    
-                    if not user:
-                        if show_error:
-                            error_msg = "❌ Произошла ошибка. Попробуйте команду /start"
-                            if callback:
+                # Пользователь уже определен UserMiddleware (или передан aiogram из data)
+                user = kwargs.get('user') or await resolve_user(
+                    (callback or message).from_user, auto_register=auto_register
+                )
+                
+                if not user:
+                    if show_error:
+                        error_msg = "❌ Произошла ошибка. Попробуйте команду /start"
+                        if callback:
+                            try:
+                                await callback.answer(error_msg, show_alert=True)
+                            except Exception as callback_error:
+                                # Если callback.answer() не работает (timeout/expired), логируем и игнорируем
+                                logger.warning(f"Не удалось ответить на callback: {callback_error}")
+                                # Пытаемся отправить сообщение в чат
                                 try:
-                                    await callback.answer(error_msg, show_alert=True)
-                                except Exception as callback_error:
-                                    # Если callback.answer() не работает (timeout/expired), логируем и игнорируем
-                                    logger.warning(f"Не удалось ответить на callback: {callback_error}")
-                                    # Пытаемся отправить сообщение в чат
-                                    try:
-                                        await callback.message.answer(error_msg)
-                                    except Exception:
-                                        pass  # Если и это не работает, просто игнорируем
-                            else:
-                                await message.reply(error_msg)
-                        return
-                    
-                    # Добавляем пользователя в kwargs
-                    kwargs['user'] = user
-                    return await func(*args, **kwargs)
+                                    await callback.message.answer(error_msg)
+                                except Exception:
+                                    pass  # Если и это не работает, просто игнорируем
+                        else:
+                            await message.reply(error_msg)
+                    return
+                
+                # Добавляем пользователя в kwargs
+                kwargs['user'] = user
+                return await func(*args, **kwargs)
                     
             except Exception as e:
                 logger.exception(f"Ошибка в декораторе require_user: {e}")
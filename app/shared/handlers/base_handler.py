@@ -11,6 +11,7 @@ from aiogram.fsm.context import FSMContext
 from app.core.di import get_user_service, get_avatar_service
 from app.core.logger import get_logger
 from app.database.models import User, Avatar
+from app.services.user_identity import resolve_user
 
 logger = get_logger(__name__)
 
@@ -36,33 +37,13 @@ class BaseHandler:
             User объект или None если не найден
         """
         try:
-            user_telegram_id = callback.from_user.id
+            # Пользователь уже определен UserMiddleware для этого обновления
+            user = await resolve_user(callback.from_user, auto_register=auto_register)
             
-            async with get_user_service() as user_service:
-                user = await user_service.get_user_by_telegram_id(str(user_telegram_id))
-                
-                if not user and auto_register:
-                    # Автоматически регистрируем пользователя
-                    telegram_user_data = {
-                        "id": callback.from_user.id,
-                        "first_name": callback.from_user.first_name,
-                        "last_name": callback.from_user.last_name,
-                        "username": callback.from_user.username,
-                        "language_code": callback.from_user.language_code,
-                        "is_premium": getattr(callback.from_user, 'is_premium', False),
-                        "is_bot": callback.from_user.is_bot,
-                    }
-                    
-                    user = await user_service.register_user(telegram_user_data)
-                    if user:
-                        logger.info(f"Автоматически зарегистрирован пользователь: {user.telegram_id}")
-                    else:
-                        logger.error(f"Не удалось зарегистрировать пользователя {callback.from_user.id}")
+            if not user and show_error:
+                await callback.answer("❌ Произошла ошибка. Попробуйте команду /start", show_alert=True)
                 
-                if not user and show_error:
-                    await callback.answer("❌ Произошла ошибка. Попробуйте команду /start", show_alert=True)
-                    
-                return user
+            return user
                 
         except Exception as e:
             logger.exception(f"Ошибка получения пользователя: {e}")
@@ -88,33 +69,13 @@ class BaseHandler:
             User объект или None если не найден
         """
         try:
-            user_telegram_id = message.from_user.id
+            # Пользователь уже определен UserMiddleware для этого обновления
+            user = await resolve_user(message.from_user, auto_register=auto_register)
             
-            async with get_user_service() as user_service:
-                user = await user_service.get_user_by_telegram_id(str(user_telegram_id))
-                
-                if not user and auto_register:
-                    # Автоматически регистрируем пользователя
-                    telegram_user_data = {
-                        "id": message.from_user.id,
-                        "first_name": message.from_user.first_name,
-                        "last_name": message.from_user.last_name,
-                        "username": message.from_user.username,
-                        "language_code": message.from_user.language_code,
-                        "is_premium": getattr(message.from_user, 'is_premium', False),
-                        "is_bot": message.from_user.is_bot,
-                    }
-                    
-                    user = await user_service.register_user(telegram_user_data)
-                    if user:
-                        logger.info(f"Автоматически зарегистрирован пользователь: {user.telegram_id}")
-                    else:
-                        logger.error(f"Не удалось зарегистрировать пользователя {message.from_user.id}")
+            if not user and show_error:
+                await message.reply("❌ Произошла ошибка. Попробуйте команду /start")
                 
-                if not user and show_error:
-                    await message.reply("❌ Произошла ошибка. Попробуйте команду /start")
-                    
-                return user
+            return user
                 
         except Exception as e:
             logger.exception(f"Ошибка получения пользователя: {e}")
@@ -0,0 +1,46 @@
+"""
+Outer middleware: пользователь бота определяется один раз на обновление
+"""
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.core.logger import get_logger
+from app.services.user_identity import current_user, get_user_identity_cache
+
+logger = get_logger(__name__)
+
+
+class UserMiddleware(BaseMiddleware):
+    """
+    Кладет пользователя в data["user"] и в current_user
+
+    Регистрируется на dp.update после UserContextMiddleware aiogram, поэтому
+    Telegram-пользователь уже в data["event_from_user"]. Пользователь
+    берется из LRU процесса, затем из Redis; новый регистрируется одним upsert.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        tg_user = data.get("event_from_user")
+        if tg_user is None or tg_user.is_bot:
+            return await handler(event, data)
+
+        try:
+            user = await get_user_identity_cache().resolve(tg_user)
+        except Exception as e:
+            # Обработчики с require_user попробуют сами и покажут ошибку
+            logger.warning(f"[User Middleware] Не удалось определить пользователя {tg_user.id}: {e}")
+            user = None
+
+        data["user"] = user
+        token = current_user.set(user)
+        try:
+            return await handler(event, data)
+        finally:
+            current_user.reset(token)
@@ -0,0 +1,100 @@
+"""
+Сборка альбомов (media group) Telegram в один пакет
+
+Telegram присылает альбом отдельными сообщениями с общим media_group_id.
+Коллектор копит их и передает обработчику одним списком, когда сообщения
+перестают приходить. Хендлер сообщения при этом сразу возвращается:
+обновления чата выполняются по очереди (ChatSequencer), и ожидание внутри
+хендлера задержало бы остальные фото альбома.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from aiogram.types import Message
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Больше фото в одном альбоме Telegram не бывает
+MEDIA_GROUP_MAX_SIZE = 10
+
+
+class _PendingGroup:
+    """Накопленные сообщения альбома и таймер его отправки"""
+
+    __slots__ = ("messages", "context", "timer")
+
+    def __init__(self, context: Tuple[Any, ...]):
+        self.messages: List[Message] = []
+        self.context = context
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MediaGroupCollector:
+    """
+    Копит сообщения альбома и вызывает flush(messages, *context) один раз
+
+    - Пакет отправляется через delay секунд после последнего сообщения
+      альбома или сразу при MEDIA_GROUP_MAX_SIZE сообщениях
+    - context - аргументы первого сообщения (state, bot и т.п.)
+    - Сообщения в пакете упорядочены по message_id
+    """
+
+    def __init__(
+        self,
+        flush: Callable[..., Awaitable[None]],
+        delay: float = 1.0,
+        max_size: int = MEDIA_GROUP_MAX_SIZE,
+    ):
+        self._flush = flush
+        self.delay = delay
+        self.max_size = max_size
+        self._groups: Dict[Tuple[int, str], _PendingGroup] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def add(self, message: Message, *context: Any) -> None:
+        """Добавляет сообщение альбома; не ждет обработки пакета"""
+        key = (message.chat.id, message.media_group_id)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _PendingGroup(context)
+
+        group.messages.append(message)
+        if group.timer is not None:
+            group.timer.cancel()
+
+        if len(group.messages) >= self.max_size:
+            self._dispatch(key)
+        else:
+            group.timer = asyncio.get_running_loop().call_later(self.delay, self._dispatch, key)
+
+    def _dispatch(self, key: Tuple[int, str]) -> None:
+        group = self._groups.pop(key, None)
+        if group is None:
+            return
+        if group.timer is not None:
+            group.timer.cancel()
+
+        messages = sorted(group.messages, key=lambda m: m.message_id)
+        task = asyncio.create_task(self._run(key, messages, group.context))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Tuple[int, str], messages: List[Message], context: Tuple[Any, ...]) -> None:
+        try:
+            await self._flush(messages, *context)
+        except Exception as e:
+            logger.exception(f"Ошибка обработки альбома {key[1]} ({len(messages)} сообщений): {e}")
+
+    @property
+    def pending(self) -> int:
+        """Альбомов в ожидании и в обработке"""
+        return len(self._groups) + len(self._tasks)
+
+    async def drain(self) -> None:
+        """Отправляет накопленные альбомы и ждет их обработки"""
+        for key in list(self._groups):
+            self._dispatch(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -19,6 +19,7 @@ class BackgroundWorker:
     def __init__(self):
         self.is_running = False
         self.tasks: list = []
+        self.job_worker = None
         
     async def start(self):
         """Запуск фонового воркера"""
@@ -30,6 +31,12 @@ class BackgroundWorker:
         signal.signal(signal.SIGTERM, self._signal_handler)
         signal.signal(signal.SIGINT, self._signal_handler)
         
+        # Очереди фоновых задач (генерации и т.д.) читаются параллельно основному циклу
+        from app.workers.job_worker import JobWorker
+        from app.workers.jobs import JOB_HANDLERS, JOB_QUEUES
+        self.job_worker = JobWorker(JOB_HANDLERS, JOB_QUEUES)
+        self.tasks.append(asyncio.create_task(self.job_worker.start()))
+        
         try:
             # Запускаем основные задачи
             await self._run_worker_tasks()
@@ -37,6 +44,8 @@ class BackgroundWorker:
         except Exception as e:
             logger.error(f"❌ Ошибка в Background Worker: {e}")
             raise
+        finally:
+            await self.stop()
         
     async def _run_worker_tasks(self):
         """Основной цикл выполнения задач"""
@@ -95,14 +104,15 @@ class BackgroundWorker:
     async def _process_background_tasks(self):
         """Обработка фоновых задач"""
         try:
-            # Здесь можно добавить обработку задач из очереди Redis
-            # Например:
-            # - Отправка отложенных сообщений
-            # - Обработка webhook-ов
-            # - Генерация статистики
-            # - Backup задачи
+            # Сами задачи выполняет JobWorker, здесь - состояние очередей
+            from app.core.job_queue import get_job_queue
+            from app.workers.jobs import JOB_QUEUES
             
-            logger.debug("🔄 Проверка фоновых задач...")
+            for queue_name in JOB_QUEUES:
+                stats = await get_job_queue().stats(queue_name)
+                logger.debug(f"🔄 Очередь {queue_name}: {stats}")
+                if stats["dead"]:
+                    logger.warning(f"⚠️ В dead letter очереди {queue_name} задач: {stats['dead']}")
             
         except Exception as e:
             logger.error(f"❌ Ошибка обработки фоновых задач: {e}")
@@ -117,6 +127,11 @@ class BackgroundWorker:
         logger.info("🛑 Остановка Background Worker...")
         self.is_running = False
         
+        # Воркер задач дожидается выполняемых задач, остальные вернутся в очередь
+        if self.job_worker is not None:
+            await self.job_worker.stop()
+            self.job_worker = None
+        
         # Отменяем все задачи
         for task in self.tasks:
             if not task.done():
@@ -0,0 +1,259 @@
+"""
+Воркер очереди фоновых задач (BOT_MODE=worker)
+
+Читает стримы очередей через группу потребителей и выполняет задачи
+обработчиками по их типу. Можно запускать на отдельных хостах в любом
+количестве реплик.
+"""
+import asyncio
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from app.core.config import settings
+from app.core.job_queue import JOB_GROUP, Job, JobQueue, PermanentJobError, get_job_queue
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Блокировка XREADGROUP в ожидании новых задач (мс)
+READ_BLOCK_MS = 5000
+
+# Проверка отложенных задач (сек)
+PROMOTE_INTERVAL = 1.0
+
+JobHandler = Callable[[Job], Awaitable[None]]
+
+
+class JobWorker:
+    """
+    Потребитель очередей задач
+
+    - Задача подтверждается (XACK) после успешного выполнения
+    - Ошибка обработчика: повтор с экспоненциальным backoff через
+      отложенный ZSET, после JOB_MAX_ATTEMPTS - dead letter стрим
+    - Пока задача выполняется, воркер продлевает ее видимость (XCLAIM
+      на себя); задачи упавших воркеров, не продленные дольше
+      visibility timeout, забираются XAUTOCLAIM и считаются неудачной попыткой
+    - Не больше JOB_WORKER_CONCURRENCY задач в обработке
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, JobHandler],
+        queues: Iterable[str],
+        queue: Optional[JobQueue] = None,
+        concurrency: Optional[int] = None,
+        visibility_timeout: Optional[float] = None,
+    ):
+        self.handlers = handlers
+        self.queues = list(queues)
+        self.queue = queue or get_job_queue()
+        self.concurrency = max(1, concurrency or settings.JOB_WORKER_CONCURRENCY)
+        self.visibility_timeout = max(3.0, visibility_timeout or settings.JOB_VISIBILITY_TIMEOUT)
+
+        self.consumer = f"{settings.INSTANCE_ID}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._in_flight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._capacity = asyncio.Event()
+        self._capacity.set()
+        self._running = False
+        self._maintenance_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Запускает воркер и обрабатывает задачи до stop()"""
+        logger.info(f"🔄 Запуск воркера задач {self.consumer}: {', '.join(self.queues)}")
+        self._running = True
+        self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+        try:
+            await self._consume_loop()
+        finally:
+            await self.stop()
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Прекращает чтение и дожидается выполняемых задач"""
+        if not self._running and self._maintenance_task is None:
+            return
+        self._running = False
+        self._capacity.set()
+
+        if self._in_flight:
+            _, pending = await asyncio.wait(list(self._in_flight.values()), timeout=timeout)
+            if pending:
+                # Незавершенные к сроку задачи отменяем: без ack они останутся
+                # в pending потока и достанутся другим воркерам
+                logger.warning(f"[JobWorker] Отменяем {len(pending)} незавершенных задач")
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            await asyncio.gather(self._maintenance_task, return_exceptions=True)
+            self._maintenance_task = None
+
+        logger.info(f"✅ Воркер задач {self.consumer} остановлен")
+
+    # ------------------------------------------------------------------
+    # Чтение и выполнение
+    # ------------------------------------------------------------------
+
+    async def _consume_loop(self) -> None:
+        groups_ready = False
+        while self._running:
+            try:
+                if not groups_ready:
+                    for name in self.queues:
+                        await self.queue.ensure_group(name)
+                    groups_ready = True
+
+                free = self.concurrency - len(self._in_flight)
+                if free <= 0:
+                    self._capacity.clear()
+                    await self._capacity.wait()
+                    continue
+
+                redis = await self.queue.get_redis()
+                response = await redis.xreadgroup(
+                    JOB_GROUP, self.consumer, {name: ">" for name in self.queues},
+                    count=free, block=READ_BLOCK_MS,
+                )
+                for stream, entries in response or []:
+                    for entry_id, fields in entries:
+                        self._dispatch(_decode(stream), _decode(entry_id), fields)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[JobWorker] Ошибка чтения задач: {e}")
+                await asyncio.sleep(1)
+
+    def _dispatch(self, queue_name: str, entry_id: str, fields) -> None:
+        key = (queue_name, entry_id)
+        task = asyncio.create_task(self._run(queue_name, entry_id, fields))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._done(key))
+
+    def _done(self, key: Tuple[str, str]) -> None:
+        self._in_flight.pop(key, None)
+        self._capacity.set()
+
+    async def _run(self, queue_name: str, entry_id: str, fields) -> None:
+        raw = _field(fields, "job")
+        try:
+            job = Job.loads(raw)
+        except Exception as e:
+            logger.error(f"[JobWorker] Некорректная запись {entry_id} в {queue_name}: {e}")
+            await self._safe(self.queue.ack(queue_name, entry_id))
+            return
+
+        handler = self.handlers.get(job.type)
+        if handler is None:
+            await self._safe(self.queue.fail(
+                queue_name, entry_id, job, f"Нет обработчика задач типа {job.type}", retryable=False
+            ))
+            return
+
+        started = time.monotonic()
+        try:
+            await handler(job)
+        except PermanentJobError as e:
+            await self._safe(self.queue.fail(queue_name, entry_id, job, str(e), retryable=False))
+            return
+        except Exception as e:
+            logger.exception(f"[JobWorker] Ошибка задачи {job.type} {job.id}: {e}")
+            await self._safe(self.queue.fail(queue_name, entry_id, job, f"{type(e).__name__}: {e}"))
+            return
+
+        await self._safe(self.queue.ack(queue_name, entry_id))
+        logger.info(f"[JobWorker] Задача {job.type} {job.id} выполнена за {time.monotonic() - started:.1f}с")
+
+    @staticmethod
+    async def _safe(operation: Awaitable) -> None:
+        try:
+            await operation
+        except Exception as e:
+            # Запись останется в pending и вернется после visibility timeout
+            logger.warning(f"[JobWorker] Ошибка подтверждения задачи: {e}")
+
+    # ------------------------------------------------------------------
+    # Отложенные задачи и visibility timeout
+    # ------------------------------------------------------------------
+
+    async def _maintenance_loop(self) -> None:
+        heartbeat_every = self.visibility_timeout / 3
+        last_heartbeat = last_reclaim = time.monotonic()
+        while self._running:
+            await asyncio.sleep(PROMOTE_INTERVAL)
+            try:
+                for name in self.queues:
+                    await self.queue.promote_due(name)
+
+                now = time.monotonic()
+                if now - last_heartbeat >= heartbeat_every:
+                    last_heartbeat = now
+                    await self._heartbeat()
+                if now - last_reclaim >= heartbeat_every:
+                    last_reclaim = now
+                    for name in self.queues:
+                        await self._reclaim(name)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[JobWorker] Ошибка обслуживания очередей: {e}")
+
+    async def _heartbeat(self) -> None:
+        """Сбрасывает время простоя выполняемых задач - их не заберут другие воркеры"""
+        by_queue: Dict[str, list] = {}
+        for queue_name, entry_id in list(self._in_flight):
+            by_queue.setdefault(queue_name, []).append(entry_id)
+        if not by_queue:
+            return
+
+        redis = await self.queue.get_redis()
+        for queue_name, entry_ids in by_queue.items():
+            await redis.xclaim(queue_name, JOB_GROUP, self.consumer, 0, entry_ids, justid=True)
+
+    async def _reclaim(self, queue_name: str) -> int:
+        """
+        Забирает задачи, простаивающие дольше visibility timeout
+
+        Их воркер упал или завис - попытка считается неудачной
+        и задача идет на повтор (или в dead letter).
+        """
+        redis = await self.queue.get_redis()
+        min_idle = int(self.visibility_timeout * 1000)
+        reclaimed = 0
+        cursor = "0-0"
+        while True:
+            response = await redis.xautoclaim(
+                queue_name, JOB_GROUP, self.consumer, min_idle, start_id=cursor, count=100
+            )
+            cursor, entries = _decode(response[0]), response[1]
+            for entry_id, fields in entries:
+                entry_id = _decode(entry_id)
+                if (queue_name, entry_id) in self._in_flight:
+                    continue
+                raw = _field(fields or {}, "job")
+                if raw is None:
+                    # Запись удалена обрезкой стрима
+                    await self.queue.ack(queue_name, entry_id)
+                    continue
+                await self.queue.fail(queue_name, entry_id, Job.loads(raw), "visibility timeout")
+                reclaimed += 1
+            if cursor == "0-0" or not entries:
+                break
+
+        if reclaimed:
+            logger.warning(f"[JobWorker] Возвращено {reclaimed} зависших задач в {queue_name}")
+        return reclaimed
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _field(fields, name: str):
+    return fields.get(name.encode()) or fields.get(name)
@@ -0,0 +1,43 @@
+"""
+Типы фоновых задач и их обработчики
+
+Продюсер ставит задачу через get_job_queue().enqueue(<очередь>, <тип>, payload),
+воркер (BOT_MODE=worker) выполняет ее обработчиком из JOB_HANDLERS.
+"""
+from typing import Dict
+from uuid import UUID
+
+from app.core.job_queue import Job, PermanentJobError, get_job_queue
+from app.core.resources import QueueNames
+from app.workers.job_worker import JobHandler
+
+# Генерация изображения по аватару, payload: {"generation_id": "<uuid>"}
+GENERATION_JOB = "generation.process"
+
+
+async def process_generation(job: Job) -> None:
+    """
+    Выполняет сохраненную генерацию (повторная доставка завершенной - no-op)
+
+    Ошибка попытки уходит в очередь на повтор; на последней попытке
+    генерация помечается FAILED и баланс возвращается.
+    """
+    from app.services.generation.core.generation_processor import GenerationProcessor
+
+    try:
+        generation_id = UUID(str(job.payload["generation_id"]))
+    except (KeyError, ValueError) as e:
+        raise PermanentJobError(f"Некорректный payload генерации: {e}")
+
+    final_attempt = job.attempt + 1 >= get_job_queue().max_attempts
+    await GenerationProcessor().run_generation(generation_id, final_attempt=final_attempt)
+
+
+JOB_HANDLERS: Dict[str, JobHandler] = {
+    GENERATION_JOB: process_generation,
+}
+
+# Очереди, которые читает воркер
+JOB_QUEUES = [
+    QueueNames.AVATAR_GENERATION,
+]
@@ -0,0 +1,327 @@
+"""
+Воркер обновлений Telegram: разбирает шарды очереди UpdateQueue
+
+Несколько реплик делят шарды через аренду в Redis: шард в каждый момент
+читает одна реплика, внутри реплики обновления одного чата выполняются
+по очереди, разные чаты - параллельно.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+import uuid
+import zlib
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from aiogram import Bot, Dispatcher
+
+from app.core.config import settings
+from app.core.update_queue import UPDATE_CONSUMER, UPDATE_GROUP, UpdateQueue
+
+logger = logging.getLogger(__name__)
+
+# Продление аренды, только если ею владеет эта реплика
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Освобождение аренды, только если ею владеет эта реплика
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Записей за один XREADGROUP на шард
+READ_BATCH = 100
+
+# Сколько XREADGROUP ждет новых записей (мс); меньше socket_timeout клиента Redis
+READ_BLOCK_MS = 1000
+
+
+class ChatSequencer:
+    """
+    Выполняет задачи одного ключа строго по очереди
+
+    Следующая задача чата стартует после завершения предыдущей, но ждет ее
+    не дольше order_timeout: долгий хендлер (генерация, транскрибация)
+    не блокирует чат навсегда. Задачи разных ключей идут параллельно.
+    """
+
+    def __init__(self, order_timeout: float):
+        self.order_timeout = order_timeout
+        self._tails: Dict[str, asyncio.Task] = {}
+
+    def submit(self, key: str, factory: Callable[[], Awaitable[None]]) -> asyncio.Task:
+        """Ставит задачу в очередь ключа"""
+        previous = self._tails.get(key)
+        task = asyncio.create_task(self._run(previous, factory))
+        self._tails[key] = task
+        task.add_done_callback(lambda t: self._forget(key, t))
+        return task
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._tails.get(key) is task:
+            del self._tails[key]
+
+    async def _run(self, previous: Optional[asyncio.Task], factory: Callable[[], Awaitable[None]]) -> None:
+        if previous is not None and not previous.done():
+            await asyncio.wait({previous}, timeout=self.order_timeout)
+        await factory()
+
+    def __len__(self) -> int:
+        return len(self._tails)
+
+
+class UpdateWorker:
+    """
+    Реплика обработки обновлений
+
+    - Аренда шардов: SET NX PX с продлением; реплики регистрируются в
+      общем ZSET и берут не больше ceil(шардов / живых реплик)
+    - Новый владелец шарда сначала дочитывает pending-записи прежнего,
+      затем новые - доставка at-least-once с сохранением порядка
+    - Запись подтверждается (XACK) после обработки хендлером
+    - Не больше UPDATE_WORKER_CONCURRENCY обновлений в обработке
+    """
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        queue: Optional[UpdateQueue] = None,
+        concurrency: Optional[int] = None,
+        lease_ttl: Optional[int] = None,
+        order_timeout: Optional[float] = None,
+    ):
+        self.dp = dp
+        self.bot = bot
+        self.queue = queue or UpdateQueue()
+        self.concurrency = max(1, concurrency or settings.UPDATE_WORKER_CONCURRENCY)
+        self.lease_ttl = max(3, lease_ttl or settings.UPDATE_LEASE_TTL)
+        self.sequencer = ChatSequencer(order_timeout or settings.UPDATE_CHAT_ORDER_TIMEOUT)
+
+        # INSTANCE_ID может совпадать у реплик одного сервиса - добавляем pid и случайный суффикс
+        self.replica_id = f"{settings.INSTANCE_ID}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._owned: Set[int] = set()        # Шарды под арендой, которые читаем
+        self._draining: Set[int] = set()     # Шарды, отдаваемые другим репликам
+        self._recovering: Dict[int, str] = {}  # Шард -> курсор чтения pending-записей
+        self._in_flight: Dict[int, int] = {}
+        self._capacity = asyncio.Event()
+        self._capacity.set()
+        self._running = False
+        self._lease_task: Optional[asyncio.Task] = None
+
+    @property
+    def _replicas_key(self) -> str:
+        return f"{self.queue.prefix}:replicas"
+
+    def _lease_key(self, shard: int) -> str:
+        return f"{self.queue.prefix}:lease:{shard}"
+
+    async def start(self) -> None:
+        """Запускает реплику и обрабатывает обновления до stop()"""
+        logger.info(f"🔄 Запуск воркера обновлений {self.replica_id}: {self.queue.shards} шардов")
+        self._running = True
+        try:
+            await self._rebalance()
+        except Exception as e:
+            # Redis недоступен - шарды будут получены в цикле продления аренды
+            logger.warning(f"[UpdateWorker] Не удалось получить шарды при запуске: {e}")
+        self._lease_task = asyncio.create_task(self._lease_loop())
+        try:
+            await self._consume_loop()
+        finally:
+            await self.stop()
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Останавливает чтение, дожидается обработки и освобождает шарды"""
+        if not self._running and self._lease_task is None:
+            return
+        self._running = False
+
+        if self._lease_task is not None:
+            self._lease_task.cancel()
+            await asyncio.gather(self._lease_task, return_exceptions=True)
+            self._lease_task = None
+
+        deadline = time.monotonic() + timeout
+        while sum(self._in_flight.values()) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+        # Неподтвержденные записи заберет следующий владелец шарда
+        for shard in list(self._owned | self._draining):
+            await self._release(shard)
+        try:
+            redis = await self.queue.get_redis()
+            await redis.zrem(self._replicas_key, self.replica_id)
+        except Exception as e:
+            logger.debug(f"[UpdateWorker] Ошибка снятия регистрации реплики: {e}")
+
+        logger.info(f"✅ Воркер обновлений {self.replica_id} остановлен")
+
+    # ------------------------------------------------------------------
+    # Аренда шардов
+    # ------------------------------------------------------------------
+
+    async def _lease_loop(self) -> None:
+        """Продлевает аренду и перераспределяет шарды"""
+        interval = self.lease_ttl / 3
+        while self._running:
+            await asyncio.sleep(interval)
+            try:
+                await self._rebalance()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[UpdateWorker] Ошибка продления аренды: {e}")
+
+    async def _rebalance(self) -> None:
+        redis = await self.queue.get_redis()
+        now = time.time()
+        ttl_ms = self.lease_ttl * 1000
+
+        # Регистрация живой реплики
+        await redis.zadd(self._replicas_key, {self.replica_id: now})
+        await redis.zremrangebyscore(self._replicas_key, "-inf", now - self.lease_ttl)
+        replicas = max(1, await redis.zcard(self._replicas_key))
+        target = math.ceil(self.queue.shards / replicas)
+
+        # Продление своих аренд
+        for shard in list(self._owned | self._draining):
+            renewed = await redis.eval(_RENEW_SCRIPT, 1, self._lease_key(shard), self.replica_id, ttl_ms)
+            if not renewed:
+                logger.warning(f"[UpdateWorker] Аренда шарда {shard} потеряна")
+                self._owned.discard(shard)
+                self._draining.discard(shard)
+                self._recovering.pop(shard, None)
+
+        # Лишние шарды отдаем после завершения их обработки
+        while len(self._owned) > target:
+            shard = max(self._owned)
+            self._owned.discard(shard)
+            self._recovering.pop(shard, None)
+            self._draining.add(shard)
+        for shard in list(self._draining):
+            if not self._in_flight.get(shard):
+                await self._release(shard)
+
+        # Недостающие берем, начиная со смещения реплики (меньше конкуренции за одни шарды)
+        if len(self._owned) < target:
+            offset = zlib.crc32(self.replica_id.encode()) % self.queue.shards
+            for i in range(self.queue.shards):
+                if len(self._owned) >= target:
+                    break
+                shard = (offset + i) % self.queue.shards
+                if shard in self._owned or shard in self._draining:
+                    continue
+                if await redis.set(self._lease_key(shard), self.replica_id, nx=True, px=ttl_ms):
+                    await self._ensure_group(shard)
+                    self._owned.add(shard)
+                    self._recovering[shard] = "0"
+                    logger.info(f"[UpdateWorker] Шард {shard} получен")
+
+    async def _release(self, shard: int) -> None:
+        self._draining.discard(shard)
+        self._owned.discard(shard)
+        self._recovering.pop(shard, None)
+        try:
+            redis = await self.queue.get_redis()
+            await redis.eval(_RELEASE_SCRIPT, 1, self._lease_key(shard), self.replica_id)
+            logger.info(f"[UpdateWorker] Шард {shard} освобожден")
+        except Exception as e:
+            logger.debug(f"[UpdateWorker] Ошибка освобождения шарда {shard}: {e}")
+
+    async def _ensure_group(self, shard: int) -> None:
+        redis = await self.queue.get_redis()
+        try:
+            await redis.xgroup_create(self.queue.stream(shard), UPDATE_GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    # ------------------------------------------------------------------
+    # Чтение и обработка
+    # ------------------------------------------------------------------
+
+    async def _consume_loop(self) -> None:
+        while self._running:
+            try:
+                free = self.concurrency - sum(self._in_flight.values())
+                if free <= 0:
+                    self._capacity.clear()
+                    await self._capacity.wait()
+                    continue
+
+                if not self._owned:
+                    await asyncio.sleep(1)
+                    continue
+
+                redis = await self.queue.get_redis()
+                batch = min(READ_BATCH, free)
+
+                if self._recovering:
+                    # Pending-записи прежнего владельца: читаем без блокировки, курсор по ID
+                    streams = {self.queue.stream(s): cursor for s, cursor in self._recovering.items()}
+                    response = await redis.xreadgroup(UPDATE_GROUP, UPDATE_CONSUMER, streams, count=batch)
+                    received = {self._shard_of(name): entries for name, entries in response or []}
+                    for shard in list(self._recovering):
+                        entries = received.get(shard)
+                        if entries:
+                            self._recovering[shard] = self._decode(entries[-1][0])
+                        else:
+                            del self._recovering[shard]
+                else:
+                    streams = {self.queue.stream(s): ">" for s in self._owned}
+                    response = await redis.xreadgroup(
+                        UPDATE_GROUP, UPDATE_CONSUMER, streams, count=batch, block=READ_BLOCK_MS
+                    )
+                    received = {self._shard_of(name): entries for name, entries in response or []}
+
+                for shard, entries in received.items():
+                    for entry_id, fields in entries:
+                        self._dispatch(shard, self._decode(entry_id), fields)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[UpdateWorker] Ошибка чтения обновлений: {e}")
+                await asyncio.sleep(1)
+
+    def _dispatch(self, shard: int, entry_id: str, fields: Dict) -> None:
+        """Передает запись в очередь ее чата"""
+        chat_key = self._decode(fields.get(b"k") or fields.get("k") or entry_id)
+        payload = fields.get(b"u") or fields.get("u")
+        self._in_flight[shard] = self._in_flight.get(shard, 0) + 1
+        self.sequencer.submit(chat_key, lambda: self._handle(shard, entry_id, payload))
+
+    async def _handle(self, shard: int, entry_id: str, payload) -> None:
+        try:
+            if payload:
+                update = json.loads(payload)
+                await self.dp.feed_raw_update(self.bot, update)
+        except Exception as e:
+            # Ошибка хендлера не должна бесконечно повторять обновление
+            logger.exception(f"[UpdateWorker] Ошибка обработки обновления {entry_id}: {e}")
+        finally:
+            try:
+                redis = await self.queue.get_redis()
+                await redis.xack(self.queue.stream(shard), UPDATE_GROUP, entry_id)
+            except Exception as e:
+                logger.warning(f"[UpdateWorker] Ошибка XACK {entry_id}: {e}")
+            self._in_flight[shard] -= 1
+            self._capacity.set()
+
+    def _shard_of(self, stream_name) -> int:
+        return int(self._decode(stream_name).rsplit(":", 1)[1])
+
+    @staticmethod
+    def _decode(value) -> str:
+        return value.decode() if isinstance(value, bytes) else str(value)
@@ -220,9 +220,15 @@ asyncio.run(main())
             exec su aisha -c "cd /app && python3 main.py"
             ;;
             
+        "update_worker")
+            log_info "📨 Запуск реплики обработки обновлений"
+            export BOT_MODE="update_worker"
+            exec su aisha -c "cd /app && python3 main.py"
+            ;;
+            
         *)
             log_error "❌ Неизвестный режим: $1"
-            log_info "Доступные режимы: polling, polling_standby, worker, webhook"
+            log_info "Доступные режимы: polling, polling_standby, worker, webhook, update_worker"
             exit 1
             ;;
     esac
@@ -6,12 +6,12 @@ setup(
     packages=find_packages(include=['app*']),
     install_requires=[
         "aiogram>=3.0.0",
-        "redis>=5.0.0",
+        "redis>=5.0.1",
         "pydantic>=2.0.0",
         "pydantic-settings>=2.0.0",
         "sqlalchemy>=2.0.0",
         "asyncpg>=0.27.0",
-        "minio>=7.0.0",
+        "minio>=7.2,<8",
         "aiohttp>=3.8.0",
     ],
     python_requires=">=3.9",
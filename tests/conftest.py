@@ -2,6 +2,8 @@
 Конфигурация pytest для интеграционных тестов
 """
 import asyncio
+import itertools
+import time
 import pytest
 import pytest_asyncio
 from typing import Generator, AsyncGenerator
@@ -82,6 +84,260 @@ async def db_session() -> AsyncGenerator[AsyncSession, None]:
     yield session
 
 
+def _bytes(value):
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+def _stream_id(value):
+    ms, _, seq = _bytes(value).decode().partition("-")
+    return int(ms), int(seq or 0)
+
+
+class FakePipeline:
+    """Пайплайн FakeRedis: команды копятся и выполняются по execute()"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self, raise_on_error=True):
+        self.redis.round_trips += 1
+        calls, self.calls = self.calls, []
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+class FakeRedis:
+    """
+    Redis в памяти для юнит-тестов
+
+    Строки, хеши, множества, ZSET и стримы с одной группой потребителей.
+    Значения отдаются в bytes, как у redis-py без decode_responses.
+    TTL запоминается (ttl/pttl), но ключи сами не истекают.
+    """
+
+    def __init__(self):
+        self.data = {}      # ключ -> bytes | dict | set
+        self.ttls = {}      # ключ -> секунды
+        self.zsets = {}     # ключ -> {member: score}
+        self.streams = {}   # stream -> [(id, fields)]
+        self.pending = {}   # (stream, id) -> [consumer, last_delivery]
+        self.delivered = {}  # stream -> индекс последней выданной записи
+        self.acked = []     # (stream, id)
+        self.ids = itertools.count(1)
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def _forget(self, key):
+        self.ttls.pop(key, None)
+        return self.data.pop(key, None) is not None or self.zsets.pop(key, None) is not None
+
+    # Строки и ключи
+
+    async def get(self, key):
+        value = self.data.get(key)
+        return None if value is None else _bytes(value)
+
+    async def set(self, key, value, ex=None, px=None, nx=False, xx=False):
+        if (nx and key in self.data) or (xx and key not in self.data):
+            return None
+        self.data[key] = _bytes(value)
+        self.ttls.pop(key, None)
+        if ex or px:
+            self.ttls[key] = ex if ex else px / 1000
+        return True
+
+    async def mget(self, keys):
+        return [await self.get(key) for key in keys]
+
+    async def setex(self, key, ttl, value):
+        return await self.set(key, value, ex=ttl)
+
+    async def getdel(self, key):
+        value = await self.get(key)
+        self._forget(key)
+        return value
+
+    async def delete(self, *keys):
+        return sum(self._forget(key) for key in keys)
+
+    async def exists(self, *keys):
+        return sum(key in self.data or key in self.zsets for key in keys)
+
+    async def incr(self, key):
+        self.data[key] = _bytes(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    async def expire(self, key, ttl):
+        if key not in self.data and key not in self.zsets:
+            return False
+        self.ttls[key] = ttl
+        return True
+
+    async def ttl(self, key):
+        if key not in self.data and key not in self.zsets:
+            return -2
+        return int(self.ttls.get(key, -1))
+
+    async def pttl(self, key):
+        ttl = await self.ttl(key)
+        return ttl * 1000 if ttl > 0 else ttl
+
+    # Хеши
+
+    async def hget(self, key, field):
+        value = self.data.get(key, {}).get(field)
+        return None if value is None else _bytes(value)
+
+    async def hset(self, key, field=None, value=None, mapping=None):
+        fields = dict(mapping or {})
+        if field is not None:
+            fields[field] = value
+        target = self.data.setdefault(key, {})
+        added = sum(name not in target for name in fields)
+        target.update({name: _bytes(v) for name, v in fields.items()})
+        return added
+
+    async def hsetnx(self, key, field, value):
+        target = self.data.setdefault(key, {})
+        if field in target:
+            return False
+        target[field] = _bytes(value)
+        return True
+
+    async def hmget(self, key, fields):
+        return [await self.hget(key, field) for field in fields]
+
+    async def hgetall(self, key):
+        return {_bytes(name): value for name, value in self.data.get(key, {}).items()}
+
+    async def hdel(self, key, *fields):
+        target = self.data.get(key, {})
+        return sum(target.pop(name, None) is not None for name in fields)
+
+    # Множества
+
+    async def sadd(self, key, *members):
+        target = self.data.setdefault(key, set())
+        added = len(set(members) - target)
+        target.update(members)
+        return added
+
+    async def sunion(self, keys):
+        result = set()
+        for key in keys:
+            result |= {_bytes(member) for member in self.data.get(key, set())}
+        return result
+
+    # ZSET
+
+    async def zadd(self, key, mapping, nx=False, xx=False):
+        target = self.zsets.setdefault(key, {})
+        added = 0
+        for member, score in mapping.items():
+            if (nx and member in target) or (xx and member not in target):
+                continue
+            added += member not in target
+            target[member] = score
+        return added
+
+    async def zrem(self, key, *members):
+        target = self.zsets.get(key, {})
+        return sum(target.pop(member, None) is not None for member in members)
+
+    async def zscore(self, key, member):
+        return self.zsets.get(key, {}).get(member)
+
+    async def zrangebyscore(self, key, min, max, start=None, num=None, withscores=False):
+        min = float("-inf") if min == "-inf" else float(min)
+        max = float("inf") if max == "+inf" else float(max)
+        items = sorted(
+            ((member, score) for member, score in self.zsets.get(key, {}).items() if min <= score <= max),
+            key=lambda item: item[1]
+        )
+        if start is not None and num is not None:
+            items = items[start:start + num]
+        if withscores:
+            return [(_bytes(member), score) for member, score in items]
+        return [_bytes(member) for member, _ in items]
+
+    # Стримы
+
+    async def xadd(self, stream, fields, maxlen=None, approximate=True):
+        entry_id = f"{next(self.ids)}-0"
+        self.streams.setdefault(stream, []).append((entry_id, dict(fields)))
+        return entry_id.encode()
+
+    async def xgroup_create(self, stream, group, id="0", mkstream=False):
+        self.streams.setdefault(stream, [])
+
+    async def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        result = []
+        for stream, cursor in streams.items():
+            if cursor != ">":
+                # Курсор по ID: pending-записи потребителя после курсора, без новых доставок
+                after = _stream_id(cursor)
+                entries = [
+                    (entry_id, fields) for entry_id, fields in self.streams.get(stream, [])
+                    if _stream_id(entry_id) > after
+                    and self.pending.get((stream, entry_id), [None])[0] == consumer
+                ][:count]
+                if entries:
+                    result.append((stream.encode(), [(i.encode(), f) for i, f in entries]))
+                continue
+            start = self.delivered.get(stream, 0)
+            entries = self.streams.get(stream, [])[start:start + count]
+            self.delivered[stream] = start + len(entries)
+            for entry_id, _ in entries:
+                self.pending[(stream, entry_id)] = [consumer, time.monotonic()]
+            if entries:
+                result.append((stream.encode(), [(i.encode(), f) for i, f in entries]))
+        if not result and block:
+            await asyncio.sleep(0.01)
+        return result
+
+    async def xack(self, stream, group, *entry_ids):
+        for entry_id in entry_ids:
+            self.pending.pop((stream, entry_id), None)
+            self.acked.append((stream, entry_id))
+        return len(entry_ids)
+
+    async def xclaim(self, stream, group, consumer, min_idle, entry_ids, justid=False):
+        for entry_id in entry_ids:
+            if (stream, entry_id) in self.pending:
+                self.pending[(stream, entry_id)] = [consumer, time.monotonic()]
+
+    async def xautoclaim(self, stream, group, consumer, min_idle, start_id="0-0", count=100):
+        claimed = []
+        for entry_id, fields in self.streams.get(stream, []):
+            owner = self.pending.get((stream, entry_id))
+            if owner and (time.monotonic() - owner[1]) * 1000 >= min_idle:
+                self.pending[(stream, entry_id)] = [consumer, time.monotonic()]
+                claimed.append((entry_id.encode(), fields))
+        return [b"0-0", claimed, []]
+
+
+@pytest.fixture
+def fake_redis() -> FakeRedis:
+    """Redis в памяти"""
+    return FakeRedis()
+
+
 # Маркеры для разных типов тестов
 pytest_markers = [
     "database: marks tests as database integration tests",
@@ -0,0 +1,108 @@
+"""
+Тесты спула аудио, ожидающего оплаты
+"""
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from app.services import storage as storage_module
+from app.services.redis_storage import AudioDataRedisStorage, PendingAudioStorage
+
+USER_ID = 42
+AUDIO = b"ID3" + b"\x00" * 1024
+QUOTE = {"cost": 10.0, "duration_minutes": 1.0}
+
+
+class FakeStorage:
+    def __init__(self):
+        self.deleted = []
+
+    async def delete_file(self, bucket, object_name):
+        self.deleted.append(object_name)
+        return True
+
+
+@pytest.fixture
+def spool(fake_redis, tmp_path):
+    return PendingAudioStorage(backend="disk", spool_dir=tmp_path, redis=fake_redis)
+
+
+def expire_all(redis, spool):
+    for member in redis.zsets[spool.expiry_key]:
+        redis.zsets[spool.expiry_key][member] = time.time() - 1
+
+
+class TestPendingAudioStorage:
+    """Выдача, возврат и сборка мусора"""
+
+    async def test_claim_is_exclusive(self, spool, fake_redis):
+        await spool.store_audio_data(USER_ID, AUDIO, {"file_name": "a.mp3"}, QUOTE)
+
+        path, file_info, quote = await spool.claim_audio_data(USER_ID)
+
+        assert Path(path).read_bytes() == AUDIO
+        assert file_info == {"file_name": "a.mp3"} and quote == QUOTE
+        # Повторное нажатие "Оплатить" ничего не находит
+        assert await spool.claim_audio_data(USER_ID) == (None, None, None)
+        assert not fake_redis.zsets[spool.expiry_key]
+
+    async def test_legacy_names_claim_the_upload(self, fake_redis, tmp_path):
+        legacy = AudioDataRedisStorage(backend="disk", spool_dir=tmp_path, redis=fake_redis)
+        await legacy.store_audio_data(USER_ID, AUDIO, {}, QUOTE)
+
+        path, _, quote = await legacy.retrieve_audio_data(USER_ID)
+
+        assert Path(path).read_bytes() == AUDIO and quote == QUOTE
+        assert await legacy.retrieve_audio_data(USER_ID) == (None, None, None)
+        assert not await legacy.clear_audio_data(USER_ID)
+
+    async def test_claimed_file_survives_new_upload_and_gc(self, spool, fake_redis):
+        await spool.store_audio_data(USER_ID, AUDIO, {}, QUOTE)
+        path, _, _ = await spool.claim_audio_data(USER_ID)
+
+        await spool.store_audio_data(USER_ID, b"new upload", {}, QUOTE)
+        expire_all(fake_redis, spool)
+        assert await spool.collect_garbage() == 1
+
+        assert os.path.exists(path)
+        await spool.discard_claimed(path)
+        assert not os.path.exists(path)
+
+    async def test_restore_after_failed_payment(self, spool):
+        await spool.store_audio_data(USER_ID, AUDIO, {"file_name": "a.mp3"}, QUOTE)
+        path, file_info, quote = await spool.claim_audio_data(USER_ID)
+
+        assert await spool.restore_audio_data(USER_ID, path, file_info, quote)
+
+        restored, _, restored_quote = await spool.claim_audio_data(USER_ID)
+        assert Path(restored).read_bytes() == AUDIO and restored_quote == QUOTE
+
+    async def test_restore_does_not_replace_newer_upload(self, spool):
+        await spool.store_audio_data(USER_ID, AUDIO, {}, QUOTE)
+        path, file_info, quote = await spool.claim_audio_data(USER_ID)
+        await spool.store_audio_data(USER_ID, b"new upload", {}, QUOTE)
+
+        assert not await spool.restore_audio_data(USER_ID, path, file_info, quote)
+
+        current, _, _ = await spool.claim_audio_data(USER_ID)
+        assert Path(current).read_bytes() == b"new upload"
+        assert not os.path.exists(path)
+
+    async def test_gc_uses_backend_of_each_upload(self, spool, fake_redis, tmp_path, monkeypatch):
+        minio = FakeStorage()
+        monkeypatch.setattr(storage_module, "get_storage_service", lambda: minio)
+
+        await spool.store_audio_data(USER_ID, AUDIO, {}, QUOTE)
+        local_file = next(tmp_path.iterdir())
+        await fake_redis.zadd(spool.expiry_key, {"minio:remote": time.time() - 1})
+        expire_all(fake_redis, spool)
+
+        # Сборщик процесса с другим AUDIO_SPOOL_BACKEND
+        other = PendingAudioStorage(backend="minio", spool_dir=tmp_path, redis=fake_redis)
+        assert await other.collect_garbage() == 2
+
+        assert not local_file.exists()
+        assert minio.deleted == ["pending-audio/remote"]
+        assert not fake_redis.zsets[spool.expiry_key]
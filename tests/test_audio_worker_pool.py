@@ -0,0 +1,89 @@
+"""
+Тесты пула процессов для обработки аудио
+"""
+import asyncio
+import math
+import operator
+import os
+import time
+
+import pytest
+
+from app.core.exceptions.audio_exceptions import AudioProcessingError, AudioWorkerBusyError
+from app.services.audio_processing import worker_pool as worker_pool_module
+from app.services.audio_processing.worker_pool import AudioWorkerPool
+
+
+@pytest.fixture
+def pool():
+    pool = AudioWorkerPool(max_workers=1, max_queue=1)
+    yield pool
+    pool.shutdown()
+
+
+class TestAudioWorkerPool:
+    """Тесты выполнения, таймаутов и backpressure"""
+
+    @pytest.mark.asyncio
+    async def test_runs_in_separate_process(self, pool):
+        assert await pool.run(operator.add, 2, 3) == 5
+        assert await pool.run(os.getpid) != os.getpid()
+        assert pool.get_stats()["completed"] == 2
+
+    @pytest.mark.asyncio
+    async def test_job_error_keeps_worker(self, pool):
+        with pytest.raises(AudioProcessingError, match="ValueError"):
+            await pool.run(math.factorial, -1)
+
+        # Воркер остается рабочим после ошибки внутри задачи
+        assert await pool.run(operator.mul, 3, 4) == 12
+
+    @pytest.mark.asyncio
+    async def test_timeout_kills_worker(self, pool):
+        started = time.monotonic()
+        with pytest.raises(AudioProcessingError, match="Превышено время"):
+            await pool.run(time.sleep, 30, timeout=0.5)
+
+        assert time.monotonic() - started < 10
+        assert pool.get_stats()["timeouts"] == 1
+        assert await pool.run(operator.add, 1, 1) == 2
+
+    @pytest.mark.asyncio
+    async def test_kill_does_not_block_event_loop(self, pool, monkeypatch):
+        joined = []
+        original = worker_pool_module._AudioWorker.kill
+
+        def kill(worker):
+            join = worker.process.join
+
+            def slow_join(timeout=None):
+                time.sleep(0.3)
+                join(timeout)
+                joined.append(worker.process.exitcode)
+
+            worker.process.join = slow_join
+            started = time.monotonic()
+            original(worker)
+            # Ожидание процесса не в event loop
+            assert time.monotonic() - started < 0.1
+
+        monkeypatch.setattr(worker_pool_module._AudioWorker, "kill", kill)
+        with pytest.raises(AudioProcessingError, match="Превышено время"):
+            await pool.run(time.sleep, 30, timeout=0.2)
+
+        for _ in range(50):
+            if joined:
+                break
+            await asyncio.sleep(0.05)
+        assert joined and joined[0] is not None
+
+    @pytest.mark.asyncio
+    async def test_queue_overflow_rejected(self, pool):
+        running = [asyncio.create_task(pool.run(time.sleep, 0.5)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(AudioWorkerBusyError):
+            await pool.run(operator.add, 1, 1)
+
+        await asyncio.gather(*running)
+        assert pool.get_stats()["rejected"] == 1
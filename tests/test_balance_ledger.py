@@ -0,0 +1,220 @@
+"""
+Тесты журнала баланса и пакетных возвратов
+"""
+import asyncio
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+
+from app.database.repositories.ledger import LedgerBatchResult, LedgerEntry, LedgerRepository
+from app.services.generation.balance.refund_batcher import RefundBatcher
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalar_one_or_none(self):
+        return self.rows[0][0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """Отдает заданные результаты запросов по порядку и запоминает запросы"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return FakeResult(result)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+class TestLedgerApply:
+    """Атомарные списания и зачисления"""
+
+    async def test_charge_is_guarded_by_balance_and_key(self):
+        session = FakeSession([(90.0,)])
+
+        result = await LedgerRepository(session).apply(uuid4(), -10.0, "charge", idempotency_key="gen:1")
+
+        assert result.applied and result.balance == 90.0
+        query = sql(session.statements[0])
+        assert "user_balances.coins >= " in query
+        assert "NOT (EXISTS" in query and "idempotency_key" in query
+
+    async def test_repeated_charge_with_same_key_is_duplicate(self):
+        # UPDATE не затронул строк, ключ уже в журнале, текущий баланс
+        session = FakeSession([], [(uuid4(),)], [(90.0,)])
+
+        result = await LedgerRepository(session).apply(uuid4(), -10.0, "charge", idempotency_key="gen:1")
+
+        assert not result.applied
+        assert result.duplicate
+        assert result.balance == 90.0
+
+    async def test_concurrent_charge_with_same_key_is_duplicate(self):
+        conflict = IntegrityError("INSERT INTO balance_transactions", {}, Exception("duplicate key"))
+        session = FakeSession(conflict, [(90.0,)])
+
+        result = await LedgerRepository(session).apply(uuid4(), -10.0, "charge", idempotency_key="gen:1")
+
+        assert result.duplicate and not result.applied
+        assert session.rollbacks == 1
+
+    async def test_insufficient_funds(self):
+        session = FakeSession([], [(5.0,)])
+
+        result = await LedgerRepository(session).apply(uuid4(), -10.0, "charge")
+
+        assert result == (False, 5.0, False, None)
+        assert len(session.statements) == 2
+
+    async def test_credit_creates_missing_balance_with_upsert(self):
+        # UPDATE без строки баланса, баланса нет, создание, повтор UPDATE
+        session = FakeSession([], [], [], [(10.0,)])
+
+        result = await LedgerRepository(session).apply(uuid4(), 10.0, "refund", idempotency_key="refund:1")
+
+        assert result.applied and result.balance == 10.0
+        assert "ON CONFLICT (user_id) DO NOTHING" in sql(session.statements[2])
+
+
+class TestLedgerApplyMany:
+    """Пакетные зачисления"""
+
+    async def test_credit_many_aggregates_users(self):
+        first, second = uuid4(), uuid4()
+        session = FakeSession(
+            [(first, 5.0, "refund:1"), (first, 3.0, "refund:2"), (second, 2.0, "refund:3")],
+            [],
+            [(first, 108.0), (second, 2.0)],
+        )
+        entries = [
+            LedgerEntry(first, 5.0, "refund", idempotency_key="refund:1"),
+            LedgerEntry(first, 3.0, "refund", idempotency_key="refund:2"),
+            LedgerEntry(second, 2.0, "refund", idempotency_key="refund:3"),
+        ]
+
+        result = await LedgerRepository(session).apply_many(entries)
+
+        assert result.balances == {first: 108.0, second: 2.0}
+        assert result.applied_keys == {"refund:1", "refund:2", "refund:3"}
+        assert "ON CONFLICT (idempotency_key) DO NOTHING" in sql(session.statements[0])
+        assert "ON CONFLICT (user_id) DO NOTHING" in sql(session.statements[1])
+        # Один UPDATE ... FROM (VALUES (user_id, delta), ...) с суммами по пользователям
+        values = list(session.statements[2].compile(dialect=postgresql.dialect()).params.values())
+        assert dict(zip(values[::2], values[1::2])) == {first: 8.0, second: 2.0}
+        assert session.commits == 1
+
+    async def test_repeated_refund_is_not_credited(self):
+        # Журнал не вставил ни одной записи - ключ уже был
+        session = FakeSession([])
+
+        result = await LedgerRepository(session).apply_many(
+            [LedgerEntry(uuid4(), 5.0, "refund", idempotency_key="refund:1")]
+        )
+
+        assert result == LedgerBatchResult({}, set())
+        assert len(session.statements) == 1
+
+
+class Recorder:
+    def __init__(self, failures: int = 0, applied=()):
+        self.failures = failures
+        self.applied = set(applied)
+        self.calls = []
+
+    async def __call__(self, entries):
+        self.calls.append(list(entries))
+        if len(self.calls) <= self.failures:
+            raise ConnectionError("db is down")
+        balances, keys = {}, set()
+        for entry in entries:
+            if entry.idempotency_key in self.applied:
+                continue
+            self.applied.add(entry.idempotency_key)
+            keys.add(entry.idempotency_key)
+            balances[entry.user_id] = balances.get(entry.user_id, 100.0) + entry.amount
+        return LedgerBatchResult(balances, keys)
+
+
+class TestRefundBatcher:
+    """Сбор возвратов в пакеты"""
+
+    async def test_refunds_in_window_are_flushed_once(self):
+        recorder = Recorder()
+        batcher = RefundBatcher(window_ms=20, max_batch=10, flush_func=recorder)
+        first, second = uuid4(), uuid4()
+
+        results = await asyncio.gather(
+            batcher.refund(first, 5.0, idempotency_key="gen:1"),
+            batcher.refund(first, 3.0),
+            batcher.refund(second, 2.0, idempotency_key="gen:3"),
+        )
+
+        assert results == [108.0, 108.0, 102.0]
+        assert len(recorder.calls) == 1
+        keys = [entry.idempotency_key for entry in recorder.calls[0]]
+        assert keys[0] == "gen:1" and keys[2] == "gen:3"
+        assert keys[1].startswith("refund:")
+
+    async def test_already_applied_refund_returns_none(self):
+        recorder = Recorder(applied={"gen:1"})
+        batcher = RefundBatcher(window_ms=20, max_batch=10, flush_func=recorder)
+        user_id = uuid4()
+
+        results = await asyncio.gather(
+            batcher.refund(user_id, 5.0, idempotency_key="gen:1"),
+            batcher.refund(user_id, 3.0, idempotency_key="gen:2"),
+        )
+
+        # Баланс получает только возврат, зачисленный этим пакетом
+        assert results == [None, 103.0]
+
+    async def test_full_batch_is_flushed_without_waiting(self):
+        recorder = Recorder()
+        batcher = RefundBatcher(window_ms=10_000, max_batch=2, flush_func=recorder)
+
+        await asyncio.wait_for(
+            asyncio.gather(batcher.refund(uuid4(), 1.0), batcher.refund(uuid4(), 1.0)),
+            timeout=1,
+        )
+
+        assert len(recorder.calls) == 1
+
+    async def test_failed_flush_is_retried_with_same_keys(self):
+        recorder = Recorder(failures=2)
+        batcher = RefundBatcher(window_ms=0, max_batch=10, flush_func=recorder, retries=2, retry_delay=0)
+
+        assert await batcher.refund(uuid4(), 5.0) == 105.0
+        assert len(recorder.calls) == 3
+        assert recorder.calls[0] == recorder.calls[1] == recorder.calls[2]
+
+    async def test_error_is_raised_after_retries(self):
+        recorder = Recorder(failures=10)
+        batcher = RefundBatcher(window_ms=0, max_batch=10, flush_func=recorder, retries=1, retry_delay=0)
+
+        with pytest.raises(ConnectionError):
+            await batcher.refund(uuid4(), 5.0)
+        assert len(recorder.calls) == 2
@@ -0,0 +1,131 @@
+"""
+Тесты CacheService: пространства имен и двухуровневый кеш
+"""
+import asyncio
+
+from app.services.cache_service import CacheService
+from tests.conftest import FakeRedis as BaseFakeRedis
+
+
+class FakeRedis(BaseFakeRedis):
+    async def keys(self, pattern):
+        raise AssertionError("KEYS не должен вызываться")
+
+
+def make_service(redis=None, **kwargs):
+    service = CacheService(**kwargs)
+
+    async def get_redis():
+        return redis
+
+    service._get_redis = get_redis
+    return service
+
+
+class TestCacheNamespaces:
+    """Инвалидация групп ключей без перебора ключей"""
+
+    async def test_invalidate_hides_old_keys_in_redis(self):
+        redis = FakeRedis()
+        service = make_service(redis)
+
+        await service.set_namespaced("gallery_optimized:u1", "page1", {"n": 1})
+        assert await service.get_namespaced("gallery_optimized:u1", "page1") == {"n": 1}
+
+        version = await service.invalidate_namespace("gallery_optimized:u1")
+
+        assert version == 1
+        assert await service.get_namespaced("gallery_optimized:u1", "page1") is None
+        # Другие пространства не затронуты
+        await service.set_namespaced("gallery_optimized:u2", "page1", {"n": 2})
+        assert await service.get_namespaced("gallery_optimized:u2", "page1") == {"n": 2}
+
+    async def test_invalidate_without_redis_uses_local_versions(self):
+        service = make_service(None)
+        await service.set_namespaced("filtered_images:u1", "f", {"image_ids": ["a"]})
+        await service.set("user:1", {"id": 1})
+
+        await service.invalidate_namespace("filtered_images:u1")
+
+        assert await service.get_namespaced("filtered_images:u1", "f") is None
+        assert await service.get("user:1") == {"id": 1}
+
+    async def test_write_with_version_read_before_load_stays_hidden(self):
+        redis = FakeRedis()
+        service = make_service(redis)
+        namespace = "gallery_optimized:u1"
+
+        # Загрузка из БД началась, затем галерею инвалидировали
+        version = await service.namespace_version(namespace)
+        await service.invalidate_namespace(namespace)
+        await service.set(await service.namespaced_key(namespace, "images", version), ["stale"])
+
+        assert await service.get_namespaced(namespace, "images") is None
+
+    async def test_flush_user_cache_does_not_scan_keys(self):
+        redis = FakeRedis()
+        service = make_service(redis)
+        await service.cache_user_balance("u1", 10)
+        await service.cache_filtered_images("u1", "no_filters", ["a"])
+
+        await service.flush_user_cache("u1")
+
+        assert await service.get_cached_balance("u1") is None
+        assert await service.get_cached_filtered_images("u1", "no_filters") is None
+
+    async def test_cached_user_is_read_from_redis(self):
+        redis = FakeRedis()
+        service = make_service(redis)
+        other = make_service(redis)
+        await service.cache_user(1, {"id": 1, "is_banned": False})
+        assert await service.get_cached_user(1) == {"id": 1, "is_banned": False}
+
+        # Другой процесс обновил пользователя - L1 не возвращает старую копию
+        await other.cache_user(1, {"id": 1, "is_banned": True})
+
+        assert await service.get_cached_user(1) == {"id": 1, "is_banned": True}
+
+
+class TestTwoTierCache:
+    """L1 процесса перед Redis"""
+
+    async def test_l1_is_bounded_by_bytes(self):
+        service = make_service(None, l1_max_bytes=100)
+        for i in range(10):
+            await service.set(f"k{i}", "x" * 20)
+
+        stats = service._local_stats()
+        assert stats["l1_bytes"] <= 100
+        assert stats["l1_evictions"] > 0
+        assert await service.get("k0") is None
+        assert await service.get("k9") == "x" * 20
+
+    async def test_redis_hit_fills_l1_and_returns_copies(self):
+        redis = FakeRedis()
+        service = make_service(redis)
+        await redis.setex("user:1", 60, b'{"id": 1}')
+
+        first = await service.get("user:1")
+        first["id"] = 2
+        trips = redis.round_trips
+        second = await service.get("user:1")
+
+        assert second == {"id": 1}
+        assert redis.round_trips == trips  # из L1, без Redis
+        assert service.l2_hits == 1
+
+    async def test_concurrent_misses_call_loader_once(self):
+        service = make_service(FakeRedis())
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"value": 42}
+
+        results = await asyncio.gather(*(service.get_or_set("hot", loader, ttl=60) for _ in range(5)))
+
+        assert calls == 1
+        assert results == [{"value": 42}] * 5
+        assert await service.get("hot") == {"value": 42}
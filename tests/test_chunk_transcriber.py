@@ -0,0 +1,163 @@
+"""
+Тесты параллельной транскрибации чанков
+"""
+import asyncio
+
+import pytest
+
+from app.services.audio_processing import segmenter as segmenter_module
+from app.services.audio_processing.chunk_transcriber import (
+    ParallelChunkTranscriber,
+    join_transcribed_chunks,
+)
+from app.services.audio_processing.segmenter import FFmpegSegmenter
+from app.services.audio_processing.types import TranscribeResult
+
+
+class FakeRecognizer:
+    """Распознаватель, возвращающий содержимое чанка как текст"""
+
+    def __init__(self, fail_times=None):
+        self.fail_times = dict(fail_times or {})
+        self.in_flight = 0
+        self.peak = 0
+
+    async def transcribe_chunk(self, audio_data: bytes, language: str = "ru") -> TranscribeResult:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            # Первые чанки отвечают дольше, чтобы порядок завершения перемешался
+            await asyncio.sleep(0.01 * (5 - int(audio_data)))
+            if self.fail_times.get(audio_data, 0) > 0:
+                self.fail_times[audio_data] -= 1
+                return TranscribeResult(success=False, error="boom")
+            return TranscribeResult(success=True, text=audio_data.decode())
+        finally:
+            self.in_flight -= 1
+
+
+class FakeFFmpeg:
+    """Процесс ffmpeg, который выдает один сегмент и продолжает нарезку"""
+
+    def __init__(self, segment: str):
+        self.returncode = None
+        self.killed = False
+        self._lines = asyncio.Queue()
+        self._lines.put_nowait(f"{segment}\n".encode())
+        self._exited = asyncio.Event()
+        self.stdout = self
+        self.stderr = self
+
+    async def readline(self):
+        return await self._lines.get()
+
+    async def read(self):
+        await self._exited.wait()
+        return b""
+
+    def kill(self):
+        self.killed = True
+        self.returncode = -9
+        self._exited.set()
+
+    async def wait(self):
+        await self._exited.wait()
+        return self.returncode
+
+
+class BlockingRecognizer:
+    def __init__(self):
+        self.started = asyncio.Event()
+
+    async def transcribe_chunk(self, audio_data: bytes, language: str = "ru") -> TranscribeResult:
+        self.started.set()
+        await asyncio.Event().wait()
+
+
+class TestParallelChunkTranscriber:
+    """Тесты порядка, повторов и прогресса"""
+
+    @pytest.mark.asyncio
+    async def test_order_concurrency_and_progress(self):
+        recognizer = FakeRecognizer()
+        transcriber = ParallelChunkTranscriber(recognizer, concurrency=2)
+        progress = []
+
+        async def on_progress(done, total):
+            progress.append((done, total))
+
+        chunks = [str(i).encode() for i in range(5)]
+        results = await transcriber.transcribe_chunks(chunks, progress_callback=on_progress)
+
+        assert [r.text for r in results] == ["0", "1", "2", "3", "4"]
+        assert recognizer.peak == 2
+        assert progress[-1] == (5, 5)
+        assert [done for done, _ in progress] == [1, 2, 3, 4, 5]
+
+    @pytest.mark.asyncio
+    async def test_failed_chunk_is_not_retried(self):
+        recognizer = FakeRecognizer(fail_times={b"3": 1})
+        calls = []
+        transcribe = recognizer.transcribe_chunk
+
+        async def counting(audio_data, language="ru"):
+            calls.append(audio_data)
+            return await transcribe(audio_data, language)
+
+        recognizer.transcribe_chunk = counting
+        transcriber = ParallelChunkTranscriber(recognizer, concurrency=4)
+
+        results = await transcriber.transcribe_chunks([str(i).encode() for i in range(5)])
+        joined = join_transcribed_chunks(results)
+
+        # Повторы делает распознаватель: каждый чанк отправлен ровно один раз
+        assert sorted(calls) == [b"0", b"1", b"2", b"3", b"4"]
+        assert not results[3].success
+        assert joined.success
+        assert joined.text == "0\n1\n2\n4"
+        assert "4" in joined.error
+
+    @pytest.mark.asyncio
+    async def test_stream_transcribes_while_producing(self, tmp_path):
+        recognizer = FakeRecognizer()
+        transcriber = ParallelChunkTranscriber(recognizer, concurrency=2)
+        started_before_end = []
+
+        async def produce():
+            for i in range(5):
+                path = tmp_path / f"chunk_{i:05d}.mp3"
+                path.write_bytes(str(i).encode())
+                yield str(path)
+                await asyncio.sleep(0.02)
+                started_before_end.append(recognizer.in_flight > 0)
+
+        results = await transcriber.transcribe_stream(produce(), expected_total=5)
+
+        assert [r.text for r in results] == ["0", "1", "2", "3", "4"]
+        assert any(started_before_end)
+        # Файлы чанков удаляются сразу после распознавания
+        assert list(tmp_path.iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_cancel_mid_stream_stops_ffmpeg(self, tmp_path, monkeypatch):
+        (tmp_path / "chunk_00000.mp3").write_bytes(b"0")
+        proc = FakeFFmpeg("chunk_00000.mp3")
+
+        async def fake_exec(*args, **kwargs):
+            return proc
+
+        monkeypatch.setattr(segmenter_module, "resolve_ffmpeg_path", lambda: "/usr/bin/ffmpeg")
+        monkeypatch.setattr(segmenter_module.asyncio, "create_subprocess_exec", fake_exec)
+
+        recognizer = BlockingRecognizer()
+        transcriber = ParallelChunkTranscriber(recognizer, concurrency=2)
+        segments = FFmpegSegmenter(segment_seconds=60, timeout=30).iter_segments("in.ogg", str(tmp_path))
+        task = asyncio.create_task(transcriber.transcribe_stream(segments))
+
+        await asyncio.wait_for(recognizer.started.wait(), timeout=1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert proc.killed
+        assert proc.returncode is not None
@@ -0,0 +1,60 @@
+"""
+Тесты записей изображений галереи
+"""
+from datetime import datetime
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.services.gallery_records import image_record, pack_record, record_attributes, unpack_record
+
+
+def generation(**fields):
+    values = dict(
+        id=uuid4(),
+        user_id=uuid4(),
+        avatar_id=uuid4(),
+        avatar=SimpleNamespace(name="Анна"),
+        result_urls=("https://minio/a.jpg",),
+        aspect_ratio="3:4",
+        is_favorite=1,
+        created_at=datetime(2026, 10, 17, 12, 30, 15),
+    )
+    values.update(fields)
+    return SimpleNamespace(**values)
+
+
+class TestImageRecords:
+    """Упаковка и восстановление записей"""
+
+    def test_round_trip(self):
+        source = generation(telegram_file_id="AgACAgIAAx")
+
+        attributes = record_attributes(unpack_record(pack_record(image_record(source))))
+
+        assert attributes == {
+            "id": source.id,
+            "user_id": source.user_id,
+            "avatar_id": source.avatar_id,
+            "avatar_name": "Анна",
+            "result_urls": ["https://minio/a.jpg"],
+            "aspect_ratio": "3:4",
+            "is_favorite": True,
+            "telegram_file_id": "AgACAgIAAx",
+            "created_at": source.created_at,
+        }
+
+    def test_generation_without_file_id_and_avatar(self):
+        # telegram_file_id не объявлен в модели - атрибута может не быть
+        record = image_record(generation(avatar_id=None, avatar=None, created_at=None, result_urls=None))
+
+        assert record["telegram_file_id"] is None
+        assert record["avatar_name"] is None and record["result_urls"] == []
+
+        attributes = record_attributes(unpack_record(pack_record(record)))
+        assert attributes["avatar_id"] is None and attributes["created_at"] is None
+
+    def test_record_without_file_id_field(self):
+        record = image_record(generation())
+        del record["telegram_file_id"]
+
+        assert record_attributes(record)["telegram_file_id"] is None
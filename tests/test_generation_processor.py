@@ -0,0 +1,132 @@
+"""
+Тесты обработки генерации: повторы через очередь задач
+"""
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from app.core.job_queue import Job
+from app.database.models.generation import GenerationStatus
+from app.services.generation.core import generation_manager as manager_module
+from app.services.generation.core import generation_processor as processor_module
+from app.services.generation.core.generation_processor import GenerationProcessor
+from app.workers import jobs as jobs_module
+
+
+class FakeManager:
+    def __init__(self, generation, avatar):
+        self.generation = generation
+        self.avatar = avatar
+        self.statuses = []
+
+    async def get_generation_by_id(self, generation_id):
+        return self.generation
+
+    async def get_avatar(self, avatar_id, user_id):
+        return self.avatar
+
+    async def update_generation(self, generation):
+        self.statuses.append(generation.status)
+
+
+class FakeBalance:
+    def __init__(self):
+        self.refunds = []
+
+    def calculate_cost(self, num_images):
+        return 5.0 * num_images
+
+    async def refund_balance(self, user_id, amount, idempotency_key=None):
+        self.refunds.append(idempotency_key)
+
+
+class FailingFal:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    async def generate_avatar_image(self, avatar, prompt, generation_config):
+        self.calls += 1
+        raise self.error
+
+
+class NoEvents:
+    async def publish(self, generation_id, status):
+        pass
+
+
+def make_generation():
+    return SimpleNamespace(
+        id=uuid4(), user_id=uuid4(), avatar_id=uuid4(), status=GenerationStatus.PENDING,
+        quality_preset="fast", aspect_ratio="1:1", num_images=1, final_prompt="portrait",
+        result_urls=None, error_message=None,
+    )
+
+
+@pytest.fixture
+def setup(monkeypatch):
+    def make(avatar=object(), error=ConnectionError("FAL недоступен")):
+        generation = make_generation()
+        manager = FakeManager(generation, avatar)
+        monkeypatch.setattr(manager_module, "GenerationManager", lambda: manager)
+        monkeypatch.setattr(processor_module, "get_generation_event_bus", lambda: NoEvents())
+
+        processor = GenerationProcessor.__new__(GenerationProcessor)
+        processor.fal_service = FailingFal(error)
+        processor.balance_manager = FakeBalance()
+        processor.config_manager = SimpleNamespace(get_generation_config=lambda *args: {})
+        processor.storage = None
+        return processor, generation, manager
+
+    return make
+
+
+class TestQueuedGeneration:
+    """Ошибки попыток и последняя попытка"""
+
+    async def test_error_before_last_attempt_is_retried(self, setup):
+        processor, generation, manager = setup()
+
+        with pytest.raises(ConnectionError):
+            await processor.run_generation(generation.id, final_attempt=False)
+
+        assert GenerationStatus.FAILED not in manager.statuses
+        assert processor.balance_manager.refunds == []
+
+    async def test_last_attempt_fails_and_refunds(self, setup):
+        processor, generation, manager = setup()
+
+        await processor.run_generation(generation.id, final_attempt=True)
+
+        assert manager.statuses[-1] == GenerationStatus.FAILED
+        assert processor.balance_manager.refunds == [f"refund:generation:{generation.id}"]
+
+    async def test_missing_avatar_is_not_retried(self, setup):
+        processor, generation, manager = setup(avatar=None)
+
+        await processor.run_generation(generation.id, final_attempt=False)
+
+        assert manager.statuses[-1] == GenerationStatus.FAILED
+        assert processor.fal_service.calls == 0
+        assert len(processor.balance_manager.refunds) == 1
+
+
+class TestGenerationJob:
+    """Номер попытки задачи -> последняя ли попытка"""
+
+    @pytest.mark.parametrize("attempt, final", [(0, False), (1, False), (2, True)])
+    async def test_final_attempt_follows_queue_limit(self, monkeypatch, attempt, final):
+        calls = []
+
+        async def run_generation(self, generation_id, final_attempt=True):
+            calls.append(final_attempt)
+
+        monkeypatch.setattr(GenerationProcessor, "__init__", lambda self: None)
+        monkeypatch.setattr(GenerationProcessor, "run_generation", run_generation)
+        monkeypatch.setattr(jobs_module, "get_job_queue", lambda: SimpleNamespace(max_attempts=3))
+
+        job = Job(type=jobs_module.GENERATION_JOB, payload={"generation_id": str(uuid4())}, attempt=attempt)
+        await jobs_module.process_generation(job)
+
+        assert calls == [final]
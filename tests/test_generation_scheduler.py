@@ -0,0 +1,76 @@
+"""
+Тесты планировщика генераций FAL AI
+"""
+import asyncio
+
+import pytest
+
+from app.services.fal.scheduler import GenerationScheduler
+
+
+class TestGenerationScheduler:
+    """Тесты лимитов и справедливой очереди планировщика"""
+
+    @pytest.mark.asyncio
+    async def test_global_limit(self):
+        """Одновременно выполняется не больше max_concurrency генераций"""
+        scheduler = GenerationScheduler(max_concurrency=3, max_per_user=10)
+        peak = 0
+
+        async def job(user_id):
+            nonlocal peak
+            async with scheduler.slot(user_id):
+                peak = max(peak, scheduler.active)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(job(i) for i in range(10)))
+
+        assert peak == 3
+        stats = scheduler.get_stats()
+        assert stats["total_started"] == 10
+        assert stats["total_completed"] == 10
+        assert stats["active"] == 0
+        assert stats["queue_depth"] == 0
+
+    @pytest.mark.asyncio
+    async def test_per_user_limit_and_fair_order(self):
+        """Пользователь с большой очередью не блокирует остальных"""
+        scheduler = GenerationScheduler(max_concurrency=2, max_per_user=1)
+        order = []
+        gate = asyncio.Event()
+
+        async def job(user_id, tag):
+            async with scheduler.slot(user_id):
+                order.append(tag)
+                await gate.wait()
+
+        tasks = [asyncio.create_task(job("heavy", f"heavy-{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(job("light", "light-0")))
+        await asyncio.sleep(0.01)
+
+        # У heavy только один слот, второй сразу достается light
+        assert order == ["heavy-0", "light-0"]
+        assert scheduler.queue_depth == 2
+
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert order[2:] == ["heavy-1", "heavy-2"]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """Отмененный ожидающий не занимает слот"""
+        scheduler = GenerationScheduler(max_concurrency=1, max_per_user=1)
+        await scheduler.acquire("a")
+
+        waiter = asyncio.create_task(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth == 1
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        assert scheduler.queue_depth == 0
+        scheduler.release("a")
+        assert scheduler.active == 0
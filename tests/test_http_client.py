@@ -0,0 +1,127 @@
+"""
+Тесты общего HTTP-клиента: пул соединений, повторы, метрики
+"""
+import asyncio
+import threading
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.core.http_client import HttpClientRegistry, HttpProfile
+
+
+@pytest.fixture
+async def server():
+    state = {"calls": 0, "peers": set(), "fail": 0}
+
+    async def flaky(request):
+        state["calls"] += 1
+        state["peers"].add(request.transport.get_extra_info("peername"))
+        if state["calls"] <= state["fail"]:
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        return web.json_response({"ok": True})
+
+    async def slow(request):
+        state["calls"] += 1
+        await asyncio.sleep(1)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_route("*", "/flaky", flaky)
+    app.router.add_route("*", "/slow", slow)
+    test_server = TestServer(app)
+    await test_server.start_server()
+    yield test_server, state
+    await test_server.close()
+
+
+def make_client(**profile):
+    profile.setdefault("timeout", 5.0)
+    profile.setdefault("backoff", 0.01)
+    return HttpClientRegistry({"default": HttpProfile("default", **profile)})
+
+
+class TestHttpClientRegistry:
+    """Переиспользование соединений и политика повторов"""
+
+    async def test_requests_reuse_pooled_connection(self, server):
+        test_server, state = server
+        client = make_client()
+        try:
+            for _ in range(5):
+                async with client.request("default", "GET", str(test_server.make_url("/flaky"))) as response:
+                    assert await response.json() == {"ok": True}
+        finally:
+            await client.close()
+
+        assert state["calls"] == 5
+        assert len(state["peers"]) == 1
+
+    async def test_retries_retryable_status_and_records_metrics(self, server):
+        test_server, state = server
+        state["fail"] = 2
+        client = make_client(retries=2)
+        try:
+            async with client.request(
+                "default", "POST", str(test_server.make_url("/flaky")), endpoint="svc/flaky", json={"a": 1}
+            ) as response:
+                assert response.status == 200
+        finally:
+            await client.close()
+
+        stats = client.stats()["svc/flaky"]
+        assert state["calls"] == 3
+        assert stats["requests"] == 3
+        assert stats["retries"] == 2
+        assert stats["statuses"] == {503: 2, 200: 1}
+
+    async def test_last_error_response_is_returned(self, server):
+        test_server, state = server
+        state["fail"] = 10
+        client = make_client(retries=1)
+        try:
+            async with client.request("default", "GET", str(test_server.make_url("/flaky"))) as response:
+                assert response.status == 503
+        finally:
+            await client.close()
+
+        assert state["calls"] == 2
+
+    async def test_post_is_not_retried_after_timeout(self, server):
+        test_server, state = server
+        client = make_client(timeout=0.1, retries=3)
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                async with client.request("default", "POST", str(test_server.make_url("/slow"))):
+                    pass
+        finally:
+            await client.close()
+
+        assert state["calls"] == 1
+
+    async def test_session_of_previous_loop_is_closed(self):
+        client = make_client()
+        other_loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+        thread.start()
+
+        async def open_session():
+            return client.session()
+
+        try:
+            old = asyncio.run_coroutine_threadsafe(open_session(), other_loop).result(timeout=5)
+
+            new = client.session()
+
+            assert new is not old
+            for _ in range(100):
+                if old.closed:
+                    break
+                await asyncio.sleep(0.01)
+            assert old.closed
+        finally:
+            await client.close()
+            other_loop.call_soon_threadsafe(other_loop.stop)
+            thread.join(timeout=5)
+            other_loop.close()
@@ -0,0 +1,78 @@
+"""
+Тесты пула процессов для обработки изображений
+"""
+import asyncio
+import io
+import os
+
+import pytest
+from PIL import Image, UnidentifiedImageError
+
+from app.services.images import image_jobs
+from app.services.images.worker_pool import ImageWorkerPool
+
+
+def make_jpeg(size=(2400, 1600), color=(200, 120, 40)) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", size, color=color).save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+@pytest.fixture
+def pool():
+    pool = ImageWorkerPool(max_workers=1, max_queue=1)
+    yield pool
+    pool.shutdown()
+
+
+class TestImageJobs:
+    """Операции Pillow без пула"""
+
+    def test_decode_meta_reads_full_size(self):
+        meta = image_jobs.decode_meta(make_jpeg())
+        assert (meta["width"], meta["height"], meta["format"]) == (2400, 1600, "JPEG")
+
+    def test_truncated_file_is_rejected(self):
+        with pytest.raises(OSError):
+            image_jobs.decode_meta(make_jpeg()[:2000])
+
+    def test_stats_on_reduced_copy(self):
+        result = image_jobs.stats(make_jpeg(color=(100, 100, 100)))
+        assert result["brightness"] == pytest.approx(100, abs=2)
+        assert result["contrast"] < 2
+
+    def test_thumbnail_and_reencode_sizes(self):
+        with Image.open(io.BytesIO(image_jobs.thumbnail(make_jpeg(), 320, fmt="WEBP"))) as thumb:
+            assert thumb.format == "WEBP"
+            assert thumb.size == (320, 213)
+
+        with Image.open(io.BytesIO(image_jobs.reencode(make_jpeg(), max_side=1200))) as image:
+            assert image.size == (1200, 800)
+            assert image.mode == "RGB"
+
+
+class TestImageWorkerPool:
+    """Выполнение в процессе и ограничение очереди"""
+
+    async def test_runs_in_separate_process(self, pool):
+        assert await pool.run(os.getpid) != os.getpid()
+
+        meta = await pool.decode_meta(make_jpeg())
+        assert meta["width"] == 2400
+        assert pool.get_stats()["completed"] == 2
+
+    async def test_job_error_is_raised(self, pool):
+        with pytest.raises(UnidentifiedImageError):
+            await pool.decode_meta(b"not an image")
+
+        assert pool.get_stats()["failed"] == 1
+        assert await pool.dhash(make_jpeg()) == image_jobs.dhash(make_jpeg())
+
+    async def test_excess_tasks_wait_for_slot(self, pool):
+        data = make_jpeg()
+        results = await asyncio.gather(*(pool.thumbnail(data, 64) for _ in range(5)))
+
+        assert len(results) == 5
+        stats = pool.get_stats()
+        assert stats["completed"] == 5
+        assert stats["pending"] == stats["waiting"] == 0
@@ -0,0 +1,165 @@
+"""
+Тесты очереди фоновых задач: повторы, dead letter, visibility timeout
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.job_queue import JOB_GROUP, Job, JobQueue, PermanentJobError
+from app.workers import job_worker
+from app.workers.job_worker import JobWorker
+from tests.conftest import FakeRedis
+
+QUEUE = "test:jobs"
+
+
+class FakeStreamsRedis(FakeRedis):
+    """FakeRedis с переносом отложенных задач (скрипт JobQueue)"""
+
+    async def eval(self, script, numkeys, delayed, stream, now, limit, maxlen):
+        due = [m for m, score in self.zsets.get(delayed, {}).items() if score <= now]
+        for member in due:
+            del self.zsets[delayed][member]
+            await self.xadd(stream, {"job": member})
+        return len(due)
+
+    def dead(self, queue):
+        return [Job.loads(f["job"]) for _, f in self.streams.get(f"{queue}:dead", [])]
+
+
+def make_queue(redis, **kwargs):
+    kwargs.setdefault("max_attempts", 3)
+    kwargs.setdefault("backoff_base", 0.01)
+    kwargs.setdefault("backoff_max", 0.01)
+    return JobQueue(redis=redis, maxlen=1000, **kwargs)
+
+
+async def run_worker(worker, until, timeout=2.0):
+    task = asyncio.create_task(worker.start())
+    deadline = time.monotonic() + timeout
+    while not until() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    await worker.stop()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+class TestJobQueue:
+    """Постановка, повтор и dead letter"""
+
+    async def test_failed_job_is_retried_then_dead_lettered(self):
+        redis = FakeStreamsRedis()
+        queue = make_queue(redis)
+        job_id = await queue.enqueue(QUEUE, "t", {"x": 1})
+        entry_id, fields = redis.streams[QUEUE][0]
+        job = Job.loads(fields["job"])
+
+        assert await queue.fail(QUEUE, entry_id, job, "boom") is True
+        assert list(redis.zsets[f"{QUEUE}:delayed"]) and not redis.dead(QUEUE)
+
+        job.attempt = 2
+        assert await queue.fail(QUEUE, entry_id, job, "boom") is False
+        dead = redis.dead(QUEUE)
+        assert [(d.id, d.attempt, d.error) for d in dead] == [(job_id, 3, "boom")]
+
+    async def test_promote_moves_only_due_jobs(self):
+        redis = FakeStreamsRedis()
+        queue = make_queue(redis)
+        await queue.enqueue(QUEUE, "later", delay=60)
+        await queue.enqueue(QUEUE, "soon", delay=0.001)
+        await asyncio.sleep(0.01)
+
+        assert await queue.promote_due(QUEUE) == 1
+        assert [Job.loads(f["job"]).type for _, f in redis.streams[QUEUE]] == ["soon"]
+
+    def test_backoff_is_exponential_and_capped(self):
+        queue = JobQueue(redis=object(), max_attempts=5, backoff_base=10, backoff_max=30)
+        assert [queue.retry_delay(a) for a in (1, 2, 3, 4)] == [10, 20, 30, 30]
+
+
+class TestJobWorker:
+    """Выполнение задач воркером"""
+
+    @pytest.fixture(autouse=True)
+    def fast_maintenance(self, monkeypatch):
+        monkeypatch.setattr(job_worker, "PROMOTE_INTERVAL", 0.01)
+
+    async def test_retries_until_success(self):
+        redis = FakeStreamsRedis()
+        queue = make_queue(redis)
+        attempts = []
+
+        async def flaky(job):
+            attempts.append(job.attempt)
+            if job.attempt < 2:
+                raise RuntimeError("temporary")
+
+        await queue.enqueue(QUEUE, "flaky")
+        worker = JobWorker({"flaky": flaky}, [QUEUE], queue=queue, visibility_timeout=30)
+        await run_worker(worker, until=lambda: len(attempts) == 3)
+
+        assert attempts == [0, 1, 2]
+        assert not redis.pending and not redis.dead(QUEUE)
+
+    async def test_permanent_error_and_unknown_type_go_to_dead_letter(self):
+        redis = FakeStreamsRedis()
+        queue = make_queue(redis)
+
+        async def broken(job):
+            raise PermanentJobError("bad payload")
+
+        await queue.enqueue(QUEUE, "broken")
+        await queue.enqueue(QUEUE, "unknown")
+        worker = JobWorker({"broken": broken}, [QUEUE], queue=queue, visibility_timeout=30)
+        await run_worker(worker, until=lambda: len(redis.dead(QUEUE)) == 2)
+
+        assert sorted(j.type for j in redis.dead(QUEUE)) == ["broken", "unknown"]
+        assert all(j.attempt == 1 for j in redis.dead(QUEUE))
+        assert not redis.pending
+
+    async def test_stale_job_of_crashed_worker_is_reclaimed(self):
+        redis = FakeStreamsRedis()
+        queue = make_queue(redis)
+        await queue.enqueue(QUEUE, "work")
+        # Воркер прочитал задачу и упал, не подтвердив ее
+        await redis.xreadgroup(JOB_GROUP, "crashed", {QUEUE: ">"}, count=1)
+
+        done = []
+
+        async def work(job):
+            done.append(job.attempt)
+
+        worker = JobWorker({"work": work}, [QUEUE], queue=queue, visibility_timeout=3)
+        worker.visibility_timeout = 0.05
+        await run_worker(worker, until=lambda: done)
+
+        assert done == [1]
+        assert not redis.pending
+
+    async def test_stop_cancels_jobs_after_timeout(self):
+        redis = FakeStreamsRedis()
+        queue = make_queue(redis)
+        await queue.enqueue(QUEUE, "slow")
+        started = asyncio.Event()
+        cancelled = []
+
+        async def slow(job):
+            started.set()
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(job.id)
+                raise
+
+        worker = JobWorker({"slow": slow}, [QUEUE], queue=queue, visibility_timeout=30)
+        task = asyncio.create_task(worker.start())
+        await asyncio.wait_for(started.wait(), 2)
+        await worker.stop(timeout=0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert len(cancelled) == 1
+        assert not worker._in_flight
+        # Задача не подтверждена и достанется другому воркеру
+        assert redis.pending and not redis.dead(QUEUE)
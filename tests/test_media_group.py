@@ -0,0 +1,76 @@
+"""
+Тесты сборки альбомов Telegram в пакеты
+"""
+import asyncio
+from types import SimpleNamespace
+
+from app.shared.utils.media_group import MediaGroupCollector
+
+
+def album_message(message_id: int, group: str = "g1", chat_id: int = 1):
+    return SimpleNamespace(message_id=message_id, media_group_id=group, chat=SimpleNamespace(id=chat_id))
+
+
+class Recorder:
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, messages, *context):
+        self.batches.append(([m.message_id for m in messages], context))
+
+
+class TestMediaGroupCollector:
+    """Пакеты альбомов"""
+
+    async def test_burst_is_flushed_once_in_order(self):
+        recorder = Recorder()
+        collector = MediaGroupCollector(recorder, delay=0.05)
+
+        for message_id in (3, 1, 2):
+            collector.add(album_message(message_id), "state", "bot")
+            await asyncio.sleep(0.01)
+
+        assert recorder.batches == []
+        await asyncio.sleep(0.1)
+
+        assert recorder.batches == [([1, 2, 3], ("state", "bot"))]
+        assert collector.pending == 0
+
+    async def test_groups_and_chats_are_separate(self):
+        recorder = Recorder()
+        collector = MediaGroupCollector(recorder, delay=0.05)
+
+        collector.add(album_message(1, group="a"))
+        collector.add(album_message(2, group="b"))
+        collector.add(album_message(3, group="a", chat_id=2))
+        await collector.drain()
+
+        assert sorted(ids for ids, _ in recorder.batches) == [[1], [2], [3]]
+
+    async def test_full_album_is_flushed_without_delay(self):
+        recorder = Recorder()
+        collector = MediaGroupCollector(recorder, delay=10, max_size=3)
+
+        for message_id in range(1, 5):
+            collector.add(album_message(message_id))
+        await asyncio.sleep(0)
+
+        assert recorder.batches == [([1, 2, 3], ())]
+
+        await collector.drain()
+        assert recorder.batches[-1] == ([4], ())
+
+    async def test_flush_error_does_not_break_collector(self):
+        calls = []
+
+        async def failing(messages):
+            calls.append(len(messages))
+            raise RuntimeError("boom")
+
+        collector = MediaGroupCollector(failing, delay=0.01)
+        collector.add(album_message(1))
+        await collector.drain()
+        collector.add(album_message(2))
+        await collector.drain()
+
+        assert calls == [1, 1]
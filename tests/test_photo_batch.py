@@ -0,0 +1,58 @@
+"""
+Тесты размещения пакета фотографий в MinIO
+"""
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.services.avatar.photo_batch import assign_upload_orders, photo_object_name, store_batch
+
+USER_ID = uuid4()
+AVATAR_ID = uuid4()
+
+
+class FakeStorage:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.objects = {}
+
+    async def upload_file(self, bucket, object_name, data, content_type=None):
+        if object_name in self.failing:
+            raise ConnectionError("minio is down")
+        self.objects[object_name] = data
+        return object_name
+
+
+def candidates(count, fmt="JPEG"):
+    validation = SimpleNamespace(metadata={"format": fmt})
+    return [(index, f"photo-{index}".encode(), f"{index}.jpg", validation) for index in range(count)]
+
+
+class TestPhotoBatch:
+    """Порядок, ключи и частичные ошибки загрузки"""
+
+    def test_order_and_key_are_assigned_together(self):
+        planned = assign_upload_orders(candidates(3, fmt="PNG"), USER_ID, AVATAR_ID, max_order=4)
+
+        assert [photo.upload_order for photo in planned] == [5, 6, 7]
+        assert planned[0].object_name == f"avatars/{USER_ID}/{AVATAR_ID}/photo_5.png"
+        assert all(
+            photo.object_name == photo_object_name(USER_ID, AVATAR_ID, photo.upload_order, "png")
+            for photo in planned
+        )
+
+    async def test_failed_upload_leaves_gap_without_key_reuse(self):
+        planned = assign_upload_orders(candidates(3), USER_ID, AVATAR_ID, max_order=0)
+        storage = FakeStorage(failing={planned[1].object_name})
+
+        stored, failed = await store_batch(storage, planned)
+
+        assert [photo.index for photo in stored] == [0, 2]
+        assert [(photo.index, type(error)) for photo, error in failed] == [(1, ConnectionError)]
+        # Записи в БД получат тот же порядок, что и в ключе
+        for photo in stored:
+            assert photo.minio_key.endswith(f"photo_{photo.upload_order}.jpeg")
+
+        # Следующий пакет начинается после max(upload_order) и не перезаписывает файлы
+        max_order = max(photo.upload_order for photo in stored)
+        following = assign_upload_orders(candidates(2), USER_ID, AVATAR_ID, max_order)
+        assert not {photo.object_name for photo in following} & set(storage.objects)
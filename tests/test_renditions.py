@@ -0,0 +1,102 @@
+"""
+Тесты производных копий фотографий
+"""
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from app.services.images import renditions as renditions_module
+from app.services.images.renditions import RENDITIONS, RenditionService, pick_rendition, rendition_key
+from app.services.images.worker_pool import ImageWorkerPool
+
+ORIGINAL = "avatars/u1/a1/photo_1.jpg"
+
+
+class FakeStorage:
+    def __init__(self):
+        self.objects = {}
+        self.downloads = []
+
+    async def upload_file(self, bucket, object_name, data, content_type=None):
+        self.objects[(bucket, object_name)] = data
+        return object_name
+
+    async def download_file(self, bucket, object_name):
+        self.downloads.append(object_name)
+        await asyncio.sleep(0.01)
+        return self.objects.get((bucket, object_name), b"")
+
+    async def delete_file(self, bucket, object_name):
+        return self.objects.pop((bucket, object_name), None) is not None
+
+
+def make_jpeg(size=(3000, 2000)) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", size, color=(10, 120, 200)).save(output, format="JPEG", quality=95)
+    return output.getvalue()
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    pool = ImageWorkerPool(max_workers=1, max_queue=4)
+    monkeypatch.setattr(renditions_module, "get_image_worker_pool", lambda: pool)
+    storage = FakeStorage()
+    storage.objects[("avatars", ORIGINAL)] = make_jpeg()
+    yield storage
+    pool.shutdown()
+
+
+class TestRenditionKeys:
+    """Выбор размера и ключи"""
+
+    def test_smallest_adequate_rendition(self):
+        assert pick_rendition(200).name == "preview"
+        assert pick_rendition(1280).name == "preview"
+        assert pick_rendition(5000).name == "preview"
+
+    def test_key_is_deterministic(self):
+        assert rendition_key(ORIGINAL, RENDITIONS[0]) == "renditions/v1/preview/avatars/u1/a1/photo_1.jpg"
+
+
+class TestRenditionService:
+    """Ленивое создание, кеш и удаление"""
+
+    async def test_legacy_photo_gets_renditions_once(self, storage):
+        service = RenditionService(storage=storage, maxbytes=10 * 1024 * 1024, ttl=60)
+
+        results = await asyncio.gather(*(service.get("avatars", ORIGINAL) for _ in range(3)))
+
+        assert results[0] == results[1] == results[2]
+        with Image.open(io.BytesIO(results[0])) as preview:
+            assert preview.format == "JPEG"
+            assert preview.size == (1280, 853)
+        assert storage.downloads.count(ORIGINAL) == 1
+        assert all(("avatars", rendition_key(ORIGINAL, r)) in storage.objects for r in RENDITIONS)
+
+        # Повторный показ - из памяти процесса, без MinIO
+        downloads = len(storage.downloads)
+        assert await service.get("avatars", ORIGINAL) == results[0]
+        assert len(storage.downloads) == downloads
+
+    async def test_stored_rendition_is_used_instead_of_original(self, storage):
+        generated = await RenditionService(storage=storage, ttl=60).generate("avatars", ORIGINAL, make_jpeg())
+        assert list(generated) == ["preview"]
+
+        service = RenditionService(storage=storage, ttl=60)
+        storage.downloads.clear()
+        preview = await service.get("avatars", ORIGINAL)
+
+        assert storage.downloads == [rendition_key(ORIGINAL, RENDITIONS[0])]
+        with Image.open(io.BytesIO(preview)) as image:
+            assert image.format == "JPEG"
+            assert max(image.size) == 1280
+
+    async def test_missing_original_and_delete(self, storage):
+        service = RenditionService(storage=storage, ttl=60)
+        assert await service.get("avatars", "avatars/u1/a1/missing.jpg") is None
+
+        await service.get("avatars", ORIGINAL)
+        await service.delete("avatars", ORIGINAL)
+        assert list(storage.objects) == [("avatars", ORIGINAL)]
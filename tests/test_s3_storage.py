@@ -0,0 +1,269 @@
+"""
+Тесты асинхронного S3-хранилища на in-process фейке S3 API
+"""
+import base64
+import hashlib
+import io
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from urllib.parse import SplitResult, parse_qsl
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from minio.credentials import Credentials
+from minio.signer import sign_v4_s3
+
+from app.services.storage.s3 import MIN_PART_SIZE, AsyncS3Storage, S3Error
+
+ACCESS_KEY = "test-access"
+SECRET_KEY = "test-secret"
+REGION = "us-east-1"
+
+
+class FakeS3:
+    """Минимальный S3: бакеты, объекты, Range, multipart и ListObjectsV2"""
+
+    def __init__(self):
+        self.buckets = {}
+        self.uploads = {}
+        self.requests = []
+        self.lifecycles = {}
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/{bucket}", self.handle_bucket)
+        app.router.add_route("*", "/{bucket}/{key:.+}", self.handle_object)
+        return app
+
+    def _check_signature(self, request: web.Request, body: bytes) -> None:
+        """Пересчитывает подпись SigV4 по тому, что реально пришло по сети"""
+        auth = request.headers["Authorization"]
+        signed = auth.split("SignedHeaders=")[1].split(",")[0].split(";")
+        assert request.headers["x-amz-content-sha256"] == hashlib.sha256(body).hexdigest()
+
+        date = datetime.strptime(request.headers["x-amz-date"], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        path, _, query = request.raw_path.partition("?")
+        expected = sign_v4_s3(
+            method=request.method,
+            url=SplitResult("http", request.host, path, query, ""),
+            region=REGION,
+            headers={name: request.headers[name] for name in signed},
+            credentials=Credentials(ACCESS_KEY, SECRET_KEY),
+            content_sha256=request.headers["x-amz-content-sha256"],
+            date=date,
+        )
+        assert expected["Authorization"] == auth
+
+    async def handle_bucket(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        self._check_signature(request, body)
+        self.requests.append((request.method, request.path))
+        bucket = request.match_info["bucket"]
+
+        if request.method == "HEAD":
+            return web.Response(status=200 if bucket in self.buckets else 404)
+        if "lifecycle" in request.query:
+            return self.handle_lifecycle(request, bucket, body)
+        if request.method == "PUT":
+            self.buckets.setdefault(bucket, {})
+            return web.Response(status=200)
+        if request.method == "GET":
+            prefix = request.query.get("prefix", "")
+            limit = int(request.query.get("max-keys", 1000))
+            delimiter = request.query.get("delimiter")
+            keys, prefixes = [], set()
+            for key in sorted(k for k in self.buckets[bucket] if k.startswith(prefix)):
+                rest = key[len(prefix):]
+                if delimiter and delimiter in rest:
+                    prefixes.add(prefix + rest.split(delimiter, 1)[0] + delimiter)
+                else:
+                    keys.append(key)
+            contents = "".join(f"<Contents><Key>{k}</Key></Contents>" for k in keys[:limit])
+            contents += "".join(f"<CommonPrefixes><Prefix>{p}</Prefix></CommonPrefixes>" for p in sorted(prefixes))
+            return web.Response(
+                text=f'<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">{contents}</ListBucketResult>'
+            )
+        return web.Response(status=405)
+
+    def handle_lifecycle(self, request: web.Request, bucket: str, body: bytes) -> web.Response:
+        if request.method == "PUT":
+            assert request.headers["Content-MD5"] == base64.b64encode(hashlib.md5(body).digest()).decode()
+            self.lifecycles[bucket] = body
+            return web.Response(status=200)
+        if bucket not in self.lifecycles:
+            return web.Response(status=404, text="<Error><Code>NoSuchLifecycleConfiguration</Code></Error>")
+        return web.Response(body=self.lifecycles[bucket])
+
+    async def handle_object(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        self._check_signature(request, body)
+        self.requests.append((request.method, request.path))
+        bucket = request.match_info["bucket"]
+        key = request.match_info["key"]
+        query = dict(parse_qsl(request.query_string, keep_blank_values=True))
+        objects = self.buckets.get(bucket)
+        if objects is None:
+            return web.Response(status=404, text="<Error><Code>NoSuchBucket</Code></Error>")
+
+        if request.method == "POST" and "uploads" in query:
+            upload_id = f"upload-{len(self.uploads) + 1}"
+            self.uploads[upload_id] = {}
+            return web.Response(text=f"<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>")
+        if request.method == "PUT" and "uploadId" in query:
+            self.uploads[query["uploadId"]][int(query["partNumber"])] = body
+            return web.Response(headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+        if request.method == "POST" and "uploadId" in query:
+            parts = self.uploads.pop(query["uploadId"])
+            objects[key] = b"".join(parts[n] for n in sorted(parts))
+            return web.Response(text="<CompleteMultipartUploadResult/>")
+        if request.method == "DELETE" and "uploadId" in query:
+            self.uploads.pop(query["uploadId"], None)
+            return web.Response(status=204)
+
+        if request.method == "PUT":
+            objects[key] = body
+            return web.Response(status=200)
+        if request.method == "DELETE":
+            objects.pop(key, None)
+            return web.Response(status=204)
+        if key not in objects:
+            return web.Response(status=404, text="<Error><Code>NoSuchKey</Code></Error>")
+
+        data = objects[key]
+        if request.method == "HEAD":
+            return web.Response(headers={"Content-Length": str(len(data)), "ETag": '"etag"'})
+        if "Range" in request.headers:
+            start, _, end = request.headers["Range"][len("bytes="):].partition("-")
+            stop = int(end) + 1 if end else len(data)
+            return web.Response(status=206, body=data[int(start):stop])
+        return web.Response(body=data)
+
+
+@pytest.fixture
+async def s3():
+    fake = FakeS3()
+    server = TestServer(fake.app())
+    await server.start_server()
+    AsyncS3Storage._known_buckets.clear()
+    AsyncS3Storage._known_rules.clear()
+    storage = AsyncS3Storage(
+        endpoint=f"{server.host}:{server.port}",
+        access_key=ACCESS_KEY,
+        secret_key=SECRET_KEY,
+        secure=False,
+        region=REGION,
+        part_size=MIN_PART_SIZE,
+    )
+    try:
+        yield storage, fake
+    finally:
+        await AsyncS3Storage.close()
+        await server.close()
+
+
+class TestAsyncS3Storage:
+    """Операции AsyncS3Storage поверх фейкового S3"""
+
+    async def test_upload_download_roundtrip(self, s3):
+        storage, fake = s3
+
+        result = await storage.upload_file("media", "dir/файл 1.txt", b"hello", "text/plain")
+
+        assert result == "dir/файл 1.txt"
+        assert fake.buckets["media"]["dir/файл 1.txt"] == b"hello"
+        assert await storage.download_file("media", "dir/файл 1.txt") == b"hello"
+        assert await storage.file_exists("media", "dir/файл 1.txt")
+        assert not await storage.file_exists("media", "missing")
+        assert await storage.download_file("media", "missing") == b""
+
+    async def test_bucket_checked_once(self, s3):
+        storage, fake = s3
+
+        await storage.upload_file("media", "a", b"1")
+        await storage.upload_file("media", "b", b"2")
+
+        assert [r for r in fake.requests if r == ("HEAD", "/media")] == [("HEAD", "/media")]
+
+    async def test_ranged_and_streaming_reads(self, s3):
+        storage, _ = s3
+        data = bytes(range(256)) * 100
+        await storage.upload_file("media", "blob", data)
+
+        assert await storage.download_range("media", "blob", 10, 19) == data[10:20]
+        assert await storage.download_range("media", "blob", 25500) == data[25500:]
+
+        chunks = [chunk async for chunk in storage.iter_object("media", "blob", chunk_size=4096)]
+        assert b"".join(chunks) == data
+
+        with pytest.raises(S3Error):
+            async for _ in storage.iter_object("media", "missing"):
+                pass
+
+    async def test_large_upload_uses_multipart(self, s3):
+        storage, fake = s3
+        data = b"a" * MIN_PART_SIZE + b"b" * MIN_PART_SIZE + b"c" * 1000
+
+        await storage.upload_file("audio", "big.mp3", data, "audio/mpeg")
+
+        assert fake.buckets["audio"]["big.mp3"] == data
+        assert sum(1 for method, path in fake.requests if method == "PUT" and path == "/audio/big.mp3") == 3
+        assert not fake.uploads
+
+    async def test_upload_stream_unknown_length(self, s3):
+        storage, fake = s3
+        data = b"x" * (MIN_PART_SIZE + 123)
+
+        await storage.upload_stream("audio", "stream.bin", io.BytesIO(data))
+        await storage.upload_stream("audio", "small.bin", io.BytesIO(b"small"))
+
+        assert fake.buckets["audio"]["stream.bin"] == data
+        assert fake.buckets["audio"]["small.bin"] == b"small"
+
+    async def test_delete_and_list(self, s3):
+        storage, _ = s3
+        for name in ("p/1", "p/2", "q/1"):
+            await storage.upload_file("media", name, b"-")
+
+        assert await storage.list_objects_with_prefix("media", "p/") == ["p/1", "p/2"]
+        assert await storage.delete_file("media", "p/1")
+        assert await storage.list_objects_with_prefix("media", "p/", limit=5) == ["p/2"]
+
+    async def test_list_is_not_recursive_by_default(self, s3):
+        storage, _ = s3
+        for name in ("p/1", "p/sub/2", "p/sub/3"):
+            await storage.upload_file("media", name, b"-")
+
+        assert await storage.list_objects_with_prefix("media", "p/") == ["p/1", "p/sub/"]
+        assert await storage.list_objects_with_prefix("media", "p/", recursive=True) == ["p/1", "p/sub/2", "p/sub/3"]
+
+    async def test_presigned_url_is_local(self, s3):
+        storage, fake = s3
+
+        url = await storage.generate_presigned_url("media", "a b.jpg", expires=10 ** 9)
+
+        assert "/media/a%20b.jpg?" in url
+        assert "X-Amz-Expires=604800" in url
+        assert "X-Amz-Signature=" in url
+        assert not fake.requests
+
+    async def test_expiration_rule_keeps_other_rules(self, s3):
+        storage, fake = s3
+        fake.lifecycles["media"] = (
+            b'<LifecycleConfiguration xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            b"<Rule><ID>other</ID><Filter><Prefix>tmp/</Prefix></Filter><Status>Enabled</Status>"
+            b"<Expiration><Days>1</Days></Expiration></Rule>"
+            b"</LifecycleConfiguration>"
+        )
+
+        await storage.ensure_expiration_rule("media", "archives", "archives/", 3)
+        await storage.ensure_expiration_rule("media", "archives", "archives/", 3)
+        AsyncS3Storage._known_rules.clear()
+        await storage.ensure_expiration_rule("media", "archives", "archives/", 8)
+
+        rules = {
+            rule.findtext("ID"): (rule.findtext("Filter/Prefix"), rule.findtext("Expiration/Days"))
+            for rule in ET.fromstring(fake.lifecycles["media"]).findall("Rule")
+        }
+        assert rules == {"other": ("tmp/", "1"), "archives": ("archives/", "8")}
+        assert fake.requests.count(("PUT", "/media")) == 3  # бакет + два правила
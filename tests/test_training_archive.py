@@ -0,0 +1,226 @@
+"""
+Тесты потоковой сборки архива для обучения
+"""
+import asyncio
+import io
+import zipfile
+
+import pytest
+
+from app.core import temp_files
+from app.core.config import settings
+from app.services.cache_service import CacheService
+from app.services.fal.files import file_manager as file_manager_module
+from app.services.fal.files.file_manager import FalFileManager
+from app.services.fal.files.zip_stream import ChunkStreamReader, iter_zip_stored
+
+JPEG = b"\xff\xd8\xff\xe0" + b"jpeg-data" * 1000
+PNG = b"\x89PNG\r\n\x1a\n" + b"png-data" * 1000
+
+
+async def entries(items):
+    for item in items:
+        await asyncio.sleep(0)
+        yield item
+
+
+class FakeStorage:
+    def __init__(self):
+        self.objects = {}
+        self.uploads = 0
+        self.reads = 0
+        self.unreadable = set()
+        self.rules = []
+
+    async def stat_object(self, bucket, object_name):
+        data = self.objects.get((bucket, object_name))
+        return {"size": len(data), "etag": str(hash(data))} if data is not None else None
+
+    async def download_file(self, bucket, object_name):
+        self.reads += 1
+        await asyncio.sleep(0.01)
+        if object_name in self.unreadable:
+            return b""
+        return self.objects.get((bucket, object_name), b"")
+
+    async def ensure_expiration_rule(self, bucket, rule_id, prefix, days):
+        self.rules.append((bucket, prefix, days))
+
+    async def upload_stream(self, bucket, object_name, stream, length=None, content_type=None):
+        self.uploads += 1
+        buffer = b""
+        while chunk := await stream.read(1024):
+            buffer += chunk
+        self.objects[(bucket, object_name)] = buffer
+        return object_name
+
+    async def delete_file(self, bucket, object_name):
+        return self.objects.pop((bucket, object_name), None) is not None
+
+    async def generate_presigned_url(self, bucket, object_name, expires=3600):
+        return f"https://minio/{bucket}/{object_name}"
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    cache = CacheService()
+
+    async def no_redis():
+        return None
+
+    cache._get_redis = no_redis
+    monkeypatch.setattr(file_manager_module, "cache_service", cache)
+    monkeypatch.setattr(settings, "FAL_ARCHIVE_STORAGE", "minio")
+
+    manager = FalFileManager()
+    manager.minio_storage = FakeStorage()
+    bucket = settings.MINIO_BUCKET_AVATARS
+    manager.minio_storage.objects.update({
+        (bucket, "avatars/u/a/photo_1.jpg"): JPEG,
+        (bucket, "avatars/u/a/photo_2.png"): PNG,
+    })
+    return manager
+
+
+def read_zip(data: bytes):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        return {info.filename: (info.compress_type, archive.read(info)) for info in archive.infolist()}
+
+
+class TestZipStream:
+    """Запись ZIP_STORED кусками"""
+
+    async def test_archive_is_readable_and_stored(self):
+        chunks = [chunk async for chunk in iter_zip_stored(entries([("a.jpg", JPEG), ("b.png", PNG)]))]
+
+        assert len(chunks) == 3
+        assert read_zip(b"".join(chunks)) == {
+            "a.jpg": (zipfile.ZIP_STORED, JPEG),
+            "b.png": (zipfile.ZIP_STORED, PNG),
+        }
+
+    async def test_same_entries_give_same_archive(self):
+        first = b"".join([c async for c in iter_zip_stored(entries([("a.jpg", JPEG)]))])
+        second = b"".join([c async for c in iter_zip_stored(entries([("a.jpg", JPEG)]))])
+        assert first == second
+
+    async def test_reader_returns_requested_sizes(self):
+        reader = ChunkStreamReader(entries([b"abc", b"defgh", b"ij"]))
+        assert await reader.read(4) == b"abcd"
+        assert await reader.read(100) == b"efghij"
+        assert await reader.read(4) == b""
+        assert reader.bytes_read == 10
+
+
+class TestFalFileManager:
+    """Сборка, загрузка и кеш архива"""
+
+    async def test_archive_is_streamed_to_minio_and_cached(self, manager):
+        keys = ["avatars/u/a/photo_1.jpg", "avatars/u/a/photo_2.png", "avatars/u/a/missing.jpg"]
+
+        first = await manager.download_and_create_archive(keys, "avatar-1")
+        second = await manager.download_and_create_archive(keys, "avatar-2")
+
+        assert first == second
+        assert first.startswith("https://minio/avatars/training_archives/")
+        assert manager.minio_storage.uploads == 1
+
+        object_name = first.split("/avatars/", 1)[1]
+        archive = manager.minio_storage.objects[(settings.MINIO_BUCKET_AVATARS, object_name)]
+        assert read_zip(archive) == {
+            "photo_001.jpg": (zipfile.ZIP_STORED, JPEG),
+            "photo_002.png": (zipfile.ZIP_STORED, PNG),
+        }
+
+    async def test_changed_photo_rebuilds_archive(self, manager):
+        keys = ["avatars/u/a/photo_1.jpg"]
+        first = await manager.download_and_create_archive(keys, "avatar-1")
+
+        manager.minio_storage.objects[(settings.MINIO_BUCKET_AVATARS, keys[0])] = JPEG + b"edited"
+        second = await manager.download_and_create_archive(keys, "avatar-1")
+
+        assert first != second
+        assert manager.minio_storage.uploads == 2
+
+    async def test_fal_target_uploads_spooled_file(self, manager, monkeypatch, tmp_path):
+        monkeypatch.setattr(settings, "FAL_ARCHIVE_STORAGE", "fal")
+        monkeypatch.setattr(temp_files, "TEMP_BASE_DIR", str(tmp_path))
+        uploaded = {}
+
+        async def fake_upload(file_path):
+            with open(file_path, "rb") as f:
+                uploaded[file_path] = f.read()
+            return "https://fal.media/archive.zip"
+
+        manager._upload_archive_to_fal = fake_upload
+        url = await manager.download_and_create_archive(["avatars/u/a/photo_1.jpg"], "avatar-1")
+
+        (file_path, data), = uploaded.items()
+        assert url == "https://fal.media/archive.zip"
+        assert file_path.endswith(".zip")
+        assert read_zip(data) == {"photo_001.jpg": (zipfile.ZIP_STORED, JPEG)}
+        assert manager.minio_storage.uploads == 0
+        # Временный файл удален после загрузки
+        assert list(tmp_path.iterdir()) == []
+
+    async def test_fal_upload_outlives_cache(self, manager, monkeypatch, tmp_path):
+        import fal_client
+
+        monkeypatch.setattr(settings, "FAL_ARCHIVE_CACHE_TTL", 7 * 24 * 3600)
+        monkeypatch.setattr(settings, "FAL_API_KEY", "key")
+        calls = []
+
+        class FakeAsyncClient:
+            def __init__(self, key):
+                pass
+
+            async def upload_file(self, path, lifecycle=None):
+                calls.append(lifecycle)
+                return "https://fal.media/archive.zip"
+
+        monkeypatch.setattr(fal_client, "AsyncClient", FakeAsyncClient)
+        archive = tmp_path / "archive.zip"
+        archive.write_bytes(b"zip")
+
+        assert await manager._upload_archive_to_fal(str(archive)) == "https://fal.media/archive.zip"
+        assert calls[0].expires_in > settings.FAL_ARCHIVE_CACHE_TTL
+
+    async def test_no_readable_photos(self, manager):
+        assert await manager.download_and_create_archive(["avatars/u/a/missing.jpg"], "avatar-1") is None
+
+    async def test_unreadable_photo_fails_without_caching(self, manager):
+        keys = ["avatars/u/a/photo_1.jpg", "avatars/u/a/photo_2.png"]
+        manager.minio_storage.unreadable.add(keys[1])
+
+        assert await manager.download_and_create_archive(keys, "avatar-1") is None
+        assert not any(name.startswith("training_archives/") for _, name in manager.minio_storage.objects)
+
+        # Неудачная сборка не закеширована: после восстановления архив собирается
+        manager.minio_storage.unreadable.clear()
+        url = await manager.download_and_create_archive(keys, "avatar-1")
+        object_name = url.split("/avatars/", 1)[1]
+        archive = manager.minio_storage.objects[(settings.MINIO_BUCKET_AVATARS, object_name)]
+        assert len(read_zip(archive)) == 2
+
+    async def test_read_ahead_is_bounded(self, manager, monkeypatch):
+        monkeypatch.setattr(settings, "FAL_ARCHIVE_READ_CONCURRENCY", 2)
+        bucket = settings.MINIO_BUCKET_AVATARS
+        keys = [f"avatars/u/a/photo_{i}.jpg" for i in range(6)]
+        manager.minio_storage.objects.update({(bucket, key): JPEG for key in keys})
+
+        names = []
+        async for name, _ in manager._iter_minio_photos(bucket, keys):
+            names.append(name)
+            await asyncio.sleep(0.05)
+            # Прочитано не больше окна сверх того, что уже ушло в архив
+            assert manager.minio_storage.reads <= len(names) + 2
+
+        assert len(names) == 6
+
+    async def test_archives_expire_after_cache(self, manager, monkeypatch):
+        monkeypatch.setattr(settings, "FAL_ARCHIVE_CACHE_TTL", 7 * 24 * 3600)
+
+        await manager.download_and_create_archive(["avatars/u/a/photo_1.jpg"], "avatar-1")
+
+        assert manager.minio_storage.rules == [(settings.MINIO_BUCKET_AVATARS, "training_archives/", 8)]
@@ -0,0 +1,174 @@
+"""
+Тесты планировщика опроса обучений FAL
+"""
+import asyncio
+import json
+import sys
+import time
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from app.core.config import settings
+from app.services.avatar.fal_training_service import training_poller as poller_module
+from app.services.avatar.fal_training_service.training_poller import (
+    DUE_KEY,
+    LEASE_KEY,
+    REGISTRY_KEY,
+    TrainingPoller,
+)
+from tests.conftest import FakeRedis
+
+
+class LeaseRedis(FakeRedis):
+    """FakeRedis со скриптами продления и освобождения аренды"""
+
+    def __init__(self):
+        super().__init__()
+        self.renewals = 0
+
+    async def eval(self, script, numkeys, key, owner, *args):
+        if await self.get(key) != owner.encode():
+            return 0
+        if "pexpire" in script:
+            self.renewals += 1
+            return 1
+        return await self.delete(key)
+
+
+class StatusRecorder:
+    """Подменяет status_checker: запоминает обработанные статусы"""
+
+    def __init__(self):
+        self.updates = []
+
+    async def _process_status_update(self, avatar_id, request_id, training_type, status_data):
+        self.updates.append((request_id, status_data["status"]))
+
+
+@pytest.fixture
+def redis():
+    return LeaseRedis()
+
+
+@pytest.fixture
+def status_checker(monkeypatch):
+    recorder = StatusRecorder()
+    module = SimpleNamespace(status_checker=recorder)
+    monkeypatch.setitem(sys.modules, "app.services.avatar.fal_training_service.status_checker", module)
+    return recorder
+
+
+@pytest.fixture
+def poller(redis, status_checker, monkeypatch):
+    poller = TrainingPoller(redis=redis)
+
+    async def no_reconcile():
+        return 0
+
+    async def still_training(avatar_id):
+        return True
+
+    poller.reconcile = no_reconcile
+    monkeypatch.setattr(poller, "_is_still_training", still_training)
+    return poller
+
+
+async def register(poller, redis, count=1, age=0.0):
+    request_ids = [f"req-{i}" for i in range(count)]
+    for request_id in request_ids:
+        await poller.register(uuid4(), request_id, "portrait", initial_delay=0)
+        entry = json.loads(await redis.hget(REGISTRY_KEY, request_id))
+        entry["registered_at"] -= age
+        await redis.hset(REGISTRY_KEY, request_id, json.dumps(entry))
+        redis.zsets[DUE_KEY][request_id] = time.time() - 1
+    return request_ids
+
+
+class TestLease:
+    """Аренда держится весь проход"""
+
+    async def test_lease_is_renewed_during_long_batch(self, poller, redis, monkeypatch):
+        monkeypatch.setattr(poller_module, "LEASE_RENEW_SECONDS", 0.01)
+        await register(poller, redis)
+
+        async def slow_status(request_id, training_type):
+            await asyncio.sleep(0.05)
+            return {"status": "IN_PROGRESS"}
+
+        poller.fetch_status = slow_status
+        await poller.tick()
+
+        assert redis.renewals >= 2
+        assert poller._is_leader
+
+    async def test_lost_lease_stops_new_polls(self, poller, redis, monkeypatch):
+        monkeypatch.setattr(poller_module, "LEASE_RENEW_SECONDS", 0.01)
+        monkeypatch.setattr(settings, "FAL_TRAINING_POLL_CONCURRENCY", 1)
+        await register(poller, redis, count=3)
+        polled = []
+
+        async def status_and_lose_lease(request_id, training_type):
+            polled.append(request_id)
+            # Пока идет запрос, аренду забирает другая реплика
+            await redis.set(LEASE_KEY, "other-replica")
+            await asyncio.sleep(0.05)
+            return {"status": "IN_PROGRESS"}
+
+        poller.fetch_status = status_and_lose_lease
+        await poller.tick()
+
+        assert len(polled) == 1
+        assert not poller._is_leader
+
+    async def test_follower_does_not_poll(self, poller, redis):
+        await redis.set(LEASE_KEY, "other-replica")
+        await register(poller, redis)
+
+        async def fail(request_id, training_type):
+            raise AssertionError("опрашивает только владелец аренды")
+
+        poller.fetch_status = fail
+        await poller.tick()
+
+
+class TestMaxAge:
+    """Обучения, превысившие FAL_TRAINING_POLL_MAX_AGE"""
+
+    async def test_stale_training_marks_avatar_failed(self, poller, redis, status_checker):
+        request_id, = await register(poller, redis, age=settings.FAL_TRAINING_POLL_MAX_AGE + 60)
+
+        async def in_progress(request_id, training_type):
+            return {"status": "IN_PROGRESS"}
+
+        poller.fetch_status = in_progress
+        await poller.tick()
+
+        assert status_checker.updates == [(request_id, "FAILED")]
+        assert await redis.hget(REGISTRY_KEY, request_id) is None
+        assert request_id not in redis.zsets[DUE_KEY]
+
+    async def test_stale_training_completed_in_fal_is_processed(self, poller, redis, status_checker):
+        request_id, = await register(poller, redis, age=settings.FAL_TRAINING_POLL_MAX_AGE + 60)
+
+        async def completed(request_id, training_type):
+            return {"status": "COMPLETED"}
+
+        poller.fetch_status = completed
+        await poller.tick()
+
+        assert status_checker.updates == [(request_id, "COMPLETED")]
+        assert await redis.hget(REGISTRY_KEY, request_id) is None
+
+    async def test_fresh_training_is_rescheduled(self, poller, redis, status_checker):
+        request_id, = await register(poller, redis)
+
+        async def in_progress(request_id, training_type):
+            return {"status": "IN_PROGRESS"}
+
+        poller.fetch_status = in_progress
+        await poller.tick()
+
+        assert not status_checker.updates
+        assert redis.zsets[DUE_KEY][request_id] > time.time()
@@ -0,0 +1,80 @@
+"""
+Тесты кеша переводов промптов
+"""
+import asyncio
+
+import pytest
+
+from app.services.cache_service import CacheService
+from app.services.generation.prompt.translation import cache as translation_cache
+from app.services.generation.prompt.translation.cache import GPTTranslationCache, translation_cache_key
+
+
+@pytest.fixture
+def translations(monkeypatch):
+    """Кеш переводов поверх CacheService без Redis и с подставным GPT"""
+    service = CacheService()
+
+    async def no_redis():
+        return None
+
+    service._get_redis = no_redis
+    monkeypatch.setattr(translation_cache, "cache_service", service)
+
+    cache = GPTTranslationCache(maxsize=16, ttl=60)
+    cache.responses = {}
+
+    async def fake_request(model, system_prompt, text, api_key, max_tokens):
+        cache.gpt_calls += 1
+        await asyncio.sleep(0.01)
+        return cache.responses.get(text.strip())
+
+    cache._request = fake_request
+    return cache
+
+
+class TestTranslationKey:
+    """Адресация по содержимому"""
+
+    def test_normalized_text_shares_key(self):
+        assert translation_cache_key("gpt-4o", "sys", "Мужчина  в\tКОСТЮМЕ\n") == \
+            translation_cache_key("gpt-4o", "sys", " Мужчина в КОСТЮМЕ")
+
+    def test_case_changes_key(self):
+        assert translation_cache_key("gpt-4o", "sys", "Мужчина в КОСТЮМЕ") != \
+            translation_cache_key("gpt-4o", "sys", "мужчина в костюме")
+
+    def test_model_and_instructions_change_key(self):
+        base = translation_cache_key("gpt-4o", "sys", "текст")
+        assert translation_cache_key("gpt-4o-mini", "sys", "текст") != base
+        assert translation_cache_key("gpt-4o", "sys v2", "текст") != base
+
+
+class TestGPTTranslationCache:
+    """Повторные и одновременные переводы"""
+
+    async def test_repeated_prompt_calls_gpt_once(self, translations):
+        translations.responses["портрет в офисе"] = "portrait in office"
+
+        first = await translations.translate("gpt-4o", "sys", "портрет в офисе", "key")
+        second = await translations.translate("gpt-4o", "sys", " портрет  в офисе\n", "key")
+
+        assert first == second == "portrait in office"
+        assert translations.gpt_calls == 1
+
+    async def test_concurrent_identical_prompts_are_coalesced(self, translations):
+        translations.responses["улица"] = "street"
+
+        results = await asyncio.gather(
+            *(translations.translate("gpt-4o", "sys", "улица", "key") for _ in range(5))
+        )
+
+        assert results == ["street"] * 5
+        assert translations.gpt_calls == 1
+
+    async def test_failed_translation_is_not_cached(self, translations):
+        assert await translations.translate("gpt-4o", "sys", "дом", "key") is None
+
+        translations.responses["дом"] = "house"
+        assert await translations.translate("gpt-4o", "sys", "дом", "key") == "house"
+        assert translations.gpt_calls == 2
@@ -0,0 +1,66 @@
+"""
+Тесты LRU-кеша процесса с TTL
+"""
+from app.core.lru import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    """Вытеснение по размеру и истечение записей"""
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1  # "a" становится самой свежей
+
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert len(cache) == 2
+
+    def test_entries_expire(self):
+        clock = FakeClock()
+        cache = TTLCache(maxsize=10, ttl=30, clock=clock)
+        cache.set("user", {"id": 1})
+        cache.set("short", 1, ttl=5)
+
+        clock.now = 10
+        assert cache.get("short") is None
+        assert cache.get("user") == {"id": 1}
+
+        clock.now = 31
+        assert cache.get("user") is None
+        assert len(cache) == 0
+
+    def test_pop_and_counters(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("k", "v")
+
+        assert cache.pop("k") == "v"
+        assert cache.pop("k") is None
+        assert cache.get("k") is None
+        assert (cache.hits, cache.misses) == (0, 1)
+
+    def test_evicts_by_bytes(self):
+        cache = TTLCache(maxsize=100, ttl=60, maxbytes=10)
+        cache.set("a", b"12345")
+        cache.set("b", b"12345")
+        cache.set("c", b"123")
+
+        assert cache.get("a") is None
+        assert cache.currbytes == 8
+        assert cache.evictions == 1
+
+        cache.set("huge", b"x" * 11)
+        assert cache.get("huge") is None
+        assert len(cache) == 2
@@ -0,0 +1,226 @@
+"""
+Тесты рантайма обновлений: шардирование, порядок по чатам, прием webhook
+"""
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.core.config import settings
+from app.core.update_queue import update_chat_key, update_shard
+from app.core.webhook_server import setup_webhook_routes
+from app.workers.update_worker import ChatSequencer, UpdateWorker
+
+
+def _message(update_id, chat_id, text="hi"):
+    return {
+        "update_id": update_id,
+        "message": {"message_id": update_id, "chat": {"id": chat_id}, "from": {"id": chat_id}, "text": text},
+    }
+
+
+class TestUpdateSharding:
+    """Ключ чата и номер шарда"""
+
+    def test_chat_key_variants(self):
+        callback = {
+            "update_id": 2,
+            "callback_query": {"id": "1", "from": {"id": 7}, "message": {"chat": {"id": -100}}},
+        }
+        inline = {"update_id": 3, "inline_query": {"id": "1", "from": {"id": 8}, "query": ""}}
+
+        assert update_chat_key(_message(1, 42)) == "c42"
+        assert update_chat_key(callback) == "c-100"
+        assert update_chat_key(inline) == "u8"
+        assert update_chat_key({"update_id": 4}) == "x4"
+
+    def test_shard_is_stable(self):
+        shards = {update_shard(update_chat_key(_message(i, 42)), 16) for i in range(10)}
+
+        assert len(shards) == 1
+        assert 0 <= shards.pop() < 16
+
+
+class TestChatSequencer:
+    """Порядок выполнения внутри чата и параллельность между чатами"""
+
+    async def test_same_chat_runs_in_order(self):
+        sequencer = ChatSequencer(order_timeout=5)
+        order = []
+
+        def job(name, delay):
+            async def _run():
+                await asyncio.sleep(delay)
+                order.append(name)
+            return _run
+
+        tasks = [
+            sequencer.submit("c1", job("first", 0.05)),
+            sequencer.submit("c1", job("second", 0.0)),
+            sequencer.submit("c2", job("other", 0.0)),
+        ]
+        await asyncio.gather(*tasks)
+
+        assert order == ["other", "first", "second"]
+        assert len(sequencer) == 0
+
+    async def test_order_timeout_unblocks_chat(self):
+        sequencer = ChatSequencer(order_timeout=0.05)
+        release = asyncio.Event()
+        done = []
+
+        async def slow():
+            await release.wait()
+
+        async def fast():
+            done.append("fast")
+
+        slow_task = sequencer.submit("c1", slow)
+        await asyncio.wait_for(sequencer.submit("c1", fast), timeout=1)
+
+        assert done == ["fast"]
+        release.set()
+        await slow_task
+
+    async def test_failed_handler_does_not_block_chat(self):
+        sequencer = ChatSequencer(order_timeout=5)
+        done = []
+
+        async def broken():
+            raise RuntimeError("boom")
+
+        async def next_one():
+            done.append(True)
+
+        first = sequencer.submit("c1", broken)
+        await sequencer.submit("c1", next_one)
+
+        assert done == [True]
+        with pytest.raises(RuntimeError):
+            await first
+
+
+class FakeDispatcher:
+    def __init__(self):
+        self.updates = []
+
+    async def feed_raw_update(self, bot, update):
+        await asyncio.sleep(0.01 if update["update_id"] == 1 else 0)
+        self.updates.append(update["update_id"])
+
+
+class TestUpdateWorkerDispatch:
+    """Обработка прочитанных записей реплики"""
+
+    async def test_entries_processed_in_chat_order_and_acked(self, fake_redis):
+        from app.core.update_queue import UpdateQueue
+
+        redis = fake_redis
+        dp = FakeDispatcher()
+        worker = UpdateWorker(dp, bot=None, queue=UpdateQueue(redis=redis, shards=4))
+
+        worker._dispatch(0, "1-0", {b"k": b"c1", b"u": b'{"update_id": 1}'})
+        worker._dispatch(0, "2-0", {b"k": b"c1", b"u": b'{"update_id": 2}'})
+        assert worker._in_flight[0] == 2
+
+        await asyncio.gather(*worker.sequencer._tails.values())
+        await asyncio.sleep(0)
+
+        assert dp.updates == [1, 2]
+        assert [entry for _, entry in redis.acked] == ["1-0", "2-0"]
+        assert worker._in_flight[0] == 0
+
+    async def test_new_owner_recovers_pending_entries_after_crash(self, fake_redis):
+        from app.core.update_queue import UPDATE_CONSUMER, UPDATE_GROUP, UpdateQueue
+
+        redis = fake_redis
+        queue = UpdateQueue(redis=redis, shards=4)
+        stream = queue.stream(0)
+        for update_id in (1, 2):
+            await redis.xadd(stream, {b"k": b"c1", b"u": f'{{"update_id": {update_id}}}'.encode()})
+
+        # Прежний владелец прочитал записи и упал до XACK
+        await redis.xreadgroup(UPDATE_GROUP, UPDATE_CONSUMER, {stream: ">"}, count=10)
+        await redis.xadd(stream, {b"k": b"c1", b"u": b'{"update_id": 3}'})
+        assert len(redis.pending) == 2
+
+        dp = FakeDispatcher()
+        worker = UpdateWorker(dp, bot=None, queue=queue)
+        worker._running = True
+        worker._owned.add(0)
+        worker._recovering[0] = "0"
+        consumer = asyncio.create_task(worker._consume_loop())
+        try:
+            for _ in range(100):
+                if len(dp.updates) == 3:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            worker._running = False
+            consumer.cancel()
+            await asyncio.gather(consumer, return_exceptions=True)
+
+        assert dp.updates == [1, 2, 3]
+        assert worker._recovering == {}
+        assert redis.pending == {}
+
+
+class FakeQueue:
+    def __init__(self, fail=False):
+        self.published = []
+        self.fail = fail
+
+    async def publish(self, update):
+        if self.fail:
+            raise ConnectionError("redis down")
+        self.published.append(update)
+        return "1-0"
+
+
+@pytest.fixture
+def webhook_secret(monkeypatch):
+    monkeypatch.setattr(settings, "TELEGRAM_WEBHOOK_SECRET", "s3cret")
+    return "s3cret"
+
+
+class TestWebhookIngress:
+    """Прием обновлений aiohttp-сервером"""
+
+    async def _client(self, queue):
+        app = setup_webhook_routes(web.Application(), queue, path="/tg")
+        client = TestClient(TestServer(app))
+        await client.start_server()
+        return client
+
+    async def test_update_is_queued(self, webhook_secret):
+        queue = FakeQueue()
+        client = await self._client(queue)
+        try:
+            response = await client.post(
+                "/tg", json=_message(1, 42), headers={"X-Telegram-Bot-Api-Secret-Token": webhook_secret}
+            )
+            assert response.status == 200
+            assert queue.published == [_message(1, 42)]
+        finally:
+            await client.close()
+
+    async def test_wrong_secret_rejected(self, webhook_secret):
+        queue = FakeQueue()
+        client = await self._client(queue)
+        try:
+            response = await client.post("/tg", json=_message(1, 42), headers={"X-Telegram-Bot-Api-Secret-Token": "x"})
+            assert response.status == 401
+            assert queue.published == []
+        finally:
+            await client.close()
+
+    async def test_queue_failure_asks_telegram_to_retry(self, webhook_secret):
+        client = await self._client(FakeQueue(fail=True))
+        try:
+            response = await client.post(
+                "/tg", json=_message(1, 42), headers={"X-Telegram-Bot-Api-Secret-Token": webhook_secret}
+            )
+            assert response.status == 503
+        finally:
+            await client.close()
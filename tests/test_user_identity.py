@@ -0,0 +1,232 @@
+"""
+Тесты определения пользователя: кеш личностей, middleware и upsert
+"""
+import asyncio
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.database.repositories.user import UserRepository
+from app.services import user_identity
+from app.services.user_identity import UserIdentityCache, current_user, get_current_user
+from app.shared.middlewares import user_middleware
+from app.shared.middlewares.user_middleware import UserMiddleware
+
+TG_USER = SimpleNamespace(
+    id=42, first_name="Анна", last_name=None, username="anna",
+    language_code="ru", is_premium=False, is_bot=False,
+)
+
+
+def snapshot(**fields):
+    values = {"id": str(uuid4()), "telegram_id": "42", "first_name": "Анна"}
+    values.update(fields)
+    return values
+
+
+class SlowLoader:
+    """Подменяет _load: считает вызовы и отдает снимок по сигналу"""
+
+    def __init__(self, result=None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.result = result or snapshot()
+
+    async def __call__(self, tg_user, auto_register):
+        self.calls += 1
+        await self.release.wait()
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+@pytest.fixture
+def identity(monkeypatch):
+    cache = UserIdentityCache(maxsize=16, ttl=60)
+    # Подписка на сбросы не нужна
+    monkeypatch.setattr(cache, "_ensure_listener", lambda: None)
+    return cache
+
+
+class TestResolve:
+    """Одна загрузка на пачку обновлений"""
+
+    async def test_concurrent_requests_share_one_load(self, identity):
+        loader = SlowLoader()
+        identity._load = loader
+
+        tasks = [asyncio.create_task(identity.resolve(TG_USER)) for _ in range(3)]
+        await asyncio.sleep(0)
+        loader.release.set()
+        users = await asyncio.gather(*tasks)
+
+        assert loader.calls == 1
+        assert {user.first_name for user in users} == {"Анна"}
+
+    async def test_waiters_get_leader_error(self, identity):
+        loader = SlowLoader(RuntimeError("db down"))
+        identity._load = loader
+
+        tasks = [asyncio.create_task(identity.resolve(TG_USER)) for _ in range(2)]
+        await asyncio.sleep(0)
+        loader.release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert not identity._inflight
+
+    async def test_cancelled_leader_does_not_hang_waiters(self, identity):
+        loader = SlowLoader()
+        identity._load = loader
+
+        leader = asyncio.create_task(identity.resolve(TG_USER))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(identity.resolve(TG_USER))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        loader.release.set()
+        user = await asyncio.wait_for(waiter, timeout=1)
+
+        assert leader.cancelled()
+        assert user.first_name == "Анна"
+        # Ожидающий загрузил пользователя сам
+        assert loader.calls == 2
+
+    async def test_cancelled_waiter_does_not_cancel_load(self, identity):
+        loader = SlowLoader()
+        identity._load = loader
+
+        leader = asyncio.create_task(identity.resolve(TG_USER))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(identity.resolve(TG_USER))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        await asyncio.sleep(0)
+        loader.release.set()
+
+        assert (await leader).first_name == "Анна"
+        assert waiter.cancelled()
+
+    async def test_second_resolve_is_served_from_lru(self, identity, monkeypatch):
+        cached = snapshot()
+        lookups = []
+
+        async def get_cached_user(key):
+            lookups.append(key)
+            return cached
+
+        monkeypatch.setattr(user_identity.cache_service, "get_cached_user", get_cached_user)
+
+        first = await identity.resolve(TG_USER)
+        second = await identity.resolve(TG_USER)
+
+        assert lookups == ["42"]
+        assert first.id == second.id
+
+
+class TestUserMiddleware:
+    """Пользователь в data["user"] и current_user"""
+
+    async def test_user_is_set_for_handler_and_reset(self, monkeypatch):
+        user = SimpleNamespace(telegram_id="42")
+        resolved = SimpleNamespace(resolve=None)
+
+        async def resolve(tg_user):
+            return user
+
+        resolved.resolve = resolve
+        monkeypatch.setattr(user_middleware, "get_user_identity_cache", lambda: resolved)
+        seen = {}
+
+        async def handler(event, data):
+            seen["data"] = data["user"]
+            seen["current"] = get_current_user(42)
+            return "ok"
+
+        result = await UserMiddleware()(handler, object(), {"event_from_user": TG_USER})
+
+        assert result == "ok"
+        assert seen == {"data": user, "current": user}
+        assert current_user.get() is None
+
+    async def test_resolve_error_gives_no_user(self, monkeypatch):
+        async def resolve(tg_user):
+            raise RuntimeError("redis down")
+
+        monkeypatch.setattr(
+            user_middleware, "get_user_identity_cache", lambda: SimpleNamespace(resolve=resolve)
+        )
+        data = {"event_from_user": TG_USER}
+
+        async def handler(event, data):
+            return data["user"]
+
+        assert await UserMiddleware()(handler, object(), data) is None
+
+    async def test_bots_and_anonymous_updates_are_skipped(self, monkeypatch):
+        def no_cache():
+            raise AssertionError("кеш пользователей не должен вызываться")
+
+        monkeypatch.setattr(user_middleware, "get_user_identity_cache", no_cache)
+
+        async def handler(event, data):
+            return "user" in data
+
+        bot = SimpleNamespace(id=1, is_bot=True)
+        assert await UserMiddleware()(handler, object(), {"event_from_user": bot}) is False
+        assert await UserMiddleware()(handler, object(), {}) is False
+
+
+class FakeResult:
+    def __init__(self, row):
+        self.row = row
+
+    def one(self):
+        return self.row
+
+
+class FakeSession:
+    def __init__(self, row):
+        self.row = row
+        self.statements = []
+        self.commits = 0
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return FakeResult(self.row)
+
+    async def commit(self):
+        self.commits += 1
+
+
+class TestUpsertByTelegramId:
+    """Регистрация одним INSERT ... ON CONFLICT"""
+
+    async def test_single_upsert_returns_created_flag(self):
+        user = SimpleNamespace(telegram_id="42")
+        session = FakeSession((user, True))
+
+        result = await UserRepository(session).upsert_by_telegram_id(
+            {"telegram_id": "42", "first_name": "Анна", "is_blocked": False},
+            ("first_name",),
+        )
+
+        assert result == (user, True)
+        assert len(session.statements) == 1 and session.commits == 1
+        query = str(session.statements[0].compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (telegram_id) DO UPDATE SET first_name = excluded.first_name" in query
+        assert "(xmax = 0) AS inserted" in query
+        # Блокировка не входит в обновляемые поля
+        assert "is_blocked = excluded" not in query
+
+    async def test_existing_user_is_not_created(self):
+        session = FakeSession((SimpleNamespace(telegram_id="42"), False))
+
+        _, created = await UserRepository(session).upsert_by_telegram_id({"telegram_id": "42"}, ())
+
+        assert created is False
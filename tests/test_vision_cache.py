@@ -0,0 +1,63 @@
+"""
+Тесты кеша анализа изображений: перцептивный хеш и поиск копий
+"""
+import io
+import random
+
+from PIL import Image
+
+from app.services.generation.vision_cache import VisionAnalysisCache, hamming
+from app.services.images.image_jobs import dhash
+from tests.conftest import FakeRedis
+
+
+def make_image(seed: int, size=(640, 480), fmt="JPEG", quality=90) -> bytes:
+    rng = random.Random(seed)
+    image = Image.new("RGB", (16, 12))
+    image.putdata([tuple(rng.randrange(256) for _ in range(3)) for _ in range(16 * 12)])
+    image = image.resize(size, Image.Resampling.BICUBIC)
+    output = io.BytesIO()
+    image.save(output, format=fmt, quality=quality)
+    return output.getvalue()
+
+
+ANALYSIS = {"analysis": "portrait", "prompt": "TOK, cinematic portrait"}
+
+
+class TestDHash:
+    """Хеш устойчив к перекодированию и различает изображения"""
+
+    def test_reencoded_copy_is_close(self):
+        original = dhash(make_image(1))
+        copy = dhash(make_image(1, size=(320, 240), fmt="PNG"))
+        recompressed = dhash(make_image(1, quality=40))
+
+        assert hamming(original, copy) <= 3
+        assert hamming(original, recompressed) <= 3
+
+    def test_different_images_are_far(self):
+        assert hamming(dhash(make_image(1)), dhash(make_image(2))) > 10
+
+
+class TestVisionAnalysisCache:
+    """Поиск сохраненного анализа"""
+
+    async def test_lookup_by_file_id_and_near_duplicate(self):
+        cache = VisionAnalysisCache(redis=FakeRedis(), ttl=60)
+        image_hash = dhash(make_image(3))
+        await cache.store("v", image_hash, ANALYSIS, file_unique_id="AQAD1")
+
+        assert await cache.get_by_file_id("v", "AQAD1") == ANALYSIS
+        assert await cache.get_by_hash("v", image_hash) == ANALYSIS
+        # Перекодированная копия: хеш отличается в паре бит
+        assert await cache.get_by_hash("v", image_hash ^ 0b101) == ANALYSIS
+
+    async def test_other_image_and_variant_miss(self):
+        cache = VisionAnalysisCache(redis=FakeRedis(), ttl=60)
+        image_hash = dhash(make_image(4))
+        await cache.store("v", image_hash, ANALYSIS)
+
+        assert await cache.get_by_hash("v", image_hash ^ 0xFFFF) is None
+        assert await cache.get_by_hash("v", dhash(make_image(5))) is None
+        assert await cache.get_by_hash("other", image_hash) is None
+        assert await cache.get_by_file_id("v", "unknown") is None